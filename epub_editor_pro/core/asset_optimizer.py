@@ -0,0 +1,91 @@
+import mimetypes
+import zipfile
+from dataclasses import dataclass
+from typing import Optional
+
+# Formats that are already compressed; deflating them again costs CPU time
+# and rarely saves a byte.
+PRECOMPRESSED_MEDIA_TYPES = {
+    "image/jpeg",
+    "image/png",
+    "image/gif",
+    "image/webp",
+    "font/woff",
+    "font/woff2",
+    "application/font-woff",
+    "application/font-woff2",
+    "audio/mpeg",
+    "audio/mp4",
+    "audio/ogg",
+    "video/mp4",
+    "video/webm",
+    "application/zip",
+}
+
+# Text formats compress very well and are small, so the best level is cheap.
+COMPRESSION_LEVELS = {
+    "application/xhtml+xml": 9,
+    "text/html": 9,
+    "text/css": 9,
+    "image/svg+xml": 9,
+    "application/x-dtbncx+xml": 9,
+    "application/oebps-package+xml": 9,
+    "application/javascript": 9,
+    "text/javascript": 9,
+}
+DEFAULT_COMPRESSION_LEVEL = 6
+
+# Extensions missing from the standard mimetypes table on some platforms.
+EXTRA_MEDIA_TYPES = {
+    ".xhtml": "application/xhtml+xml",
+    ".ncx": "application/x-dtbncx+xml",
+    ".opf": "application/oebps-package+xml",
+    ".woff": "font/woff",
+    ".woff2": "font/woff2",
+    ".webp": "image/webp",
+}
+
+
+@dataclass(frozen=True)
+class CompressionPolicy:
+    """How a ZIP member should be compressed."""
+    compress_type: int
+    level: Optional[int] = None
+
+
+def guess_media_type(name: str) -> Optional[str]:
+    """Guesses the media type of an archive entry from its extension."""
+    extension = "." + name.rsplit(".", 1)[-1].lower() if "." in name else ""
+    return EXTRA_MEDIA_TYPES.get(extension) or mimetypes.guess_type(name)[0]
+
+
+def choose_compression(media_type: Optional[str]) -> CompressionPolicy:
+    """Chooses the compression for a member from its media type."""
+    if media_type in PRECOMPRESSED_MEDIA_TYPES:
+        return CompressionPolicy(zipfile.ZIP_STORED)
+    return CompressionPolicy(
+        zipfile.ZIP_DEFLATED, COMPRESSION_LEVELS.get(media_type, DEFAULT_COMPRESSION_LEVEL)
+    )
+
+
+@dataclass
+class AssetOptimizationReport:
+    """What a save did and, with asset optimization, what it saved."""
+    members: int = 0
+    copied_members: int = 0  # Copied without decompressing
+    stored_members: int = 0  # Written uncompressed
+    deflated_members: int = 0
+    deflate_skipped_bytes: int = 0  # Uncompressed bytes that were not deflated
+    bytes_before: int = 0  # Size of the original archive
+    bytes_after: int = 0  # Size of the new archive
+    compress_seconds: float = 0.0  # Time spent compressing, summed over workers
+    elapsed_seconds: float = 0.0  # Wall-clock time of the whole save
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+    @property
+    def seconds_saved(self) -> float:
+        """Compression time hidden by running the workers in parallel."""
+        return max(0.0, self.compress_seconds - self.elapsed_seconds)
@@ -0,0 +1,206 @@
+import json
+import re
+from dataclasses import asdict, dataclass, field, fields
+from fnmatch import fnmatchcase
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import soupsieve
+from bs4 import BeautifulSoup, NavigableString
+
+RULESET_VERSION = 1
+YAML_SUFFIXES = {".yaml", ".yml"}
+
+
+class RuleSetError(ValueError):
+    """Raised for rulesets that cannot be read, written or compiled."""
+    pass
+
+
+@dataclass(frozen=True)
+class ReplaceRule:
+    """A single find/replace rule of a batch operation."""
+    find: str
+    replace: str = ""
+    case_sensitive: bool = False
+    whole_word: bool = False
+    regex: bool = False
+    # Glob patterns matched against manifest hrefs and ids; empty for every document.
+    items: Tuple[str, ...] = ()
+    # Only text inside elements matching this CSS selector is replaced.
+    selector: Optional[str] = None
+    enabled: bool = True
+
+    def __post_init__(self):
+        # Rules are cache keys of compile_ruleset; keep them hashable.
+        if isinstance(self.items, str):
+            object.__setattr__(self, "items", (self.items,))
+        elif not isinstance(self.items, tuple):
+            object.__setattr__(self, "items", tuple(self.items or ()))
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["items"] = list(self.items)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ReplaceRule":
+        if not isinstance(data, dict):
+            raise RuleSetError(f"A rule must be a mapping, not {type(data).__name__}.")
+        unknown = set(data) - {f.name for f in fields(cls)}
+        if unknown:
+            raise RuleSetError(f"Unknown rule keys: {', '.join(sorted(unknown))}.")
+        if not data.get("find"):
+            raise RuleSetError("Every rule needs a non-empty 'find'.")
+        return cls(**data)
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    """An ordered list of rules; each rule sees the output of the previous ones."""
+    rules: Tuple[ReplaceRule, ...] = ()
+    name: Optional[str] = None
+
+    def __post_init__(self):
+        if not isinstance(self.rules, tuple):
+            object.__setattr__(self, "rules", tuple(self.rules))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": RULESET_VERSION,
+            "name": self.name,
+            "rules": [rule.to_dict() for rule in self.rules],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RuleSet":
+        if not isinstance(data, dict) or not isinstance(data.get("rules", []), list):
+            raise RuleSetError("A ruleset must be a mapping with a 'rules' list.")
+        version = data.get("version", RULESET_VERSION)
+        if version != RULESET_VERSION:
+            raise RuleSetError(f"Unsupported ruleset version: {version}.")
+        return cls(
+            rules=tuple(ReplaceRule.from_dict(rule) for rule in data.get("rules", [])),
+            name=data.get("name"),
+        )
+
+
+def _yaml():
+    try:
+        import yaml
+    except ImportError:
+        raise RuleSetError("YAML rulesets require PyYAML; use a .json file instead.")
+    return yaml
+
+
+def load_ruleset(path: Path) -> RuleSet:
+    """Loads a ruleset from a JSON file, or a YAML file if PyYAML is installed."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            if path.suffix.lower() in YAML_SUFFIXES:
+                yaml = _yaml()
+                try:
+                    data = yaml.safe_load(f)
+                except yaml.YAMLError as e:
+                    raise RuleSetError(f"Invalid YAML in {path}: {e}")
+            else:
+                data = json.load(f)
+    except json.JSONDecodeError as e:
+        raise RuleSetError(f"Invalid JSON in {path}: {e}")
+    except OSError as e:
+        raise RuleSetError(f"Could not read {path}: {e}")
+    return RuleSet.from_dict(data)
+
+
+def save_ruleset(ruleset: RuleSet, path: Path):
+    """Saves a ruleset as JSON, or YAML for .yaml/.yml paths."""
+    data = ruleset.to_dict()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            if path.suffix.lower() in YAML_SUFFIXES:
+                _yaml().safe_dump(data, f, sort_keys=False, allow_unicode=True)
+            else:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+    except OSError as e:
+        raise RuleSetError(f"Could not write {path}: {e}")
+
+
+@dataclass
+class CompiledRule:
+    """A rule with its pattern and selector compiled."""
+    rule: ReplaceRule
+    pattern: re.Pattern
+    selector: Optional[soupsieve.SoupSieve] = None
+
+    def applies_to(self, href: str, item_id: str) -> bool:
+        if not self.rule.items:
+            return True
+        return any(
+            fnmatchcase(href, pattern) or fnmatchcase(item_id, pattern)
+            for pattern in self.rule.items
+        )
+
+    def text_nodes(self, soup: BeautifulSoup) -> Iterator[NavigableString]:
+        """Yields the editable text nodes in the rule's scope."""
+        scopes = self.selector.select(soup) if self.selector is not None else [soup]
+        seen = set()
+        for scope in scopes:
+            for node in scope.find_all(string=True):
+                # Nested matches would otherwise yield the same node twice.
+                if id(node) in seen or node.parent.name in ("style", "script"):
+                    continue
+                seen.add(id(node))
+                yield node
+
+
+@dataclass
+class CompiledRuleSet:
+    """A ruleset ready to be applied to any number of books."""
+    ruleset: RuleSet
+    rules: List[CompiledRule] = field(default_factory=list)
+
+    def rules_for(self, href: str, item_id: str) -> List[CompiledRule]:
+        return [rule for rule in self.rules if rule.applies_to(href, item_id)]
+
+
+def _compile_rule(rule: ReplaceRule) -> CompiledRule:
+    find = rule.find if rule.regex else re.escape(rule.find)
+    if rule.whole_word:
+        find = r"\b" + find + r"\b"
+    try:
+        pattern = re.compile(find, 0 if rule.case_sensitive else re.IGNORECASE)
+    except re.error as e:
+        raise RuleSetError(f"Invalid regular expression {rule.find!r}: {e}") from e
+    selector = None
+    if rule.selector:
+        try:
+            selector = soupsieve.compile(rule.selector)
+        except soupsieve.SelectorSyntaxError as e:
+            raise RuleSetError(f"Invalid CSS selector {rule.selector!r}: {e}") from e
+    return CompiledRule(rule, pattern, selector)
+
+
+@lru_cache(maxsize=32)
+def _compile_cached(ruleset: RuleSet) -> CompiledRuleSet:
+    return CompiledRuleSet(
+        ruleset, [_compile_rule(rule) for rule in ruleset.rules if rule.enabled]
+    )
+
+
+def compile_ruleset(ruleset: RuleSet) -> CompiledRuleSet:
+    """
+    Compiles the enabled rules of a ruleset.
+
+    Rulesets are immutable, so compiled forms are cached and shared
+    between every book the ruleset is applied to.
+
+    Raises:
+        RuleSetError: If a pattern or selector is invalid, or a field holds
+            a value of the wrong type.
+    """
+    try:
+        return _compile_cached(ruleset)
+    except TypeError as e:
+        raise RuleSetError(f"Invalid ruleset: {e}") from e
@@ -0,0 +1,299 @@
+import json
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+from lxml import etree
+
+from epub_editor_pro.core.book_statistics import parse_body
+from epub_editor_pro.core.epub_loader import EpubLoader
+from epub_editor_pro.core.epub_model import EpubBook
+from epub_editor_pro.core.normalized_text import BLOCK_ELEMENTS, SKIPPED_ELEMENTS
+
+log = logging.getLogger(__name__)
+
+FORMAT_TEXT = "text"
+FORMAT_MARKDOWN = "markdown"
+FORMAT_JSONL = "jsonl"
+FORMAT_EXTENSIONS = {FORMAT_TEXT: ".txt", FORMAT_MARKDOWN: ".md", FORMAT_JSONL: ".jsonl"}
+
+# Markdown written around the text of inline elements.
+INLINE_MARKUP = {"em": "*", "i": "*", "strong": "**", "b": "**", "code": "`"}
+
+# Chapters buffered per book between its reader and the writer; readers
+# block when their queue is full, so a slow output slows them down.
+DEFAULT_QUEUE_SIZE = 64
+
+
+@dataclass
+class ExportedChapter:
+    """The extracted text of one spine document."""
+    index: int  # Position in the exported sequence, from 0
+    href: str
+    title: Optional[str]
+    text: str
+
+
+@dataclass
+class ExportReport:
+    """The result of exporting one or more books."""
+    books: int = 0
+    chapters: int = 0
+    errors: List[Tuple[str, str]] = field(default_factory=list)  # (book, message)
+
+
+def extract_text(content: bytes, markdown: bool = False) -> str:
+    """
+    Extracts the text of an XHTML document as paragraphs separated by
+    blank lines, optionally with Markdown headings, lists, quotes and
+    emphasis.
+    """
+    body = parse_body(content)
+    if body is None:
+        return ""
+
+    blocks: List[str] = []
+    current: List[str] = []
+    prefixes: List[str] = []
+    skipped = 0
+
+    def flush():
+        text = " ".join("".join(current).split())
+        if text:
+            blocks.append("".join(prefixes) + text if markdown else text)
+        current.clear()
+
+    for event, element in etree.iterwalk(body, events=("start", "end")):
+        if not isinstance(element.tag, str):
+            # Comments and processing instructions: only their tail is text.
+            if event == "end" and element.tail and not skipped:
+                current.append(element.tail)
+            continue
+        name = etree.QName(element).localname.lower()
+        if event == "start":
+            if name in SKIPPED_ELEMENTS:
+                skipped += 1
+                continue
+            if skipped:
+                continue
+            if name in BLOCK_ELEMENTS:
+                flush()
+                prefixes.append(_block_prefix(name))
+            elif markdown and name in INLINE_MARKUP:
+                current.append(INLINE_MARKUP[name])
+            if element.text:
+                current.append(element.text)
+        else:
+            if name in SKIPPED_ELEMENTS:
+                skipped -= 1
+            elif skipped:
+                continue
+            elif name in BLOCK_ELEMENTS:
+                flush()
+                prefixes.pop()
+            elif markdown and name in INLINE_MARKUP:
+                current.append(INLINE_MARKUP[name])
+            if element.tail and element is not body and not skipped:
+                current.append(element.tail)
+    flush()
+    return "\n\n".join(blocks)
+
+
+def _block_prefix(name: str) -> str:
+    if len(name) == 2 and name[0] == "h" and name[1].isdigit():
+        return "#" * int(name[1]) + " "
+    if name == "li":
+        return "- "
+    if name == "blockquote":
+        return "> "
+    return ""
+
+
+def iter_chapters(book: EpubBook, markdown: bool = False) -> Iterator[ExportedChapter]:
+    """
+    Yields the text of the book's spine documents in reading order.
+
+    Documents are read one at a time and not kept in the content cache,
+    so memory use does not grow with the size of the book. Edited
+    documents are exported as edited.
+    """
+    content_manager = book.content_manager
+    navigation = book.navigation
+    seen = set()
+    index = 0
+    for spine_item in book.spine:
+        item = book.manifest.get(spine_item.idref)
+        if item is None or "html" not in item.media_type or item.href in seen:
+            continue
+        seen.add(item.href)
+        try:
+            content = content_manager.get_content(item.href, cache=False)
+        except FileNotFoundError:
+            log.warning("Skipping missing spine document %s", item.href)
+            continue
+        title = navigation.title_for(item.href) if navigation is not None else None
+        yield ExportedChapter(index, item.href, title, extract_text(content, markdown))
+        index += 1
+
+
+def format_chapter(chapter: ExportedChapter, fmt: str, book: str = "") -> str:
+    """Formats a chapter as a piece of output, including its trailing newlines."""
+    if fmt == FORMAT_JSONL:
+        record = {
+            "book": book,
+            "index": chapter.index,
+            "href": chapter.href,
+            "title": chapter.title,
+            "text": chapter.text,
+        }
+        return json.dumps(record, ensure_ascii=False) + "\n"
+    if not chapter.text:
+        return ""
+    return chapter.text + "\n\n"
+
+
+class BookExporter:
+    """
+    Exports the text of many books in one of the supported formats.
+
+    Books are read in parallel, each by one thread walking its spine.
+    Chapters are handed to the writers as they are extracted, and readers
+    wait for a slow output instead of buffering whole books.
+    """
+
+    def __init__(self, fmt: str = FORMAT_TEXT, max_workers: Optional[int] = None,
+                 queue_size: int = DEFAULT_QUEUE_SIZE):
+        if fmt not in FORMAT_EXTENSIONS:
+            raise ValueError(f"Unknown export format: {fmt!r}.")
+        self.fmt = fmt
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.queue_size = queue_size
+
+    def _chapters(self, path: Path) -> Iterator[ExportedChapter]:
+        loader = EpubLoader(path)
+        try:
+            book = loader.load()
+        finally:
+            loader.close()
+        try:
+            yield from iter_chapters(book, markdown=self.fmt == FORMAT_MARKDOWN)
+        finally:
+            book.content_manager.close()
+
+    def export_book(self, path: Path, output: TextIO) -> int:
+        """
+        Writes one book to an open text stream.
+
+        Returns:
+            The number of chapters written.
+        """
+        count = 0
+        for chapter in self._chapters(path):
+            output.write(format_chapter(chapter, self.fmt, str(path)))
+            count += 1
+        return count
+
+    def export_to_directory(self, paths: Iterable[Path], directory: Path) -> ExportReport:
+        """
+        Writes each book to its own file in `directory`, named after the book.
+
+        Books with the same name, e.g. from different directories, get a
+        counter appended in the order given, so no two write the same file.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        report = ExportReport()
+        extension = FORMAT_EXTENSIONS[self.fmt]
+
+        paths = list(paths)
+        targets: Dict[Path, Path] = {}
+        taken: Set[str] = set()
+        for path in paths:
+            if path in targets:
+                continue
+            name, counter = path.stem + extension, 1
+            # Compared case-insensitively, for case-insensitive file systems.
+            while name.lower() in taken:
+                counter += 1
+                name = f"{path.stem}-{counter}{extension}"
+            taken.add(name.lower())
+            targets[path] = directory / name
+
+        def export(path: Path) -> int:
+            target = targets[path]
+            try:
+                with open(target, "w", encoding="utf-8") as output:
+                    return self.export_book(path, output)
+            except Exception:
+                target.unlink(missing_ok=True)
+                raise
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [(path, executor.submit(export, path)) for path in targets]
+            for path, future in futures:
+                try:
+                    report.chapters += future.result()
+                    report.books += 1
+                except Exception as e:
+                    report.errors.append((str(path), str(e)))
+        return report
+
+    def export_to_stream(self, paths: Iterable[Path], output: TextIO) -> ExportReport:
+        """
+        Writes all books to a single stream, one after the other, in order.
+
+        Each book's reader fills its own bounded queue and blocks when it
+        is full, so books ahead of the one being written wait in at most
+        `queue_size` chapters each while the writer drains them in turn.
+        """
+        paths = list(paths)
+        report = ExportReport()
+        stop = threading.Event()
+
+        def read(path: Path, records: "queue.Queue"):
+            def put(item) -> bool:
+                while not stop.is_set():
+                    try:
+                        records.put(item, timeout=0.1)
+                        return True
+                    except queue.Full:
+                        continue
+                return False
+
+            try:
+                for chapter in self._chapters(path):
+                    if not put(format_chapter(chapter, self.fmt, str(path))):
+                        return
+                put(None)
+            except Exception as e:
+                put(e)
+
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in paths]
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = []
+        try:
+            # Submitted in order, so the book being written has always started.
+            for path, records in zip(paths, queues):
+                futures.append(executor.submit(read, path, records))
+            for path, records in zip(paths, queues):
+                while True:
+                    item = records.get()
+                    if item is None:
+                        report.books += 1
+                        break
+                    if isinstance(item, Exception):
+                        report.errors.append((str(path), str(item)))
+                        break
+                    output.write(item)
+                    report.chapters += 1
+        finally:
+            stop.set()
+            # Executor.shutdown only takes cancel_futures from Python 3.9.
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+        return report
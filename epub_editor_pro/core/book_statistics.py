@@ -0,0 +1,214 @@
+import os
+import re
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from lxml import etree, html
+
+from epub_editor_pro.core.epub_model import EpubBook
+from epub_editor_pro.core.settings_model import PerformanceProfile
+
+# Letters and digits, with inner apostrophes kept (don't, l'homme).
+WORD_RE = re.compile(r"\w+(?:['’]\w+)*")
+
+SKIPPED_ELEMENTS = {"style", "script"}
+
+
+@dataclass
+class ChapterStatistics:
+    """The counts of one spine document, cached by its CRC."""
+    href: str
+    crc: int
+    bytes: int  # Uncompressed size of the document
+    words: int = 0
+    characters: int = 0  # Excluding whitespace
+    word_counts: Counter = field(default_factory=Counter)
+    character_counts: Counter = field(default_factory=Counter)
+
+
+@dataclass
+class BookStatistics:
+    """Book-wide totals, summed over the spine documents."""
+    chapters: List[ChapterStatistics] = field(default_factory=list)  # In spine order
+    image_count: int = 0
+    image_bytes: int = 0
+    word_counts: Counter = field(default_factory=Counter)
+    character_counts: Counter = field(default_factory=Counter)
+    recomputed: List[str] = field(default_factory=list)  # Documents counted in this run
+
+    @property
+    def words(self) -> int:
+        return sum(chapter.words for chapter in self.chapters)
+
+    @property
+    def characters(self) -> int:
+        return sum(chapter.characters for chapter in self.chapters)
+
+    @property
+    def text_bytes(self) -> int:
+        return sum(chapter.bytes for chapter in self.chapters)
+
+    def most_common_words(self, n: int = 10) -> List[Tuple[str, int]]:
+        return self.word_counts.most_common(n)
+
+    def most_common_characters(self, n: int = 10) -> List[Tuple[str, int]]:
+        return self.character_counts.most_common(n)
+
+
+def parse_body(content: bytes):
+    """
+    Parses an XHTML document, falling back to the HTML parser for documents
+    that are not well-formed, and returns its body (or root) element.
+    Returns None if the document cannot be parsed at all.
+    """
+    try:
+        root = etree.fromstring(content, etree.XMLParser(resolve_entities=False, no_network=True))
+    except etree.XMLSyntaxError:
+        try:
+            root = html.fromstring(content)
+        except (etree.ParserError, ValueError):
+            return None
+    return next(root.iter("{http://www.w3.org/1999/xhtml}body", "body"), root)
+
+
+def _text_chunks(root) -> List[str]:
+    """The text of a parsed document, skipping styles, scripts and comments."""
+    chunks = []
+    for element in root.iter():
+        if isinstance(element.tag, str) and etree.QName(element).localname not in SKIPPED_ELEMENTS:
+            if element.text:
+                chunks.append(element.text)
+        # The tail follows the element, so it belongs to the parent's text.
+        if element.tail and element is not root:
+            chunks.append(element.tail)
+    return chunks
+
+
+def count_document(href: str, crc: int, content: bytes) -> ChapterStatistics:
+    """Counts the words and characters of one XHTML document."""
+    statistics = ChapterStatistics(href, crc, len(content))
+    body = parse_body(content)
+    if body is None:
+        return statistics
+    for chunk in _text_chunks(body):
+        words = WORD_RE.findall(chunk.lower())
+        statistics.words += len(words)
+        statistics.word_counts.update(words)
+        characters = "".join(chunk.split())
+        statistics.characters += len(characters)
+        statistics.character_counts.update(characters)
+    return statistics
+
+
+class StatisticsEngine:
+    """
+    Computes word, character and size statistics for an EpubBook.
+
+    Spine documents are read once, in reading order, and counted in
+    parallel. Per-document results are cached by CRC, so computing again
+    after an edit only recounts the documents that changed, and the last
+    result is available instantly through `cached`.
+    """
+
+    def __init__(
+        self, book: EpubBook, max_workers: Optional[int] = None, profile: Optional[PerformanceProfile] = None
+    ):
+        self.book = book
+        self.max_workers = max_workers or (profile or PerformanceProfile()).max_workers
+        self._chapters: Dict[str, ChapterStatistics] = {}
+        self._last: Optional[BookStatistics] = None
+
+    @property
+    def cached(self) -> Optional[BookStatistics]:
+        """The statistics from the last `compute`, which may predate recent edits."""
+        return self._last
+
+    def _spine_documents(self) -> List[str]:
+        hrefs, seen = [], set()
+        for spine_item in self.book.spine:
+            item = self.book.manifest.get(spine_item.idref)
+            if item is None or "html" not in item.media_type or item.href in seen:
+                continue
+            seen.add(item.href)
+            hrefs.append(item.href)
+        return hrefs
+
+    def compute(
+        self,
+        on_chapter: Optional[Callable[[ChapterStatistics], None]] = None,
+        is_cancelled: Optional[Callable[[], bool]] = None,
+    ) -> Optional[BookStatistics]:
+        """
+        Computes the book's statistics, recounting only changed documents.
+
+        Documents are read on the calling thread in spine order, at most a
+        few ahead of the counting threads.
+
+        Args:
+            on_chapter: Called with each chapter's statistics, in spine order.
+            is_cancelled: Polled between documents; cancelling returns None
+                and keeps the chapters counted so far cached.
+
+        Returns:
+            The BookStatistics, or None if cancelled.
+        """
+        content_manager = self.book.content_manager
+        statistics = BookStatistics()
+        chapters: Dict[str, ChapterStatistics] = {}
+
+        def finish(chapter: ChapterStatistics):
+            chapters[chapter.href] = chapter
+            statistics.chapters.append(chapter)
+            statistics.word_counts.update(chapter.word_counts)
+            statistics.character_counts.update(chapter.character_counts)
+            if on_chapter is not None:
+                on_chapter(chapter)
+
+        max_workers = self.max_workers or os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            window = 2 * max_workers
+            pending = deque()
+
+            def drain(limit):
+                while len(pending) > limit:
+                    entry = pending.popleft()
+                    if isinstance(entry, ChapterStatistics):
+                        finish(entry)
+                    else:
+                        chapter = entry.result()
+                        self._chapters[chapter.href] = chapter
+                        statistics.recomputed.append(chapter.href)
+                        finish(chapter)
+
+            for href in self._spine_documents():
+                if is_cancelled is not None and is_cancelled():
+                    return None
+                try:
+                    crc = content_manager.get_crc(href)
+                except FileNotFoundError:
+                    continue
+                cached = self._chapters.get(href)
+                if cached is not None and cached.crc == crc:
+                    pending.append(cached)
+                else:
+                    content = content_manager.get_content(href)
+                    pending.append(executor.submit(count_document, href, crc, content))
+                drain(window)
+            drain(0)
+
+        # Documents no longer in the spine are forgotten.
+        self._chapters = chapters
+
+        for item in self.book.manifest.values():
+            if not item.media_type.startswith("image/"):
+                continue
+            try:
+                statistics.image_bytes += content_manager.get_size(item.href)
+            except FileNotFoundError:
+                continue
+            statistics.image_count += 1
+
+        self._last = statistics
+        return statistics
@@ -1,39 +1,115 @@
+import io
+import threading
 import zipfile
+import zlib
 import urllib.parse
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Optional, TYPE_CHECKING
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from epub_editor_pro.core.epub_model import EpubBook
 
 from epub_editor_pro.core.epub_model import ManifestItem
+from epub_editor_pro.core.fuzzy_index import BookTrigramIndex, TrigramIndex, document_trigrams
+from epub_editor_pro.core.normalized_text import NormalizedText, normalize_document, text_lines
+from epub_editor_pro.core.settings_model import PerformanceProfile
+from epub_editor_pro.core.workspace import Workspace
+from epub_editor_pro.utils.text_utils import decode_text, document_encoding, encode_text
+
+# Locks that serialize loading and updating the items hashed to them.
+LOCK_STRIPES = 16
+# Archive handles kept open for reuse once a read is done.
+MAX_IDLE_HANDLES = 8
+
+
+class StaleContentError(Exception):
+    """Raised when an item changed since the version an update was based on."""
+    pass
 
 
 class ContentManager:
     """
     Manages access to the content of an EPUB book.
     Handles lazy loading and caching of content files.
+
+    It can be used from several threads at once. Members are read through a
+    pool of archive handles, so reads do not share a file position. The
+    caches are guarded by one lock, held only to look up and store entries;
+    loading and parsing happen outside it, under a lock striped by href, so
+    an item is loaded once while different items load in parallel. Every
+    change to an item bumps its version, and anything loaded or derived
+    from an older version is returned but not cached.
     """
 
-    def __init__(self, book: 'EpubBook'):
+    def __init__(self, book: 'EpubBook', profile: Optional[PerformanceProfile] = None):
         self._book = book
-        self._content_cache: Dict[str, bytes] = {}
+        self.profile = profile or PerformanceProfile()
+        # Least recently used first; unmodified entries are evicted past the budget.
+        self._content_cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._text_cache: Dict[str, str] = {}  # Decoded once, next to the bytes
+        self._encodings: Dict[str, str] = {}
+        self._lines_cache: Dict[str, Tuple[str, List[str]]] = {}  # (parser, text lines)
+        self._normalized_cache: Dict[str, NormalizedText] = {}
+        self._trigram_cache: Dict[str, TrigramIndex] = {}
+        self._book_trigrams = BookTrigramIndex()  # Kept past eviction, dropped on change
+        self._modified: Set[str] = set()
+        self._removed: Set[str] = set()  # Archive paths of renamed items, left out on save
+        self._versions: Dict[str, int] = {}
+        self._epoch = 0  # Bumped when the caches are dropped or the archive closed
+        self._lock = threading.RLock()
+        self._stripes = [threading.RLock() for _ in range(LOCK_STRIPES)]
         self._zipfile: Optional[zipfile.ZipFile] = None
+        self._idle_handles: List[zipfile.ZipFile] = []
+        self.workspace: Optional[Workspace] = None  # Set for books edited unpacked
 
     @property
     def zipfile(self) -> zipfile.ZipFile:
-        """Opens the EPUB zip file if not already open."""
-        if self._zipfile is None:
-            self._zipfile = zipfile.ZipFile(self._book.filepath, 'r')
-        return self._zipfile
+        """
+        Opens the EPUB zip file if not already open. The handle is shared:
+        use it for the archive directory, while members are read through
+        pooled handles.
+        """
+        with self._lock:
+            if self._zipfile is None:
+                self._zipfile = zipfile.ZipFile(self._book.filepath, 'r')
+            return self._zipfile
 
-    def get_content(self, item_href: str) -> bytes:
+    @contextmanager
+    def _archive_handle(self) -> "Iterator[zipfile.ZipFile]":
+        """Lends an archive handle that no other thread reads from meanwhile."""
+        with self._lock:
+            handle = self._idle_handles.pop() if self._idle_handles else None
+            epoch = self._epoch
+        if handle is None:
+            handle = zipfile.ZipFile(self._book.filepath, 'r')
+        try:
+            yield handle
+        finally:
+            with self._lock:
+                if self._epoch == epoch and len(self._idle_handles) < MAX_IDLE_HANDLES:
+                    self._idle_handles.append(handle)
+                    handle = None
+            if handle is not None:
+                handle.close()
+
+    def _stripe(self, item_href: str) -> threading.RLock:
+        return self._stripes[hash(item_href) % LOCK_STRIPES]
+
+    def _stamp(self, item_href: str) -> Tuple[int, int]:
+        return self._epoch, self._versions.get(item_href, 0)
+
+    def get_version(self, item_href: str) -> int:
         """
-        Gets the content of a manifest item, loading it if not cached.
+        Returns the version of a manifest item, bumped by every change to
+        its content. Read it before the content an update is based on.
         """
-        if item_href in self._content_cache:
-            return self._content_cache[item_href]
+        with self._lock:
+            return self._versions.get(item_href, 0)
 
+    def archive_path(self, item_href: str) -> str:
+        """Returns the path of a manifest item inside the zip archive."""
         # The href in the manifest is relative to the OPF file.
         # We need to construct the full path within the zip archive.
         href_path = urllib.parse.unquote(item_href)
@@ -44,21 +120,415 @@ class ContentManager:
         # os.path.normpath might be better but works on the current OS's path format.
         # A simple string-based normalization for now.
         # full_path = os.path.normpath(full_path) # This might not work on all systems for zip paths
+        return full_path
 
-        try:
-            content = self.zipfile.read(full_path)
-            self._content_cache[item_href] = content
+    def get_content(self, item_href: str, cache: bool = True) -> bytes:
+        """
+        Gets the content of a manifest item, loading it if not cached.
+
+        With `cache=False` a content that is not already cached is read
+        without being kept, for one-off passes such as exports.
+        """
+        with self._lock:
+            if item_href in self._content_cache:
+                self._content_cache.move_to_end(item_href)
+                return self._content_cache[item_href]
+        if not cache:
+            return self._read(item_href)
+
+        with self._stripe(item_href):
+            with self._lock:
+                if item_href in self._content_cache:  # Loaded by another thread meanwhile
+                    self._content_cache.move_to_end(item_href)
+                    return self._content_cache[item_href]
+                stamp = self._stamp(item_href)
+            content = self._read(item_href)
+            with self._lock:
+                if self._stamp(item_href) == stamp:
+                    self._content_cache[item_href] = content
+                    self._evict(keep=item_href)
             return content
-        except KeyError:
+
+    def _read(self, item_href: str) -> bytes:
+        full_path = self.archive_path(item_href)
+
+        try:
+            if self.workspace is not None:
+                return self.workspace.read(full_path)
+            with self._archive_handle() as handle:
+                return handle.read(full_path)
+        except (KeyError, FileNotFoundError):
+            raise FileNotFoundError(f"Could not find '{full_path}' in the EPUB archive.")
+
+    def open_content(self, item_href: str) -> BinaryIO:
+        """
+        Opens a manifest item's current content as a binary stream, without
+        reading it whole, for documents too large to hold more than once.
+        """
+        with self._lock:
+            if item_href in self._content_cache:
+                return io.BytesIO(self._content_cache[item_href])
+
+        full_path = self.archive_path(item_href)
+
+        try:
+            if self.workspace is not None:
+                return open(self.workspace.path_for(full_path), "rb")
+            return self.zipfile.open(full_path)
+        except (KeyError, FileNotFoundError):
             raise FileNotFoundError(f"Could not find '{full_path}' in the EPUB archive.")
 
-    def update_content(self, item_href: str, new_content: bytes):
+    def update_content(self, item_href: str, new_content: bytes, expected_version: Optional[int] = None) -> int:
         """
         Updates the content of a manifest item in the cache.
-        Marks the book as modified.
+        Marks the book as modified. In a workspace, the file on disk is
+        updated too, so other editors see the change.
+
+        Args:
+            expected_version: If given, the update is refused with a
+                StaleContentError unless the item is still at this version.
+
+        Returns:
+            The item's new version.
         """
+        return self._update(item_href, new_content, None, expected_version)
+
+    def _update(self, item_href: str, new_content: bytes, new_text: Optional[str],
+                expected_version: Optional[int]) -> int:
+        with self._stripe(item_href):
+            if expected_version is not None and self.get_version(item_href) != expected_version:
+                raise StaleContentError(f"'{item_href}' changed since version {expected_version}.")
+            if self.workspace is not None:
+                self.workspace.write(self.archive_path(item_href), new_content)
+            with self._lock:
+                version = self._store(item_href, new_content)
+                if new_text is not None:
+                    self._text_cache[item_href] = new_text
+                return version
+
+    def _store(self, item_href: str, new_content: bytes) -> int:
+        """Stores new content for an item; called with the lock held."""
         self._content_cache[item_href] = new_content
+        self._content_cache.move_to_end(item_href)
+        self._drop_derived(item_href)
+        self._book_trigrams.remove(item_href)
+        self._modified.add(item_href)
         self._book.is_modified = True
+        version = self._versions[item_href] = self._versions.get(item_href, 0) + 1
+        return version
+
+    def rename(self, item_href: str, new_href: str):
+        """
+        Moves a manifest item's content to a new href. The content is held
+        under the new href as modified, and the old archive entry is left
+        out of the next save. In a workspace, the file is moved on disk too.
+        Updating the manifest and the references is up to the caller.
+        """
+        with self._stripe(item_href):
+            content = self.get_content(item_href)
+            old_path, new_path = self.archive_path(item_href), self.archive_path(new_href)
+            if self.workspace is not None:
+                self.workspace.write(new_path, content)
+                self.workspace.remove(old_path)
+            with self._lock:
+                self._content_cache.pop(item_href, None)
+                self._drop_derived(item_href)
+                self._book_trigrams.remove(item_href)
+                self._modified.discard(item_href)
+                self._versions[item_href] = self._versions.get(item_href, 0) + 1
+                self._removed.discard(new_path)
+                self._removed.add(old_path)
+                self._store(new_href, content)
+
+    @property
+    def removed_paths(self) -> Set[str]:
+        """The archive paths of items renamed since the last save."""
+        with self._lock:
+            return set(self._removed)
+
+    def modified_contents(self) -> Dict[str, bytes]:
+        """The content of the items with unsaved changes, by href."""
+        with self._lock:
+            return {href: self._content_cache[href] for href in self._modified}
+
+    def _drop_derived(self, item_href: str):
+        self._text_cache.pop(item_href, None)
+        self._encodings.pop(item_href, None)
+        self._lines_cache.pop(item_href, None)
+        self._normalized_cache.pop(item_href, None)
+        self._trigram_cache.pop(item_href, None)
+
+    def _evict(self, keep: Optional[str] = None):
+        """
+        Drops the least recently used unmodified content, and everything
+        derived from it, until the cache fits the profile's budget. Modified
+        content is never dropped, nor is `keep`, the content just loaded.
+        """
+        budget = self.profile.cache_budget
+        if budget is None:
+            return
+        clean = [href for href in self._content_cache if href not in self._modified]
+        size = sum(len(self._content_cache[href]) for href in clean)
+        for href in clean:
+            if size <= budget:
+                break
+            if href == keep:
+                continue
+            size -= len(self._content_cache.pop(href))
+            self._drop_derived(href)
+
+    @property
+    def cached_bytes(self) -> int:
+        """The size of the content held in the cache."""
+        with self._lock:
+            return sum(len(content) for content in self._content_cache.values())
+
+    def apply_profile(self, profile: PerformanceProfile):
+        """Switches to another performance profile, shrinking the caches to it."""
+        with self._lock:
+            self.profile = profile
+            self._evict()
+            if not profile.search_index:
+                self._normalized_cache.clear()
+                self._trigram_cache.clear()
+
+    def attach_workspace(self, workspace: Workspace):
+        """Serves content from an opened workspace instead of the archive."""
+        self.workspace = workspace
+
+    def close_workspace(self):
+        """Stops watching the workspace and reads from the archive again."""
+        if self.workspace is not None:
+            self.workspace.close()
+            self.workspace = None
+
+    def sync_workspace(self) -> List[str]:
+        """
+        Picks up the files of the workspace changed by other programs.
+
+        Changed manifest items replace the cached content, dropping
+        everything derived from it, and count as modified so the next save
+        repacks them. Files that are not manifest items, deleted files, and
+        files still matching what we hold are ignored.
+
+        Returns:
+            The hrefs of the items that changed.
+        """
+        if self.workspace is None:
+            return []
+        names = self.workspace.drain_changes()
+        if not names:
+            return []
+        hrefs = {self.archive_path(item.href): item.href for item in self._book.manifest.values()}
+        changed = []
+        for name in sorted(names):
+            href = hrefs.get(name)
+            if href is None:
+                continue
+            try:
+                content = self.workspace.read(name)
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                if href in self._content_cache:
+                    if self._content_cache[href] == content:
+                        continue  # Our own write, or a touch
+                elif zlib.crc32(content) == self.get_crc(href):
+                    continue
+                self._store(href, content)
+            changed.append(href)
+        return changed
+
+    def _cached(self, cache: Dict[str, Any], item_href: str, build: Callable[[], Any],
+                is_current: Optional[Callable[[Any], bool]] = None,
+                store: Optional[Callable[[Any], None]] = None) -> Any:
+        """
+        Returns an item's entry in one of the derived caches, building it
+        if missing or not current. A build based on content that changed
+        meanwhile is returned without being stored.
+        """
+        with self._lock:
+            value = cache.get(item_href)
+            if value is not None and (is_current is None or is_current(value)):
+                return value
+        with self._stripe(item_href):
+            with self._lock:
+                value = cache.get(item_href)
+                if value is not None and (is_current is None or is_current(value)):
+                    return value
+                stamp = self._stamp(item_href)
+            value = build()
+            with self._lock:
+                if self._stamp(item_href) == stamp:
+                    if store is not None:
+                        store(value)
+                    else:
+                        cache[item_href] = value
+            return value
+
+    def get_encoding(self, item_href: str) -> str:
+        """
+        Returns the encoding of a manifest item, detected once from its
+        byte order mark, XML declaration or meta charset, or sniffed when
+        the document does not decode in the declared one.
+        """
+        return self._cached(self._encodings, item_href, lambda: document_encoding(self.get_content(item_href)))
+
+    def get_text(self, item_href: str) -> str:
+        """
+        Gets the decoded content of a manifest item, decoding it if not cached.
+        """
+        text = self._cached(
+            self._text_cache, item_href,
+            lambda: decode_text(self.get_content(item_href), self.get_encoding(item_href)),
+        )
+        with self._lock:
+            if item_href in self._content_cache:
+                self._content_cache.move_to_end(item_href)
+        return text
+
+    def get_text_lines(self, item_href: str, parser: Optional[str] = None) -> List[str]:
+        """
+        Gets the lines of a manifest item's text, parsing it if not cached.
+        They are dropped whenever the item's content changes.
+        """
+        parser = parser or self.profile.parser_backend
+        return self._cached(
+            self._lines_cache, item_href,
+            lambda: (parser, text_lines(self.get_text(item_href), parser)),
+            is_current=lambda cached: cached[0] == parser,
+        )[1]
+
+    def get_normalized_text(self, item_href: str) -> NormalizedText:
+        """
+        Gets the normalized text layer of a manifest item, building it if
+        not cached. It is dropped whenever the item's content changes.
+        """
+        def store(normalized: NormalizedText):
+            if not self.profile.search_index:
+                # Only the document being searched is kept.
+                self._normalized_cache.clear()
+                self._trigram_cache.clear()
+            self._normalized_cache[item_href] = normalized
+
+        return self._cached(
+            self._normalized_cache, item_href,
+            lambda: normalize_document(self.get_text(item_href), self.profile.parser_backend),
+            store=store,
+        )
+
+    def get_trigram_index(self, item_href: str) -> TrigramIndex:
+        """
+        Gets the trigram index of a manifest item's normalized text, used by
+        fuzzy search; cached and dropped like the normalized text.
+        """
+        def store(index: TrigramIndex):
+            if not self.profile.search_index:
+                self._trigram_cache.clear()
+            self._trigram_cache[item_href] = index
+
+        return self._cached(
+            self._trigram_cache, item_href,
+            lambda: TrigramIndex(self.get_normalized_text(item_href).text),
+            store=store,
+        )
+
+    def get_book_trigram_index(self, item_hrefs: Iterable[str]) -> BookTrigramIndex:
+        """
+        Gets the book-level trigram index, indexing the given manifest items
+        that are not yet. Items missing from the archive are skipped.
+
+        Indexing an item builds its normalized text, but the index keeps
+        only its trigrams, whatever the profile: once the book is indexed,
+        fuzzy searches load only the items that can match.
+        """
+        for item_href in item_hrefs:
+            if item_href in self._book_trigrams:
+                continue
+            with self._stripe(item_href):
+                with self._lock:
+                    if item_href in self._book_trigrams:
+                        continue
+                    stamp = self._stamp(item_href)
+                try:
+                    trigrams = document_trigrams(self.get_normalized_text(item_href).text)
+                except FileNotFoundError:
+                    continue
+                with self._lock:
+                    if self._stamp(item_href) == stamp:
+                        self._book_trigrams.add(item_href, trigrams)
+        return self._book_trigrams
+
+    def encode_text(self, item_href: str, text: str) -> bytes:
+        """Encodes text for a manifest item in the item's original encoding."""
+        return encode_text(text, self.get_encoding(item_href))
+
+    def update_text(self, item_href: str, new_text: str, expected_version: Optional[int] = None) -> int:
+        """
+        Updates the content of a manifest item from text, keeping its
+        original encoding. Marks the book as modified.
+
+        Returns:
+            The item's new version; see `update_content`.
+        """
+        with self._stripe(item_href):
+            return self._update(item_href, self.encode_text(item_href, new_text), new_text, expected_version)
+
+    def is_item_modified(self, item_href: str) -> bool:
+        """Whether a manifest item has unsaved changes."""
+        with self._lock:
+            return item_href in self._modified
+
+    def get_crc(self, item_href: str) -> int:
+        """
+        Returns the CRC32 of a manifest item's current content.
+
+        Unmodified items use the CRC stored in the archive, so nothing is
+        decompressed.
+        """
+        with self._lock:
+            if item_href in self._modified:
+                return zlib.crc32(self._content_cache[item_href])
+        try:
+            return self.zipfile.getinfo(self.archive_path(item_href)).CRC
+        except KeyError:
+            raise FileNotFoundError(
+                f"Could not find '{self.archive_path(item_href)}' in the EPUB archive."
+            )
+
+    def get_size(self, item_href: str) -> int:
+        """
+        Returns the uncompressed size of a manifest item's current content,
+        read from the archive directory for unmodified items.
+        """
+        with self._lock:
+            if item_href in self._modified:
+                return len(self._content_cache[item_href])
+        try:
+            return self.zipfile.getinfo(self.archive_path(item_href)).file_size
+        except KeyError:
+            raise FileNotFoundError(
+                f"Could not find '{self.archive_path(item_href)}' in the EPUB archive."
+            )
+
+    def clear_cache(self):
+        """
+        Drops all cached content and closes the archive.
+
+        Called after the book has been saved, as the open archive handle then
+        refers to the replaced file.
+        """
+        with self._lock:
+            self._content_cache.clear()
+            self._text_cache.clear()
+            self._encodings.clear()
+            self._lines_cache.clear()
+            self._normalized_cache.clear()
+            self._trigram_cache.clear()
+            self._book_trigrams = BookTrigramIndex()
+            self._modified.clear()
+            self._removed.clear()
+            self.close()
 
     def get_all_content(self) -> Dict[str, ManifestItem]:
         """
@@ -83,7 +553,15 @@ class ContentManager:
         return None
 
     def close(self):
-        """Closes the zip file if it's open."""
-        if self._zipfile:
-            self._zipfile.close()
-            self._zipfile = None
+        """
+        Closes the zip file if it's open, and the pooled handles. Handles
+        lent out are closed when they are given back.
+        """
+        with self._lock:
+            self._epoch += 1
+            handles, self._idle_handles = self._idle_handles, []
+            if self._zipfile:
+                handles.append(self._zipfile)
+                self._zipfile = None
+        for handle in handles:
+            handle.close()
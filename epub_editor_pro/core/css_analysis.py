@@ -0,0 +1,449 @@
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+
+import soupsieve
+from bs4 import BeautifulSoup
+
+from epub_editor_pro.core.epub_model import EpubBook
+from epub_editor_pro.core.settings_model import PerformanceProfile
+
+COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+
+# At-rules whose block holds style rules; the others (@font-face, @page,
+# @keyframes...) are kept as they are.
+GROUPING_AT_RULES = {"media", "supports", "layer", "document", "-moz-document"}
+
+# Parts of a selector that depend on user interaction or generate content;
+# they are dropped before matching, so 'a:hover::after' counts as used when
+# the document has an 'a'.
+PSEUDO_ELEMENT_RE = re.compile(
+    r"::?(?:before|after|first-line|first-letter|marker|selection|placeholder|backdrop)\b"
+    r"|::[\w-]+",
+    re.I,
+)
+DYNAMIC_PSEUDO_CLASS_RE = re.compile(
+    r":(?:hover|active|focus|focus-within|focus-visible|visited|link|any-link|target|checked)\b", re.I
+)
+TRAILING_COMBINATOR_RE = re.compile(r"(?:^|[\s>+~])$")
+# A namespace prefix ('epub|type'), not the '|=' attribute operator.
+NAMESPACE_RE = re.compile(r"\|(?!=)")
+SIMPLE_SELECTOR_RE = re.compile(r"^(\*|[a-zA-Z][\w-]*)?(?:\.(-?[_a-zA-Z][\w-]*)|#(-?[_a-zA-Z][\w-]*))?$")
+STRING_OR_COMMENT_RE = re.compile(r"""\"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*'|/\*.*?(?:\*/|$)""", re.S)
+
+# A soupsieve selector, or a (tag, class, id) tuple for the simplest selectors.
+CompiledSelector = Union[soupsieve.SoupSieve, Tuple[Optional[str], Optional[str], Optional[str]]]
+
+
+@dataclass(frozen=True)
+class CssRule:
+    """A style rule of a stylesheet, with its position in the stylesheet's text."""
+    stylesheet: str  # Href of the stylesheet
+    selectors: Tuple[str, ...]
+    line: int
+    start: int  # Offset of the first character of the selectors
+    end: int  # Offset after the closing brace
+    group: Optional[Tuple[int, int]] = None  # Span of the enclosing @media/@supports block
+
+
+@dataclass
+class StylesheetReport:
+    """The rules of one stylesheet, and those no document uses."""
+    href: str
+    size: int
+    rules: List[CssRule] = field(default_factory=list)
+    unused_rules: List[CssRule] = field(default_factory=list)
+    # Unused selectors of rules that other selectors of the list keep.
+    unused_selectors: List[Tuple[CssRule, str]] = field(default_factory=list)
+
+
+@dataclass
+class CssReport:
+    """The result of matching every stylesheet against every XHTML document."""
+    stylesheets: List[StylesheetReport] = field(default_factory=list)
+    documents: int = 0
+    rematched: List[str] = field(default_factory=list)  # Documents parsed in this run
+    bytes_saved: int = 0  # Set when the stylesheets are rewritten
+
+    @property
+    def rules(self) -> int:
+        return sum(len(stylesheet.rules) for stylesheet in self.stylesheets)
+
+    @property
+    def unused_rules(self) -> int:
+        return sum(len(stylesheet.unused_rules) for stylesheet in self.stylesheets)
+
+
+@dataclass
+class _DocumentMatches:
+    """The selectors tried on one document, and those that matched, cached by CRC."""
+    crc: int
+    checked: FrozenSet[str]
+    matched: FrozenSet[str]
+
+
+def _skip_string(text: str, i: int) -> int:
+    """The offset after the string starting at `i`."""
+    quote = text[i]
+    i += 1
+    while i < len(text) and text[i] != quote:
+        i += 2 if text[i] == "\\" else 1
+    return i + 1
+
+
+def _scan_to(text: str, i: int, stops: str) -> int:
+    """The offset of the first of `stops` at nesting level 0, skipping strings and comments."""
+    depth = 0
+    while i < len(text):
+        c = text[i]
+        if c in "\"'":
+            i = _skip_string(text, i)
+            continue
+        if text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = len(text) if end < 0 else end + 2
+            continue
+        if depth == 0 and c in stops:
+            return i
+        if c in "([":
+            depth += 1
+        elif c in ")]":
+            depth = max(0, depth - 1)
+        i += 1
+    return len(text)
+
+
+def _block_end(text: str, i: int) -> int:
+    """The offset after the brace closing the block opened at `i`."""
+    depth = 0
+    while i < len(text):
+        i = _scan_to(text, i, "{}")
+        if i >= len(text):
+            break
+        depth += 1 if text[i] == "{" else -1
+        i += 1
+        if depth == 0:
+            return i
+    return len(text)
+
+
+def split_selectors(prelude: str) -> Tuple[str, ...]:
+    """Splits a selector list on its top-level commas."""
+    selectors, start = [], 0
+    prelude = COMMENT_RE.sub(" ", prelude)
+    while True:
+        end = _scan_to(prelude, start, ",")
+        selector = " ".join(prelude[start:end].split())
+        if selector:
+            selectors.append(selector)
+        if end >= len(prelude):
+            return tuple(selectors)
+        start = end + 1
+
+
+def parse_stylesheet(href: str, text: str) -> List[CssRule]:
+    """Finds the style rules of a stylesheet, including those nested in @media blocks."""
+    rules = []
+
+    def parse_block(i: int, end: int, group: Optional[Tuple[int, int]]):
+        while i < end:
+            while i < end and (text[i].isspace() or text[i] in ";}"):
+                i += 1
+            if text.startswith("/*", i):
+                comment_end = text.find("*/", i + 2)
+                i = end if comment_end < 0 else comment_end + 2
+                continue
+            if i >= end:
+                return
+            stop = min(_scan_to(text, i, "{;" if text[i] == "@" else "{"), end)
+            if stop >= end or text[stop] == ";":
+                i = stop + 1
+                continue
+            block_end = min(_block_end(text, stop), end)
+            if text[i] == "@":
+                keyword = re.match(r"@([\w-]+)", text[i:stop])
+                if keyword and keyword.group(1).lower() in GROUPING_AT_RULES:
+                    parse_block(stop + 1, block_end - 1, (i, block_end))
+            else:
+                selectors = split_selectors(text[i:stop])
+                if selectors:
+                    line = text.count("\n", 0, i) + 1
+                    rules.append(CssRule(href, selectors, line, i, block_end, group))
+            i = block_end
+
+    parse_block(0, len(text), None)
+    return rules
+
+
+def matchable_selector(selector: str) -> str:
+    """The selector without the parts that cannot be checked against a static document."""
+    stripped = DYNAMIC_PSEUDO_CLASS_RE.sub("", PSEUDO_ELEMENT_RE.sub("", selector)).strip()
+    if TRAILING_COMBINATOR_RE.search(stripped):
+        stripped += "*"
+    return stripped
+
+
+def compile_selector(selector: str) -> Optional[CompiledSelector]:
+    """
+    Compiles a selector for matching, or returns None if it cannot be
+    matched statically (namespaced selectors, as documents are parsed as
+    HTML). A lone tag, class or id, or a tag with one of them, becomes a
+    (tag, class, id) tuple, checked against sets of the document's names
+    instead of walking its tree.
+    """
+    selector = matchable_selector(selector)
+    if NAMESPACE_RE.search(selector):
+        return None
+    simple = SIMPLE_SELECTOR_RE.match(selector)
+    if simple:
+        tag = simple.group(1).lower() if simple.group(1) not in (None, "*") else None
+        return (tag, simple.group(2), simple.group(3))
+    try:
+        return soupsieve.compile(selector)
+    except (soupsieve.SelectorSyntaxError, NotImplementedError, ValueError):
+        return None
+
+
+class _DocumentNames:
+    """The tag names, classes and ids of a document, collected in one walk."""
+
+    def __init__(self, soup: BeautifulSoup):
+        self.tags: Set[str] = set()
+        self.classes: Set[Tuple[Optional[str], str]] = set()
+        self.ids: Set[Tuple[Optional[str], str]] = set()
+        for element in soup.find_all(True):
+            self.tags.add(element.name)
+            for class_name in element.get("class") or ():
+                self.classes.update(((element.name, class_name), (None, class_name)))
+            if element.get("id"):
+                self.ids.update(((element.name, element["id"]), (None, element["id"])))
+
+    def matches(self, tag: Optional[str], class_name: Optional[str], element_id: Optional[str]) -> bool:
+        if class_name is not None:
+            return (tag, class_name) in self.classes
+        if element_id is not None:
+            return (tag, element_id) in self.ids
+        return tag in self.tags if tag is not None else bool(self.tags)
+
+
+def match_document(
+    href: str, crc: int, content: bytes, selectors: Dict[str, CompiledSelector], parser: str
+) -> Tuple[str, _DocumentMatches]:
+    """Tries selectors on one document; runs in a worker thread."""
+    soup = BeautifulSoup(content, parser)
+    names = _DocumentNames(soup)
+    matched = set()
+    for selector, compiled in selectors.items():
+        if isinstance(compiled, tuple):
+            if names.matches(*compiled):
+                matched.add(selector)
+        elif compiled.select_one(soup) is not None:
+            matched.add(selector)
+    return href, _DocumentMatches(crc, frozenset(selectors), frozenset(matched))
+
+
+def minify_css(text: str) -> str:
+    """Removes comments and unneeded whitespace, leaving strings as they are."""
+    strings = []
+
+    def hide(match):
+        if match.group(0)[0] not in "\"'":
+            return " "  # A comment
+        strings.append(match.group(0))
+        return f"\x00{len(strings) - 1}\x00"
+
+    text = " ".join(STRING_OR_COMMENT_RE.sub(hide, text).split())
+    text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+    text = re.sub(r":\s+", ":", text).replace(";}", "}")
+    return re.sub("\x00(\\d+)\x00", lambda match: strings[int(match.group(1))], text)
+
+
+def prune_stylesheet(text: str, report: StylesheetReport) -> str:
+    """
+    Removes a stylesheet's unused rules and unused selectors, and the
+    @media blocks left empty. The rest of the text is kept as it was.
+    """
+    unused_rules = {rule.start for rule in report.unused_rules}
+    unused_selectors: Dict[int, Set[str]] = {}
+    for rule, selector in report.unused_selectors:
+        unused_selectors.setdefault(rule.start, set()).add(selector)
+
+    # Groups left with no rule are removed whole.
+    groups: Dict[Tuple[int, int], bool] = {}
+    for rule in report.rules:
+        if rule.group is not None:
+            groups[rule.group] = groups.get(rule.group, False) or rule.start not in unused_rules
+
+    edits = []  # (start, end, replacement), in text order
+    for group, used in groups.items():
+        if not used:
+            edits.append((group[0], group[1], ""))
+    for rule in report.rules:
+        if rule.group is not None and not groups[rule.group]:
+            continue
+        if rule.start in unused_rules:
+            edits.append((rule.start, rule.end, ""))
+        elif rule.start in unused_selectors:
+            kept = [s for s in rule.selectors if s not in unused_selectors[rule.start]]
+            brace = _scan_to(text, rule.start, "{")
+            edits.append((rule.start, brace, ", ".join(kept) + " "))
+
+    for start, end, replacement in sorted(edits, reverse=True):
+        if not replacement:
+            # Take the line the rule was on with it, when it had one of its own.
+            line_start = start
+            while line_start > 0 and text[line_start - 1] in " \t":
+                line_start -= 1
+            line_end = end
+            while line_end < len(text) and text[line_end] in " \t":
+                line_end += 1
+            if (line_start == 0 or text[line_start - 1] == "\n") and text[line_end:line_end + 1] in ("\n", ""):
+                start, end = line_start, line_end + 1
+        text = text[:start] + replacement + text[end:]
+    return text
+
+
+class CssAnalyzer:
+    """
+    Finds the style rules of a book's stylesheets that no document uses.
+
+    Every text/css item is parsed and each distinct selector compiled
+    once. XHTML documents are read on the calling thread and matched by a
+    pool of threads in a single pass. The selectors tried on each document
+    are cached by CRC, so analyzing again after an edit only re-parses the
+    documents that changed, or is limited to selectors not tried before.
+    """
+
+    def __init__(self, book: EpubBook, max_workers: Optional[int] = None, profile: Optional[PerformanceProfile] = None):
+        profile = profile or PerformanceProfile()
+        self.book = book
+        self.max_workers = max_workers or profile.max_workers
+        self.parser = profile.parser_backend
+        self._documents: Dict[str, _DocumentMatches] = {}
+        self._compiled: Dict[str, Optional[CompiledSelector]] = {}
+
+    def _items(self, predicate: Callable[[str], bool]) -> List[str]:
+        hrefs, seen = [], set()
+        for item in self.book.manifest.values():
+            if predicate(item.media_type) and item.href not in seen:
+                seen.add(item.href)
+                hrefs.append(item.href)
+        return hrefs
+
+    def _compile(self, selectors: Iterable[str]) -> Dict[str, CompiledSelector]:
+        """The compiled form of the selectors that can be matched statically."""
+        compiled = {}
+        for selector in selectors:
+            if selector not in self._compiled:
+                self._compiled[selector] = compile_selector(selector)
+            if self._compiled[selector] is not None:
+                compiled[selector] = self._compiled[selector]
+        return compiled
+
+    def analyze(self, is_cancelled: Optional[Callable[[], bool]] = None) -> Optional[CssReport]:
+        """
+        Matches every stylesheet's selectors against every XHTML document.
+
+        Selectors that cannot be checked statically (unsupported syntax,
+        namespaced attributes) always count as used.
+
+        Args:
+            is_cancelled: Polled between documents; cancelling returns None
+                and keeps the documents matched so far cached.
+
+        Returns:
+            The CssReport, or None if cancelled.
+        """
+        content_manager = self.book.content_manager
+        report = CssReport()
+        for href in self._items(lambda media_type: media_type == "text/css"):
+            try:
+                text = content_manager.get_text(href)
+            except FileNotFoundError:
+                continue
+            stylesheet = StylesheetReport(href, content_manager.get_size(href))
+            stylesheet.rules = parse_stylesheet(href, text)
+            report.stylesheets.append(stylesheet)
+
+        selectors = self._compile(
+            selector for stylesheet in report.stylesheets for rule in stylesheet.rules for selector in rule.selectors
+        )
+        documents: Dict[str, _DocumentMatches] = {}
+
+        def finish(href: str, matches: _DocumentMatches):
+            documents[href] = matches
+            self._documents[href] = matches
+            report.rematched.append(href)
+
+        max_workers = self.max_workers or os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            window = 2 * max_workers
+            pending = deque()
+
+            def drain(limit):
+                while len(pending) > limit:
+                    finish(*pending.popleft().result())
+
+            for href in self._items(lambda media_type: "html" in media_type):
+                if is_cancelled is not None and is_cancelled():
+                    return None
+                try:
+                    crc = content_manager.get_crc(href)
+                except FileNotFoundError:
+                    continue
+                cached = self._documents.get(href)
+                if cached is not None and cached.crc == crc:
+                    missing = {s: c for s, c in selectors.items() if s not in cached.checked}
+                    if not missing:
+                        documents[href] = cached
+                        continue
+                    # Only the new selectors are tried; the earlier results still hold.
+                    content = content_manager.get_content(href, cache=False)
+                    _, matches = match_document(href, crc, content, missing, self.parser)
+                    finish(href, _DocumentMatches(
+                        crc, cached.checked | matches.checked, cached.matched | matches.matched
+                    ))
+                    continue
+                content = content_manager.get_content(href, cache=False)
+                pending.append(executor.submit(match_document, href, crc, content, selectors, self.parser))
+                drain(window)
+            drain(0)
+
+        # Documents no longer in the manifest are forgotten.
+        self._documents = documents
+        report.documents = len(documents)
+
+        used = set().union(*(matches.matched for matches in documents.values()))
+        for stylesheet in report.stylesheets:
+            for rule in stylesheet.rules:
+                unused = [s for s in rule.selectors if s in selectors and s not in used]
+                if len(unused) == len(rule.selectors):
+                    stylesheet.unused_rules.append(rule)
+                else:
+                    stylesheet.unused_selectors.extend((rule, selector) for selector in unused)
+        return report
+
+    def write_stylesheets(self, report: CssReport, prune: bool = True, minify: bool = True) -> List[str]:
+        """
+        Rewrites the stylesheets of a report without their unused rules,
+        minified, or both. The changes are saved with the book.
+
+        Returns:
+            The hrefs of the stylesheets that changed.
+        """
+        content_manager = self.book.content_manager
+        changed = []
+        for stylesheet in report.stylesheets:
+            text = content_manager.get_text(stylesheet.href)
+            new_text = prune_stylesheet(text, stylesheet) if prune else text
+            if minify:
+                new_text = minify_css(new_text)
+            if new_text == text:
+                continue
+            content_manager.update_text(stylesheet.href, new_text)
+            report.bytes_saved += stylesheet.size - content_manager.get_size(stylesheet.href)
+            changed.append(stylesheet.href)
+        return changed
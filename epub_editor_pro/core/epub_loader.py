@@ -1,10 +1,13 @@
 import logging
+import urllib.parse
 import zipfile
 from pathlib import Path
 from typing import Optional, Dict, List
 from lxml import etree
 
 from epub_editor_pro.core.epub_model import EpubBook, EpubMetadata, ManifestItem, SpineItem
+from epub_editor_pro.core.navigation import NavEntry, NavigationIndex, parse_nav_document, parse_ncx
+from epub_editor_pro.utils.file_utils import normalize_href
 
 log = logging.getLogger(__name__)
 
@@ -110,6 +113,37 @@ class EpubLoader:
             spine.append(spine_item)
         return spine
 
+    def _parse_navigation(self, manifest: Dict[str, ManifestItem], spine_element) -> List[NavEntry]:
+        """
+        Parses the top level of the table of contents.
+
+        The EPUB 3 navigation document is preferred over the NCX. A broken
+        table of contents is logged and results in an empty one, as it does
+        not prevent editing the book.
+        """
+        nav_item = next(
+            (item for item in manifest.values() if "nav" in (item.properties or "").split()),
+            None,
+        )
+        ncx_item = manifest.get(spine_element.get('toc') or "") or next(
+            (item for item in manifest.values() if item.media_type == "application/x-dtbncx+xml"),
+            None,
+        )
+        manifest_hrefs = {normalize_href(item.href): item.href for item in manifest.values()}
+
+        for item, parse in ((nav_item, parse_nav_document), (ncx_item, parse_ncx)):
+            if item is None:
+                continue
+            path = (self.opf_dir / urllib.parse.unquote(item.href)).as_posix()
+            try:
+                entries = parse(self.epub.read(path), item.href, manifest_hrefs)
+            except (KeyError, etree.XMLSyntaxError) as e:
+                log.warning("Could not parse the table of contents in %s: %s", path, e)
+                continue
+            if entries:
+                return entries
+        return []
+
     def _parse_opf(self) -> EpubBook:
         """
         Parses the OPF file to extract metadata, manifest, and spine.
@@ -139,13 +173,18 @@ class EpubLoader:
         metadata = self._parse_metadata(metadata_element, ns)
         manifest = self._parse_manifest(manifest_element, ns)
         spine = self._parse_spine(spine_element, ns)
+        toc = self._parse_navigation(manifest, spine_element)
+        spine_hrefs = [manifest[item.idref].href for item in spine if item.idref in manifest]
 
         return EpubBook(
             filepath=str(self.file_path),
             opf_dir=str(self.opf_dir),
+            opf_path=self.opf_path,
             metadata=metadata,
             manifest=manifest,
-            spine=spine
+            spine=spine,
+            toc=toc,
+            navigation=NavigationIndex(toc, spine_hrefs),
         )
 
     def _validate_epub(self):
@@ -1,6 +1,8 @@
 from dataclasses import dataclass, field
 from typing import List, Dict, Optional
 
+from epub_editor_pro.core.navigation import NavEntry, NavigationIndex
+
 
 @dataclass
 class EpubMetadata:
@@ -48,7 +50,9 @@ class EpubBook:
     metadata: EpubMetadata
     manifest: Dict[str, ManifestItem] = field(default_factory=dict)
     spine: List[SpineItem] = field(default_factory=list)
-    toc: List[Dict] = field(default_factory=list)  # For NCX or Nav document
+    toc: List[NavEntry] = field(default_factory=list)  # Top level of the NCX or Nav document
+    opf_path: Optional[str] = None  # Path of the OPF file inside the archive
+    navigation: Optional[NavigationIndex] = None
     is_modified: bool = False
 
     def __post_init__(self):
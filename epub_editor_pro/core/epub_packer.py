@@ -0,0 +1,549 @@
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import re
+import time
+import uuid
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from lxml import etree
+
+from epub_editor_pro.core.asset_optimizer import CompressionPolicy, choose_compression, guess_media_type
+from epub_editor_pro.core.metadata_index import CONTAINER_NS, DC_NS, OPF_NS
+from epub_editor_pro.core.navigation import OPS_NS, XHTML_NS
+from epub_editor_pro.utils.file_utils import RawZipWriter, deflate_raw, normalize_href, read_raw_member
+
+log = logging.getLogger(__name__)
+
+MIMETYPE = b"application/epub+zip"
+CONTAINER_PATH = "META-INF/container.xml"
+DEFAULT_OPF_PATH = "content.opf"
+
+# Files editors and operating systems leave behind; never packed.
+IGNORED_NAMES = {".DS_Store", "Thumbs.db", "desktop.ini"}
+
+CONTAINER_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="{path}" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+"""
+
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+XML_NS = "http://www.w3.org/XML/1998/namespace"
+XHTML_MEDIA_TYPE = "application/xhtml+xml"
+# File names taken for the navigation document; one is generated when none exists.
+NAV_NAMES = ("nav.xhtml", "toc.xhtml")
+UNDETERMINED_LANGUAGE = "und"
+
+
+class PackError(Exception):
+    """Raised when a directory cannot be packed into an EPUB."""
+    pass
+
+
+@dataclass
+class PackReport:
+    """What a pack did."""
+    members: int = 0
+    reused_members: int = 0  # Copied from the previous build without compressing
+    compressed_members: int = 0
+    generated_opf: bool = False
+    manifest_added: List[str] = field(default_factory=list)
+    manifest_removed: List[str] = field(default_factory=list)
+    bytes_written: int = 0
+    elapsed_seconds: float = 0.0
+
+
+class BuildCache:
+    """
+    Remembers what each member of the previous build contained.
+
+    Entries are keyed by archive name and hold the file's mtime and size,
+    the SHA-256 of its content, and how it was compressed. A file whose
+    mtime and size are unchanged is not even read again.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        if path is not None and path.exists():
+            try:
+                with open(path, "r") as f:
+                    self.entries = json.load(f)
+            except (json.JSONDecodeError, IOError) as e:
+                log.warning("Ignoring unreadable build cache %s: %s", path, e)
+
+    def save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(temp_path, self.path)
+
+
+def newest_mtime(files: Dict[str, Path]) -> float:
+    """
+    The modification time of the newest file, used for everything the packer
+    generates so that an unchanged tree packs to the same bytes.
+    """
+    return max((path.stat().st_mtime for path in files.values()), default=0.0)
+
+
+def collect_files(source_dir: Path) -> Dict[str, Path]:
+    """
+    Lists the files to pack, by archive name, skipping hidden files and the
+    mimetype, which the packer always writes itself.
+    """
+    files: Dict[str, Path] = {}
+    for root, directories, names in os.walk(source_dir):
+        directories[:] = sorted(d for d in directories if not d.startswith("."))
+        for name in names:
+            if name.startswith(".") or name in IGNORED_NAMES:
+                continue
+            path = Path(root) / name
+            archive_name = path.relative_to(source_dir).as_posix()
+            if archive_name != "mimetype":
+                files[archive_name] = path
+    return files
+
+
+def _opf_from_container(content: bytes) -> Optional[str]:
+    try:
+        root = etree.fromstring(content)
+    except etree.XMLSyntaxError as e:
+        raise PackError(f"{CONTAINER_PATH} is not well-formed XML: {e}")
+    rootfile = root.find(f"{{{CONTAINER_NS}}}rootfiles/{{{CONTAINER_NS}}}rootfile")
+    return rootfile.get("full-path") if rootfile is not None else None
+
+
+def _manifest_id(name: str, used: set) -> str:
+    """A unique, valid XML id derived from a file name."""
+    base = re.sub(r"[^A-Za-z0-9_.-]", "_", posixpath.basename(name))
+    if not base[:1].isalpha() and base[:1] != "_":
+        base = "id_" + base
+    candidate, number = base, 1
+    while candidate in used:
+        number += 1
+        candidate = f"{base}_{number}"
+    used.add(candidate)
+    return candidate
+
+
+def _content_files(files: Dict[str, Path], opf_path: str) -> List[str]:
+    """The archive names that belong in the manifest."""
+    return sorted(
+        name for name in files
+        if name != opf_path and not name.startswith("META-INF/")
+    )
+
+
+def _is_nav(name: str) -> bool:
+    return posixpath.basename(name) in NAV_NAMES
+
+
+def nav_path_for(files: Dict[str, Path], opf_path: str) -> Optional[str]:
+    """Where a navigation document is generated, or None if the tree has one."""
+    if any(_is_nav(name) for name in files):
+        return None
+    return posixpath.join(posixpath.dirname(opf_path), NAV_NAMES[0])
+
+
+def _spine_documents(files: Dict[str, Path], opf_path: str) -> List[str]:
+    return [
+        name for name in _content_files(files, opf_path)
+        if guess_media_type(name) == XHTML_MEDIA_TYPE and not _is_nav(name)
+    ]
+
+
+def _document_details(path: Path) -> Tuple[Optional[str], Optional[str]]:
+    """The title and language an XHTML document declares, if it can be read."""
+    parser = etree.XMLParser(recover=True, resolve_entities=False, no_network=True)
+    try:
+        root = etree.parse(str(path), parser).getroot()
+    except (etree.XMLSyntaxError, OSError):
+        return None, None
+    if root is None:
+        return None, None
+    language = root.get(f"{{{XML_NS}}}lang") or root.get("lang")
+    title = next(
+        (
+            " ".join("".join(element.itertext()).split())
+            for element in root.iter("{*}title")
+        ),
+        None,
+    )
+    return title or None, language or None
+
+
+def generate_nav(files: Dict[str, Path], opf_path: str, nav_path: str) -> bytes:
+    """
+    Generates an EPUB 3 navigation document with a table of contents
+    listing the XHTML documents in path order, titled as they are.
+    """
+    documents = _spine_documents(files, opf_path)
+    details = [_document_details(files[name]) for name in documents]
+    language = next((lang for _, lang in details if lang), UNDETERMINED_LANGUAGE)
+    nav_dir = posixpath.dirname(nav_path)
+
+    html = etree.Element(f"{{{XHTML_NS}}}html", nsmap={None: XHTML_NS, "epub": OPS_NS})
+    html.set(f"{{{XML_NS}}}lang", language)
+    head = etree.SubElement(html, f"{{{XHTML_NS}}}head")
+    etree.SubElement(head, f"{{{XHTML_NS}}}title").text = "Contents"
+    body = etree.SubElement(html, f"{{{XHTML_NS}}}body")
+    nav = etree.SubElement(body, f"{{{XHTML_NS}}}nav", id="toc")
+    nav.set(f"{{{OPS_NS}}}type", "toc")
+    etree.SubElement(nav, f"{{{XHTML_NS}}}h1").text = "Contents"
+    ol = etree.SubElement(nav, f"{{{XHTML_NS}}}ol")
+    for name, (title, _) in zip(documents, details):
+        li = etree.SubElement(ol, f"{{{XHTML_NS}}}li")
+        anchor = etree.SubElement(li, f"{{{XHTML_NS}}}a", href=posixpath.relpath(name, nav_dir or "."))
+        anchor.text = title or posixpath.splitext(posixpath.basename(name))[0]
+    return etree.tostring(html, xml_declaration=True, encoding="utf-8", pretty_print=True)
+
+
+def generate_opf(
+    files: Dict[str, Path], opf_path: str, title: str, identifier: str, nav_path: Optional[str] = None
+) -> bytes:
+    """
+    Generates an EPUB 3 package document listing every file, with the
+    XHTML documents in the spine in path order.
+
+    Args:
+        nav_path: A generated navigation document to list as well, for
+            trees that have none; see `nav_path_for`.
+    """
+    opf_dir = posixpath.dirname(opf_path)
+    documents = _spine_documents(files, opf_path)
+    language = next(
+        (lang for lang in (_document_details(files[name])[1] for name in documents) if lang),
+        UNDETERMINED_LANGUAGE,
+    )
+    package = etree.Element(
+        f"{{{OPF_NS}}}package", nsmap={None: OPF_NS},
+        version="3.0", **{"unique-identifier": "pub-id"},
+    )
+    metadata = etree.SubElement(package, f"{{{OPF_NS}}}metadata", nsmap={"dc": DC_NS})
+    identifier_element = etree.SubElement(metadata, f"{{{DC_NS}}}identifier", id="pub-id")
+    identifier_element.text = identifier
+    etree.SubElement(metadata, f"{{{DC_NS}}}title").text = title
+    etree.SubElement(metadata, f"{{{DC_NS}}}language").text = language
+    modified = etree.SubElement(metadata, f"{{{OPF_NS}}}meta", property="dcterms:modified")
+    modified.text = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(newest_mtime(files)))
+
+    manifest = etree.SubElement(package, f"{{{OPF_NS}}}manifest")
+    spine = etree.SubElement(package, f"{{{OPF_NS}}}spine")
+    used: set = set()
+    names = _content_files(files, opf_path)
+    if nav_path is not None:
+        names = sorted(names + [nav_path])
+    for name in names:
+        media_type = guess_media_type(name) or "application/octet-stream"
+        item_id = _manifest_id(name, used)
+        item = etree.SubElement(
+            manifest, f"{{{OPF_NS}}}item",
+            id=item_id, href=posixpath.relpath(name, opf_dir or "."), **{"media-type": media_type},
+        )
+        if _is_nav(name):
+            item.set("properties", "nav")
+        elif media_type == "application/x-dtbncx+xml":
+            spine.set("toc", item_id)
+        elif media_type == XHTML_MEDIA_TYPE:
+            etree.SubElement(spine, f"{{{OPF_NS}}}itemref", idref=item_id)
+    return etree.tostring(package, xml_declaration=True, encoding="utf-8", pretty_print=True)
+
+
+def update_opf(content: bytes, files: Dict[str, Path], opf_path: str) -> Tuple[bytes, List[str], List[str]]:
+    """
+    Brings the manifest of a package document in line with the file tree.
+
+    Files missing from the manifest are added, XHTML documents at the end
+    of the spine; items whose file no longer exists are removed, along
+    with their spine entries. Remote resources are left alone.
+
+    Returns:
+        The new package document and the added and removed archive names.
+    """
+    try:
+        package = etree.fromstring(content)
+    except etree.XMLSyntaxError as e:
+        raise PackError(f"{opf_path} is not well-formed XML: {e}")
+    manifest = package.find(f"{{{OPF_NS}}}manifest")
+    if manifest is None:
+        raise PackError(f"{opf_path} has no manifest.")
+    spine = package.find(f"{{{OPF_NS}}}spine")
+
+    opf_dir = posixpath.dirname(opf_path)
+    present = set(_content_files(files, opf_path))
+    listed = set()
+    used = {item.get("id") for item in manifest.iter(f"{{{OPF_NS}}}item")}
+    removed: List[str] = []
+    for item in list(manifest.iter(f"{{{OPF_NS}}}item")):
+        href = item.get("href", "")
+        if re.match(r"^[a-zA-Z][a-zA-Z0-9+.-]*:", href):
+            continue
+        name = normalize_href(posixpath.join(opf_dir, href))
+        if name in present:
+            listed.add(name)
+            continue
+        removed.append(name)
+        manifest.remove(item)
+        if spine is not None:
+            for itemref in spine.findall(f"{{{OPF_NS}}}itemref"):
+                if itemref.get("idref") == item.get("id"):
+                    spine.remove(itemref)
+
+    added = sorted(present - listed)
+    for name in added:
+        media_type = guess_media_type(name) or "application/octet-stream"
+        item_id = _manifest_id(name, used)
+        etree.SubElement(
+            manifest, f"{{{OPF_NS}}}item",
+            id=item_id,
+            href=posixpath.relpath(name, opf_dir or "."),
+            **{"media-type": media_type},
+        )
+        if spine is not None and media_type == XHTML_MEDIA_TYPE and not _is_nav(name):
+            etree.SubElement(spine, f"{{{OPF_NS}}}itemref", idref=item_id)
+    if not added and not removed:
+        return content, added, removed
+    return etree.tostring(package, xml_declaration=True, encoding="utf-8"), added, removed
+
+
+class EpubPacker:
+    """
+    Builds an EPUB from a directory tree.
+
+    The mimetype is written first and stored, a container and package
+    document are generated when missing, and the manifest is updated from
+    the files present. Members are compressed by a pool of threads; on a
+    rebuild, members whose content hash matches the previous build are
+    copied from the previous archive without being compressed again.
+    """
+
+    def __init__(self, source_dir: Path, max_workers: Optional[int] = None,
+                 compression_level: Optional[int] = None, use_cache: bool = True):
+        """
+        Args:
+            source_dir: The root of the unpacked book.
+            max_workers: Number of compression threads (None for the default).
+            compression_level: Deflate level for every compressed member;
+                None picks one per media type.
+            use_cache: Whether to reuse members of the previous build.
+        """
+        self.source_dir = Path(source_dir)
+        self.max_workers = max_workers
+        self.compression_level = compression_level
+        self.use_cache = use_cache
+
+    @staticmethod
+    def cache_path(output: Path) -> Path:
+        """Where the build cache of an output archive is kept."""
+        return output.with_name(output.name + ".pack-cache.json")
+
+    def _policy(self, name: str) -> CompressionPolicy:
+        policy = choose_compression(guess_media_type(name))
+        if policy.compress_type == zipfile.ZIP_DEFLATED and self.compression_level is not None:
+            return CompressionPolicy(zipfile.ZIP_DEFLATED, self.compression_level)
+        return policy
+
+    def _package_files(self, files: Dict[str, Path], report: PackReport) -> Dict[str, bytes]:
+        """Returns the container and package documents to write in place of the files."""
+        generated: Dict[str, bytes] = {}
+        if CONTAINER_PATH in files:
+            opf_path = _opf_from_container(files[CONTAINER_PATH].read_bytes())
+            if opf_path is None:
+                raise PackError(f"{CONTAINER_PATH} names no package document.")
+        else:
+            candidates = sorted(name for name in files if name.endswith(".opf"))
+            opf_path = candidates[0] if candidates else DEFAULT_OPF_PATH
+            generated[CONTAINER_PATH] = CONTAINER_TEMPLATE.format(path=opf_path).encode("utf-8")
+
+        if opf_path in files:
+            content, added, removed = update_opf(files[opf_path].read_bytes(), files, opf_path)
+            report.manifest_added, report.manifest_removed = added, removed
+            if added or removed:
+                generated[opf_path] = content
+        else:
+            # Derived from the source path, so rebuilds keep the same identifier.
+            identifier = f"urn:uuid:{uuid.uuid5(uuid.NAMESPACE_URL, self.source_dir.resolve().as_uri())}"
+            nav_path = nav_path_for(files, opf_path)
+            if nav_path is not None:
+                generated[nav_path] = generate_nav(files, opf_path, nav_path)
+            generated[opf_path] = generate_opf(files, opf_path, self.source_dir.name, identifier, nav_path)
+            report.generated_opf = True
+            report.manifest_added = sorted(_content_files(files, opf_path) + ([nav_path] if nav_path else []))
+        return generated
+
+    @staticmethod
+    def _zip_info(name: str, mtime: float) -> zipfile.ZipInfo:
+        date_time = max(time.localtime(mtime)[:6], ZIP_EPOCH)
+        zinfo = zipfile.ZipInfo(name, date_time)
+        zinfo.external_attr = 0o644 << 16
+        return zinfo
+
+    @staticmethod
+    def _compress(zinfo: zipfile.ZipInfo, data: bytes, policy: CompressionPolicy) -> Tuple[zipfile.ZipInfo, bytes]:
+        """Compresses one member; runs in a worker thread (zlib releases the GIL)."""
+        zinfo.CRC = zlib.crc32(data)
+        zinfo.file_size = len(data)
+        zinfo.compress_type = zipfile.ZIP_STORED
+        payload = data
+        if policy.compress_type == zipfile.ZIP_DEFLATED:
+            compressed = deflate_raw(data, policy.level)
+            if len(compressed) < len(data):
+                zinfo.compress_type = zipfile.ZIP_DEFLATED
+                payload = compressed
+        return zinfo, payload
+
+    def pack(self, output: Path) -> PackReport:
+        """
+        Packs the directory into `output`, replacing it atomically.
+
+        Raises:
+            PackError: If the source is not a directory or its container
+                or package document cannot be read.
+        """
+        started = time.perf_counter()
+        output = Path(output)
+        if not self.source_dir.is_dir():
+            raise PackError(f"Not a directory: {self.source_dir}")
+        report = PackReport()
+        files = collect_files(self.source_dir)
+        generated = self._package_files(files, report)
+        newest = newest_mtime(files)
+
+        names = sorted(set(files) | set(generated))
+        # The container and package document come right after the mimetype.
+        names.sort(key=lambda name: (name != CONTAINER_PATH, not name.endswith(".opf")))
+
+        cache = BuildCache(self.cache_path(output) if self.use_cache else None)
+        previous = previous_file = None
+        if self.use_cache and cache.entries and output.exists():
+            try:
+                previous = zipfile.ZipFile(output, "r")
+                previous_file = open(output, "rb")
+            except zipfile.BadZipFile:
+                previous = None
+        entries: Dict[str, Dict] = {}
+        temp_path = output.with_name(output.name + ".tmp")
+
+        def jobs():
+            for name in names:
+                policy = self._policy(name)
+                if name in generated:
+                    data = generated[name]
+                    mtime = newest
+                    stat = None
+                else:
+                    stat = files[name].stat()
+                    mtime = stat.st_mtime
+                    data = None
+                entry = cache.entries.get(name)
+                unchanged = (
+                    stat is not None and entry
+                    and entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("size") == stat.st_size
+                )
+                if unchanged:
+                    digest = entry["sha256"]
+                else:
+                    if data is None:
+                        data = files[name].read_bytes()
+                    digest = hashlib.sha256(data).hexdigest()
+                new_entry = {
+                    "mtime_ns": stat.st_mtime_ns if stat is not None else 0,
+                    "size": stat.st_size if stat is not None else len(data),
+                    "sha256": digest,
+                    "level": policy.level,
+                }
+                info = self._reusable(previous, name, entry, digest, policy)
+                if info is not None:
+                    new_entry.update(crc=info.CRC, compress_type=info.compress_type)
+                    entries[name] = new_entry
+                    yield name, info, None, None
+                    continue
+                if data is None:
+                    data = files[name].read_bytes()
+                entries[name] = new_entry
+                yield name, self._zip_info(name, mtime), data, policy
+
+        try:
+            with RawZipWriter(temp_path) as new_zip:
+                mimetype = self._zip_info("mimetype", newest)
+                new_zip.write_stored(mimetype, MIMETYPE)
+                report.members += 1
+
+                max_workers = self.max_workers or os.cpu_count() or 1
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    window = 2 * max_workers
+                    pending = deque()
+
+                    def drain(limit):
+                        while len(pending) > limit:
+                            name, value = pending.popleft()
+                            if isinstance(value, zipfile.ZipInfo):
+                                zinfo = zipfile.ZipInfo(name, value.date_time)
+                                zinfo.external_attr = value.external_attr
+                                zinfo.compress_type = value.compress_type
+                                zinfo.CRC = value.CRC
+                                zinfo.file_size = value.file_size
+                                new_zip.write(zinfo, read_raw_member(previous_file, value))
+                                report.reused_members += 1
+                            else:
+                                zinfo, payload = value.result()
+                                entries[name].update(crc=zinfo.CRC, compress_type=zinfo.compress_type)
+                                new_zip.write(zinfo, payload)
+                                report.compressed_members += 1
+                            report.members += 1
+
+                    for name, info, data, policy in jobs():
+                        if data is None:
+                            pending.append((name, info))
+                        else:
+                            pending.append((name, executor.submit(self._compress, info, data, policy)))
+                        drain(window)
+                    drain(0)
+        except Exception:
+            if temp_path.exists():
+                os.remove(temp_path)
+            raise
+        finally:
+            if previous is not None:
+                previous.close()
+                previous_file.close()
+
+        os.replace(temp_path, output)
+        cache.entries = entries
+        try:
+            cache.save()
+        except OSError as e:
+            log.warning("Could not write build cache %s: %s", cache.path, e)
+        report.bytes_written = output.stat().st_size
+        report.elapsed_seconds = time.perf_counter() - started
+        return report
+
+    @staticmethod
+    def _reusable(previous: Optional[zipfile.ZipFile], name: str, entry: Optional[Dict],
+                  digest: str, policy: CompressionPolicy) -> Optional[zipfile.ZipInfo]:
+        """The previous build's member for `name`, if it can be copied as is."""
+        if previous is None or entry is None or entry.get("sha256") != digest or entry.get("level") != policy.level:
+            return None
+        try:
+            info = previous.getinfo(name)
+        except KeyError:
+            return None
+        if info.CRC != entry.get("crc") or info.compress_type != entry.get("compress_type"):
+            return None
+        return info
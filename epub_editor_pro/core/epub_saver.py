@@ -1,8 +1,22 @@
+import time
 import zipfile
+import zlib
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-
+from typing import Dict, Optional, Tuple
+
+from epub_editor_pro.core.asset_optimizer import (
+    AssetOptimizationReport,
+    CompressionPolicy,
+    choose_compression,
+    guess_media_type,
+)
+from epub_editor_pro.core.css_analysis import CssAnalyzer, CssReport
 from epub_editor_pro.core.epub_model import EpubBook
+from epub_editor_pro.core.settings_model import PerformanceProfile
+from epub_editor_pro.utils.file_utils import RawZipWriter, deflate_raw, read_raw_member
 
 
 class EpubSaver:
@@ -10,42 +24,157 @@ class EpubSaver:
     Saves the changes in an EpubBook object back to an EPUB file.
     """
 
-    def __init__(self, book: EpubBook):
+    def __init__(
+        self,
+        book: EpubBook,
+        optimize_assets: bool = False,
+        optimize_stylesheets: bool = False,
+        max_workers: Optional[int] = None,
+        profile: Optional[PerformanceProfile] = None,
+    ):
+        """
+        Args:
+            book: The book to save.
+            optimize_assets: If True, every member is compressed according to
+                its media type: already compressed media is stored, text is
+                deflated at the best level. Otherwise each member keeps its
+                compression method, rewritten members being deflated at the
+                profile's compression level.
+            optimize_stylesheets: If True, the rules no document uses are
+                removed from the stylesheets, which are minified.
+            max_workers: Number of compression threads (None for the profile's).
+            profile: The performance profile (None for the defaults).
+        """
+        profile = profile or PerformanceProfile()
         self.book = book
+        self.optimize_assets = optimize_assets
+        self.optimize_stylesheets = optimize_stylesheets
+        self.profile = profile
+        self.max_workers = max_workers or profile.max_workers
+        self.compression_level = profile.compression_level
+        self.report: Optional[AssetOptimizationReport] = None  # Set by `save`
+        self.css_report: Optional[CssReport] = None  # Set by `save` with optimize_stylesheets
 
     def _write_mimetype(self, new_zip, original_zip):
         mimetype_info = original_zip.getinfo("mimetype")
         mimetype_content = original_zip.read(mimetype_info)
-        new_zip.writestr(
-            mimetype_info, mimetype_content, compress_type=zipfile.ZIP_STORED
-        )
-
-    def _write_unmodified_files(self, new_zip, original_zip, modified_files):
-        for item in original_zip.infolist():
-            if item.filename == "mimetype":
-                continue
-
-            is_modified = False
-            for href in modified_files:
-                if item.filename.endswith(href):
-                    is_modified = True
-                    break
-
-            if not is_modified:
-                new_zip.writestr(item, original_zip.read(item.filename))
-
-    def _write_modified_files(self, new_zip, original_zip):
-        for href, content in self.book.content_manager._content_cache.items():
-            found_info = None
+        new_zip.write_stored(self._new_zip_info("mimetype", mimetype_info), mimetype_content)
+
+    def _new_zip_info(self, name: str, original: Optional[zipfile.ZipInfo] = None) -> zipfile.ZipInfo:
+        if original is None:
+            return zipfile.ZipInfo(name, time.localtime()[:6])
+        zinfo = zipfile.ZipInfo(name, original.date_time)
+        zinfo.external_attr = original.external_attr
+        zinfo.create_system = original.create_system
+        zinfo.comment = original.comment
+        return zinfo
+
+    def _compress_member(
+        self, zinfo: zipfile.ZipInfo, data: bytes, policy: CompressionPolicy
+    ) -> Tuple[zipfile.ZipInfo, bytes, float]:
+        """Compresses one member; runs in a worker thread (zlib releases the GIL)."""
+        start = time.perf_counter()
+        zinfo.CRC = zlib.crc32(data)
+        zinfo.file_size = len(data)
+        zinfo.compress_type = zipfile.ZIP_STORED
+        payload = data
+        if policy.compress_type == zipfile.ZIP_DEFLATED:
+            compressed = deflate_raw(data, policy.level)
+            # Keep incompressible data stored rather than growing it.
+            if len(compressed) < len(data):
+                zinfo.compress_type = zipfile.ZIP_DEFLATED
+                payload = compressed
+        return zinfo, payload, time.perf_counter() - start
+
+    def _choose_policy(
+        self, name: str, media_type: Optional[str], original: Optional[zipfile.ZipInfo]
+    ) -> CompressionPolicy:
+        """Chooses how a member is compressed in the saved archive."""
+        if self.optimize_assets:
+            return choose_compression(media_type or guess_media_type(name))
+        # Keep each member's compression method, as a plain writestr would.
+        if original is not None and original.compress_type == zipfile.ZIP_STORED:
+            return CompressionPolicy(zipfile.ZIP_STORED)
+        return CompressionPolicy(zipfile.ZIP_DEFLATED, self.compression_level)
+
+    def _write_members(self, new_zip, original_zip, original_file, report: AssetOptimizationReport):
+        """
+        Writes every member but the mimetype. Copied members are read from
+        `original_file`, a handle on the original archive of our own.
+
+        Members that already use the chosen compression and are not modified
+        are copied without being decompressed. The others are read in
+        archive order and compressed by a pool of threads into ready-made
+        payloads, with a bounded number in flight. Payloads are written back
+        sequentially in archive order, followed by new files sorted by name,
+        so the output does not depend on thread scheduling.
+        """
+        content_manager = self.book.content_manager
+        media_types: Dict[str, str] = {
+            content_manager.archive_path(item.href): item.media_type
+            for item in self.book.manifest.values()
+        }
+        modified = {
+            content_manager.archive_path(href): content
+            for href, content in content_manager.modified_contents().items()
+        }
+        removed = content_manager.removed_paths - set(modified)
+
+        def jobs():
             for info in original_zip.infolist():
-                if info.filename.endswith(href):
-                    found_info = info
-                    break
-
-            if found_info:
-                new_zip.writestr(found_info, content)
+                if info.filename == "mimetype" or info.filename in removed:
+                    continue
+                policy = self._choose_policy(info.filename, media_types.get(info.filename), info)
+                data = modified.pop(info.filename, None)
+                encrypted = info.flag_bits & 0x1
+                if data is None and info.compress_type == policy.compress_type and not encrypted:
+                    yield info, None, policy
+                else:
+                    if data is None:
+                        data = original_zip.read(info)
+                    yield self._new_zip_info(info.filename, info), data, policy
+            for name in sorted(modified):
+                yield self._new_zip_info(name), modified[name], self._choose_policy(
+                    name, media_types.get(name), None
+                )
+
+        def write(zinfo, payload):
+            new_zip.write(zinfo, payload)
+            report.members += 1
+            if zinfo.compress_type == zipfile.ZIP_STORED:
+                report.stored_members += 1
+                report.deflate_skipped_bytes += zinfo.file_size
             else:
-                new_zip.writestr(href, content)
+                report.deflated_members += 1
+
+        max_workers = self.max_workers or os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            window = 2 * max_workers
+            pending = deque()
+
+            def drain(limit):
+                while len(pending) > limit:
+                    kind, value = pending.popleft()
+                    if kind == "copy":
+                        info = value
+                        zinfo = self._new_zip_info(info.filename, info)
+                        zinfo.compress_type = info.compress_type
+                        zinfo.CRC = info.CRC
+                        zinfo.file_size = info.file_size
+                        write(zinfo, read_raw_member(original_file, info))
+                        report.copied_members += 1
+                    else:
+                        zinfo, payload, seconds = value.result()
+                        report.compress_seconds += seconds
+                        write(zinfo, payload)
+
+            for zinfo, data, policy in jobs():
+                if data is None:
+                    pending.append(("copy", zinfo))
+                else:
+                    pending.append(("compress", executor.submit(self._compress_member, zinfo, data, policy)))
+                drain(window)
+            drain(0)
 
     def save(self, backup=True):
         """
@@ -54,24 +183,31 @@ class EpubSaver:
         Args:
             backup: If True, creates a backup of the original file.
         """
+        content_manager = self.book.content_manager
+        # Edits made by other programs in the workspace are saved too.
+        content_manager.sync_workspace()
+        if self.optimize_stylesheets:
+            analyzer = CssAnalyzer(self.book, self.max_workers, self.profile)
+            self.css_report = analyzer.analyze()
+            analyzer.write_stylesheets(self.css_report)
         if not self.book.is_modified:
             return
 
+        started = time.perf_counter()
         original_path = Path(self.book.filepath)
         temp_path = original_path.with_suffix(original_path.suffix + ".tmp")
         backup_path = original_path.with_suffix(original_path.suffix + ".bak")
+        report = AssetOptimizationReport()
 
         try:
-            with zipfile.ZipFile(self.book.filepath, "r") as original_zip:
-                with zipfile.ZipFile(
-                    temp_path, "w", zipfile.ZIP_DEFLATED
-                ) as new_zip:
+            with zipfile.ZipFile(self.book.filepath, "r") as original_zip, \
+                    open(self.book.filepath, "rb") as original_file:
+                with RawZipWriter(temp_path) as new_zip:
                     self._write_mimetype(new_zip, original_zip)
-                    modified_files = self.book.content_manager._content_cache.keys()
-                    self._write_unmodified_files(
-                        new_zip, original_zip, modified_files
-                    )
-                    self._write_modified_files(new_zip, original_zip)
+                    self._write_members(new_zip, original_zip, original_file, report)
+
+            report.bytes_before = original_path.stat().st_size
+            report.bytes_after = temp_path.stat().st_size
 
             if backup and original_path.exists():
                 os.replace(original_path, backup_path)
@@ -79,7 +215,12 @@ class EpubSaver:
             os.replace(temp_path, original_path)
 
             self.book.is_modified = False
-            self.book.content_manager._content_cache.clear()
+            content_manager.clear_cache()
+            if content_manager.workspace is not None:
+                content_manager.workspace.mark_synced()
+
+            report.elapsed_seconds = time.perf_counter() - started
+            self.report = report
 
         except Exception as e:
             if temp_path.exists():
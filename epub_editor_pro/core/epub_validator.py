@@ -0,0 +1,211 @@
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from lxml import etree, html
+
+from epub_editor_pro.core.epub_model import EpubBook
+from epub_editor_pro.utils.file_utils import normalize_href, resolve_href
+
+log = logging.getLogger(__name__)
+
+XLINK_HREF = "{http://www.w3.org/1999/xlink}href"
+XML_ID = "{http://www.w3.org/XML/1998/namespace}id"
+LINK_ATTRIBUTES = ("href", "src", XLINK_HREF)
+
+
+@dataclass
+class ValidationIssue:
+    """A single problem found in an EPUB."""
+    severity: str  # "error" or "warning"
+    code: str
+    message: str
+    item_href: Optional[str] = None
+
+
+@dataclass
+class ValidationReport:
+    """The result of validating a book."""
+    issues: List[ValidationIssue] = field(default_factory=list)
+    rechecked: List[str] = field(default_factory=list)  # Documents parsed in this run
+
+    @property
+    def errors(self) -> List[ValidationIssue]:
+        return [issue for issue in self.issues if issue.severity == "error"]
+
+    @property
+    def warnings(self) -> List[ValidationIssue]:
+        return [issue for issue in self.issues if issue.severity == "warning"]
+
+    @property
+    def is_valid(self) -> bool:
+        return not self.errors
+
+
+@dataclass
+class _DocumentReport:
+    """The cached, link-independent analysis of one XHTML document."""
+    crc: int
+    issues: List[ValidationIssue]
+    ids: FrozenSet[str]
+    links: List[Tuple[str, str, str]]  # (target href, fragment, raw reference)
+
+
+class EpubValidator:
+    """
+    Validates the structure and content documents of an EpubBook.
+
+    Per-document results are cached by CRC, so validating again after an
+    edit only re-parses the documents that changed. Link checks are redone
+    for those documents and for the documents that link to them.
+    """
+
+    def __init__(self, book: EpubBook, max_workers: Optional[int] = None):
+        self.book = book
+        self.max_workers = max_workers
+        self._reports: Dict[str, _DocumentReport] = {}
+        self._link_issues: Dict[str, List[ValidationIssue]] = {}
+        self._manifest_key: Optional[FrozenSet[str]] = None
+
+    def _check_structure(self, names: Set[str]) -> List[ValidationIssue]:
+        content_manager = self.book.content_manager
+        issues = []
+
+        referenced = set()
+        for item in self.book.manifest.values():
+            path = content_manager.archive_path(item.href)
+            referenced.add(path)
+            if path not in names and not content_manager.is_item_modified(item.href):
+                issues.append(ValidationIssue(
+                    "error", "manifest-missing",
+                    f"Manifest item '{item.id}' refers to '{path}', which is not in the archive.",
+                    item.href,
+                ))
+
+        for position, spine_item in enumerate(self.book.spine):
+            if spine_item.idref not in self.book.manifest:
+                issues.append(ValidationIssue(
+                    "error", "spine-unresolved",
+                    f"Spine item {position} refers to unknown manifest id '{spine_item.idref}'.",
+                ))
+
+        for name in sorted(names - referenced):
+            if name == "mimetype" or name.startswith("META-INF/") or name.endswith("/"):
+                continue
+            if name == self.book.opf_path or (self.book.opf_path is None and name.endswith(".opf")):
+                continue
+            issues.append(ValidationIssue(
+                "warning", "orphaned-entry",
+                f"Archive entry '{name}' is not listed in the manifest.",
+            ))
+        return issues
+
+    def _analyze_document(self, href: str, crc: int, content: bytes) -> _DocumentReport:
+        issues = []
+        try:
+            root = etree.fromstring(content, etree.XMLParser(resolve_entities=False, no_network=True))
+        except etree.XMLSyntaxError as e:
+            issues.append(ValidationIssue("error", "not-well-formed", f"Not well-formed XML: {e}", href))
+            try:
+                root = html.fromstring(content)
+            except (etree.ParserError, ValueError):
+                return _DocumentReport(crc, issues, frozenset(), [])
+
+        id_counts = Counter()
+        links = []
+        for element in root.iter():
+            if not isinstance(element.tag, str):
+                continue
+            element_id = element.get("id") or element.get(XML_ID)
+            if element_id:
+                id_counts[element_id] += 1
+            for attribute in LINK_ATTRIBUTES:
+                reference = element.get(attribute)
+                if not reference:
+                    continue
+                resolved = resolve_href(href, reference)
+                if resolved is not None:
+                    links.append((resolved[0], resolved[1], reference))
+
+        for element_id, count in id_counts.items():
+            if count > 1:
+                issues.append(ValidationIssue(
+                    "error", "duplicate-id", f"The id '{element_id}' is used {count} times.", href
+                ))
+        return _DocumentReport(crc, issues, frozenset(id_counts), links)
+
+    def _check_links(self, href: str, manifest_hrefs: Dict[str, str]) -> List[ValidationIssue]:
+        issues = []
+        for target, fragment, reference in self._reports[href].links:
+            target_href = manifest_hrefs.get(target)
+            if target_href is None:
+                issues.append(ValidationIssue(
+                    "error", "broken-link", f"Link '{reference}' points to a file that is not in the manifest.", href
+                ))
+            elif fragment and target_href in self._reports and fragment not in self._reports[target_href].ids:
+                issues.append(ValidationIssue(
+                    "error", "broken-anchor", f"Link '{reference}' points to a missing anchor.", href
+                ))
+        return issues
+
+    def validate(self) -> ValidationReport:
+        """
+        Validates the book, reusing cached results for unchanged documents.
+
+        Returns:
+            A ValidationReport listing all issues.
+        """
+        content_manager = self.book.content_manager
+        names = set(content_manager.zipfile.namelist())
+        report = ValidationReport(issues=self._check_structure(names))
+
+        documents: Dict[str, int] = {}
+        for item in self.book.manifest.values():
+            if "html" not in item.media_type:
+                continue
+            try:
+                documents[item.href] = content_manager.get_crc(item.href)
+            except FileNotFoundError:
+                continue  # Already reported as manifest-missing
+
+        for href in list(self._reports):
+            if href not in documents:
+                del self._reports[href]
+                self._link_issues.pop(href, None)
+
+        changed = [
+            href for href, crc in documents.items()
+            if href not in self._reports or self._reports[href].crc != crc
+        ]
+        if changed:
+            contents = [content_manager.get_content(href) for href in changed]
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                analyzed = executor.map(
+                    self._analyze_document, changed, [documents[h] for h in changed], contents
+                )
+                for href, document_report in zip(changed, analyzed):
+                    self._reports[href] = document_report
+        report.rechecked = changed
+
+        manifest_hrefs = {normalize_href(item.href): item.href for item in self.book.manifest.values()}
+        manifest_key = frozenset(manifest_hrefs)
+        if manifest_key != self._manifest_key:
+            relink = set(documents)
+            self._manifest_key = manifest_key
+        else:
+            changed_targets = {normalize_href(href) for href in changed}
+            relink = set(changed) | {
+                href for href, document_report in self._reports.items()
+                if any(target in changed_targets for target, _, _ in document_report.links)
+            }
+        for href in relink:
+            self._link_issues[href] = self._check_links(href, manifest_hrefs)
+
+        for href in documents:
+            report.issues.extend(self._reports[href].issues)
+            report.issues.extend(self._link_issues.get(href, []))
+
+        log.debug("Validated %d documents, %d re-parsed", len(documents), len(changed))
+        return report
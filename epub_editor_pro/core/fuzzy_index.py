@@ -0,0 +1,190 @@
+import threading
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterator, Optional, Set, Tuple
+
+TRIGRAM = 3
+
+
+@dataclass
+class FuzzyMatch:
+    """An approximate occurrence of a query in a document's normalized text."""
+    start: int
+    end: int
+    distance: int
+
+
+def default_max_distance(query: str) -> int:
+    """The number of edits tolerated by default: one per six characters."""
+    return max(1, len(query) // 6)
+
+
+def fold_case(text: str) -> str:
+    """Lowercases text without changing its length, so positions still line up."""
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    # A few characters lowercase to several (e.g. a dotted capital I).
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+
+def document_trigrams(text: str) -> FrozenSet[str]:
+    """The distinct trigrams of a text, case folded."""
+    text = fold_case(text)
+    return frozenset(text[position:position + TRIGRAM] for position in range(len(text) - TRIGRAM + 1))
+
+
+def _best_substring_match(query: str, region: str, max_distance: int) -> Optional[Tuple[int, int, int]]:
+    """
+    Finds the substring of `region` closest to `query` (Sellers' algorithm).
+
+    Returns:
+        (start, end, distance) of the best match within `max_distance`
+        edits, or None.
+    """
+    m = len(query)
+    cost = list(range(m + 1))
+    start = [0] * (m + 1)
+    best = (cost[m], 0, 0) if cost[m] <= max_distance else None
+    for i, character in enumerate(region, 1):
+        new_cost = [0] * (m + 1)
+        new_start = [i] * (m + 1)
+        for j in range(1, m + 1):
+            substitution = cost[j - 1] + (query[j - 1] != character)
+            insertion = cost[j] + 1
+            deletion = new_cost[j - 1] + 1
+            if substitution <= insertion and substitution <= deletion:
+                new_cost[j], new_start[j] = substitution, start[j - 1]
+            elif insertion <= deletion:
+                new_cost[j], new_start[j] = insertion, start[j]
+            else:
+                new_cost[j], new_start[j] = deletion, new_start[j - 1]
+        if new_cost[m] <= max_distance and (
+            best is None
+            or new_cost[m] < best[0]
+            # On a tie, a longer match from the same start reads better.
+            or (new_cost[m] == best[0] and new_start[m] == best[1])
+        ):
+            best = (new_cost[m], new_start[m], i)
+        cost, start = new_cost, new_start
+    if best is None:
+        return None
+    distance, match_start, match_end = best
+    return match_start, match_end, distance
+
+
+class TrigramIndex:
+    """
+    The positions of every trigram in a document's normalized, lowercased text.
+    """
+
+    def __init__(self, text: str):
+        self.text = fold_case(text)
+        self.postings: Dict[str, array] = {}
+        for position in range(len(self.text) - TRIGRAM + 1):
+            trigram = self.text[position:position + TRIGRAM]
+            postings = self.postings.get(trigram)
+            if postings is None:
+                postings = self.postings[trigram] = array("i")
+            postings.append(position)
+
+    def search(self, query: str, max_distance: int) -> Iterator[FuzzyMatch]:
+        """
+        Yields the non-overlapping approximate matches of `query`.
+
+        A substring within k edits of the query shares at least
+        (trigrams - 3k) of its trigrams, as one edit changes at most three.
+        Candidate start positions are voted for by the shared trigrams, and
+        only candidates reaching that count (at least one) are verified
+        with an exact edit distance computation. When k is so large that
+        the bound drops to one, matches sharing no trigram with the query
+        are not found.
+        """
+        query = fold_case(query)
+        grams = [query[j:j + TRIGRAM] for j in range(len(query) - TRIGRAM + 1)]
+        if not grams:
+            return
+        threshold = max(1, len(grams) - TRIGRAM * max_distance)
+
+        votes = Counter()
+        for offset, gram in enumerate(grams):
+            for position in self.postings.get(gram, ()):
+                votes[position - offset] += 1
+
+        candidates = []
+        for diagonal in sorted(votes):
+            # Insertions and deletions shift later trigrams by up to k positions.
+            support = sum(votes.get(d, 0) for d in range(diagonal - max_distance, diagonal + max_distance + 1))
+            if support >= threshold:
+                candidates.append(diagonal)
+
+        covered = 0
+        for diagonal in candidates:
+            region_start = max(covered, diagonal - max_distance)
+            region_end = min(len(self.text), diagonal + len(query) + max_distance)
+            if region_end - region_start < len(query) - max_distance:
+                continue
+            best = _best_substring_match(query, self.text[region_start:region_end], max_distance)
+            if best is None:
+                continue
+            start, end, distance = best
+            if end == start:
+                continue
+            covered = region_start + end
+            yield FuzzyMatch(region_start + start, covered, distance)
+
+
+class BookTrigramIndex:
+    """
+    The documents of a book each trigram occurs in.
+
+    It selects the documents a fuzzy query can match in, so only those are
+    loaded and searched with their own `TrigramIndex`. It holds one entry
+    per distinct trigram of each document, much less than the positions,
+    and is kept while the documents it was built from are unchanged.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Set[str]] = {}
+        self._documents: Dict[str, FrozenSet[str]] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, href: str) -> bool:
+        return href in self._documents
+
+    def add(self, href: str, trigrams: FrozenSet[str]):
+        """Indexes a document's trigrams, replacing those indexed before."""
+        with self._lock:
+            self._remove(href)
+            self._documents[href] = trigrams
+            for trigram in trigrams:
+                self.postings.setdefault(trigram, set()).add(href)
+
+    def remove(self, href: str):
+        """Forgets a document, whose content changed."""
+        with self._lock:
+            self._remove(href)
+
+    def _remove(self, href: str):
+        for trigram in self._documents.pop(href, ()):
+            documents = self.postings[trigram]
+            documents.discard(href)
+            if not documents:
+                del self.postings[trigram]
+
+    def candidates(self, query: str, max_distance: int) -> Set[str]:
+        """
+        The documents that may hold a match of `query` within `max_distance`.
+
+        An edit changes at most three trigrams, so a match keeps at least
+        (distinct trigrams - 3k) of the query's distinct trigrams, and at
+        least one.
+        """
+        grams = document_trigrams(query)
+        threshold = max(1, len(grams) - TRIGRAM * max_distance)
+        votes = Counter()
+        with self._lock:
+            for gram in grams:
+                votes.update(self.postings.get(gram, ()))
+        return {href for href, count in votes.items() if count >= threshold}
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import logging
+import os
+import zipfile
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+log = logging.getLogger(__name__)
+
+# Members every EPUB has by definition; reporting them would be noise.
+IGNORED_MEMBERS = {"mimetype"}
+
+
+@dataclass
+class MemberFingerprint:
+    """A ZIP member identified by the CRC32 and size from the central directory."""
+    book: str
+    name: str
+    crc: int
+    size: int
+    compress_size: int
+
+
+@dataclass
+class DuplicateGroup:
+    """Members with identical content, across one or more books."""
+    crc: int
+    size: int
+    members: List[MemberFingerprint] = field(default_factory=list)
+
+    @property
+    def reclaimable_bytes(self) -> int:
+        """Archive bytes freed by keeping a single shared copy."""
+        sizes = sorted(member.compress_size for member in self.members)
+        return sum(sizes[1:])
+
+
+@dataclass
+class DedupReport:
+    """The result of scanning a library for duplicate members."""
+    books_scanned: int = 0
+    books_rescanned: int = 0  # Books whose fingerprints were not cached
+    members_hashed: int = 0
+    groups: List[DuplicateGroup] = field(default_factory=list)
+
+    @property
+    def reclaimable_bytes(self) -> int:
+        return sum(group.reclaimable_bytes for group in self.groups)
+
+
+class FingerprintCache:
+    """
+    Persists member fingerprints per book, keyed by path, mtime and size.
+
+    A book is only re-read when its file changed. Content hashes computed
+    to resolve CRC collisions are cached alongside.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self._entries: Dict[str, Dict] = {}
+        if path is not None and path.exists():
+            try:
+                with open(path, "r") as f:
+                    self._entries = json.load(f)
+            except (json.JSONDecodeError, IOError) as e:
+                log.warning("Ignoring unreadable fingerprint cache %s: %s", path, e)
+
+    def get(self, book: str, mtime: float, size: int) -> Optional[Dict]:
+        entry = self._entries.get(book)
+        if entry and entry["mtime"] == mtime and entry["size"] == size:
+            return entry
+        return None
+
+    def put(self, book: str, mtime: float, size: int, members: List[List]) -> Dict:
+        entry = {"mtime": mtime, "size": size, "members": members, "hashes": {}}
+        self._entries[book] = entry
+        return entry
+
+    def prune_missing(self):
+        """Drops the entries of books that no longer exist."""
+        for book in list(self._entries):
+            if not os.path.exists(book):
+                del self._entries[book]
+
+    def save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(temp_path, self.path)
+
+
+def _read_fingerprints(book: str) -> List[List]:
+    """Reads [name, crc, size, compress_size] rows from the central directory only."""
+    with zipfile.ZipFile(book) as zf:
+        return [
+            [info.filename, info.CRC, info.file_size, info.compress_size]
+            for info in zf.infolist()
+            if not info.is_dir()
+        ]
+
+
+def _hash_member(book: str, name: str) -> str:
+    digest = hashlib.sha256()
+    with zipfile.ZipFile(book) as zf, zf.open(name) as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LibraryScanner:
+    """
+    Finds members shared between the EPUBs of a library.
+
+    Members are matched on the (CRC32, size) pairs stored in each archive's
+    central directory, so nothing is decompressed. Only when a CRC is seen
+    with different sizes, i.e. a CRC collision is known to exist, are the
+    members with that CRC confirmed by hashing their content.
+    """
+
+    def __init__(self, cache: Optional[FingerprintCache] = None, min_size: int = 1,
+                 max_workers: Optional[int] = None):
+        self.cache = cache or FingerprintCache()
+        self.min_size = min_size
+        self.max_workers = max_workers
+
+    def _fingerprint_books(self, books: List[str], report: DedupReport) -> List[MemberFingerprint]:
+        entries = {}
+        stale = []
+        for book in books:
+            stat = os.stat(book)
+            entry = self.cache.get(book, stat.st_mtime, stat.st_size)
+            if entry is None:
+                stale.append((book, stat))
+            else:
+                entries[book] = entry
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            rows = executor.map(lambda job: self._safe_read(job[0]), stale)
+            for (book, stat), members in zip(stale, rows):
+                if members is not None:
+                    entries[book] = self.cache.put(book, stat.st_mtime, stat.st_size, members)
+                    report.books_rescanned += 1
+        report.books_scanned = len(entries)
+
+        return [
+            MemberFingerprint(book, name, crc, size, compress_size)
+            for book in books if book in entries
+            for name, crc, size, compress_size in entries[book]["members"]
+            if name not in IGNORED_MEMBERS and size >= self.min_size
+        ]
+
+    def _safe_read(self, book: str) -> Optional[List[List]]:
+        try:
+            return _read_fingerprints(book)
+        except (zipfile.BadZipFile, OSError) as e:
+            log.warning("Skipping %s: %s", book, e)
+            return None
+
+    def _content_hash(self, member: MemberFingerprint, report: DedupReport) -> str:
+        stat = os.stat(member.book)
+        entry = self.cache.get(member.book, stat.st_mtime, stat.st_size)
+        hashes = entry["hashes"] if entry else {}
+        if member.name not in hashes:
+            hashes[member.name] = _hash_member(member.book, member.name)
+            report.members_hashed += 1
+        return hashes[member.name]
+
+    def find_duplicates(
+        self,
+        fingerprints: List[MemberFingerprint],
+        content_hash: Callable[[MemberFingerprint], str],
+    ) -> List[DuplicateGroup]:
+        """
+        Groups fingerprints into duplicate sets, largest savings first.
+
+        Args:
+            fingerprints: The members to compare.
+            content_hash: Returns a content hash for a member; only called
+                for members whose CRC is involved in a known collision.
+        """
+        sizes_by_crc = defaultdict(set)
+        counts = Counter()
+        groups: Dict[tuple, DuplicateGroup] = {}
+        for member in fingerprints:
+            sizes_by_crc[member.crc].add(member.size)
+            counts[(member.crc, member.size)] += 1
+        for member in fingerprints:
+            key = (member.crc, member.size)
+            if counts[key] > 1 and len(sizes_by_crc[member.crc]) > 1:
+                key += (content_hash(member),)
+            groups.setdefault(key, DuplicateGroup(member.crc, member.size)).members.append(member)
+
+        duplicates = [group for group in groups.values() if len(group.members) > 1]
+        duplicates.sort(key=lambda group: group.reclaimable_bytes, reverse=True)
+        return duplicates
+
+    def scan(self, paths: Iterable[Path]) -> DedupReport:
+        """
+        Scans EPUB files and directories (recursively) for duplicate members.
+
+        The fingerprint cache is updated and saved.
+        """
+        books = []
+        for path in paths:
+            if path.is_dir():
+                books.extend(str(p.resolve()) for p in sorted(path.rglob("*.epub")) if p.is_file())
+            elif path.is_file():
+                books.append(str(path.resolve()))
+
+        report = DedupReport()
+        fingerprints = self._fingerprint_books(books, report)
+        report.groups = self.find_duplicates(
+            fingerprints, lambda member: self._content_hash(member, report)
+        )
+        self.cache.prune_missing()
+        self.cache.save()
+        return report
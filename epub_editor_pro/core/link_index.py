@@ -0,0 +1,426 @@
+import html as html_entities
+import os
+import posixpath
+import re
+import urllib.parse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from lxml import etree, html
+
+from epub_editor_pro.core.epub_model import EpubBook, ManifestItem
+from epub_editor_pro.core.epub_validator import LINK_ATTRIBUTES, XML_ID
+from epub_editor_pro.core.settings_model import PerformanceProfile
+from epub_editor_pro.utils.file_utils import normalize_href, resolve_href
+from epub_editor_pro.utils.text_utils import decode_text, detect_encoding
+
+# How a reference is written: as an href/src attribute, or in CSS.
+KIND_ATTRIBUTE = "attribute"
+KIND_CSS = "css"
+
+LINKING_MEDIA_TYPES = {
+    "application/x-dtbncx+xml",
+    "application/oebps-package+xml",
+    "image/svg+xml",
+    "text/css",
+}
+
+CSS_URL_RE = re.compile(r"""url\(\s*(?:"([^"]*)"|'([^']*)'|([^)"'\s]*))\s*\)""")
+CSS_IMPORT_RE = re.compile(r"""@import\s+(?:"([^"]*)"|'([^']*)')""")
+LINK_ATTRIBUTE_RE = re.compile(r"""(\s(?:[\w.-]+:)?(?:href|src)\s*=\s*)(?:"([^"]*)"|'([^']*)')""")
+ID_ATTRIBUTE_RE = re.compile(r"""(\s(?:xml:)?id\s*=\s*)(?:"([^"]*)"|'([^']*)')""")
+
+# Characters left as they are when writing a path into a reference.
+SAFE_PATH_CHARACTERS = "/!$&'()*+,;=:@-._~"
+
+
+class RenameError(Exception):
+    """Raised when a document or anchor cannot be renamed."""
+    pass
+
+
+@dataclass(frozen=True)
+class Reference:
+    """A link from one document of the book to a document or anchor."""
+    source: str  # Href of the referring document, relative to the OPF directory
+    target: str  # Normalized href of the target document
+    fragment: str
+    raw: str  # The reference as written
+    kind: str
+
+
+@dataclass
+class _DocumentLinks:
+    crc: int
+    references: Tuple[Reference, ...]
+    ids: FrozenSet[str]
+
+
+def _css_references(text: str) -> List[Tuple[str, str]]:
+    values = []
+    for regex in (CSS_URL_RE, CSS_IMPORT_RE):
+        for match in regex.finditer(text):
+            value = next((group for group in match.groups() if group is not None), "")
+            if value:
+                values.append((value, KIND_CSS))
+    return values
+
+
+def extract_links(href: str, crc: int, content: bytes, media_type: str) -> _DocumentLinks:
+    """Finds the references and ids of one document; runs in a worker thread."""
+    values: List[Tuple[str, str]] = []
+    ids: Set[str] = set()
+    if media_type == "text/css":
+        values = _css_references(decode_text(content, detect_encoding(content)))
+    else:
+        try:
+            root = etree.fromstring(content, etree.XMLParser(resolve_entities=False, no_network=True))
+        except etree.XMLSyntaxError:
+            try:
+                root = html.fromstring(content)
+            except (etree.ParserError, ValueError):
+                return _DocumentLinks(crc, (), frozenset())
+        for element in root.iter():
+            if not isinstance(element.tag, str):
+                continue
+            element_id = element.get("id") or element.get(XML_ID)
+            if element_id:
+                ids.add(element_id)
+            for attribute in LINK_ATTRIBUTES:
+                reference = element.get(attribute)
+                if reference:
+                    values.append((reference, KIND_ATTRIBUTE))
+            if element.get("style"):
+                values.extend(_css_references(element.get("style")))
+            if etree.QName(element).localname == "style" and element.text:
+                values.extend(_css_references(element.text))
+
+    references = []
+    for raw, kind in values:
+        resolved = resolve_href(href, raw)
+        if resolved is not None:
+            references.append(Reference(href, resolved[0], resolved[1], raw, kind))
+    return _DocumentLinks(crc, tuple(references), frozenset(ids))
+
+
+def _split_reference(raw: str) -> Tuple[str, str]:
+    """Splits a reference into its path and its '#fragment' suffix, as written."""
+    index = raw.find("#")
+    return (raw, "") if index < 0 else (raw[:index], raw[index:])
+
+
+def relative_reference(source_href: str, target_href: str) -> str:
+    """The reference to a document as written in another one, both relative to the OPF directory."""
+    path = posixpath.relpath(target_href, posixpath.dirname(source_href) or ".")
+    return urllib.parse.quote(path, safe=SAFE_PATH_CHARACTERS)
+
+
+def _escape_attribute(value: str) -> str:
+    return value.replace("&", "&amp;").replace("<", "&lt;").replace('"', "&quot;")
+
+
+def rewrite_references(text: str, mapping: Dict[str, str], css_only: bool = False) -> Tuple[str, int]:
+    """
+    Replaces references, matched by their unescaped value, leaving the rest
+    of the document byte for byte as it was.
+
+    Returns:
+        The new text and the number of references replaced.
+    """
+    count = 0
+
+    def attribute(match):
+        nonlocal count
+        quoted_by = '"' if match.group(2) is not None else "'"
+        value = html_entities.unescape(match.group(2) if match.group(2) is not None else match.group(3))
+        if value not in mapping:
+            return match.group(0)
+        count += 1
+        new_value = _escape_attribute(mapping[value])
+        if quoted_by == "'":
+            new_value = new_value.replace("'", "&apos;")
+        return f"{match.group(1)}{quoted_by}{new_value}{quoted_by}"
+
+    def css(match):
+        nonlocal count
+        for index, value in enumerate(match.groups(), 1):
+            if value is None:
+                continue
+            if value not in mapping:
+                return match.group(0)
+            count += 1
+            start, end = match.span(index)
+            offset = match.start()
+            whole = match.group(0)
+            return whole[:start - offset] + mapping[value] + whole[end - offset:]
+        return match.group(0)
+
+    if not css_only:
+        text = LINK_ATTRIBUTE_RE.sub(attribute, text)
+    text = CSS_URL_RE.sub(css, text)
+    text = CSS_IMPORT_RE.sub(css, text)
+    return text, count
+
+
+class LinkIndex:
+    """
+    The references between the documents of a book, in both directions.
+
+    Every href/src attribute (including NCX and navigation documents, and
+    the OPF itself), CSS url() and @import is indexed by source and by
+    target, so the documents linking to a file or an anchor are found
+    without reading the book again. `refresh` only re-reads documents
+    whose CRC changed since the last one.
+    """
+
+    def __init__(self, book: EpubBook, max_workers: Optional[int] = None, profile: Optional[PerformanceProfile] = None):
+        self.book = book
+        self.max_workers = max_workers or (profile or PerformanceProfile()).max_workers
+        self._documents: Dict[str, _DocumentLinks] = {}
+        self._inbound: Dict[str, Set[str]] = {}
+
+    @property
+    def opf_href(self) -> Optional[str]:
+        """The OPF file's href, relative to its own directory like the manifest hrefs."""
+        if self.book.opf_path is None:
+            return None
+        return posixpath.basename(self.book.opf_path)
+
+    def _linking_documents(self) -> Dict[str, str]:
+        documents = {}
+        if self.opf_href is not None:
+            documents[self.opf_href] = "application/oebps-package+xml"
+        for item in self.book.manifest.values():
+            if "html" in item.media_type or item.media_type in LINKING_MEDIA_TYPES:
+                documents[item.href] = item.media_type
+        return documents
+
+    def _forget(self, href: str):
+        links = self._documents.pop(href, None)
+        if links is None:
+            return
+        for reference in links.references:
+            sources = self._inbound.get(reference.target)
+            if sources is not None:
+                sources.discard(href)
+                if not sources:
+                    del self._inbound[reference.target]
+
+    def _remember(self, href: str, links: _DocumentLinks):
+        self._documents[href] = links
+        for reference in links.references:
+            self._inbound.setdefault(reference.target, set()).add(href)
+
+    def refresh(self, is_cancelled: Optional[Callable[[], bool]] = None) -> Optional[List[str]]:
+        """
+        Brings the index up to date, re-reading only documents whose CRC changed.
+
+        Documents are read on the calling thread and parsed by a pool of
+        threads, with a bounded number in flight.
+
+        Args:
+            is_cancelled: Polled between documents; cancelling returns None
+                and keeps the documents indexed so far.
+
+        Returns:
+            The hrefs of the documents (re-)indexed, or None if cancelled.
+        """
+        content_manager = self.book.content_manager
+        documents = self._linking_documents()
+        for href in list(self._documents):
+            if href not in documents:
+                self._forget(href)
+
+        indexed = []
+        max_workers = self.max_workers or os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            window = 2 * max_workers
+            pending = deque()
+
+            def drain(limit):
+                while len(pending) > limit:
+                    href, future = pending.popleft()
+                    self._forget(href)
+                    self._remember(href, future.result())
+                    indexed.append(href)
+
+            for href, media_type in documents.items():
+                if is_cancelled is not None and is_cancelled():
+                    return None
+                try:
+                    crc = content_manager.get_crc(href)
+                except FileNotFoundError:
+                    self._forget(href)
+                    continue
+                cached = self._documents.get(href)
+                if cached is not None and cached.crc == crc:
+                    continue
+                content = content_manager.get_content(href, cache=False)
+                pending.append((href, executor.submit(extract_links, href, crc, content, media_type)))
+                drain(window)
+            drain(0)
+        return indexed
+
+    def references_from(self, href: str) -> List[Reference]:
+        """The references made by a document."""
+        links = self._documents.get(href)
+        return list(links.references) if links is not None else []
+
+    def references_to(self, href: str, fragment: Optional[str] = None) -> List[Reference]:
+        """The references to a document, or to one of its anchors, in document order."""
+        target = normalize_href(href)
+        references = []
+        for source in sorted(self._inbound.get(target, ())):
+            for reference in self._documents[source].references:
+                if reference.target == target and (fragment is None or reference.fragment == fragment):
+                    references.append(reference)
+        return references
+
+    def referring_documents(self, href: str) -> List[str]:
+        """The documents referring to a document."""
+        return sorted(self._inbound.get(normalize_href(href), ()))
+
+    def ids(self, href: str) -> FrozenSet[str]:
+        """The ids of a document's elements."""
+        links = self._documents.get(href)
+        return links.ids if links is not None else frozenset()
+
+    def _find_item(self, href: str) -> Optional[ManifestItem]:
+        key = normalize_href(href)
+        return next((item for item in self.book.manifest.values() if normalize_href(item.href) == key), None)
+
+    def _apply(self, mappings: Dict[str, Dict[str, str]], media_types: Dict[str, str]) -> List[str]:
+        """Rewrites references in each document with a mapping; returns those changed."""
+        content_manager = self.book.content_manager
+        changed = []
+        for source, mapping in mappings.items():
+            if not mapping:
+                continue
+            text = content_manager.get_text(source)
+            new_text, count = rewrite_references(text, mapping, css_only=media_types.get(source) == "text/css")
+            if count:
+                content_manager.update_text(source, new_text)
+                changed.append(source)
+        return changed
+
+    def rename_item(self, old_href: str, new_href: str) -> List[str]:
+        """
+        Renames a manifest item, with its archive entry and every reference to it.
+
+        Only the documents the index lists as referring to the item are
+        read and rewritten, plus the item itself if it moves to another
+        directory, as its own relative references then change.
+
+        Args:
+            old_href: The manifest href of the item.
+            new_href: Its new href, relative to the OPF directory.
+
+        Returns:
+            The hrefs of the documents whose references were rewritten.
+
+        Raises:
+            RenameError: If the item does not exist or the new href is
+                invalid or taken.
+        """
+        item = self._find_item(old_href)
+        if item is None:
+            raise RenameError(f"No manifest item has the href '{old_href}'.")
+        parts = urllib.parse.urlsplit(new_href)
+        target = normalize_href(new_href)
+        if (
+            parts.scheme or parts.netloc or parts.fragment or parts.query
+            or not target or target.startswith("../") or target == ".." or target.startswith("/")
+        ):
+            raise RenameError(f"Invalid href: '{new_href}'.")
+        if self._find_item(target) is not None or target == self.opf_href:
+            raise RenameError(f"'{new_href}' is already in use.")
+
+        self.refresh()
+        old_target = normalize_href(item.href)
+        moved = posixpath.dirname(old_target) != posixpath.dirname(target)
+        new_raw = relative_reference(self.opf_href or "", target)
+
+        def mapping_for(source: str, new_source: str) -> Dict[str, str]:
+            mapping = {}
+            for reference in self.references_from(source):
+                path, fragment = _split_reference(reference.raw)
+                if not path:
+                    continue  # '#anchor' stays valid wherever the document is
+                if reference.target == old_target:
+                    new_path = relative_reference(new_source, target)
+                elif source == item.href and moved:
+                    new_path = relative_reference(new_source, reference.target)
+                else:
+                    continue
+                if new_path + fragment != reference.raw:
+                    mapping[reference.raw] = new_path + fragment
+            return mapping
+
+        media_types = self._linking_documents()
+        mappings = {}
+        for source in self.referring_documents(item.href):
+            if source != item.href:
+                mappings[source] = mapping_for(source, source)
+        own_mapping = mapping_for(item.href, target) if item.href in self._documents else {}
+
+        self.book.content_manager.rename(item.href, new_raw)
+        self._forget(item.href)
+        old_href, item.href = item.href, new_raw
+        mappings[new_raw] = own_mapping
+        media_types[new_raw] = item.media_type
+        changed = self._apply(mappings, media_types)
+
+        if self.book.navigation is not None:
+            self.book.navigation.rename(old_href, new_raw)
+        self.refresh()
+        return sorted(changed)
+
+    def rename_anchor(self, href: str, old_id: str, new_id: str) -> List[str]:
+        """
+        Renames an element id, and every reference to it.
+
+        Returns:
+            The hrefs of the documents rewritten, including the one holding the id.
+
+        Raises:
+            RenameError: If the document or id does not exist, or the new
+                id is invalid or taken.
+        """
+        item = self._find_item(href)
+        if item is None:
+            raise RenameError(f"No manifest item has the href '{href}'.")
+        if not new_id or any(c.isspace() for c in new_id) or "#" in new_id:
+            raise RenameError(f"Invalid id: '{new_id}'.")
+        self.refresh()
+        ids = self.ids(item.href)
+        if old_id not in ids:
+            raise RenameError(f"'{item.href}' has no element with the id '{old_id}'.")
+        if new_id in ids:
+            raise RenameError(f"'{item.href}' already has an element with the id '{new_id}'.")
+
+        content_manager = self.book.content_manager
+        text = content_manager.get_text(item.href)
+
+        def rename_id(match):
+            value = match.group(2) if match.group(2) is not None else match.group(3)
+            if html_entities.unescape(value) != old_id:
+                return match.group(0)
+            quote = '"' if match.group(2) is not None else "'"
+            return f"{match.group(1)}{quote}{_escape_attribute(new_id)}{quote}"
+
+        content_manager.update_text(item.href, ID_ATTRIBUTE_RE.sub(rename_id, text))
+
+        fragment = urllib.parse.quote(new_id, safe=SAFE_PATH_CHARACTERS + "?")
+        mappings: Dict[str, Dict[str, str]] = {}
+        for reference in self.references_to(item.href, old_id):
+            path, _ = _split_reference(reference.raw)
+            mappings.setdefault(reference.source, {})[reference.raw] = f"{path}#{fragment}"
+        changed = set(self._apply(mappings, self._linking_documents()))
+        changed.add(item.href)
+
+        if self.book.navigation is not None:
+            self.book.navigation.rename(item.href, item.href, old_id, new_id)
+        self.refresh()
+        return sorted(changed)
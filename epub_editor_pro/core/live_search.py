@@ -0,0 +1,115 @@
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional
+
+from epub_editor_pro.core.search_engine import MODE_EXACT, SearchEngine
+from epub_editor_pro.core.search_models import SearchResult
+
+
+@dataclass
+class _CompletedSearch:
+    """A query whose full result set is known."""
+    query: str
+    case_sensitive: bool
+    whole_word: bool
+    regex: bool
+    mode: str = MODE_EXACT
+    results: List[SearchResult] = field(default_factory=list)
+
+
+class LiveSearchSession:
+    """
+    Runs successive search-as-you-type queries against one book.
+
+    The session remembers the last query that ran to completion. When the
+    next query only extends it, the previous result set is narrowed instead
+    of rescanning the book.
+    """
+
+    def __init__(self, engine: SearchEngine):
+        self.engine = engine
+        self._last: Optional[_CompletedSearch] = None
+
+    @property
+    def book(self):
+        return self.engine.book
+
+    def can_narrow(
+        self, query: str, case_sensitive: bool, whole_word: bool, regex: bool,
+        mode: str = MODE_EXACT,
+    ) -> bool:
+        """Whether `query` can be answered from the last completed result set."""
+        last = self._last
+        if last is None or regex or last.regex or last.whole_word:
+            return False
+        # Phrase and fuzzy results only carry part of their context.
+        if mode != MODE_EXACT or last.mode != MODE_EXACT:
+            return False
+        if case_sensitive != last.case_sensitive:
+            return False
+        if case_sensitive:
+            return last.query in query
+        return last.query.lower() in query.lower()
+
+    def results_for(
+        self, query: str, case_sensitive: bool, whole_word: bool, regex: bool,
+        mode: str = MODE_EXACT,
+    ) -> Optional[List[SearchResult]]:
+        """Returns the complete results of an identical finished query, if any."""
+        last = self._last
+        if last and (last.query, last.case_sensitive, last.whole_word, last.regex, last.mode) == (
+            query, case_sensitive, whole_word, regex, mode
+        ):
+            return list(last.results)
+        return None
+
+    def run(
+        self,
+        query: str,
+        case_sensitive: bool,
+        whole_word: bool,
+        regex: bool,
+        is_cancelled: Callable[[], bool] = lambda: False,
+        position: Optional[int] = None,
+        mode: str = MODE_EXACT,
+    ) -> Iterator[SearchResult]:
+        """
+        Yields the results for `query`, narrowing the previous set when possible.
+
+        The results only become the base for later narrowing once the
+        generator has been exhausted without being cancelled; a partial
+        result set would silently drop matches. `position` and `mode` are
+        passed on to `SearchEngine.search_in_mode`; narrowed results keep
+        their earlier order.
+
+        Raises:
+            ValueError: If the query is an invalid regular expression.
+        """
+        cached = self.results_for(query, case_sensitive, whole_word, regex, mode)
+        if cached is not None:
+            yield from cached
+            return
+
+        if self.can_narrow(query, case_sensitive, whole_word, regex, mode):
+            source = self.engine.narrow(
+                self._last.results, query, case_sensitive, whole_word, regex
+            )
+        else:
+            source = self.engine.search_in_mode(
+                mode, query, case_sensitive, whole_word, regex, position
+            )
+
+        results = []
+        for result in source:
+            if is_cancelled():
+                return
+            results.append(result)
+            yield result
+
+        if not is_cancelled():
+            self._last = _CompletedSearch(
+                query, case_sensitive, whole_word, regex, mode, results
+            )
+
+    def reset(self):
+        """Forgets the previous result set, e.g. after the book was modified."""
+        self._last = None
@@ -0,0 +1,194 @@
+import logging
+import os
+import sqlite3
+import threading
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from lxml import etree
+
+log = logging.getLogger(__name__)
+
+CONTAINER_NS = "urn:oasis:names:tc:opendocument:xmlns:container"
+OPF_NS = "http://www.idpf.org/2007/opf"
+DC_NS = "http://purl.org/dc/elements/1.1/"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    title TEXT,
+    creator TEXT,
+    language TEXT,
+    error TEXT
+)
+"""
+
+
+@dataclass
+class BookSummary:
+    """The few metadata fields shown when browsing for a book."""
+    path: str
+    title: Optional[str] = None
+    creator: Optional[str] = None
+    language: Optional[str] = None
+    error: Optional[str] = None  # Why the metadata could not be read
+
+
+def read_book_summary(path: str) -> BookSummary:
+    """
+    Reads the title, author and language of an EPUB.
+
+    Only container.xml and the OPF are opened, and the OPF is parsed
+    incrementally up to the end of its metadata element, so the manifest
+    and spine of large books are never built.
+    """
+    summary = BookSummary(path)
+    try:
+        with zipfile.ZipFile(path) as zf:
+            container = etree.fromstring(zf.read("META-INF/container.xml"))
+            rootfile = container.find(f"{{{CONTAINER_NS}}}rootfiles/{{{CONTAINER_NS}}}rootfile")
+            if rootfile is None or not rootfile.get("full-path"):
+                summary.error = "No rootfile in container.xml"
+                return summary
+
+            fields = {"title", "creator", "language"}
+            with zf.open(rootfile.get("full-path")) as opf:
+                for _, element in etree.iterparse(
+                    opf, events=("end",), resolve_entities=False, no_network=True
+                ):
+                    if element.tag == f"{{{OPF_NS}}}metadata":
+                        break
+                    if not isinstance(element.tag, str) or not element.tag.startswith(f"{{{DC_NS}}}"):
+                        continue
+                    attribute = etree.QName(element).localname
+                    # The first title/creator is the main one.
+                    if attribute in fields and getattr(summary, attribute) is None and element.text:
+                        setattr(summary, attribute, element.text.strip())
+    except (zipfile.BadZipFile, KeyError, OSError, etree.XMLSyntaxError) as e:
+        summary.error = str(e)
+    return summary
+
+
+class MetadataCache:
+    """
+    A SQLite cache of book summaries keyed by path, mtime and size.
+
+    The connection is shared between threads and guarded by a lock. Once
+    closed, the cache misses and drops writes, so background indexing that
+    is still winding down does not fail.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        """
+        Args:
+            path: The database file, or None for an in-memory cache.
+        """
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = sqlite3.connect(
+            str(path) if path is not None else ":memory:", check_same_thread=False
+        )
+        self._connection.execute(SCHEMA)
+        self._connection.commit()
+
+    def get(self, path: str, mtime: float, size: int) -> Optional[BookSummary]:
+        """Returns the cached summary, unless the file changed since."""
+        with self._lock:
+            if self._connection is None:
+                return None
+            row = self._connection.execute(
+                "SELECT title, creator, language, error FROM books WHERE path = ? AND mtime = ? AND size = ?",
+                (path, mtime, size),
+            ).fetchone()
+        if row is None:
+            return None
+        return BookSummary(path, *row)
+
+    def put_many(self, entries: Iterable[tuple]):
+        """Stores (summary, mtime, size) tuples in a single transaction."""
+        with self._lock:
+            if self._connection is None:
+                return
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO books (path, mtime, size, title, creator, language, error) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (s.path, mtime, size, s.title, s.creator, s.language, s.error)
+                        for s, mtime, size in entries
+                    ],
+                )
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class MetadataIndexer:
+    """
+    Resolves book summaries from the cache, reading only changed files.
+    """
+
+    def __init__(self, cache: MetadataCache, batch_size: int = 50):
+        self.cache = cache
+        self.batch_size = batch_size
+        self.summaries: Dict[str, BookSummary] = {}  # In-memory view of what was indexed
+
+    def cached(self, path: Path) -> Optional[BookSummary]:
+        """Returns a known summary without touching the file system."""
+        return self.summaries.get(str(path))
+
+    def index(
+        self,
+        paths: Iterable[Path],
+        is_cancelled: Callable[[], bool] = lambda: False,
+        on_batch: Callable[[List[BookSummary]], None] = lambda batch: None,
+    ) -> int:
+        """
+        Makes sure the given books are indexed.
+
+        Unchanged books are served from the cache. The others are read and
+        written back in batches, each reported through `on_batch` so the
+        caller can refresh its display progressively.
+
+        Returns:
+            The number of books that had to be read.
+        """
+        read = 0
+        pending: List[tuple] = []
+        batch: List[BookSummary] = []
+
+        def flush():
+            if pending:
+                self.cache.put_many(pending)
+                pending.clear()
+            if batch:
+                on_batch(list(batch))
+                batch.clear()
+
+        for path in paths:
+            if is_cancelled():
+                break
+            key = str(path)
+            try:
+                stat = os.stat(key)
+            except OSError:
+                continue
+            summary = self.cache.get(key, stat.st_mtime, stat.st_size)
+            if summary is None:
+                summary = read_book_summary(key)
+                pending.append((summary, stat.st_mtime, stat.st_size))
+                read += 1
+            self.summaries[key] = summary
+            batch.append(summary)
+            if len(batch) >= self.batch_size:
+                flush()
+        flush()
+        return read
@@ -0,0 +1,268 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from lxml import etree
+
+from epub_editor_pro.utils.file_utils import normalize_href, resolve_href
+
+NCX_NS = "http://www.daisy.org/z3986/2005/ncx/"
+XHTML_NS = "http://www.w3.org/1999/xhtml"
+OPS_NS = "http://www.idpf.org/2007/ops"
+
+# Produces the (title, reference, source element) of the children of a source element.
+ChildReader = Callable[[etree._Element], List[Tuple[str, Optional[str], etree._Element]]]
+
+
+@dataclass
+class NavEntry:
+    """
+    An entry of the table of contents.
+
+    Children are read from the navigation document the first time they are
+    accessed, so opening a book with a large nested TOC only parses the top
+    level.
+    """
+    title: str
+    href: Optional[str]  # Manifest href of the target document, without fragment
+    fragment: str = ""
+    level: int = 0
+    _source: Optional[etree._Element] = field(default=None, repr=False, compare=False)
+    _read_children: Optional[ChildReader] = field(default=None, repr=False, compare=False)
+    _base_href: str = field(default="", repr=False, compare=False)
+    _manifest_hrefs: Dict[str, str] = field(default_factory=dict, repr=False, compare=False)
+    _children: Optional[List["NavEntry"]] = field(default=None, repr=False, compare=False)
+
+    @property
+    def children(self) -> List["NavEntry"]:
+        """The nested entries, loaded on first access."""
+        if self._children is None:
+            self._children = []
+            if self._source is not None and self._read_children is not None:
+                self._children = _make_entries(
+                    self._read_children(self._source), self._read_children,
+                    self._base_href, self._manifest_hrefs, self.level + 1,
+                )
+            self._source = None
+        return self._children
+
+    def walk(self) -> Iterator["NavEntry"]:
+        """Yields this entry and all of its descendants, depth first."""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+def _make_entries(raw_entries, read_children, base_href, manifest_hrefs, level) -> List[NavEntry]:
+    entries = []
+    for title, reference, source in raw_entries:
+        href, fragment = None, ""
+        if reference:
+            resolved = resolve_href(base_href, reference)
+            if resolved is not None:
+                href = manifest_hrefs.get(resolved[0], resolved[0])
+                fragment = resolved[1]
+        entries.append(NavEntry(
+            title=title, href=href, fragment=fragment, level=level,
+            _source=source, _read_children=read_children,
+            _base_href=base_href, _manifest_hrefs=manifest_hrefs,
+        ))
+    return entries
+
+
+def _text(element) -> str:
+    if element is None:
+        return ""
+    return " ".join("".join(element.itertext()).split())
+
+
+def _read_ncx_children(element) -> List[Tuple[str, Optional[str], etree._Element]]:
+    children = []
+    for nav_point in element.iterchildren(f"{{{NCX_NS}}}navPoint"):
+        label = nav_point.find(f"{{{NCX_NS}}}navLabel/{{{NCX_NS}}}text")
+        content = nav_point.find(f"{{{NCX_NS}}}content")
+        children.append((_text(label), content.get("src") if content is not None else None, nav_point))
+    return children
+
+
+def _read_nav_children(element) -> List[Tuple[str, Optional[str], etree._Element]]:
+    children = []
+    ol = element if element.tag == f"{{{XHTML_NS}}}ol" else element.find(f"{{{XHTML_NS}}}ol")
+    if ol is None:
+        return children
+    for li in ol.iterchildren(f"{{{XHTML_NS}}}li"):
+        anchor = li.find(f"{{{XHTML_NS}}}a")
+        label = anchor if anchor is not None else li.find(f"{{{XHTML_NS}}}span")
+        children.append((_text(label), anchor.get("href") if anchor is not None else None, li))
+    return children
+
+
+class NavigationIndex:
+    """
+    The table of contents of a book with constant-time lookups.
+
+    `title_for` resolves a document (and optionally an anchor) to the title
+    of the TOC entry that covers it. Documents without an entry of their own
+    resolve to the closest preceding entry in reading order.
+
+    Lookups index the levels already loaded. When one misses, it loads only
+    the subtrees that can hold the document: those whose entry comes before
+    it in the spine and whose following entry does not. Entries whose place
+    in the spine is unknown are loaded on any miss.
+    """
+
+    def __init__(self, entries: List[NavEntry], spine_hrefs: Optional[List[str]] = None):
+        self.entries = entries
+        self._spine_hrefs = spine_hrefs or []
+        self._reset()
+
+    def _reset(self):
+        self._spine_keys = [normalize_href(href) for href in self._spine_hrefs]
+        self._positions: Dict[str, int] = {}
+        for position, key in enumerate(self._spine_keys):
+            self._positions.setdefault(key, position)
+        self._by_href: Dict[str, NavEntry] = {}
+        self._by_anchor: Dict[Tuple[str, str], NavEntry] = {}
+        self._by_document: Dict[str, Optional[NavEntry]] = {}
+        # Entries with unloaded children: (entry, spine position, position of the entry after it).
+        self._pending: List[Tuple[NavEntry, Optional[int], Optional[int]]] = []
+        self._count: Optional[int] = None
+        self._index(self.entries, None)
+
+    def _position(self, entry: NavEntry) -> Optional[int]:
+        return None if entry.href is None else self._positions.get(normalize_href(entry.href))
+
+    def _index(self, entries: List[NavEntry], upper: Optional[int]):
+        """Indexes sibling entries and their loaded descendants, depth first."""
+        positions = [self._position(entry) for entry in entries]
+        bounds: List[Optional[int]] = [None] * len(entries)
+        following = upper
+        for i in reversed(range(len(entries))):
+            bounds[i] = following
+            if positions[i] is not None:
+                following = positions[i]
+        for entry, position, bound in zip(entries, positions, bounds):
+            if entry.href is not None:
+                key = normalize_href(entry.href)
+                if entry.fragment:
+                    self._by_anchor.setdefault((key, entry.fragment), entry)
+                current = self._by_href.get(key)
+                if current is None or (current.fragment and not entry.fragment):
+                    self._by_href[key] = entry
+            if entry._children is not None:
+                self._index(entry._children, bound)
+            elif entry._source is not None and entry._read_children is not None:
+                self._pending.append((entry, position, bound))
+
+    def _expand(self, position: Optional[int]) -> bool:
+        """Loads the pending subtrees that can hold the document at `position`."""
+        def may_hold(pending) -> bool:
+            _, start, end = pending
+            if position is None or start is None:
+                return True
+            if end is None:  # Nothing follows: the subtree runs to the end of the book.
+                return start <= position
+            return start > end or start <= position <= end
+
+        expanded = [pending for pending in self._pending if may_hold(pending)]
+        if not expanded:
+            return False
+        self._pending = [pending for pending in self._pending if not may_hold(pending)]
+        for entry, _, bound in expanded:
+            self._index(entry.children, bound)
+        return True
+
+    def _exact(self, key: str, fragment: str = "") -> Optional[NavEntry]:
+        """The entry of a document or anchor itself, loading subtrees until found."""
+        position = self._positions.get(key)
+        while True:
+            entry = self._by_anchor.get((key, fragment)) if fragment else self._by_href.get(key)
+            if entry is not None or not self._expand(position):
+                return entry
+
+    def walk(self) -> Iterator[NavEntry]:
+        """Yields every entry, depth first."""
+        for entry in self.entries:
+            yield from entry.walk()
+
+    def entry_for(self, href: str, fragment: Optional[str] = None) -> Optional[NavEntry]:
+        """Returns the TOC entry that covers a document or anchor, if any."""
+        key = normalize_href(href)
+        if fragment:
+            entry = self._exact(key, fragment)
+            if entry is not None:
+                return entry
+        entry = self._exact(key)
+        if entry is not None:
+            return entry
+        if key not in self._by_document:
+            position = self._positions.get(key)
+            for previous in reversed(self._spine_keys[:position or 0]):
+                entry = self._exact(previous)
+                if entry is not None:
+                    break
+            self._by_document[key] = entry
+        return self._by_document[key]
+
+    def title_for(self, href: str, fragment: Optional[str] = None) -> Optional[str]:
+        """Returns the title of the TOC entry that covers a document or anchor."""
+        entry = self.entry_for(href, fragment)
+        return entry.title if entry else None
+
+    def rename(self, href: str, new_href: str, fragment: Optional[str] = None, new_fragment: Optional[str] = None):
+        """
+        Points the entries of a renamed document, or of one of its anchors
+        when `fragment` is given, to the new name. Every entry is loaded.
+        """
+        key = normalize_href(href)
+        for entry in self.walk():
+            if entry.href is None or normalize_href(entry.href) != key:
+                continue
+            if fragment is None:
+                entry.href = new_href
+            elif entry.fragment == fragment:
+                entry.fragment = new_fragment or ""
+        if fragment is None:
+            self._spine_hrefs = [new_href if normalize_href(h) == key else h for h in self._spine_hrefs]
+        self._reset()
+
+    def __len__(self) -> int:
+        """The total number of entries, at every level. Every entry is loaded."""
+        if self._count is None:
+            self._count = sum(1 for _ in self.walk())
+        return self._count
+
+
+def parse_ncx(content: bytes, ncx_href: str, manifest_hrefs: Dict[str, str]) -> List[NavEntry]:
+    """
+    Parses the top level of an EPUB 2 NCX document.
+
+    Args:
+        content: The NCX document.
+        ncx_href: The manifest href of the NCX document.
+        manifest_hrefs: Maps normalized hrefs to manifest hrefs.
+    """
+    root = etree.fromstring(content, etree.XMLParser(resolve_entities=False, no_network=True))
+    nav_map = root.find(f"{{{NCX_NS}}}navMap")
+    if nav_map is None:
+        return []
+    return _make_entries(_read_ncx_children(nav_map), _read_ncx_children, ncx_href, manifest_hrefs, 0)
+
+
+def parse_nav_document(content: bytes, nav_href: str, manifest_hrefs: Dict[str, str]) -> List[NavEntry]:
+    """
+    Parses the top level of the table of contents of an EPUB 3 navigation document.
+
+    Args:
+        content: The navigation document.
+        nav_href: The manifest href of the navigation document.
+        manifest_hrefs: Maps normalized hrefs to manifest hrefs.
+    """
+    root = etree.fromstring(content, etree.XMLParser(resolve_entities=False, no_network=True))
+    navs = list(root.iter(f"{{{XHTML_NS}}}nav"))
+    toc = next((nav for nav in navs if "toc" in (nav.get(f"{{{OPS_NS}}}type") or "").split()), None)
+    if toc is None:
+        # Only an untyped nav can stand for the TOC, not a page list or landmarks.
+        toc = next((nav for nav in navs if not nav.get(f"{{{OPS_NS}}}type")), None)
+        if toc is None:
+            return []
+    return _make_entries(_read_nav_children(toc), _read_nav_children, nav_href, manifest_hrefs, 0)
@@ -0,0 +1,166 @@
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Dict, List
+
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+
+# Typographic ligatures are searched as the letters they stand for.
+LIGATURES = {
+    "ﬀ": "ff",
+    "ﬁ": "fi",
+    "ﬂ": "fl",
+    "ﬃ": "ffi",
+    "ﬄ": "ffl",
+    "ﬅ": "st",
+    "ﬆ": "st",
+    "Ĳ": "IJ",
+    "ĳ": "ij",
+    "Œ": "OE",
+    "œ": "oe",
+}
+
+# Invisible characters that split words without the reader seeing it:
+# soft hyphen, zero-width space/joiners, word joiner and BOM.
+REMOVED_CHARACTERS = {"\u00ad", "\u200b", "\u200c", "\u200d", "\u2060", "\ufeff"}
+
+# Elements whose boundaries separate words even without whitespace.
+BLOCK_ELEMENTS = {
+    "address", "article", "aside", "blockquote", "body", "br", "caption", "dd",
+    "div", "dl", "dt", "figcaption", "figure", "footer", "h1", "h2", "h3", "h4",
+    "h5", "h6", "header", "hr", "html", "li", "main", "nav", "ol", "p", "pre",
+    "section", "table", "td", "th", "tr", "ul",
+}
+
+SKIPPED_ELEMENTS = {"style", "script"}
+
+
+@dataclass
+class SourceSpan:
+    """A range of characters within one text node of the parsed document."""
+    node: NavigableString
+    start: int
+    end: int
+
+
+def normalize_query(query: str) -> str:
+    """Normalizes a plain-text query the way document text is normalized."""
+    characters = []
+    for character in query:
+        if character in REMOVED_CHARACTERS:
+            continue
+        characters.append(LIGATURES.get(character, character))
+    return " ".join("".join(characters).split())
+
+
+class NormalizedText:
+    """
+    The text of a document as one flat, normalized string.
+
+    Whitespace runs collapse to a single space, block boundaries become a
+    space, soft hyphens and other invisible characters are dropped, and
+    ligatures are expanded. Every character of `text` maps back to the
+    text node and offset it came from, so a match in the flat string can
+    be located exactly in the parsed document.
+    """
+
+    def __init__(self, soup: BeautifulSoup):
+        self.soup = soup
+        self.nodes: List[NavigableString] = []
+        self._node_index = array("l")
+        self._node_offset = array("l")
+        self._raw_offsets: List[int] = []
+        self._newlines: List[int] = []
+        self.text = self._build()
+
+    def _build(self) -> str:
+        # Offsets into get_text(), which unscoped searches number lines by.
+        raw_offsets: Dict[int, int] = {}
+        position = 0
+        for string in self.soup.strings:
+            raw_offsets[id(string)] = position
+            start = string.find("\n")
+            while start != -1:
+                self._newlines.append(position + start)
+                start = string.find("\n", start + 1)
+            position += len(string)
+
+        output: List[str] = []
+        pending_space = False
+        previous_block = None
+        blocks: Dict[int, object] = {}
+        for element in self.soup.descendants:
+            if isinstance(element, Tag):
+                if element.name in BLOCK_ELEMENTS:
+                    pending_space = True
+                continue
+            if type(element) not in (NavigableString, CData) or element.parent.name in SKIPPED_ELEMENTS:
+                continue
+
+            block = self._block_of(element.parent, blocks)
+            if block is not previous_block:
+                pending_space = True
+                previous_block = block
+
+            node_index = len(self.nodes)
+            self.nodes.append(element)
+            self._raw_offsets.append(raw_offsets.get(id(element), -1))
+            for offset, character in enumerate(element):
+                if character in REMOVED_CHARACTERS:
+                    continue
+                if character.isspace():
+                    pending_space = True
+                    continue
+                if pending_space and output:
+                    self._append(output, " ", node_index, offset)
+                pending_space = False
+                self._append(output, LIGATURES.get(character, character), node_index, offset)
+        return "".join(output)
+
+    def _block_of(self, parent: Tag, blocks: Dict[int, object]):
+        """The nearest block element containing a tag, memoized per tag."""
+        key = id(parent)
+        if key not in blocks:
+            element = parent
+            while element is not None and element.name not in BLOCK_ELEMENTS:
+                element = element.parent
+            blocks[key] = element
+        return blocks[key]
+
+    def _append(self, output: List[str], characters: str, node_index: int, offset: int):
+        output.append(characters)
+        for _ in characters:
+            self._node_index.append(node_index)
+            self._node_offset.append(offset)
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def source_spans(self, start: int, end: int) -> List[SourceSpan]:
+        """Maps a range of the normalized text back to the text nodes it came from."""
+        spans: List[SourceSpan] = []
+        for position in range(start, end):
+            node = self.nodes[self._node_index[position]]
+            offset = self._node_offset[position]
+            if spans and spans[-1].node is node:
+                spans[-1].end = offset + 1
+            else:
+                spans.append(SourceSpan(node, offset, offset + 1))
+        return spans
+
+    def line_number(self, position: int) -> int:
+        """The line of the document's get_text() a normalized position falls on."""
+        raw_offset = self._raw_offsets[self._node_index[position]]
+        if raw_offset < 0:
+            return 1
+        return bisect_left(self._newlines, raw_offset + self._node_offset[position]) + 1
+
+
+def text_lines(text: str, parser: str = "lxml") -> List[str]:
+    """The lines of a decoded document's text, as searched and numbered by the search engine."""
+    return BeautifulSoup(text, parser).get_text().splitlines()
+
+
+def normalize_document(text: str, parser: str = "lxml") -> NormalizedText:
+    """Parses a decoded document with a BeautifulSoup tree builder and builds its normalized text."""
+    return NormalizedText(BeautifulSoup(text, parser))
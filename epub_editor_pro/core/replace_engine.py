@@ -1,39 +1,312 @@
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Optional, Tuple
+
 from bs4 import BeautifulSoup
+from lxml import etree
 
+from epub_editor_pro.core.batch_rules import (
+    CompiledRule,
+    CompiledRuleSet,
+    ReplaceRule,
+    RuleSet,
+    compile_ruleset,
+)
 from epub_editor_pro.core.epub_model import EpubBook
+from epub_editor_pro.core.replace_models import FilePreview, ReplacePreview, ReplaceSnippet
 from epub_editor_pro.core.search_models import SearchResult
+from epub_editor_pro.core.search_scope import SearchScope
+from epub_editor_pro.core.settings_model import PerformanceProfile
+from epub_editor_pro.core.streaming import StreamingUnsupported, stream_replace
+from epub_editor_pro.utils.text_utils import encode_text, xml_declaration
+
+# Characters of surrounding text kept on each side of a previewed replacement.
+SNIPPET_CONTEXT = 30
 
 
 class ReplaceEngine:
     """A class to perform find and replace operations within an EPUB."""
 
-    def __init__(self, book: EpubBook):
+    def __init__(self, book: EpubBook, profile: Optional[PerformanceProfile] = None):
         self.book = book
+        profile = profile or PerformanceProfile()
+        self.parser_backend = profile.parser_backend
+        self.max_workers = profile.max_workers
+        # Documents larger than this are rewritten by streaming (None: never).
+        self.chunk_threshold = profile.chunk_threshold
+
+    def _compile_pattern(
+        self, find: str, case_sensitive: bool, whole_word: bool, regex: bool
+    ) -> re.Pattern:
+        flags = 0 if case_sensitive else re.IGNORECASE
+        if not regex:
+            find = re.escape(find)
+        if whole_word:
+            find = r"\b" + find + r"\b"
+
+        try:
+            return re.compile(find, flags)
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression: {e}") from e
+
+    def _compute_replacements(
+        self,
+        text: str,
+        encoding: str,
+        search_pattern,
+        replace,
+        max_snippets: int = 0,
+        scope: Optional[SearchScope] = None,
+    ) -> Tuple[int, Optional[bytes], List[ReplaceSnippet]]:
+        """
+        Applies a pattern to the text nodes of a document without storing the result.
+
+        The document is given already decoded, and the new document is
+        encoded back in `encoding`. With a scope, only the text nodes it
+        selects are changed.
 
-    def _replace_in_file(self, item, search_pattern, replace) -> int:
+        Returns:
+            The number of replacements, the new document (None if unchanged)
+            and up to `max_snippets` before/after snippets.
+        """
+        soup = BeautifulSoup(text, self.parser_backend)
+        text_nodes = soup.find_all(string=True)
+        includes = scope.text_filter(soup) if scope is not None and scope.filters_nodes else None
+        file_replacements = 0
+        snippets = []
+        for node in text_nodes:
+            if node.parent.name in ["style", "script"]:
+                continue
+            if includes is not None and not includes(node):
+                continue
+            if len(snippets) < max_snippets:
+                for match in search_pattern.finditer(node.string):
+                    if len(snippets) >= max_snippets:
+                        break
+                    snippets.append(self._make_snippet(node.string, match, replace))
+            new_content, num_subs = search_pattern.subn(replace, node.string)
+            if num_subs > 0:
+                node.string.replace_with(new_content)
+                file_replacements += num_subs
+        new_html = encode_text(self._serialize(soup, text), encoding) if file_replacements > 0 else None
+        return file_replacements, new_html, snippets
+
+    def _serialize(self, soup: BeautifulSoup, original_text: str) -> str:
+        """
+        Serializes a modified document with its original encoding declarations,
+        so that it still matches the encoding it is written back in.
+        """
+        # Meta charset attributes are kept as they are rather than set to UTF-8.
+        html = soup.decode_contents(indent_level=0, eventual_encoding=None)
+        declaration = xml_declaration(original_text)
+        if declaration:
+            # The HTML parser turns the XML declaration into a comment.
+            if html.startswith("<!--?xml"):
+                html = html[html.index("-->") + 3:].lstrip("\n")
+            html = declaration + "\n" + html
+        return html
+
+    def _make_snippet(self, text: str, match, replace) -> ReplaceSnippet:
+        start = max(0, match.start() - SNIPPET_CONTEXT)
+        end = match.end() + SNIPPET_CONTEXT
+        before = text[start:match.start()]
+        after = text[match.end():end]
+        return ReplaceSnippet(
+            before=before + match.group(0) + after,
+            after=before + match.expand(replace) + after,
+        )
+
+    def _stream_replacements(
+        self, item_href: str, rules: List[Tuple[re.Pattern, str]]
+    ) -> Optional[Tuple[int, Optional[bytes]]]:
+        """
+        Applies rules to an oversized document by streaming it.
+
+        Returns:
+            The number of replacements and the new document, or None if the
+            document is small enough, or cannot be streamed, and must be
+            parsed into a tree instead.
+        """
+        if self.chunk_threshold is None:
+            return None
         content_manager = self.book.content_manager
+        if content_manager.get_size(item_href) <= self.chunk_threshold:
+            return None
         try:
-            content = content_manager.get_content(item.href)
-            soup = BeautifulSoup(content, "lxml")
-            text_nodes = soup.find_all(string=True)
-            file_replacements = 0
-            for node in text_nodes:
-                if node.parent.name in ["style", "script"]:
-                    continue
-                new_content, num_subs = search_pattern.subn(replace, node.string)
-                if num_subs > 0:
-                    node.string.replace_with(new_content)
-                    file_replacements += num_subs
+            with content_manager.open_content(item_href) as stream:
+                return stream_replace(stream, rules)
+        except (StreamingUnsupported, etree.XMLSyntaxError):
+            return None
+
+    def _replace_in_file(self, item, search_pattern, replace, scope: Optional[SearchScope] = None) -> int:
+        content_manager = self.book.content_manager
+        try:
+            streamed = None
+            if scope is None or not scope.filters_nodes:
+                streamed = self._stream_replacements(item.href, [(search_pattern, replace)])
+            if streamed is not None:
+                file_replacements, new_html = streamed
+            else:
+                file_replacements, new_html, _ = self._compute_replacements(
+                    content_manager.get_text(item.href),
+                    content_manager.get_encoding(item.href),
+                    search_pattern,
+                    replace,
+                    scope=scope,
+                )
             if file_replacements > 0:
-                new_html = soup.prettify(encoding="utf-8")
                 content_manager.update_content(item.href, new_html)
             return file_replacements
         except (FileNotFoundError, KeyError):
             return 0
 
-    def replace_all(
+    def _preview_file(self, href, search_pattern, replace, max_snippets) -> Optional[FilePreview]:
+        """Previews one file; runs in a worker thread, reading the file there too."""
+        content_manager = self.book.content_manager
+        try:
+            content = content_manager.get_content(href)
+            text = content_manager.get_text(href)
+            encoding = content_manager.get_encoding(href)
+        except (FileNotFoundError, KeyError):
+            return None
+        count, new_html, snippets = self._compute_replacements(
+            text, encoding, search_pattern, replace, max_snippets
+        )
+        return FilePreview(
+            item_href=href,
+            count=count,
+            snippets=snippets,
+            original_content=content,
+            new_content=new_html,
+        )
+
+    def start_preview(
         self, find: str, replace: str, case_sensitive: bool, whole_word: bool, regex: bool
+    ) -> ReplacePreview:
+        """
+        Creates an empty preview for a replace-all, to be filled by `iter_preview`.
+
+        Raises:
+            ValueError: If `find` is an invalid regular expression.
+        """
+        search_pattern = self._compile_pattern(find, case_sensitive, whole_word, regex)
+        return ReplacePreview(pattern=search_pattern, replace=replace)
+
+    def iter_preview(
+        self,
+        preview: ReplacePreview,
+        max_snippets: int = 5,
+        max_workers: Optional[int] = None,
+    ) -> Iterator[FilePreview]:
+        """
+        Computes a replace-all without modifying the book, one file at a time.
+
+        Files are read and processed concurrently, through the thread-safe
+        content manager, and yielded as they finish, so the order is not the
+        manifest order. Only files with at least one
+        replacement are yielded, and each is also appended to
+        `preview.files`. Closing the generator early cancels files that
+        have not started yet.
+
+        Args:
+            preview: The preview created by `start_preview`.
+            max_snippets: Maximum number of before/after snippets per file.
+            max_workers: Number of worker threads (None for the profile's).
+
+        Yields:
+            FilePreview objects for each file that would change.
+        """
+        executor = ThreadPoolExecutor(max_workers=max_workers or self.max_workers)
+        futures = []
+        try:
+            for item in self.book.manifest.values():
+                if "html" not in item.media_type:
+                    continue
+                futures.append(executor.submit(
+                    self._preview_file, item.href, preview.pattern, preview.replace, max_snippets,
+                ))
+            for future in as_completed(futures):
+                file_preview = future.result()
+                if file_preview is not None and file_preview.count > 0:
+                    preview.files.append(file_preview)
+                    yield file_preview
+        finally:
+            # Executor.shutdown only takes cancel_futures from Python 3.9.
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def preview_all(
+        self,
+        find: str,
+        replace: str,
+        case_sensitive: bool,
+        whole_word: bool,
+        regex: bool,
+        max_snippets: int = 5,
+        max_workers: Optional[int] = None,
+    ) -> ReplacePreview:
+        """
+        Computes a complete replace-all preview, with files in manifest order.
+
+        Args:
+            find: The text to search for.
+            replace: The text to replace with.
+            case_sensitive: Whether the search is case-sensitive.
+            whole_word: Whether to match whole words only.
+            regex: Whether the query is a regular expression.
+            max_snippets: Maximum number of before/after snippets per file.
+            max_workers: Number of worker threads (None for the profile's).
+
+        Returns:
+            A ReplacePreview that can be passed to `apply_preview`.
+        """
+        preview = self.start_preview(find, replace, case_sensitive, whole_word, regex)
+        for _ in self.iter_preview(preview, max_snippets, max_workers):
+            pass
+        order = {item.href: i for i, item in enumerate(self.book.manifest.values())}
+        preview.files.sort(key=lambda f: order.get(f.item_href, len(order)))
+        return preview
+
+    def apply_preview(self, preview: ReplacePreview) -> int:
+        """
+        Applies a previously computed preview.
+
+        The precomputed documents are stored as they are. A file whose
+        content changed after the preview was computed is replaced afresh
+        so that the intervening edit is not lost.
+
+        Returns:
+            The total number of replacements made.
+        """
+        content_manager = self.book.content_manager
+        items_by_href = {item.href: item for item in self.book.manifest.values()}
+        total_replacements = 0
+        for file_preview in preview.files:
+            try:
+                current = content_manager.get_content(file_preview.item_href)
+            except (FileNotFoundError, KeyError):
+                continue
+            if current is file_preview.original_content or current == file_preview.original_content:
+                if file_preview.count > 0:
+                    content_manager.update_content(file_preview.item_href, file_preview.new_content)
+                    total_replacements += file_preview.count
+            else:
+                item = items_by_href.get(file_preview.item_href)
+                if item is not None:
+                    total_replacements += self._replace_in_file(
+                        item, preview.pattern, preview.replace
+                    )
+        return total_replacements
+
+    def replace_all(
+        self,
+        find: str,
+        replace: str,
+        case_sensitive: bool,
+        whole_word: bool,
+        regex: bool,
+        scope: Optional[SearchScope] = None,
     ) -> int:
         """
         Replaces all occurrences of a string in the EPUB content.
@@ -44,53 +317,105 @@ class ReplaceEngine:
             case_sensitive: Whether the search is case-sensitive.
             whole_word: Whether to match whole words only.
             regex: Whether the query is a regular expression.
+            scope: Restricts the replacement to some documents or elements;
+                documents outside it are not loaded.
 
         Returns:
             The total number of replacements made.
         """
-        flags = 0 if case_sensitive else re.IGNORECASE
-        if not regex:
-            find = re.escape(find)
-        if whole_word:
-            find = r"\b" + find + r"\b"
+        search_pattern = self._compile_pattern(find, case_sensitive, whole_word, regex)
 
-        try:
-            search_pattern = re.compile(find, flags)
-        except re.error as e:
-            raise ValueError(f"Invalid regular expression: {e}") from e
+        items = [item for item in self.book.manifest.values() if "html" in item.media_type]
+        if scope is not None:
+            scope.validate()
+            items = scope.select_documents(self.book, items)
 
         total_replacements = 0
-        for item in self.book.manifest.values():
-            if "html" in item.media_type:
-                total_replacements += self._replace_in_file(
-                    item, search_pattern, replace
-                )
+        for item in items:
+            total_replacements += self._replace_in_file(
+                item, search_pattern, replace, scope
+            )
         return total_replacements
 
     def replace_one(self, search_result: SearchResult, replace_text: str) -> bool:
         content_manager = self.book.content_manager
         try:
-            content = content_manager.get_content(search_result.item_href)
-            lines = content.splitlines(True)
+            text = content_manager.get_text(search_result.item_href)
+            lines = text.splitlines(True)
             if 0 <= search_result.line_number < len(lines):
                 line = lines[search_result.line_number]
                 new_line = line.replace(search_result.match_text, replace_text, 1)
                 if new_line != line:
                     lines[search_result.line_number] = new_line
-                    new_content = "".join(lines)
-                    content_manager.update_content(search_result.item_href, new_content.encode('utf-8'))
+                    content_manager.update_text(search_result.item_href, "".join(lines))
                     return True
             return False
         except (FileNotFoundError, KeyError):
             return False
 
+    def _apply_rules_to_text(
+        self, text: str, encoding: str, rules: List[CompiledRule]
+    ) -> Tuple[int, Optional[bytes]]:
+        """Applies rules in order to one document, parsing and serializing it once."""
+        soup = BeautifulSoup(text, self.parser_backend)
+        file_replacements = 0
+        for rule in rules:
+            for node in list(rule.text_nodes(soup)):
+                new_content, num_subs = rule.pattern.subn(rule.rule.replace, node)
+                if num_subs > 0:
+                    node.replace_with(new_content)
+                    file_replacements += num_subs
+        if file_replacements == 0:
+            return 0, None
+        return file_replacements, encode_text(self._serialize(soup, text), encoding)
+
+    def apply_rules(self, compiled: CompiledRuleSet) -> int:
+        """
+        Applies a compiled ruleset to every HTML document of the book.
+
+        Each document is parsed once, whatever the number of rules, and
+        only the rules whose item scope matches it are run. Documents over
+        the chunk threshold are streamed rather than parsed into a tree,
+        unless a rule selects elements.
+
+        Returns:
+            The total number of replacements made.
+        """
+        content_manager = self.book.content_manager
+        total_replacements = 0
+        for item in self.book.manifest.values():
+            if "html" not in item.media_type:
+                continue
+            rules = compiled.rules_for(item.href, item.id)
+            if not rules:
+                continue
+            try:
+                streamed = None
+                if all(rule.selector is None for rule in rules):
+                    streamed = self._stream_replacements(
+                        item.href, [(rule.pattern, rule.rule.replace) for rule in rules]
+                    )
+                if streamed is not None:
+                    count, new_html = streamed
+                else:
+                    count, new_html = self._apply_rules_to_text(
+                        content_manager.get_text(item.href),
+                        content_manager.get_encoding(item.href),
+                        rules,
+                    )
+            except (FileNotFoundError, KeyError):
+                continue
+            if count > 0:
+                content_manager.update_content(item.href, new_html)
+                total_replacements += count
+        return total_replacements
+
     def batch_replace_all(self, operations: list[tuple[str, str]], case_sensitive: bool, whole_word: bool, regex: bool) -> int:
         """
         Performs a batch of replace all operations.
 
-        For simplicity, this implementation iterates through the operations and calls
-        replace_all for each. A more optimized version might process all replacements
-        in a single pass over the content.
+        The operations are applied in order as a ruleset sharing the same
+        flags, so each document is parsed once for the whole batch.
 
         Args:
             operations: A list of (find, replace) tuples.
@@ -101,7 +426,8 @@ class ReplaceEngine:
         Returns:
             The total number of replacements made across all operations.
         """
-        total_replacements = 0
-        for find, replace in operations:
-            total_replacements += self.replace_all(find, replace, case_sensitive, whole_word, regex)
-        return total_replacements
+        ruleset = RuleSet(rules=tuple(
+            ReplaceRule(find, replace, case_sensitive, whole_word, regex)
+            for find, replace in operations
+        ))
+        return self.apply_rules(compile_ruleset(ruleset))
@@ -0,0 +1,33 @@
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+@dataclass
+class ReplaceSnippet:
+    """A single replacement shown in context."""
+    before: str
+    after: str
+
+
+@dataclass
+class FilePreview:
+    """The computed, not yet applied, replacements for one content file."""
+    item_href: str
+    count: int
+    snippets: List[ReplaceSnippet] = field(default_factory=list)
+    original_content: Optional[bytes] = None  # Content the preview was computed from
+    new_content: Optional[bytes] = None
+
+
+@dataclass
+class ReplacePreview:
+    """A dry-run of a replace-all operation across the book."""
+    pattern: re.Pattern
+    replace: str
+    files: List[FilePreview] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        """The total number of replacements across all files."""
+        return sum(f.count for f in self.files)
@@ -1,16 +1,35 @@
 import re
-from typing import Iterator
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Optional
 from bs4 import BeautifulSoup
+from lxml import etree
 
-from epub_editor_pro.core.epub_model import EpubBook
+from epub_editor_pro.core.epub_model import EpubBook, ManifestItem
+from epub_editor_pro.core.fuzzy_index import TRIGRAM, default_max_distance
+from epub_editor_pro.core.normalized_text import normalize_query
 from epub_editor_pro.core.search_models import SearchResult
+from epub_editor_pro.core.search_scope import SearchScope
+from epub_editor_pro.core.settings_model import PerformanceProfile
+from epub_editor_pro.core.streaming import iter_text_lines
+
+# Characters of normalized text reported on each side of a phrase match.
+PHRASE_CONTEXT = 40
+
+# Search modes: line by line, across elements, or approximate.
+MODE_EXACT = "exact"
+MODE_PHRASE = "phrase"
+MODE_FUZZY = "fuzzy"
 
 
 class SearchEngine:
     """A class to perform searches within an EPUB."""
 
-    def __init__(self, book: EpubBook):
+    def __init__(self, book: EpubBook, profile: Optional[PerformanceProfile] = None):
         self.book = book
+        profile = profile or PerformanceProfile()
+        self.parser_backend = profile.parser_backend
+        # Documents larger than this are searched by streaming (None: never).
+        self.chunk_threshold = profile.chunk_threshold
 
     def _compile_search_pattern(
         self, query: str, case_sensitive: bool, whole_word: bool, regex: bool
@@ -25,36 +44,351 @@ class SearchEngine:
         except re.error as e:
             raise ValueError(f"Invalid regular expression: {e}") from e
 
-    def _search_in_file(self, item, search_pattern) -> Iterator[SearchResult]:
+    def is_oversized(self, item_href: str) -> bool:
+        """Whether a document is too large to be parsed into a tree for searching."""
+        if self.chunk_threshold is None:
+            return False
+        try:
+            return self.book.content_manager.get_size(item_href) > self.chunk_threshold
+        except FileNotFoundError:
+            return False
+
+    def _search_in_file(self, item, search_pattern, scope: Optional[SearchScope] = None) -> Iterator[SearchResult]:
         try:
-            content = self.book.content_manager.get_content(item.href)
-            soup = BeautifulSoup(content, "lxml")
-            text_lines = soup.get_text().splitlines()
-
-            for i, line in enumerate(text_lines):
-                for match in search_pattern.finditer(line):
-                    context_before = line[:match.start()]
-                    match_text = match.group(0)
-                    context_after = line[match.end() :]
-
-                    yield SearchResult(
-                        file_path=item.href,
-                        line_number=i + 1,
-                        match_text=match_text,
-                        context_before=context_before,
-                        context_after=context_after,
-                        item_href=item.href,
-                    )
+            first_line = 1
+            if (scope is None or not scope.filters_nodes) and self.is_oversized(item.href):
+                try:
+                    with self.book.content_manager.open_content(item.href) as stream:
+                        for i, line in enumerate(iter_text_lines(stream)):
+                            first_line = i + 2
+                            yield from self._search_line(item, i + 1, line, search_pattern)
+                    return
+                except etree.XMLSyntaxError:
+                    # Not well-formed: parse it as HTML, from where streaming stopped.
+                    pass
+
+            if scope is not None and scope.filters_nodes:
+                soup = BeautifulSoup(self.book.content_manager.get_text(item.href), self.parser_backend)
+                yield from self._search_in_scope(item, soup, search_pattern, scope)
+                return
+            # Parsed once per content; cache warm-up fills these in ahead of the first search.
+            text_lines = self.book.content_manager.get_text_lines(item.href, self.parser_backend)
+
+            for i, line in enumerate(text_lines[first_line - 1:], first_line - 1):
+                yield from self._search_line(item, i + 1, line, search_pattern)
         except (FileNotFoundError, KeyError):
             pass
 
+    def _search_line(self, item, line_number: int, line: str, search_pattern) -> Iterator[SearchResult]:
+        for match in search_pattern.finditer(line):
+            context_before = line[:match.start()]
+            match_text = match.group(0)
+            context_after = line[match.end() :]
+
+            yield SearchResult(
+                file_path=item.href,
+                line_number=line_number,
+                match_text=match_text,
+                context_before=context_before,
+                context_after=context_after,
+                item_href=item.href,
+            )
+
+    def _search_in_scope(self, item, soup, search_pattern, scope: SearchScope) -> Iterator[SearchResult]:
+        """
+        Searches only the text inside the elements selected by a scope.
+
+        Lines, line numbers and context are those of the whole document, as
+        for an unscoped search; matches are kept only if they lie entirely
+        within in-scope text.
+        """
+        includes = scope.text_filter(soup)
+        pieces, ranges, offset = [], [], 0
+        # The same strings get_text() joins, so lines match an unscoped search.
+        for node in soup.strings:
+            if includes(node):
+                if ranges and ranges[-1][1] == offset:
+                    ranges[-1][1] += len(node)
+                else:
+                    ranges.append([offset, offset + len(node)])
+            pieces.append(node)
+            offset += len(node)
+        if not ranges:
+            return
+        starts = [start for start, _ in ranges]
+
+        line_start = 0
+        for i, raw_line in enumerate("".join(pieces).splitlines(keepends=True)):
+            line = raw_line.splitlines()[0]
+            for match in search_pattern.finditer(line):
+                start, end = line_start + match.start(), line_start + match.end()
+                index = bisect_right(starts, start) - 1
+                if index < 0 or end > ranges[index][1]:
+                    continue
+                yield SearchResult(
+                    file_path=item.href,
+                    line_number=i + 1,
+                    match_text=match.group(0),
+                    context_before=line[:match.start()],
+                    context_after=line[match.end():],
+                    item_href=item.href,
+                )
+            line_start += len(raw_line)
+
+    def spine_position(self, item_href: str) -> Optional[int]:
+        """Returns the index of a document in the spine, if it is in the spine."""
+        for position, spine_item in enumerate(self.book.spine):
+            item = self.book.manifest.get(spine_item.idref)
+            if item is not None and item.href == item_href:
+                return position
+        return None
+
+    def _schedule(self, position: Optional[int] = None) -> List[ManifestItem]:
+        """
+        Orders the searchable documents so the most useful ones come first.
+
+        Linear spine documents come first, in reading order, or nearest
+        first around `position`, preferring the following document on ties.
+        Non-linear spine documents follow, then HTML documents that are not
+        in the spine at all.
+        """
+        linear, non_linear, scheduled = [], [], set()
+        for index, spine_item in enumerate(self.book.spine):
+            item = self.book.manifest.get(spine_item.idref)
+            if item is None or "html" not in item.media_type or item.id in scheduled:
+                continue
+            scheduled.add(item.id)
+            (linear if spine_item.linear else non_linear).append((index, item))
+
+        if position is not None:
+            linear.sort(key=lambda entry: (abs(entry[0] - position), entry[0] < position))
+
+        rest = [
+            item for item in self.book.manifest.values()
+            if "html" in item.media_type and item.id not in scheduled
+        ]
+        return [item for _, item in linear] + [item for _, item in non_linear] + rest
+
     def search(
-        self, query: str, case_sensitive: bool, whole_word: bool, regex: bool
+        self,
+        query: str,
+        case_sensitive: bool,
+        whole_word: bool,
+        regex: bool,
+        position: Optional[int] = None,
+        scope: Optional[SearchScope] = None,
     ) -> Iterator[SearchResult]:
         """
         Searches the EPUB content.
 
+        Documents are searched lazily in the order given by `_schedule`, so
+        a caller that stops after the first results never loads or parses
+        the remaining documents. Documents outside `scope` are never loaded.
+
+        Args:
+            query: The text to search for.
+            case_sensitive: Whether the search is case-sensitive.
+            whole_word: Whether to match whole words only.
+            regex: Whether the query is a regular expression.
+            position: The spine index of the reader's current document;
+                documents around it are searched first.
+            scope: Restricts the search to some documents or elements.
+
+        Yields:
+            SearchResult objects for each match.
+        """
+        search_pattern = self._compile_search_pattern(
+            query, case_sensitive, whole_word, regex
+        )
+
+        items = self._schedule(position)
+        if scope is not None:
+            scope.validate()
+            items = scope.select_documents(self.book, items)
+        for item in items:
+            yield from self._search_in_file(item, search_pattern, scope)
+
+    def _search_phrase_in_file(
+        self, item, search_pattern, scope: Optional[SearchScope] = None
+    ) -> Iterator[SearchResult]:
+        try:
+            normalized = self.book.content_manager.get_normalized_text(item.href)
+        except (FileNotFoundError, KeyError):
+            return
+        includes = None
+        if scope is not None and scope.filters_nodes:
+            includes = scope.text_filter(normalized.soup)
+
+        text = normalized.text
+        for match in search_pattern.finditer(text):
+            start, end = match.span()
+            if start == end:
+                continue
+            if includes is not None and not all(
+                includes(span.node) for span in normalized.source_spans(start, end)
+            ):
+                continue
+            yield SearchResult(
+                file_path=item.href,
+                line_number=normalized.line_number(start),
+                match_text=match.group(0),
+                context_before=text[max(0, start - PHRASE_CONTEXT):start],
+                context_after=text[end:end + PHRASE_CONTEXT],
+                item_href=item.href,
+            )
+
+    def search_phrase(
+        self,
+        query: str,
+        case_sensitive: bool,
+        whole_word: bool,
+        regex: bool,
+        position: Optional[int] = None,
+        scope: Optional[SearchScope] = None,
+    ) -> Iterator[SearchResult]:
+        """
+        Searches the normalized text of each document, across elements.
+
+        Unlike `search`, a phrase is found even when it is split by inline
+        markup, line breaks, soft hyphens or ligatures. Each document's
+        normalized text is built once and cached by the content manager.
+        Match text and context are reported in normalized form; line
+        numbers are those `search` would report.
+
         Args:
+            query: The text to search for; plain-text queries are
+                normalized like the documents.
+            case_sensitive: Whether the search is case-sensitive.
+            whole_word: Whether to match whole words only.
+            regex: Whether the query is a regular expression.
+            position: The spine index of the reader's current document;
+                documents around it are searched first.
+            scope: Restricts the search to some documents or elements.
+
+        Yields:
+            SearchResult objects for each match.
+        """
+        if not regex:
+            query = normalize_query(query)
+        search_pattern = self._compile_search_pattern(
+            query, case_sensitive, whole_word, regex
+        )
+
+        items = self._schedule(position)
+        if scope is not None:
+            scope.validate()
+            items = scope.select_documents(self.book, items)
+        for item in items:
+            yield from self._search_phrase_in_file(item, search_pattern, scope)
+
+    def search_fuzzy(
+        self,
+        query: str,
+        max_distance: Optional[int] = None,
+        position: Optional[int] = None,
+        scope: Optional[SearchScope] = None,
+    ) -> Iterator[SearchResult]:
+        """
+        Searches for approximate, case-insensitive matches of a phrase.
+
+        Candidate documents come from the book's trigram index, built once
+        and kept by the content manager; only they are loaded. Within them,
+        candidates come from each document's trigram index, and only they
+        are checked with an exact edit distance computation.
+
+        Args:
+            query: The text to search for, normalized like the documents.
+            max_distance: The maximum number of edits (insertions,
+                deletions, substitutions); by default one per six characters.
+            position: The spine index of the reader's current document;
+                documents around it are searched first.
+            scope: Restricts the search to some documents or elements.
+
+        Yields:
+            SearchResult objects for each match.
+
+        Raises:
+            ValueError: If the query is shorter than a trigram.
+        """
+        query = normalize_query(query)
+        if len(query) < TRIGRAM:
+            raise ValueError(f"Fuzzy search needs at least {TRIGRAM} characters.")
+        if max_distance is None:
+            max_distance = default_max_distance(query)
+
+        items = self._schedule(position)
+        if scope is not None:
+            scope.validate()
+            items = scope.select_documents(self.book, items)
+        content_manager = self.book.content_manager
+        book_index = content_manager.get_book_trigram_index([item.href for item in items])
+        candidates = book_index.candidates(query, max_distance)
+        for item in items:
+            if item.href not in candidates:
+                continue
+            try:
+                index = content_manager.get_trigram_index(item.href)
+                normalized = content_manager.get_normalized_text(item.href)
+            except (FileNotFoundError, KeyError):
+                continue
+            includes = None
+            if scope is not None and scope.filters_nodes:
+                includes = scope.text_filter(normalized.soup)
+
+            text = normalized.text
+            for match in index.search(query, max_distance):
+                if includes is not None and not all(
+                    includes(span.node) for span in normalized.source_spans(match.start, match.end)
+                ):
+                    continue
+                yield SearchResult(
+                    file_path=item.href,
+                    line_number=normalized.line_number(match.start),
+                    match_text=text[match.start:match.end],
+                    context_before=text[max(0, match.start - PHRASE_CONTEXT):match.start],
+                    context_after=text[match.end:match.end + PHRASE_CONTEXT],
+                    item_href=item.href,
+                )
+
+    def search_in_mode(
+        self,
+        mode: str,
+        query: str,
+        case_sensitive: bool,
+        whole_word: bool,
+        regex: bool,
+        position: Optional[int] = None,
+        scope: Optional[SearchScope] = None,
+    ) -> Iterator[SearchResult]:
+        """
+        Runs `search`, `search_phrase` or `search_fuzzy` depending on `mode`.
+
+        Fuzzy searches ignore the case, whole word and regex options.
+        """
+        if mode == MODE_PHRASE:
+            return self.search_phrase(query, case_sensitive, whole_word, regex, position, scope)
+        if mode == MODE_FUZZY:
+            return self.search_fuzzy(query, position=position, scope=scope)
+        return self.search(query, case_sensitive, whole_word, regex, position, scope)
+
+    def narrow(
+        self,
+        previous: Iterable[SearchResult],
+        query: str,
+        case_sensitive: bool,
+        whole_word: bool,
+        regex: bool,
+    ) -> Iterator[SearchResult]:
+        """
+        Re-runs a query over only the lines that produced earlier results.
+
+        Every line matching a query that contains an earlier plain-text query
+        also matched that earlier query, so when the previous result set was
+        complete this yields exactly what `search` would, without reloading
+        or re-parsing any document.
+
+        Args:
+            previous: The complete results of the earlier, shorter query.
             query: The text to search for.
             case_sensitive: Whether the search is case-sensitive.
             whole_word: Whether to match whole words only.
@@ -67,6 +401,20 @@ class SearchEngine:
             query, case_sensitive, whole_word, regex
         )
 
-        for item in self.book.manifest.values():
-            if "html" in item.media_type:
-                yield from self._search_in_file(item, search_pattern)
+        seen_lines = set()
+        for result in previous:
+            key = (result.item_href, result.line_number)
+            if key in seen_lines:
+                continue
+            seen_lines.add(key)
+
+            line = result.context_before + result.match_text + result.context_after
+            for match in search_pattern.finditer(line):
+                yield SearchResult(
+                    file_path=result.file_path,
+                    line_number=result.line_number,
+                    match_text=match.group(0),
+                    context_before=line[:match.start()],
+                    context_after=line[match.end():],
+                    item_href=result.item_href,
+                )
@@ -0,0 +1,127 @@
+import csv
+import html
+import json
+from pathlib import Path
+from typing import Iterable, Optional, TextIO
+
+from epub_editor_pro.core.epub_model import EpubBook
+from epub_editor_pro.core.search_models import SearchResult
+
+FORMAT_CSV = "csv"
+FORMAT_JSONL = "jsonl"
+FORMAT_HTML = "html"
+REPORT_EXTENSIONS = {FORMAT_CSV: ".csv", FORMAT_JSONL: ".jsonl", FORMAT_HTML: ".html"}
+
+REPORT_FIELDS = ("book", "href", "chapter", "line", "match", "before", "after")
+
+HTML_HEADER = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8"/>
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; }}
+table {{ border-collapse: collapse; }}
+td, th {{ border: 1px solid #ccc; padding: 0.2em 0.5em; text-align: left; vertical-align: top; }}
+mark {{ background: #fe6; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<table>
+<tr><th>Book</th><th>Document</th><th>Chapter</th><th>Line</th><th>Match</th></tr>
+"""
+
+HTML_FOOTER = """</table>
+<p>{count} results.</p>
+</body>
+</html>
+"""
+
+
+def report_format_for(path: Path) -> Optional[str]:
+    """The report format matching a file's extension, if any."""
+    suffix = path.suffix.lower()
+    if suffix == ".htm":
+        return FORMAT_HTML
+    return next((fmt for fmt, extension in REPORT_EXTENSIONS.items() if extension == suffix), None)
+
+
+class SearchReportWriter:
+    """
+    Writes search results to a CSV, JSONL or HTML report as they come.
+
+    Each result is formatted and written when it is added, and nothing is
+    kept, so a report over many books takes constant memory. Use it as a
+    context manager, or call `close` to write the HTML footer.
+    """
+
+    def __init__(self, output: TextIO, fmt: str = FORMAT_CSV, title: str = "Search results"):
+        if fmt not in REPORT_EXTENSIONS:
+            raise ValueError(f"Unknown report format: {fmt!r}.")
+        self.output = output
+        self.fmt = fmt
+        self.count = 0
+        self._closed = False
+        if fmt == FORMAT_CSV:
+            self._csv = csv.writer(output)
+            self._csv.writerow(REPORT_FIELDS)
+        elif fmt == FORMAT_HTML:
+            output.write(HTML_HEADER.format(title=html.escape(title)))
+
+    def write(self, result: SearchResult, book: str = "", chapter: Optional[str] = None):
+        """Writes one result, found in `book` in the chapter titled `chapter`."""
+        if self.fmt == FORMAT_CSV:
+            self._csv.writerow((
+                book, result.item_href, chapter or "", result.line_number,
+                result.match_text, result.context_before, result.context_after,
+            ))
+        elif self.fmt == FORMAT_JSONL:
+            record = {
+                "book": book,
+                "href": result.item_href,
+                "chapter": chapter,
+                "line": result.line_number,
+                "match": result.match_text,
+                "before": result.context_before,
+                "after": result.context_after,
+            }
+            self.output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            self.output.write(
+                f"<tr><td>{html.escape(book)}</td><td>{html.escape(result.item_href)}</td>"
+                f"<td>{html.escape(chapter or '')}</td><td>{result.line_number}</td>"
+                f"<td>{html.escape(result.context_before)}<mark>{html.escape(result.match_text)}</mark>"
+                f"{html.escape(result.context_after)}</td></tr>\n"
+            )
+        self.count += 1
+
+    def write_book(self, book: EpubBook, results: Iterable[SearchResult], name: str = "") -> int:
+        """
+        Writes the results of one book as they are produced, with the
+        title of the chapter each was found in.
+
+        Returns:
+            The number of results written.
+        """
+        navigation = book.navigation
+        count = 0
+        for result in results:
+            chapter = navigation.title_for(result.item_href) if navigation is not None else None
+            self.write(result, name, chapter)
+            count += 1
+        return count
+
+    def close(self):
+        """Ends the report. The output stream is left open."""
+        if self._closed:
+            return
+        self._closed = True
+        if self.fmt == FORMAT_HTML:
+            self.output.write(HTML_FOOTER.format(count=self.count))
+
+    def __enter__(self) -> "SearchReportWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
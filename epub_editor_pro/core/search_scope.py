@@ -0,0 +1,91 @@
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import soupsieve
+from bs4 import BeautifulSoup, NavigableString
+
+from epub_editor_pro.core.epub_model import EpubBook, ManifestItem
+
+
+@lru_cache(maxsize=64)
+def compile_selector(selector: str) -> soupsieve.SoupSieve:
+    """
+    Compiles a CSS selector once for all the documents it is run against.
+
+    Raises:
+        ValueError: If the selector is invalid.
+    """
+    try:
+        return soupsieve.compile(selector)
+    except soupsieve.SelectorSyntaxError as e:
+        raise ValueError(f"Invalid CSS selector {selector!r}: {e}") from e
+
+
+@dataclass(frozen=True)
+class SearchScope:
+    """
+    Restricts a search or replace to part of a book.
+
+    Document filters (spine range, href glob) are checked before a
+    document is loaded. Node filters (CSS selector, element names) limit
+    matching to the text inside the selected elements.
+    """
+    spine_start: Optional[int] = None  # First spine index, inclusive
+    spine_end: Optional[int] = None  # Last spine index, inclusive
+    href_glob: Optional[str] = None
+    selector: Optional[str] = None
+    elements: Tuple[str, ...] = ()  # Names of the elements directly containing the text
+
+    @property
+    def filters_nodes(self) -> bool:
+        return bool(self.selector or self.elements)
+
+    def validate(self):
+        """
+        Raises:
+            ValueError: If the selector is invalid or the spine range is empty.
+        """
+        if self.selector:
+            compile_selector(self.selector)
+        if self.spine_start is not None and self.spine_end is not None and self.spine_start > self.spine_end:
+            raise ValueError(f"Empty spine range: {self.spine_start}-{self.spine_end}.")
+
+    def includes_document(self, href: str, spine_index: Optional[int]) -> bool:
+        """Whether a document is in scope, given its spine index (None if not in the spine)."""
+        if self.spine_start is not None or self.spine_end is not None:
+            if spine_index is None:
+                return False
+            if self.spine_start is not None and spine_index < self.spine_start:
+                return False
+            if self.spine_end is not None and spine_index > self.spine_end:
+                return False
+        return self.href_glob is None or fnmatchcase(href, self.href_glob)
+
+    def select_documents(self, book: EpubBook, items: Iterable[ManifestItem]) -> List[ManifestItem]:
+        """Keeps the in-scope documents of `items`, without loading any."""
+        spine_positions: Dict[str, int] = {}
+        for index, spine_item in enumerate(book.spine):
+            spine_positions.setdefault(spine_item.idref, index)
+        return [
+            item for item in items
+            if self.includes_document(item.href, spine_positions.get(item.id))
+        ]
+
+    def text_filter(self, soup: BeautifulSoup) -> Callable[[NavigableString], bool]:
+        """Returns a predicate telling whether a text node of `soup` is in scope."""
+        selected = None
+        if self.selector:
+            selected = {
+                id(node)
+                for element in compile_selector(self.selector).select(soup)
+                for node in element.find_all(string=True)
+            }
+
+        def includes(node: NavigableString) -> bool:
+            if self.elements and node.parent.name not in self.elements:
+                return False
+            return selected is None or id(node) in selected
+
+        return includes
@@ -1,7 +1,80 @@
 import json
-from dataclasses import dataclass, asdict, fields
+from dataclasses import dataclass, asdict, field, fields, replace
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from epub_editor_pro.core.streaming import DEFAULT_CHUNK_THRESHOLD
+
+# BeautifulSoup tree builders the editing engines can parse documents with.
+PARSER_BACKENDS = ("lxml", "html.parser")
+
+MIB = 1024 * 1024
+
+
+@dataclass
+class PerformanceProfile:
+    """
+    Runtime costs of the editor, read by the engines when they are created.
+
+    Attributes:
+        cache_budget: Bytes of unmodified content kept in memory per book
+            (None for no limit); text and indexes derived from evicted
+            content are dropped with it.
+        max_workers: Threads for parallel passes (None for one per CPU).
+        parser_backend: The BeautifulSoup tree builder, one of PARSER_BACKENDS.
+        search_index: Whether normalized text and per-document trigram
+            indexes are kept between searches, or rebuilt by each search;
+            the book's trigram index is kept either way.
+        compression_level: Deflate level of the members rewritten by a save
+            that does not optimize assets.
+        chunk_threshold: Size above which documents are streamed rather
+            than parsed into a tree (None to never stream).
+    """
+    cache_budget: Optional[int] = 256 * MIB
+    max_workers: Optional[int] = None
+    parser_backend: str = "lxml"
+    search_index: bool = True
+    compression_level: int = 6
+    chunk_threshold: Optional[int] = DEFAULT_CHUNK_THRESHOLD
+
+    def validate(self):
+        """
+        Raises:
+            ValueError: If a knob has an invalid value.
+        """
+        if self.parser_backend not in PARSER_BACKENDS:
+            raise ValueError(f"Unknown parser backend: {self.parser_backend!r}")
+        if not 0 <= self.compression_level <= 9:
+            raise ValueError(f"Invalid compression level: {self.compression_level}")
+        if self.max_workers is not None and self.max_workers < 1:
+            raise ValueError(f"Invalid worker count: {self.max_workers}")
+        for name in ("cache_budget", "chunk_threshold"):
+            value = getattr(self, name)
+            if value is None:
+                continue
+            # bool is an int, but true is not a size.
+            if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+                raise ValueError(f"Invalid {name.replace('_', ' ')}: {value!r}")
+
+
+DEFAULT_PROFILE = "balanced"
+
+PROFILE_PRESETS: Dict[str, PerformanceProfile] = {
+    DEFAULT_PROFILE: PerformanceProfile(),
+    "low_memory_phone": PerformanceProfile(
+        cache_budget=32 * MIB,
+        max_workers=1,
+        search_index=False,
+        compression_level=1,
+        chunk_threshold=1 * MIB,
+    ),
+    "workstation": PerformanceProfile(
+        cache_budget=None,
+        compression_level=9,
+        chunk_threshold=64 * MIB,
+    ),
+}
+
 
 @dataclass
 class Settings:
@@ -9,11 +82,18 @@ class Settings:
     theme: str = "dark"
     autosave: bool = True
     show_line_numbers: bool = True
+    optimize_assets: bool = False
+    optimize_stylesheets: bool = False
+    unpacked_workspace: bool = False
+    performance_profile: str = DEFAULT_PROFILE
+    # The preset named above, with the knobs the user changed.
+    performance: PerformanceProfile = field(default_factory=PerformanceProfile)
 
     def to_dict(self) -> Dict[str, Any]:
         """Converts the settings to a dictionary."""
         return asdict(self)
 
+
 class SettingsManager:
     """Manages loading, merging, and saving settings."""
 
@@ -30,10 +110,33 @@ class SettingsManager:
         merged_settings = {**defaults, **user_settings}
 
         # Filter out keys that are not in the Settings dataclass
-        valid_keys = {f.name for f in fields(Settings)}
+        valid_keys = {f.name for f in fields(Settings)} - {"performance"}
         filtered_settings = {k: v for k, v in merged_settings.items() if k in valid_keys}
+        if filtered_settings.get("performance_profile") not in PROFILE_PRESETS:
+            filtered_settings["performance_profile"] = DEFAULT_PROFILE
 
-        return Settings(**filtered_settings)
+        performance = self._load_profile(
+            filtered_settings["performance_profile"],
+            defaults.get("performance"),
+            user_settings.get("performance"),
+        )
+        return Settings(**filtered_settings, performance=performance)
+
+    def _load_profile(self, name: str, *overrides: Any) -> PerformanceProfile:
+        """Applies the knobs set in the settings files on top of a preset."""
+        preset = PROFILE_PRESETS[name]
+        valid_keys = {f.name for f in fields(PerformanceProfile)}
+        values = asdict(preset)
+        for override in overrides:
+            if isinstance(override, dict):
+                values.update({k: v for k, v in override.items() if k in valid_keys})
+        profile = PerformanceProfile(**values)
+        try:
+            profile.validate()
+        except (ValueError, TypeError):
+            # Log this error in a real application
+            return replace(preset)
+        return profile
 
     def _load_json_file(self, path: Path) -> Dict[str, Any]:
         """Loads a JSON file, returning an empty dict if it doesn't exist."""
@@ -50,8 +153,14 @@ class SettingsManager:
         """Saves the current settings to the user settings file."""
         try:
             self.user_settings_path.parent.mkdir(parents=True, exist_ok=True)
+            data = self.settings.to_dict()
+            # Only the knobs that differ from the preset, so presets can evolve.
+            preset = asdict(PROFILE_PRESETS[self.settings.performance_profile])
+            data["performance"] = {
+                k: v for k, v in data["performance"].items() if preset[k] != v
+            }
             with open(self.user_settings_path, "w") as f:
-                json.dump(self.settings.to_dict(), f, indent=2)
+                json.dump(data, f, indent=2)
         except IOError:
             # Log this error in a real application
             pass
@@ -65,6 +174,18 @@ class SettingsManager:
         if hasattr(self.settings, key):
             setattr(self.settings, key, value)
 
+    def apply_profile(self, name: str):
+        """
+        Switches to a performance preset, discarding changed knobs.
+
+        Raises:
+            ValueError: If there is no preset of that name.
+        """
+        if name not in PROFILE_PRESETS:
+            raise ValueError(f"Unknown performance profile: {name!r}")
+        self.settings.performance_profile = name
+        self.settings.performance = replace(PROFILE_PRESETS[name])
+
     def __getattr__(self, name: str) -> Any:
         """Allows direct access to settings attributes."""
         if hasattr(self.settings, name):
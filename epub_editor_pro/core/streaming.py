@@ -0,0 +1,308 @@
+import codecs
+import io
+import re
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from lxml import etree
+
+from epub_editor_pro.utils.text_utils import PRESCAN_BYTES, decode_text, detect_encoding, xml_declaration
+
+# Documents larger than this (uncompressed) are searched and replaced in a
+# single streaming pass instead of being parsed into a tree.
+DEFAULT_CHUNK_THRESHOLD = 4 * 1024 * 1024
+
+READ_SIZE = 64 * 1024
+
+SKIPPED_ELEMENTS = {"style", "script"}
+
+# Written as <br/>; every other element keeps an explicit end tag, which
+# HTML parsers need for e.g. <script></script>.
+VOID_ELEMENTS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+    "meta", "param", "source", "track", "wbr",
+}
+
+# The XML parser silently drops entities it does not know (e.g. &nbsp;
+# without the DTD); such documents cannot be rewritten by streaming.
+UNKNOWN_ENTITY_RE = re.compile(rb"&(?!(?:amp|lt|gt|quot|apos);|#)[A-Za-z]")
+
+
+class StreamingUnsupported(Exception):
+    """Raised when a document cannot be processed by streaming; use a tree instead."""
+    pass
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+class _TextTarget:
+    """Parser target collecting whole text nodes outside styles and scripts."""
+
+    def __init__(self, on_text: Callable[[str], None]):
+        self.on_text = on_text
+        self.stack: List[str] = []
+        self.buffer: List[str] = []
+        self.skipped = 0
+
+    def _flush(self):
+        if self.buffer:
+            text = "".join(self.buffer)
+            self.buffer.clear()
+            if not self.skipped:
+                self.on_text(text)
+
+    def start(self, tag, attrib, nsmap=None):
+        self._flush()
+        name = _local_name(tag)
+        self.stack.append(name)
+        if name in SKIPPED_ELEMENTS:
+            self.skipped += 1
+
+    def end(self, tag):
+        self._flush()
+        name = self.stack.pop()
+        if name in SKIPPED_ELEMENTS:
+            self.skipped -= 1
+
+    def data(self, data):
+        self.buffer.append(data)
+
+    def comment(self, text):
+        self._flush()
+
+    def pi(self, target, data=None):
+        self._flush()
+
+    def close(self):
+        self._flush()
+
+
+def _feed(stream: BinaryIO, parser, check_entities: bool = False) -> Iterator[None]:
+    """Feeds a stream to a parser in chunks, yielding after each one."""
+    tail = b""
+    while True:
+        chunk = stream.read(READ_SIZE)
+        if not chunk:
+            break
+        if check_entities and UNKNOWN_ENTITY_RE.search(tail + chunk):
+            raise StreamingUnsupported("The document uses entities defined in its DTD.")
+        tail = chunk[-16:]
+        parser.feed(chunk)
+        yield
+    parser.close()
+    yield
+
+
+def _parser(target) -> etree.XMLParser:
+    return etree.XMLParser(target=target, resolve_entities=False, no_network=True, huge_tree=True)
+
+
+def iter_text_lines(stream: BinaryIO) -> Iterator[str]:
+    """
+    Yields the lines of a document's text without building a tree.
+
+    Memory is bounded by the read size and the longest line. Style and
+    script contents are skipped, as by BeautifulSoup's get_text().
+
+    Raises:
+        lxml.etree.XMLSyntaxError: If the document is not well-formed XML.
+    """
+    pending: List[str] = []
+    lines: List[str] = []
+
+    def on_text(text: str):
+        parts = text.split("\n")
+        pending.append(parts[0])
+        for part in parts[1:]:
+            lines.append("".join(pending))
+            pending.clear()
+            pending.append(part)
+
+    parser = _parser(_TextTarget(on_text))
+    for _ in _feed(stream, parser):
+        yield from lines
+        lines.clear()
+    if pending and "".join(pending):
+        yield "".join(pending)
+
+
+class _SerializingTarget:
+    """Parser target writing the document back out, transforming its text nodes."""
+
+    def __init__(self, write: Callable[[str], None], transform: Callable[[str], str]):
+        self.write = write
+        self.transform = transform
+        self.stack: List[str] = []
+        self.scopes: List[Dict[str, str]] = [{"http://www.w3.org/XML/1998/namespace": "xml"}]
+        self.declarations: List[Tuple[str, str]] = []
+        self.buffer: List[str] = []
+        self.open_tag = False
+        self.skipped = 0
+
+    def _close_open_tag(self):
+        if self.open_tag:
+            self.write(">")
+            self.open_tag = False
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        self._close_open_tag()
+        text = "".join(self.buffer)
+        self.buffer.clear()
+        if not self.skipped:
+            text = self.transform(text)
+        self.write(_escape_text(text))
+
+    def _qualified(self, tag: str, attribute: bool = False) -> str:
+        if not tag.startswith("{"):
+            return tag
+        uri, local = tag[1:].split("}", 1)
+        prefix = self.scopes[-1].get(uri)
+        if prefix is None or (attribute and prefix == ""):
+            raise StreamingUnsupported(f"No prefix for namespace {uri}.")
+        return f"{prefix}:{local}" if prefix else local
+
+    def doctype(self, name, pubid, system):
+        if pubid:
+            self.write(f'<!DOCTYPE {name} PUBLIC "{pubid}" "{system}">\n')
+        elif system:
+            self.write(f'<!DOCTYPE {name} SYSTEM "{system}">\n')
+        else:
+            self.write(f"<!DOCTYPE {name}>\n")
+
+    def start_ns(self, prefix, uri):
+        self.declarations.append((prefix or "", uri))
+
+    def end_ns(self, prefix):
+        pass
+
+    def start(self, tag, attrib, nsmap=None):
+        self._flush()
+        self._close_open_tag()
+        scope = dict(self.scopes[-1])
+        for prefix, uri in self.declarations:
+            scope[uri] = prefix
+        self.scopes.append(scope)
+        parts = [self._qualified(tag)]
+        for prefix, uri in self.declarations:
+            name = f"xmlns:{prefix}" if prefix else "xmlns"
+            parts.append(f'{name}="{_escape_attribute(uri)}"')
+        self.declarations = []
+        for key, value in attrib.items():
+            parts.append(f'{self._qualified(key, attribute=True)}="{_escape_attribute(value)}"')
+        self.write("<" + " ".join(parts))
+        self.open_tag = True
+        name = _local_name(tag)
+        self.stack.append(name)
+        if name in SKIPPED_ELEMENTS:
+            self.skipped += 1
+
+    def end(self, tag):
+        self._flush()
+        name = self.stack.pop()
+        if self.open_tag and name in VOID_ELEMENTS:
+            self.write("/>")
+            self.open_tag = False
+        else:
+            self._close_open_tag()
+            self.write(f"</{self._qualified(tag)}>")
+        self.scopes.pop()
+        if name in SKIPPED_ELEMENTS:
+            self.skipped -= 1
+
+    def data(self, data):
+        self.buffer.append(data)
+
+    def comment(self, text):
+        self._flush()
+        self._close_open_tag()
+        self.write(f"<!--{text}-->")
+
+    def pi(self, target, data=None):
+        self._flush()
+        self._close_open_tag()
+        self.write(f"<?{target} {data}?>" if data else f"<?{target}?>")
+
+    def close(self):
+        self._flush()
+
+
+def _escape_text(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _escape_attribute(value: str) -> str:
+    return _escape_text(value).replace('"', "&quot;")
+
+
+def stream_replace(
+    stream: BinaryIO,
+    rules: List[Tuple[re.Pattern, str]],
+) -> Tuple[int, Optional[bytes]]:
+    """
+    Applies replacement rules to the text nodes of a document in one pass.
+
+    The document is parsed as a stream of events and written back as it
+    goes, in its original encoding, without building a tree. Rules are
+    applied in order to each text node outside styles and scripts.
+
+    Returns:
+        The number of replacements and the new document (None if unchanged).
+
+    Raises:
+        StreamingUnsupported: If the document cannot be rewritten this way.
+        lxml.etree.XMLSyntaxError: If the document is not well-formed XML.
+    """
+    head = stream.read(PRESCAN_BYTES)
+    encoding = detect_encoding(head)
+    stream = _Rewound(head, stream)
+    output = io.BytesIO()
+    count = 0
+    # One encoder for the whole document, so BOM codecs write a single BOM.
+    encoder = codecs.getincrementalencoder(encoding)(errors="xmlcharrefreplace")
+
+    declaration = xml_declaration(decode_text(head, encoding).lstrip("﻿"))
+    if declaration:
+        output.write(encoder.encode(declaration + "\n"))
+
+    def transform(text: str) -> str:
+        nonlocal count
+        for pattern, replace in rules:
+            text, num_subs = pattern.subn(replace, text)
+            count += num_subs
+        return text
+
+    pieces: List[str] = []
+
+    def write(piece: str):
+        pieces.append(piece)
+        if len(pieces) >= 1024:
+            output.write(encoder.encode("".join(pieces)))
+            pieces.clear()
+
+    parser = _parser(_SerializingTarget(write, transform))
+    for _ in _feed(stream, parser, check_entities=True):
+        pass
+    output.write(encoder.encode("".join(pieces), final=True))
+    if count == 0:
+        return 0, None
+    return count, output.getvalue()
+
+
+class _Rewound(io.RawIOBase):
+    """A stream with bytes already read from it put back in front."""
+
+    def __init__(self, head: bytes, stream: BinaryIO):
+        self.head = head
+        self.stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        if self.head:
+            data, self.head = self.head, b""
+            return data
+        return self.stream.read(size)
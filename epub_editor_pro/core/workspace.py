@@ -0,0 +1,349 @@
+import ctypes
+import ctypes.util
+import errno
+import hashlib
+import json
+import logging
+import os
+import select
+import shutil
+import struct
+import threading
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+log = logging.getLogger(__name__)
+
+WORKSPACES_DIR = Path.home() / ".cache" / "epsilon-editor" / "workspaces"
+
+# Written in the workspace root; records which archive it was extracted from.
+MARKER_NAME = ".epsilon-workspace.json"
+
+DEFAULT_POLL_INTERVAL = 1.0
+
+# inotify(7) constants.
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class WorkspaceError(Exception):
+    """Raised when a workspace cannot be created or used."""
+    pass
+
+
+class PollingWatcher:
+    """
+    Reports changed files by comparing mtimes and sizes at a fixed interval.
+
+    Works everywhere; used when inotify is not available.
+    """
+
+    def __init__(self, root: Path, on_change: Callable[[str], None], interval: float = DEFAULT_POLL_INTERVAL):
+        self.root = root
+        self.on_change = on_change
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = Path(directory) / name
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                snapshot[path.relative_to(self.root).as_posix()] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def check(self):
+        """Compares the tree with the last scan and reports the differences."""
+        snapshot = self._scan()
+        for name in set(snapshot) | set(self._snapshot):
+            if snapshot.get(name) != self._snapshot.get(name):
+                self.on_change(name)
+        self._snapshot = snapshot
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="workspace-poll", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class InotifyWatcher:
+    """
+    Reports changed files as the kernel notifies them (Linux and Android).
+
+    Every directory of the tree is watched; directories created later are
+    added as they appear.
+    """
+
+    def __init__(self, root: Path, on_change: Callable[[str], None]):
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise OSError("libc not found")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.root = root
+        self.on_change = on_change
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories: Dict[int, Path] = {}
+        self._stop_read, self._stop_write = os.pipe()
+        self._thread: Optional[threading.Thread] = None
+        for directory, _, _ in os.walk(root):
+            self._watch(Path(directory))
+
+    def _watch(self, directory: Path):
+        descriptor = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), INOTIFY_MASK)
+        if descriptor < 0:
+            error = ctypes.get_errno()
+            if error != errno.ENOENT:
+                log.warning("Cannot watch %s: %s", directory, os.strerror(error))
+            return
+        self._directories[descriptor] = directory
+
+    def _handle(self, data: bytes):
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            descriptor, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+            offset += length
+            directory = self._directories.get(descriptor)
+            if directory is None or not name:
+                continue
+            path = directory / name
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch(path)
+                    for child_directory, _, names in os.walk(path):
+                        for child in names:
+                            self.on_change((Path(child_directory) / child).relative_to(self.root).as_posix())
+                continue
+            self.on_change(path.relative_to(self.root).as_posix())
+
+    def _run(self):
+        while True:
+            readable, _, _ = select.select([self._fd, self._stop_read], [], [])
+            if self._stop_read in readable:
+                return
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            self._handle(data)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="workspace-inotify", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            os.write(self._stop_write, b"\0")
+            self._thread.join()
+            self._thread = None
+        for fd in (self._fd, self._stop_read, self._stop_write):
+            os.close(fd)
+        self._fd = -1
+
+
+def create_watcher(root: Path, on_change: Callable[[str], None], polling: bool = False):
+    """Returns an inotify watcher if the platform has one, else a polling watcher."""
+    if not polling:
+        try:
+            return InotifyWatcher(root, on_change)
+        except (OSError, AttributeError) as e:
+            log.info("Falling back to polling for %s: %s", root, e)
+    return PollingWatcher(root, on_change)
+
+
+class Workspace:
+    """
+    An EPUB extracted to a directory that other editors can work on too.
+
+    The archive is extracted once; reopening a book whose archive has not
+    changed reuses the existing directory. When the archive changed, it is
+    extracted afresh and swapped in, unless the directory holds edits that
+    were never saved to the archive. Files changed on disk by other
+    programs are collected by a watcher and handed out by
+    `drain_changes`, for the ContentManager to invalidate its caches.
+    """
+
+    def __init__(self, epub_path: Path, directory: Optional[Path] = None, polling: bool = False):
+        self.epub_path = Path(epub_path)
+        self.directory = Path(directory) if directory is not None else self.default_directory(self.epub_path)
+        self.polling = polling
+        self._changes: Set[str] = set()
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    @staticmethod
+    def default_directory(epub_path: Path) -> Path:
+        """A per-book directory in the user's cache, stable across sessions."""
+        key = hashlib.sha1(str(Path(epub_path).resolve()).encode("utf-8")).hexdigest()[:12]
+        return WORKSPACES_DIR / f"{Path(epub_path).stem}-{key}"
+
+    def _archive_stamp(self) -> Dict[str, float]:
+        stat = self.epub_path.stat()
+        return {"mtime": stat.st_mtime, "size": stat.st_size}
+
+    def _is_current(self) -> bool:
+        marker = self.directory / MARKER_NAME
+        try:
+            with open(marker, "r") as f:
+                return json.load(f).get("archive") == self._archive_stamp()
+        except (OSError, json.JSONDecodeError):
+            return False
+
+    def _write_marker(self, directory: Path):
+        with open(directory / MARKER_NAME, "w") as f:
+            json.dump({"source": str(self.epub_path), "archive": self._archive_stamp()}, f)
+
+    def mark_synced(self):
+        """Records that the workspace matches the archive, e.g. after a save."""
+        self._write_marker(self.directory)
+
+    def _extract(self):
+        """Extracts the archive next to the directory, then swaps it in."""
+        staging = self.directory.with_name(f".{self.directory.name}.extracting")
+        retired = self.directory.with_name(f".{self.directory.name}.old")
+        try:
+            for leftover in (staging, retired):
+                shutil.rmtree(leftover, ignore_errors=True)
+            staging.mkdir(parents=True)
+            with zipfile.ZipFile(self.epub_path, "r") as zf:
+                for info in zf.infolist():
+                    if not info.is_dir():
+                        zf.extract(info, staging)
+            self._write_marker(staging)
+            if self.directory.exists():
+                os.replace(self.directory, retired)
+            os.replace(staging, self.directory)
+        except (OSError, zipfile.BadZipFile) as e:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise WorkspaceError(f"Could not extract {self.epub_path}: {e}") from e
+        shutil.rmtree(retired, ignore_errors=True)
+
+    def open(self) -> bool:
+        """
+        Extracts the archive unless an up-to-date extraction exists, and
+        starts watching the directory.
+
+        Returns:
+            True if the archive was extracted, False if reused.
+
+        Raises:
+            WorkspaceError: If the archive cannot be read or extracted, or
+                changed while the directory holds unsaved edits, which are
+                then left as they are.
+        """
+        extracted = False
+        if not self._is_current():
+            edited = self._changed_since_sync() if self.directory.exists() else []
+            if edited:
+                raise WorkspaceError(
+                    f"{self.epub_path} changed, but {self.directory} has edits that were not "
+                    f"saved to it (e.g. {edited[0]}); save or remove them first."
+                )
+            self._extract()
+            extracted = True
+        else:
+            self._queue_offline_changes()
+        self._watcher = create_watcher(self.directory, self._on_change, polling=self.polling)
+        self._watcher.start()
+        return extracted
+
+    def _changed_since_sync(self) -> List[str]:
+        """
+        The archive names of the files modified since the last sync, or of
+        every file if no sync was recorded.
+        """
+        try:
+            synced = (self.directory / MARKER_NAME).stat().st_mtime_ns
+        except FileNotFoundError:
+            synced = -1
+        changed = []
+        for directory, _, names in os.walk(self.directory):
+            for name in names:
+                path = Path(directory) / name
+                if not name.startswith(".") and path.stat().st_mtime_ns > synced:
+                    changed.append(path.relative_to(self.directory).as_posix())
+        return sorted(changed)
+
+    def _queue_offline_changes(self):
+        """Reports files modified since the last sync, while nobody was watching."""
+        for name in self._changed_since_sync():
+            self._on_change(name)
+
+    def close(self):
+        """Stops watching; the directory is kept for the next session."""
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def _on_change(self, name: str):
+        # The marker, and temporary files of atomic writes, are not members.
+        if PurePosixPath(name).name.startswith("."):
+            return
+        with self._lock:
+            self._changes.add(name)
+
+    def drain_changes(self) -> Set[str]:
+        """Returns and forgets the archive names changed since the last call."""
+        with self._lock:
+            changes, self._changes = self._changes, set()
+        return changes
+
+    def path_for(self, name: str) -> Path:
+        """
+        The file of an archive member in the workspace.
+
+        Raises:
+            WorkspaceError: If the name would escape the workspace.
+        """
+        parts = PurePosixPath(name).parts
+        if not parts or ".." in parts or PurePosixPath(name).is_absolute():
+            raise WorkspaceError(f"Invalid member name: {name!r}")
+        return self.directory.joinpath(*parts)
+
+    def read(self, name: str) -> bytes:
+        """
+        Raises:
+            FileNotFoundError: If the member's file does not exist.
+        """
+        return self.path_for(name).read_bytes()
+
+    def write(self, name: str, data: bytes):
+        """Writes a member's file atomically, so other editors never see half of it."""
+        path = self.path_for(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f".{path.name}.tmp")
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+
+    def remove(self, name: str):
+        """Deletes a member's file, if it exists."""
+        self.path_for(name).unlink(missing_ok=True)
@@ -1,20 +1,531 @@
 import argparse
+import os
+import sys
+from pathlib import Path
 
-def main():
-    """Main function for the Epsilon Editor CLI."""
+DEFAULT_FINGERPRINT_CACHE = Path.home() / ".cache" / "epsilon-editor" / "fingerprints.json"
+
+
+def _load_book(path: Path):
+    from epub_editor_pro.core.epub_loader import EpubLoader
+
+    loader = EpubLoader(path)
+    try:
+        return loader.load()
+    finally:
+        loader.close()
+
+
+def cmd_validate(args) -> int:
+    """Validates one or more EPUB files and prints the issues found."""
+    from epub_editor_pro.core.epub_loader import EpubLoaderError
+    from epub_editor_pro.core.epub_validator import EpubValidator
+
+    exit_code = 0
+    for path in args.files:
+        try:
+            book = _load_book(path)
+        except (EpubLoaderError, FileNotFoundError, KeyError) as e:
+            print(f"{path}: error: {e}")
+            exit_code = 1
+            continue
+
+        try:
+            report = EpubValidator(book, max_workers=args.workers).validate()
+        finally:
+            book.content_manager.close()
+
+        for issue in report.issues:
+            location = f" [{issue.item_href}]" if issue.item_href else ""
+            print(f"{path}: {issue.severity}: {issue.code}{location}: {issue.message}")
+        print(f"{path}: {len(report.errors)} errors, {len(report.warnings)} warnings")
+        if not report.is_valid:
+            exit_code = 1
+    return exit_code
+
+
+def _format_bytes(size: int) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def cmd_dedup(args) -> int:
+    """Reports members that are duplicated across a library of EPUB files."""
+    from epub_editor_pro.core.library_dedup import FingerprintCache, LibraryScanner
+
+    cache = FingerprintCache(None if args.no_cache else args.cache)
+    scanner = LibraryScanner(cache, min_size=args.min_size, max_workers=args.workers)
+    report = scanner.scan(args.paths)
+
+    for group in report.groups[:args.limit]:
+        books = {member.book for member in group.members}
+        print(
+            f"{len(group.members)} copies in {len(books)} books, {_format_bytes(group.size)} each, "
+            f"{_format_bytes(group.reclaimable_bytes)} reclaimable: {group.members[0].name}"
+        )
+    if len(report.groups) > args.limit:
+        print(f"... and {len(report.groups) - args.limit} more duplicate groups")
+    print(
+        f"Scanned {report.books_scanned} books ({report.books_rescanned} re-read, "
+        f"{report.members_hashed} members hashed): {len(report.groups)} duplicate groups, "
+        f"{_format_bytes(report.reclaimable_bytes)} reclaimable"
+    )
+    return 0
+
+
+def cmd_stats(args) -> int:
+    """Prints word, character and size statistics for one or more EPUB files."""
+    from epub_editor_pro.core.book_statistics import StatisticsEngine
+    from epub_editor_pro.core.epub_loader import EpubLoaderError
+
+    exit_code = 0
+    for path in args.files:
+        try:
+            book = _load_book(path)
+        except (EpubLoaderError, FileNotFoundError, KeyError) as e:
+            print(f"{path}: error: {e}")
+            exit_code = 1
+            continue
+
+        try:
+            statistics = StatisticsEngine(book, max_workers=args.workers).compute()
+        finally:
+            book.content_manager.close()
+
+        print(f"{path}:")
+        for chapter in statistics.chapters:
+            title = book.navigation.title_for(chapter.href) if book.navigation else None
+            print(
+                f"  {chapter.words:>8,} words {chapter.characters:>10,} chars "
+                f"{_format_bytes(chapter.bytes):>10}  {chapter.href}" + (f" ({title})" if title else "")
+            )
+        print(
+            f"  {statistics.words:,} words, {statistics.characters:,} characters in "
+            f"{len(statistics.chapters)} documents ({_format_bytes(statistics.text_bytes)}); "
+            f"{statistics.image_count} images ({_format_bytes(statistics.image_bytes)})"
+        )
+        print("  Top words: " + ", ".join(
+            f"{word} ({count})" for word, count in statistics.most_common_words(args.top)
+        ))
+        print("  Top characters: " + ", ".join(
+            f"{character} ({count})" for character, count in statistics.most_common_characters(args.top)
+        ))
+    return exit_code
+
+
+def cmd_export(args) -> int:
+    """Exports the text of EPUB files as plain text, Markdown or JSONL."""
+    from epub_editor_pro.core.book_export import BookExporter
+
+    exporter = BookExporter(args.format, max_workers=args.workers)
+    if args.output_dir is not None:
+        report = exporter.export_to_directory(args.files, args.output_dir)
+    elif args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as output:
+            report = exporter.export_to_stream(args.files, output)
+    else:
+        try:
+            report = exporter.export_to_stream(args.files, sys.stdout)
+        except BrokenPipeError:
+            # The reader went away (e.g. `| head`); silence the final flush.
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 1
+
+    for path, message in report.errors:
+        print(f"{path}: error: {message}", file=sys.stderr)
+    print(f"Exported {report.chapters} chapters from {report.books} books.", file=sys.stderr)
+    return 1 if report.errors else 0
+
+
+def cmd_pack(args) -> int:
+    """Builds an EPUB file from a directory tree."""
+    from epub_editor_pro.core.epub_packer import EpubPacker, PackError
+
+    packer = EpubPacker(
+        args.source, max_workers=args.workers, compression_level=args.level, use_cache=not args.no_cache
+    )
+    try:
+        report = packer.pack(args.output)
+    except (PackError, OSError) as e:
+        print(f"{args.source}: error: {e}")
+        return 1
+
+    if report.generated_opf:
+        print(f"Generated a package document listing {len(report.manifest_added)} files.")
+    else:
+        for name in report.manifest_added:
+            print(f"Added to the manifest: {name}")
+        for name in report.manifest_removed:
+            print(f"Removed from the manifest: {name}")
+    print(
+        f"{args.output}: {report.members} members ({report.reused_members} reused, "
+        f"{report.compressed_members} compressed), {_format_bytes(report.bytes_written)} "
+        f"in {report.elapsed_seconds:.2f}s"
+    )
+    return 0
+
+
+def _describe_rule(index: int, rule) -> str:
+    flags = [
+        name for name, enabled in (
+            ("case-sensitive", rule.case_sensitive),
+            ("whole-word", rule.whole_word),
+            ("regex", rule.regex),
+            ("disabled", not rule.enabled),
+        ) if enabled
+    ]
+    scope = []
+    if rule.items:
+        scope.append("items " + " ".join(rule.items))
+    if rule.selector:
+        scope.append(f"selector {rule.selector}")
+    details = ", ".join(flags + scope)
+    return f"{index}. {rule.find!r} -> {rule.replace!r}" + (f" ({details})" if details else "")
+
+
+def cmd_rules(args) -> int:
+    """Shows, extends or converts a batch replace ruleset."""
+    from epub_editor_pro.core.batch_rules import (
+        ReplaceRule, RuleSet, RuleSetError, compile_ruleset, load_ruleset, save_ruleset,
+    )
+
+    try:
+        if args.add and not args.file.exists():
+            ruleset = RuleSet()
+        else:
+            ruleset = load_ruleset(args.file)
+        if args.add:
+            find, replace = args.add
+            ruleset = RuleSet(
+                rules=ruleset.rules + (ReplaceRule(
+                    find=find,
+                    replace=replace,
+                    case_sensitive=args.case_sensitive,
+                    whole_word=args.whole_word,
+                    regex=args.regex,
+                    items=tuple(args.items or ()),
+                    selector=args.selector,
+                ),),
+                name=ruleset.name,
+            )
+        compile_ruleset(ruleset)
+        if args.add or args.output:
+            save_ruleset(ruleset, args.output or args.file)
+    except RuleSetError as e:
+        print(f"{args.file}: error: {e}")
+        return 1
+
+    for index, rule in enumerate(ruleset.rules, 1):
+        print(_describe_rule(index, rule))
+    return 0
+
+
+def cmd_batch(args) -> int:
+    """Applies a batch replace ruleset to one or more EPUB files."""
+    from epub_editor_pro.core.batch_rules import RuleSetError, compile_ruleset, load_ruleset
+    from epub_editor_pro.core.epub_loader import EpubLoaderError
+    from epub_editor_pro.core.epub_saver import EpubSaver
+    from epub_editor_pro.core.replace_engine import ReplaceEngine
+
+    try:
+        compiled = compile_ruleset(load_ruleset(args.rules))
+    except RuleSetError as e:
+        print(f"{args.rules}: error: {e}")
+        return 1
+
+    exit_code = 0
+    for path in args.files:
+        try:
+            book = _load_book(path)
+        except (EpubLoaderError, FileNotFoundError, KeyError) as e:
+            print(f"{path}: error: {e}")
+            exit_code = 1
+            continue
+
+        try:
+            count = ReplaceEngine(book).apply_rules(compiled)
+            if count and not args.dry_run:
+                EpubSaver(book).save(backup=not args.no_backup)
+        except IOError as e:
+            print(f"{path}: error: {e}")
+            exit_code = 1
+            continue
+        finally:
+            book.content_manager.close()
+        print(f"{path}: {count} replacements" + (" (dry run)" if args.dry_run else ""))
+    return exit_code
+
+
+def _search_books(args, on_book) -> int:
+    """Searches each book in turn, handing its lazily produced results to `on_book`."""
+    from epub_editor_pro.core.epub_loader import EpubLoaderError
+    from epub_editor_pro.core.search_engine import SearchEngine
+
+    exit_code = 0
+    for path in args.files:
+        try:
+            book = _load_book(path)
+        except (EpubLoaderError, FileNotFoundError, KeyError) as e:
+            print(f"{path}: error: {e}", file=sys.stderr)
+            exit_code = 1
+            continue
+
+        try:
+            results = SearchEngine(book).search_in_mode(
+                args.mode, args.query, args.case_sensitive, args.whole_word, args.regex
+            )
+            on_book(path, book, results)
+        except ValueError as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 1
+        finally:
+            book.content_manager.close()
+    return exit_code
+
+
+def cmd_search(args) -> int:
+    """Searches EPUB files, printing the results or writing them to a report."""
+    from epub_editor_pro.core.search_report import FORMAT_CSV, SearchReportWriter, report_format_for
+
+    if args.report is None:
+        def print_results(path, book, results):
+            for result in results:
+                line = f"{result.context_before}{result.match_text}{result.context_after}"
+                print(f"{path}: {result.item_href}:{result.line_number}: {line}")
+
+        try:
+            return _search_books(args, print_results)
+        except BrokenPipeError:
+            # The reader went away (e.g. `| head`); silence the final flush.
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 1
+
+    fmt = args.format or report_format_for(args.report) or FORMAT_CSV
+    with open(args.report, "w", encoding="utf-8", newline="") as output:
+        with SearchReportWriter(output, fmt, title=f"Search results for {args.query!r}") as writer:
+            exit_code = _search_books(
+                args, lambda path, book, results: writer.write_book(book, results, str(path))
+            )
+    print(f"{args.report}: {writer.count} results", file=sys.stderr)
+    return exit_code
+
+
+def cmd_css(args) -> int:
+    """Reports the CSS rules no document uses, optionally removing them and minifying."""
+    from epub_editor_pro.core.css_analysis import CssAnalyzer
+    from epub_editor_pro.core.epub_loader import EpubLoaderError
+    from epub_editor_pro.core.epub_saver import EpubSaver
+
+    exit_code = 0
+    for path in args.files:
+        try:
+            book = _load_book(path)
+        except (EpubLoaderError, FileNotFoundError, KeyError) as e:
+            print(f"{path}: error: {e}")
+            exit_code = 1
+            continue
+
+        try:
+            analyzer = CssAnalyzer(book, max_workers=args.workers)
+            report = analyzer.analyze()
+            if args.prune or args.minify:
+                analyzer.write_stylesheets(report, prune=args.prune, minify=args.minify)
+                EpubSaver(book).save(backup=not args.no_backup)
+        except IOError as e:
+            print(f"{path}: error: {e}")
+            exit_code = 1
+            continue
+        finally:
+            book.content_manager.close()
+
+        for stylesheet in report.stylesheets:
+            for rule in stylesheet.unused_rules:
+                print(f"{path}: {stylesheet.href}:{rule.line}: unused rule: {', '.join(rule.selectors)}")
+            for rule, selector in stylesheet.unused_selectors:
+                print(f"{path}: {stylesheet.href}:{rule.line}: unused selector: {selector}")
+        print(
+            f"{path}: {report.unused_rules} of {report.rules} rules unused in "
+            f"{len(report.stylesheets)} stylesheets, matched against {report.documents} documents"
+            + (f"; {_format_bytes(report.bytes_saved)} saved" if args.prune or args.minify else "")
+        )
+    return exit_code
+
+
+def cmd_rename(args) -> int:
+    """Renames a document or an anchor of an EPUB file, updating every reference to it."""
+    from epub_editor_pro.core.epub_loader import EpubLoaderError
+    from epub_editor_pro.core.epub_saver import EpubSaver
+    from epub_editor_pro.core.link_index import LinkIndex, RenameError
+
+    try:
+        book = _load_book(args.file)
+    except (EpubLoaderError, FileNotFoundError, KeyError) as e:
+        print(f"{args.file}: error: {e}")
+        return 1
+
+    try:
+        link_index = LinkIndex(book, max_workers=args.workers)
+        if args.document is not None:
+            changed = link_index.rename_anchor(args.document, args.old, args.new)
+        else:
+            changed = link_index.rename_item(args.old, args.new)
+        EpubSaver(book).save(backup=not args.no_backup)
+    except (RenameError, IOError) as e:
+        print(f"{args.file}: error: {e}")
+        return 1
+    finally:
+        book.content_manager.close()
+
+    for href in changed:
+        print(f"{args.file}: updated {href}")
+    print(f"{args.file}: renamed {args.old} to {args.new}, {len(changed)} documents updated")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Builds the argument parser for the CLI."""
     parser = argparse.ArgumentParser(
         description="Epsilon Editor - A modular EPUB editor."
     )
     parser.add_argument(
         "-v", "--version", action="version", version="%(prog)s 2.0.0"
     )
-    # Add more arguments as functionality is implemented
+    subparsers = parser.add_subparsers(dest="command")
+
+    validate_parser = subparsers.add_parser(
+        "validate", help="Check the structure and content documents of EPUB files."
+    )
+    validate_parser.add_argument("files", nargs="+", type=Path, help="EPUB files to validate.")
+    validate_parser.add_argument("--workers", type=int, default=None, help="Number of worker threads.")
+    validate_parser.set_defaults(func=cmd_validate)
+
+    stats_parser = subparsers.add_parser(
+        "stats", help="Print word, character and size statistics of EPUB files."
+    )
+    stats_parser.add_argument("files", nargs="+", type=Path, help="EPUB files to analyze.")
+    stats_parser.add_argument("--top", type=int, default=10, help="Number of frequent words and characters.")
+    stats_parser.add_argument("--workers", type=int, default=None, help="Number of worker threads.")
+    stats_parser.set_defaults(func=cmd_stats)
+
+    export_parser = subparsers.add_parser(
+        "export", help="Export the text of EPUB files in reading order."
+    )
+    export_parser.add_argument("files", nargs="+", type=Path, help="EPUB files to export.")
+    export_parser.add_argument(
+        "--format", choices=("text", "markdown", "jsonl"), default="text",
+        help="Plain text, Markdown, or one JSON record per chapter.",
+    )
+    export_target = export_parser.add_mutually_exclusive_group()
+    export_target.add_argument("--output", type=Path, help="Write all books to this file (default: stdout).")
+    export_target.add_argument("--output-dir", type=Path, help="Write one file per book to this directory.")
+    export_parser.add_argument("--workers", type=int, default=None, help="Number of books read in parallel.")
+    export_parser.set_defaults(func=cmd_export)
+
+    pack_parser = subparsers.add_parser(
+        "pack", help="Build an EPUB file from an unpacked directory tree."
+    )
+    pack_parser.add_argument("source", type=Path, help="The directory to pack.")
+    pack_parser.add_argument("output", type=Path, help="The EPUB file to write.")
+    pack_parser.add_argument("--level", type=int, choices=range(0, 10), default=None,
+                             help="Deflate level for every compressed member (default: per media type).")
+    pack_parser.add_argument("--no-cache", action="store_true", help="Recompress every member.")
+    pack_parser.add_argument("--workers", type=int, default=None, help="Number of compression threads.")
+    pack_parser.set_defaults(func=cmd_pack)
+
+    dedup_parser = subparsers.add_parser(
+        "dedup", help="Report fonts, images and styles duplicated across a library."
+    )
+    dedup_parser.add_argument("paths", nargs="+", type=Path, help="EPUB files or directories to scan.")
+    dedup_parser.add_argument(
+        "--cache", type=Path, default=DEFAULT_FINGERPRINT_CACHE,
+        help="Fingerprint cache file, so re-scans only read changed books.",
+    )
+    dedup_parser.add_argument("--no-cache", action="store_true", help="Do not read or write the cache.")
+    dedup_parser.add_argument("--min-size", type=int, default=1, help="Ignore members smaller than this.")
+    dedup_parser.add_argument("--limit", type=int, default=20, help="Number of groups to list.")
+    dedup_parser.add_argument("--workers", type=int, default=None, help="Number of worker threads.")
+    dedup_parser.set_defaults(func=cmd_dedup)
+
+    rules_parser = subparsers.add_parser(
+        "rules", help="Show, extend or convert a batch replace ruleset (JSON or YAML)."
+    )
+    rules_parser.add_argument("file", type=Path, help="The ruleset file.")
+    rules_parser.add_argument(
+        "--add", nargs=2, metavar=("FIND", "REPLACE"), help="Append a rule and save the ruleset."
+    )
+    rules_parser.add_argument("--case-sensitive", action="store_true", help="The added rule is case-sensitive.")
+    rules_parser.add_argument("--whole-word", action="store_true", help="The added rule matches whole words.")
+    rules_parser.add_argument("--regex", action="store_true", help="The added rule is a regular expression.")
+    rules_parser.add_argument("--items", nargs="+", help="Manifest href or id globs the added rule applies to.")
+    rules_parser.add_argument("--selector", help="CSS selector the added rule is restricted to.")
+    rules_parser.add_argument("--output", type=Path, help="Save the ruleset here instead (e.g. to convert it).")
+    rules_parser.set_defaults(func=cmd_rules)
+
+    batch_parser = subparsers.add_parser(
+        "batch", help="Apply a batch replace ruleset to EPUB files."
+    )
+    batch_parser.add_argument("rules", type=Path, help="The ruleset file.")
+    batch_parser.add_argument("files", nargs="+", type=Path, help="EPUB files to modify.")
+    batch_parser.add_argument("--dry-run", action="store_true", help="Count replacements without saving.")
+    batch_parser.add_argument("--no-backup", action="store_true", help="Do not keep a .bak copy of each book.")
+    batch_parser.set_defaults(func=cmd_batch)
+
+    search_parser = subparsers.add_parser(
+        "search", help="Search EPUB files, optionally writing the results to a report."
+    )
+    search_parser.add_argument("query", help="The text or regular expression to search for.")
+    search_parser.add_argument("files", nargs="+", type=Path, help="EPUB files to search.")
+    search_parser.add_argument("--case-sensitive", action="store_true", help="Match the case.")
+    search_parser.add_argument("--whole-word", action="store_true", help="Match whole words only.")
+    search_parser.add_argument("--regex", action="store_true", help="The query is a regular expression.")
+    search_parser.add_argument(
+        "--mode", choices=("exact", "phrase", "fuzzy"), default="exact",
+        help="Exact lines, phrases across markup and line breaks, or approximate matches.",
+    )
+    search_parser.add_argument("--report", type=Path, help="Write the results to this file instead of stdout.")
+    search_parser.add_argument(
+        "--format", choices=("csv", "jsonl", "html"), default=None,
+        help="Report format (default: from the report's extension, else CSV).",
+    )
+    search_parser.set_defaults(func=cmd_search)
+
+    css_parser = subparsers.add_parser(
+        "css", help="Report the CSS rules no document uses, optionally removing them."
+    )
+    css_parser.add_argument("files", nargs="+", type=Path, help="EPUB files to analyze.")
+    css_parser.add_argument("--prune", action="store_true", help="Remove the unused rules and save.")
+    css_parser.add_argument("--minify", action="store_true", help="Minify the stylesheets and save.")
+    css_parser.add_argument("--no-backup", action="store_true", help="Do not keep a .bak copy of each book.")
+    css_parser.add_argument("--workers", type=int, default=None, help="Number of worker threads.")
+    css_parser.set_defaults(func=cmd_css)
+
+    rename_parser = subparsers.add_parser(
+        "rename", help="Rename a document or an anchor, updating every reference to it."
+    )
+    rename_parser.add_argument("file", type=Path, help="The EPUB file to modify.")
+    rename_parser.add_argument("old", help="The manifest href of the document, or the id with --document.")
+    rename_parser.add_argument("new", help="The new href, relative to the package document, or the new id.")
+    rename_parser.add_argument("--document", help="Rename an id of this document instead of a document.")
+    rename_parser.add_argument("--no-backup", action="store_true", help="Do not keep a .bak copy of the book.")
+    rename_parser.add_argument("--workers", type=int, default=None, help="Number of worker threads.")
+    rename_parser.set_defaults(func=cmd_rename)
+
+    return parser
+
+
+def main(argv=None):
+    """Main function for the Epsilon Editor CLI."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
 
-    args = parser.parse_args()
+    if not args.command:
+        parser.print_help()
+        return 0
+    return args.func(args)
 
-    # Placeholder for CLI logic
-    print("CLI entry point. No functionality implemented yet.")
-    print("Arguments:", args)
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,24 +1,36 @@
+from contextlib import nullcontext
 from pathlib import Path
+from textual import work
 from textual.app import App
+from textual.worker import get_current_worker
 
 from epub_editor_pro.core.epub_model import EpubBook
-from epub_editor_pro.core.settings_model import SettingsManager
+from epub_editor_pro.core.settings_model import PerformanceProfile, SettingsManager
 from epub_editor_pro.screens.file_manager import FileManager
 from epub_editor_pro.screens.dashboard import Dashboard
 from epub_editor_pro.screens.search import SearchScreen
 from epub_editor_pro.screens.search_results import SearchResultsScreen
 from epub_editor_pro.screens.replace import ReplaceScreen
+from epub_editor_pro.screens.replace_preview import ReplacePreviewScreen
 from epub_editor_pro.screens.settings import SettingsScreen
 from epub_editor_pro.screens.batch_operations import BatchOperationsScreen
 from epub_editor_pro.screens.help import HelpScreen
 from epub_editor_pro.core.search_engine import SearchEngine
+from epub_editor_pro.core.live_search import LiveSearchSession
 from epub_editor_pro.core.replace_engine import ReplaceEngine
+from epub_editor_pro.core.batch_rules import compile_ruleset
 from epub_editor_pro.core.epub_saver import EpubSaver
+from epub_editor_pro.core.book_statistics import StatisticsEngine
+from epub_editor_pro.core.link_index import LinkIndex
+from epub_editor_pro.core.warmup import CacheWarmer
 
 
 DEFAULT_SETTINGS_PATH = Path("config/defaults.json")
 USER_SETTINGS_PATH = Path("config/app_config.json")
 
+# How often edits made to an unpacked workspace by other programs are picked up.
+WORKSPACE_SYNC_SECONDS = 1.0
+
 
 class EpsilonApp(App):
     """A Textual app to edit EPUBs."""
@@ -52,6 +64,36 @@ class EpsilonApp(App):
         )
         self.book: EpubBook | None = None
         self.search_results = []
+        self.live_search_session: LiveSearchSession | None = None
+        self.statistics_engine: StatisticsEngine | None = None
+        self.link_index: LinkIndex | None = None
+        self.cache_warmer: CacheWarmer | None = None
+        # Spine index of the document the user last worked on.
+        self.reading_position: int | None = None
+        self._workspace_timer = None
+
+    @property
+    def performance(self) -> PerformanceProfile:
+        """The performance profile engines are created with."""
+        return self.settings_manager.get("performance")
+
+    def apply_performance_profile(self, name: str) -> None:
+        """
+        Switches to a performance preset; the loaded book's caches adapt at
+        once, engines as they are next created.
+
+        Raises:
+            ValueError: If there is no preset of that name.
+        """
+        self.settings_manager.apply_profile(name)
+        self.settings_manager.save_settings()
+        if self.book is not None:
+            self.book.content_manager.apply_profile(self.performance)
+            self.live_search_session = LiveSearchSession(SearchEngine(self.book, self.performance))
+            self.statistics_engine = StatisticsEngine(self.book, profile=self.performance)
+            self.link_index = LinkIndex(self.book, profile=self.performance)
+            self._index_links()
+            self.cache_warmer.profile = self.performance
 
     def on_mount(self) -> None:
         """Called when the app is first mounted."""
@@ -70,13 +112,70 @@ class EpsilonApp(App):
         from epub_editor_pro.core.epub_loader import EpubLoader, InvalidEpubFileError
         try:
             loader = EpubLoader(event.path)
-            self.book = loader.load()
+            book = loader.load()
+            if self.book is not None:
+                self.book.content_manager.close_workspace()
+            self.book = book
+            self.book.content_manager.apply_profile(self.performance)
+            if self.settings_manager.get("unpacked_workspace", False):
+                self._open_workspace(event.path)
+            self.live_search_session = LiveSearchSession(SearchEngine(self.book, self.performance))
+            self.statistics_engine = StatisticsEngine(self.book, profile=self.performance)
+            self.link_index = LinkIndex(self.book, profile=self.performance)
+            self._index_links()
+            self.cache_warmer = CacheWarmer(self.book, self.performance)
+            self._warm_caches()
+            self.reading_position = None
             self.push_screen("dashboard")
         except InvalidEpubFileError as e:
             self.notify(f"Error loading EPUB: {e}", title="Error", severity="error")
         except Exception as e:
             self.notify(f"An unexpected error occurred: {e}", title="Error", severity="error")
 
+    @work(thread=True, group="links", exclusive=True)
+    def _index_links(self) -> None:
+        """Builds the link index in the background, so renames find references at once."""
+        worker = get_current_worker()
+        if self.link_index is not None:
+            self.link_index.refresh(is_cancelled=lambda: worker.is_cancelled)
+
+    @work(thread=True, group="warm-up", exclusive=True)
+    def _warm_caches(self) -> None:
+        """Parses the spine documents ahead of the first search, yielding to user operations."""
+        worker = get_current_worker()
+        if self.cache_warmer is not None:
+            self.cache_warmer.run(is_cancelled=lambda: worker.is_cancelled)
+
+    def user_operation(self):
+        """Holds the cache warm-up while an operation reads or edits the book."""
+        if self.cache_warmer is None:
+            return nullcontext()
+        return self.cache_warmer.paused()
+
+    def _open_workspace(self, path: Path) -> None:
+        """Edits the loaded book through an unpacked copy watched for external edits."""
+        from epub_editor_pro.core.workspace import Workspace, WorkspaceError
+        workspace = Workspace(path)
+        try:
+            workspace.open()
+        except WorkspaceError as e:
+            self.notify(f"Editing the archive directly: {e}", title="Workspace", severity="warning")
+            return
+        self.book.content_manager.attach_workspace(workspace)
+        self.notify(f"Workspace: {workspace.directory}", title="Workspace")
+        if self._workspace_timer is None:
+            self._workspace_timer = self.set_interval(WORKSPACE_SYNC_SECONDS, self._sync_workspace)
+
+    def _sync_workspace(self) -> None:
+        """Picks up files changed in the workspace by other programs."""
+        if self.book is None:
+            return
+        with self.user_operation():
+            changed = self.book.content_manager.sync_workspace()
+        if changed:
+            self._content_changed()
+            self.notify(f"{len(changed)} files changed on disk.", title="Workspace")
+
     def on_search_screen_search_initiated(self, event: SearchScreen.SearchInitiated) -> None:
         """Handle search initiation from the SearchScreen."""
         if not self.book:
@@ -84,13 +183,19 @@ class EpsilonApp(App):
             return
 
         try:
-            search_engine = SearchEngine(self.book)
-            self.search_results = list(search_engine.search(
-                event.query,
-                event.case_sensitive,
-                event.whole_word,
-                event.regex
-            ))
+            if event.results is not None:
+                self.search_results = list(event.results)
+            else:
+                search_engine = SearchEngine(self.book, self.performance)
+                with self.user_operation():
+                    self.search_results = list(search_engine.search_in_mode(
+                        event.mode,
+                        event.query,
+                        event.case_sensitive,
+                        event.whole_word,
+                        event.regex,
+                        position=self.reading_position,
+                    ))
             self.notify(f"Found {len(self.search_results)} results.", title="Search Complete")
             if self.search_results:
                 self.push_screen("search_results")
@@ -109,6 +214,10 @@ class EpsilonApp(App):
         self, event: SearchResultsScreen.ReplaceSelection
     ) -> None:
         """Handle the selection of a search result for replacement."""
+        if self.book:
+            position = SearchEngine(self.book, self.performance).spine_position(event.search_result.item_href)
+            if position is not None:
+                self.reading_position = position
         self.push_screen(ReplaceScreen(search_result=event.search_result))
 
     def on_replace_screen_replace_initiated(self, event: ReplaceScreen.ReplaceInitiated) -> None:
@@ -118,20 +227,24 @@ class EpsilonApp(App):
             return
 
         try:
-            replace_engine = ReplaceEngine(self.book)
+            replace_engine = ReplaceEngine(self.book, self.performance)
             if event.replace_all:
-                num_replacements = replace_engine.replace_all(
-                    event.find,
-                    event.replace,
-                    event.case_sensitive,
-                    event.whole_word,
-                    event.regex
-                )
+                with self.user_operation():
+                    num_replacements = replace_engine.replace_all(
+                        event.find,
+                        event.replace,
+                        event.case_sensitive,
+                        event.whole_word,
+                        event.regex
+                    )
+                self._content_changed()
                 self.notify(f"Made {num_replacements} replacements.", title="Replace Complete")
                 self.pop_screen()
             elif event.search_result:
-                success = replace_engine.replace_one(event.search_result, event.replace)
+                with self.user_operation():
+                    success = replace_engine.replace_one(event.search_result, event.replace)
                 if success:
+                    self._content_changed()
                     self.notify("Replacement successful.", title="Replace Complete")
                     self.search_results.remove(event.search_result)
                     self.pop_screen()
@@ -147,6 +260,44 @@ class EpsilonApp(App):
         except Exception as e:
             self.notify(f"An unexpected error occurred during replace: {e}", title="Error", severity="error")
 
+    def on_replace_screen_preview_requested(self, event: ReplaceScreen.PreviewRequested) -> None:
+        """Open a dry-run preview of a replace-all operation."""
+        if not self.book:
+            self.notify("No EPUB loaded.", title="Error", severity="error")
+            return
+
+        try:
+            replace_engine = ReplaceEngine(self.book, self.performance)
+            preview = replace_engine.start_preview(
+                event.find,
+                event.replace,
+                event.case_sensitive,
+                event.whole_word,
+                event.regex
+            )
+            self.push_screen(ReplacePreviewScreen(replace_engine, preview))
+        except ValueError as e:
+            self.notify(str(e), title="Replace Error", severity="error")
+
+    def on_replace_preview_screen_apply_preview(
+        self, event: ReplacePreviewScreen.ApplyPreview
+    ) -> None:
+        """Apply the replacements computed by a preview."""
+        if not self.book:
+            self.notify("No EPUB loaded.", title="Error", severity="error")
+            return
+
+        try:
+            replace_engine = ReplaceEngine(self.book, self.performance)
+            with self.user_operation():
+                num_replacements = replace_engine.apply_preview(event.preview)
+            self._content_changed()
+            self.notify(f"Made {num_replacements} replacements.", title="Replace Complete")
+            self.pop_screen()  # Preview
+            self.pop_screen()  # Replace
+        except Exception as e:
+            self.notify(f"An unexpected error occurred during replace: {e}", title="Error", severity="error")
+
     def on_batch_operations_screen_batch_operations_initiated(
         self, event: BatchOperationsScreen.BatchOperationsInitiated
     ) -> None:
@@ -156,13 +307,10 @@ class EpsilonApp(App):
             return
 
         try:
-            replace_engine = ReplaceEngine(self.book)
-            num_replacements = replace_engine.batch_replace_all(
-                operations=event.operations,
-                case_sensitive=event.case_sensitive,
-                whole_word=event.whole_word,
-                regex=event.regex,
-            )
+            replace_engine = ReplaceEngine(self.book, self.performance)
+            with self.user_operation():
+                num_replacements = replace_engine.apply_rules(compile_ruleset(event.ruleset))
+            self._content_changed()
             self.notify(
                 f"Made {num_replacements} replacements in batch operation.",
                 title="Batch Replace Complete",
@@ -177,6 +325,11 @@ class EpsilonApp(App):
                 severity="error",
             )
 
+    def _content_changed(self) -> None:
+        """Drops state derived from the book's content after an edit."""
+        if self.live_search_session is not None:
+            self.live_search_session.reset()
+
     def action_save_book(self) -> None:
         """Saves the current book."""
         if not self.book:
@@ -188,9 +341,27 @@ class EpsilonApp(App):
             return
 
         try:
-            saver = EpubSaver(self.book)
-            saver.save()
-            self.notify("Book saved successfully.", title="Success", severity="information")
+            saver = EpubSaver(
+                self.book,
+                optimize_assets=self.settings_manager.get("optimize_assets", False),
+                optimize_stylesheets=self.settings_manager.get("optimize_stylesheets", False),
+                profile=self.performance,
+            )
+            with self.user_operation():
+                saver.save()
+            message = "Book saved successfully."
+            if saver.optimize_assets and saver.report:
+                message += (
+                    f" Optimized {saver.report.members} files:"
+                    f" {saver.report.bytes_saved / 1024:.1f} KiB saved"
+                    f" in {saver.report.elapsed_seconds:.2f}s."
+                )
+            if saver.css_report:
+                message += (
+                    f" Removed {saver.css_report.unused_rules} unused CSS rules,"
+                    f" {saver.css_report.bytes_saved / 1024:.1f} KiB."
+                )
+            self.notify(message, title="Success", severity="information")
         except Exception as e:
             self.notify(f"Error saving book: {e}", title="Error", severity="error")
 
@@ -1,28 +1,61 @@
+from pathlib import Path
+
 from textual.app import ComposeResult
 from textual.screen import Screen
 from textual.widgets import Header, Footer, Button, ListView, ListItem, Input, Checkbox
-from textual.containers import VerticalScroll, Horizontal
+from textual.containers import VerticalScroll, Horizontal, Vertical
 from textual.message import Message
-from typing import List, Tuple
+from typing import Optional
+
+from epub_editor_pro.core.batch_rules import (
+    ReplaceRule,
+    RuleSet,
+    RuleSetError,
+    load_ruleset,
+    save_ruleset,
+)
+
+DEFAULT_RULES_PATH = Path("config/batch_rules.json")
 
 
 class BatchOperationItem(ListItem):
-    """A widget for a single find/replace operation in a batch."""
-    def __init__(self, find: str = "", replace: str = "") -> None:
+    """A widget for a single find/replace rule in a batch."""
+    def __init__(self, rule: Optional[ReplaceRule] = None) -> None:
         super().__init__()
-        self.find_text = find
-        self.replace_text = replace
+        self.rule = rule or ReplaceRule(find="")
 
     def compose(self) -> ComposeResult:
-        yield Horizontal(
-            Input(value=self.find_text, placeholder="Find..."),
-            Input(value=self.replace_text, placeholder="Replace with..."),
+        yield Vertical(
+            Horizontal(
+                Input(value=self.rule.find, placeholder="Find...", classes="rule-find"),
+                Input(value=self.rule.replace, placeholder="Replace with...", classes="rule-replace"),
+            ),
+            Horizontal(
+                Checkbox("Case-sensitive", self.rule.case_sensitive, classes="rule-case-sensitive"),
+                Checkbox("Whole word", self.rule.whole_word, classes="rule-whole-word"),
+                Checkbox("Regex", self.rule.regex, classes="rule-regex"),
+                Input(
+                    value=" ".join(self.rule.items),
+                    placeholder="Items (globs, all if empty)",
+                    classes="rule-items",
+                ),
+                Input(value=self.rule.selector or "", placeholder="CSS selector", classes="rule-selector"),
+            ),
         )
 
     @property
-    def values(self) -> Tuple[str, str]:
-        inputs = self.query(Input)
-        return inputs[0].value, inputs[1].value
+    def values(self) -> ReplaceRule:
+        selector = self.query_one(".rule-selector", Input).value.strip()
+        return ReplaceRule(
+            find=self.query_one(".rule-find", Input).value,
+            replace=self.query_one(".rule-replace", Input).value,
+            case_sensitive=self.query_one(".rule-case-sensitive", Checkbox).value,
+            whole_word=self.query_one(".rule-whole-word", Checkbox).value,
+            regex=self.query_one(".rule-regex", Checkbox).value,
+            items=tuple(self.query_one(".rule-items", Input).value.split()),
+            selector=selector or None,
+            enabled=self.rule.enabled,
+        )
 
 
 class BatchOperationsScreen(Screen):
@@ -30,30 +63,21 @@ class BatchOperationsScreen(Screen):
 
     class BatchOperationsInitiated(Message):
         """Posted when batch operations are initiated."""
-        def __init__(
-            self,
-            operations: List[Tuple[str, str]],
-            case_sensitive: bool,
-            whole_word: bool,
-            regex: bool,
-        ) -> None:
-            self.operations = operations
-            self.case_sensitive = case_sensitive
-            self.whole_word = whole_word
-            self.regex = regex
+        def __init__(self, ruleset: RuleSet) -> None:
+            self.ruleset = ruleset
             super().__init__()
 
     def compose(self) -> ComposeResult:
         """Create child widgets for the screen."""
         yield Header()
         with VerticalScroll(id="batch-body"):
-            yield ListView(id="batch-list")
             yield Horizontal(
-                Checkbox("Case-sensitive", id="case-sensitive-checkbox"),
-                Checkbox("Whole word", id="whole-word-checkbox"),
-                Checkbox("Regex", id="regex-checkbox"),
-                id="batch-options"
+                Input(value=str(DEFAULT_RULES_PATH), placeholder="Rules file (.json or .yaml)", id="rules-path"),
+                Button("Load Rules", id="load-rules-button"),
+                Button("Save Rules", id="save-rules-button"),
+                id="batch-rules-file"
             )
+            yield ListView(id="batch-list")
         yield Footer()
         yield Horizontal(
             Button("Add Row", id="add-row-button"),
@@ -68,6 +92,39 @@ class BatchOperationsScreen(Screen):
         # Add an initial empty row
         self.query_one(ListView).append(BatchOperationItem())
 
+    def _ruleset(self) -> RuleSet:
+        """Returns the rules in the list, in order, skipping empty rows."""
+        rules = [item.values for item in self.query_one(ListView).query(BatchOperationItem)]
+        return RuleSet(rules=tuple(rule for rule in rules if rule.find))
+
+    def _rules_path(self) -> Path:
+        return Path(self.query_one("#rules-path", Input).value.strip() or DEFAULT_RULES_PATH)
+
+    def _load_rules(self) -> None:
+        path = self._rules_path()
+        try:
+            ruleset = load_ruleset(path)
+        except RuleSetError as e:
+            self.app.notify(str(e), title="Load Error", severity="error")
+            return
+        list_view = self.query_one(ListView)
+        list_view.clear()
+        for rule in ruleset.rules:
+            list_view.append(BatchOperationItem(rule))
+        if not ruleset.rules:
+            list_view.append(BatchOperationItem())
+        self.app.notify(f"Loaded {len(ruleset.rules)} rules from {path}.", title="Rules Loaded")
+
+    def _save_rules(self) -> None:
+        path = self._rules_path()
+        ruleset = self._ruleset()
+        try:
+            save_ruleset(ruleset, path)
+        except RuleSetError as e:
+            self.app.notify(str(e), title="Save Error", severity="error")
+            return
+        self.app.notify(f"Saved {len(ruleset.rules)} rules to {path}.", title="Rules Saved")
+
     def on_button_pressed(self, event: Button.Pressed) -> None:
         """Handle button presses."""
         list_view = self.query_one(ListView)
@@ -77,21 +134,14 @@ class BatchOperationsScreen(Screen):
         elif event.button.id == "remove-row-button":
             if list_view.children:
                 list_view.children[-1].remove()
+        elif event.button.id == "load-rules-button":
+            self._load_rules()
+        elif event.button.id == "save-rules-button":
+            self._save_rules()
         elif event.button.id == "start-batch-button":
-            operations = [item.values for item in list_view.query(BatchOperationItem)]
-            # Filter out empty operations
-            operations = [op for op in operations if op[0]]
-
-            case_sensitive = self.query_one("#case-sensitive-checkbox", Checkbox).value
-            whole_word = self.query_one("#whole-word-checkbox", Checkbox).value
-            regex = self.query_one("#regex-checkbox", Checkbox).value
-
-            if operations:
-                self.post_message(
-                    self.BatchOperationsInitiated(
-                        operations, case_sensitive, whole_word, regex
-                    )
-                )
+            ruleset = self._ruleset()
+            if ruleset.rules:
+                self.post_message(self.BatchOperationsInitiated(ruleset))
             else:
                 self.app.notify("No operations to perform.", title="Warning", severity="warning")
         elif event.button.id == "cancel-button":
@@ -1,8 +1,12 @@
+from textual import work
 from textual.app import ComposeResult
 from textual.screen import Screen
 from textual.widgets import Header, Footer, Label
 from textual.containers import VerticalScroll
 from textual.binding import Binding
+from textual.worker import get_current_worker
+
+from epub_editor_pro.core.book_statistics import BookStatistics
 
 from epub_editor_pro.ui.material_components import Card, Button
 from epub_editor_pro.ui.layout_manager import LayoutManager, ResponsiveGrid
@@ -41,6 +45,12 @@ class Dashboard(Screen):
                     Label(f"Content Files: {num_content_files}"),
                     Label(f"Spine Items: {len(book.spine)}"),
                     Label(f"TOC Entries: {len(book.toc)}"),
+                    Label("Words: counting...", id="stats-words"),
+                    Label("", id="stats-characters"),
+                    Label("", id="stats-images"),
+                    Label("", id="stats-largest"),
+                    Label("", id="stats-top-words"),
+                    Label("", id="stats-top-characters"),
                     id="stats-card"
                 )
 
@@ -70,6 +80,46 @@ class Dashboard(Screen):
         if self.app.book:
             self.query_one("#save-button", Button).disabled = not self.app.book.is_modified
 
+    def on_screen_resume(self) -> None:
+        """Shows the last statistics at once, then recounts the documents that changed."""
+        engine = self.app.statistics_engine
+        if self.app.book is None or engine is None:
+            return
+        if engine.cached is not None:
+            self._show_statistics(engine.cached)
+        self._compute_statistics()
+
+    @work(thread=True, group="statistics", exclusive=True)
+    def _compute_statistics(self) -> None:
+        worker = get_current_worker()
+        with self.app.user_operation():
+            statistics = self.app.statistics_engine.compute(is_cancelled=lambda: worker.is_cancelled)
+        if statistics is not None and not worker.is_cancelled:
+            self.app.call_from_thread(self._show_statistics, statistics)
+
+    def _show_statistics(self, statistics: BookStatistics) -> None:
+        self.query_one("#stats-words", Label).update(f"Words: {statistics.words:,}")
+        self.query_one("#stats-characters", Label).update(
+            f"Characters: {statistics.characters:,} ({statistics.text_bytes / 1024:.1f} KiB of text)"
+        )
+        self.query_one("#stats-images", Label).update(
+            f"Images: {statistics.image_count} ({statistics.image_bytes / 1024:.1f} KiB)"
+        )
+        largest = ""
+        if statistics.chapters:
+            chapter = max(statistics.chapters, key=lambda chapter: chapter.words)
+            navigation = self.app.book.navigation
+            title = (navigation.title_for(chapter.href) if navigation else None) or chapter.href
+            largest = f"Longest Chapter: {title} ({chapter.words:,} words)"
+        self.query_one("#stats-largest", Label).update(largest)
+        self.query_one("#stats-top-words", Label).update(
+            "Top Words: " + ", ".join(f"{word} ({count})" for word, count in statistics.most_common_words(5))
+        )
+        self.query_one("#stats-top-characters", Label).update(
+            "Top Characters: "
+            + ", ".join(f"{character} ({count})" for character, count in statistics.most_common_characters(5))
+        )
+
     def on_button_pressed(self, event: Button.Pressed) -> None:
         """Handle button presses."""
         if event.button.id == "search-button":
@@ -1,18 +1,66 @@
+import logging
+import sqlite3
 from pathlib import Path
+from typing import Dict, List, Optional
+
+from rich.style import Style
+from rich.text import Text
+from textual import work
 from textual.app import ComposeResult
 from textual.screen import Screen
-from textual.widgets import DirectoryTree, Header, Footer
+from textual.widgets import DirectoryTree, Header, Footer, Tree
+from textual.widgets.tree import TreeNode
 from textual.containers import Container
 from textual.message import Message
+from textual.worker import get_current_worker
+
+from epub_editor_pro.core.metadata_index import BookSummary, MetadataCache, MetadataIndexer
+
+log = logging.getLogger(__name__)
+
+METADATA_CACHE_PATH = Path.home() / ".cache" / "epsilon-editor" / "metadata.sqlite3"
 
 
 class EpubDirectoryTree(DirectoryTree):
-    """A DirectoryTree that filters for EPUB files."""
+    """A DirectoryTree that filters for EPUB files and shows their title and author."""
+
+    def __init__(self, path: Path, indexer: Optional[MetadataIndexer] = None, **kwargs) -> None:
+        super().__init__(path, **kwargs)
+        self.indexer = indexer
+        self._resolved: Dict[Path, Path] = {}  # Node paths as the indexer keys them
+
+    def _resolve(self, path: Path) -> Path:
+        resolved = self._resolved.get(path)
+        if resolved is None:
+            resolved = self._resolved[path] = path.expanduser().resolve()
+        return resolved
 
     def filter_paths(self, paths: list[Path]) -> list[Path]:
         """Filter paths to only include directories and .epub files."""
         return [path for path in paths if path.is_dir() or path.suffix == ".epub"]
 
+    def render_label(self, node: TreeNode, base_style: Style, style: Style) -> Text:
+        """Appends the indexed title and author to EPUB file labels."""
+        label = super().render_label(node, base_style, style)
+        if self.indexer is None or node.data is None or node.allow_expand:
+            return label
+        summary = self.indexer.cached(self._resolve(node.data.path))
+        if summary is not None and summary.title:
+            details = summary.title
+            if summary.creator:
+                details += f" — {summary.creator}"
+            label.append(f"  {details}", style="dim")
+        return label
+
+    def refresh_paths(self, paths: set) -> None:
+        """Redraws the nodes of the given files."""
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.data is not None and str(self._resolve(node.data.path)) in paths:
+                node.refresh()
+            stack.extend(node.children)
+
 
 class FileManager(Screen):
     """A screen for selecting an EPUB file."""
@@ -25,12 +73,53 @@ class FileManager(Screen):
 
     BINDINGS = [("q", "quit", "Quit")]
 
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        try:
+            cache = MetadataCache(METADATA_CACHE_PATH)
+        except (sqlite3.Error, OSError) as e:
+            log.warning("Using an in-memory metadata cache: %s", e)
+            cache = MetadataCache()
+        self.indexer = MetadataIndexer(cache)
+
     def compose(self) -> ComposeResult:
         """Create child widgets for the screen."""
         yield Header()
-        yield Container(EpubDirectoryTree(Path.home()))
+        yield Container(EpubDirectoryTree(Path.home(), indexer=self.indexer))
         yield Footer()
 
+    def on_mount(self) -> None:
+        """Index the books of the starting directory."""
+        self._index_directory(Path(self.query_one(EpubDirectoryTree).path))
+
+    def on_unmount(self) -> None:
+        """Stop indexing and close the metadata cache."""
+        self.workers.cancel_group(self, "metadata")
+        self.indexer.cache.close()
+
+    def on_tree_node_expanded(self, event: Tree.NodeExpanded) -> None:
+        """Index the books of a directory when it is opened."""
+        if event.node.data is not None:
+            self._index_directory(event.node.data.path)
+
+    @work(thread=True, group="metadata")
+    def _index_directory(self, directory: Path) -> None:
+        """Reads the metadata of the books in a directory, in the background."""
+        worker = get_current_worker()
+        directory = directory.expanduser().resolve()
+        try:
+            books = sorted(p for p in directory.iterdir() if p.suffix == ".epub" and p.is_file())
+        except OSError:
+            return
+        self.indexer.index(
+            books,
+            is_cancelled=lambda: worker.is_cancelled,
+            on_batch=lambda batch: self.app.call_from_thread(self._show_summaries, batch),
+        )
+
+    def _show_summaries(self, batch: List[BookSummary]) -> None:
+        self.query_one(EpubDirectoryTree).refresh_paths({summary.path for summary in batch})
+
     def on_directory_tree_file_selected(self, event: DirectoryTree.FileSelected) -> None:
         """Handle file selection."""
         self.post_message(self.FileSelected(event.path))
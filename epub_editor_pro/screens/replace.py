@@ -39,6 +39,24 @@ class ReplaceScreen(Screen):
             self.search_result = search_result
             super().__init__()
 
+    class PreviewRequested(Message):
+        """Posted when a dry-run of a replace-all is requested."""
+
+        def __init__(
+            self,
+            find: str,
+            replace: str,
+            case_sensitive: bool,
+            whole_word: bool,
+            regex: bool,
+        ) -> None:
+            self.find = find
+            self.replace = replace
+            self.case_sensitive = case_sensitive
+            self.whole_word = whole_word
+            self.regex = regex
+            super().__init__()
+
     def compose(self) -> ComposeResult:
         """Create child widgets for the screen."""
         yield Header()
@@ -56,6 +74,7 @@ class ReplaceScreen(Screen):
                 Horizontal(
                     Button("Replace", id="replace-button"),
                     Button("Replace All", id="replace-all-button", variant="primary"),
+                    Button("Preview", id="preview-button"),
                     Button("Cancel", id="cancel-button"),
                     id="replace-actions"
                 ),
@@ -108,3 +127,13 @@ class ReplaceScreen(Screen):
                     replace_all=True,
                 )
             )
+        elif event.button.id == "preview-button":
+            self.post_message(
+                self.PreviewRequested(
+                    find_query,
+                    replace_text,
+                    case_sensitive,
+                    whole_word,
+                    regex,
+                )
+            )
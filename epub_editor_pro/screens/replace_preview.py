@@ -0,0 +1,97 @@
+from textual import work
+from textual.app import ComposeResult
+from textual.screen import Screen
+from textual.widgets import Header, Footer, Button, Label, ListView, ListItem
+from textual.containers import VerticalScroll, Horizontal
+from textual.message import Message
+from textual.worker import get_current_worker
+
+from epub_editor_pro.core.replace_engine import ReplaceEngine
+from epub_editor_pro.core.replace_models import FilePreview, ReplacePreview
+
+
+class FilePreviewItem(ListItem):
+    """A widget to display the previewed replacements of one file."""
+
+    def __init__(self, file_preview: FilePreview) -> None:
+        super().__init__()
+        self.file_preview = file_preview
+
+    def compose(self) -> ComposeResult:
+        """Create child widgets for the list item."""
+        yield Label(
+            f"{self.file_preview.item_href}: {self.file_preview.count} replacements",
+            classes="file-path",
+            markup=False,
+        )
+        for snippet in self.file_preview.snippets:
+            yield Label(f"- {snippet.before}", classes="snippet-before", markup=False)
+            yield Label(f"+ {snippet.after}", classes="snippet-after", markup=False)
+
+
+class ReplacePreviewScreen(Screen):
+    """A screen that streams in a dry-run of a replace-all operation."""
+
+    class ApplyPreview(Message):
+        """Posted when the user accepts a completed preview."""
+
+        def __init__(self, preview: ReplacePreview) -> None:
+            self.preview = preview
+            super().__init__()
+
+    def __init__(self, engine: ReplaceEngine, preview: ReplacePreview, *args, **kwargs) -> None:
+        self.engine = engine
+        self.preview = preview
+        super().__init__(*args, **kwargs)
+
+    def compose(self) -> ComposeResult:
+        """Create child widgets for the screen."""
+        yield Header()
+        with VerticalScroll(id="preview-body"):
+            yield Label("Computing preview...", id="preview-status")
+            yield ListView(id="preview-list")
+        yield Horizontal(
+            Button("Apply", id="apply-button", variant="primary", disabled=True),
+            Button("Cancel", id="cancel-button"),
+            id="preview-actions",
+        )
+        yield Footer()
+
+    def on_mount(self) -> None:
+        """Start computing the preview."""
+        self._compute_preview()
+
+    @work(exclusive=True, thread=True, group="replace-preview")
+    def _compute_preview(self) -> None:
+        worker = get_current_worker()
+        files = self.engine.iter_preview(self.preview)
+        try:
+            with self.app.user_operation():
+                for file_preview in files:
+                    if worker.is_cancelled:
+                        return
+                    self.app.call_from_thread(self._add_file, file_preview)
+        finally:
+            files.close()
+        if not worker.is_cancelled:
+            self.app.call_from_thread(self._preview_complete)
+
+    def _add_file(self, file_preview: FilePreview) -> None:
+        self.query_one("#preview-list", ListView).append(FilePreviewItem(file_preview))
+        self.query_one("#preview-status", Label).update(
+            f"{self.preview.total} replacements in {len(self.preview.files)} files so far..."
+        )
+
+    def _preview_complete(self) -> None:
+        self.query_one("#preview-status", Label).update(
+            f"{self.preview.total} replacements in {len(self.preview.files)} files."
+        )
+        self.query_one("#apply-button", Button).disabled = self.preview.total == 0
+
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        """Handle button presses."""
+        if event.button.id == "apply-button":
+            self.post_message(self.ApplyPreview(self.preview))
+        elif event.button.id == "cancel-button":
+            self.workers.cancel_group(self, "replace-preview")
+            self.app.pop_screen()
@@ -1,24 +1,58 @@
+from typing import List, Optional
+
+from textual import work
 from textual.app import ComposeResult
 from textual.screen import Screen
-from textual.widgets import Header, Footer, Input, Checkbox, Button
+from textual.timer import Timer
+from textual.widgets import Header, Footer, Input, Checkbox, Button, Label, ListView, Select
 from textual.containers import VerticalScroll, Horizontal
 from textual.message import Message
+from textual.worker import get_current_worker
 
+from epub_editor_pro.core.search_engine import MODE_EXACT, MODE_FUZZY, MODE_PHRASE
+from epub_editor_pro.core.search_models import SearchResult
+from epub_editor_pro.screens.search_results import SearchResultItem
 from epub_editor_pro.ui.material_components import Card
 
+# Seconds of typing inactivity before a live query is started.
+LIVE_SEARCH_DEBOUNCE = 0.15
+# Number of hits shown while searching as you type.
+LIVE_TOP_HITS = 20
+
+SEARCH_MODE_OPTIONS = [
+    ("Exact", MODE_EXACT),
+    ("Across elements", MODE_PHRASE),
+    ("Fuzzy", MODE_FUZZY),
+]
+
 
 class SearchScreen(Screen):
     """A screen for searching text within the EPUB."""
 
     class SearchInitiated(Message):
         """Posted when a search is initiated."""
-        def __init__(self, query: str, case_sensitive: bool, whole_word: bool, regex: bool) -> None:
+        def __init__(
+            self,
+            query: str,
+            case_sensitive: bool,
+            whole_word: bool,
+            regex: bool,
+            results: Optional[List[SearchResult]] = None,
+            mode: str = MODE_EXACT,
+        ) -> None:
             self.query = query
             self.case_sensitive = case_sensitive
             self.whole_word = whole_word
             self.regex = regex
+            # Complete results already computed by the live search, if any.
+            self.results = results
+            self.mode = mode
             super().__init__()
 
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._debounce_timer: Optional[Timer] = None
+
     def compose(self) -> ComposeResult:
         """Create child widgets for the screen."""
         yield Header()
@@ -30,6 +64,8 @@ class SearchScreen(Screen):
                     Checkbox("Case-sensitive", id="case-sensitive-checkbox"),
                     Checkbox("Whole word", id="whole-word-checkbox"),
                     Checkbox("Regex", id="regex-checkbox"),
+                    Checkbox("Live", id="live-checkbox"),
+                    Select(SEARCH_MODE_OPTIONS, value=MODE_EXACT, allow_blank=False, id="mode-select"),
                     id="search-options"
                 ),
                 Horizontal(
@@ -39,18 +75,116 @@ class SearchScreen(Screen):
                 ),
                 id="search-card"
             )
+            yield Label("", id="live-status")
+            yield ListView(id="live-results")
         yield Footer()
 
+    def _options(self):
+        """Returns the current (case_sensitive, whole_word, regex) flags."""
+        return (
+            self.query_one("#case-sensitive-checkbox", Checkbox).value,
+            self.query_one("#whole-word-checkbox", Checkbox).value,
+            self.query_one("#regex-checkbox", Checkbox).value,
+        )
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        """Schedule a live search when the query changes."""
+        if event.input.id == "search-input":
+            self._schedule_live_search()
+
+    def _mode(self) -> str:
+        return self.query_one("#mode-select", Select).value
+
+    def on_select_changed(self, event: Select.Changed) -> None:
+        """Re-run the live search when the mode changes."""
+        self._schedule_live_search()
+
+    def on_checkbox_changed(self, event: Checkbox.Changed) -> None:
+        """Re-run the live search when an option changes."""
+        if event.checkbox.id == "live-checkbox" and not event.value:
+            self.workers.cancel_group(self, "live-search")
+            self._show_live_hits([], 0, complete=True)
+            return
+        self._schedule_live_search()
+
+    def _schedule_live_search(self) -> None:
+        """Debounce keystrokes so only the last query of a burst runs."""
+        if self._debounce_timer is not None:
+            self._debounce_timer.stop()
+            self._debounce_timer = None
+        if not self.query_one("#live-checkbox", Checkbox).value:
+            return
+        self._debounce_timer = self.set_timer(LIVE_SEARCH_DEBOUNCE, self._start_live_search)
+
+    def _start_live_search(self) -> None:
+        self._debounce_timer = None
+        query = self.query_one("#search-input", Input).value
+        if not query or self.app.live_search_session is None:
+            self.workers.cancel_group(self, "live-search")
+            self._show_live_hits([], 0, complete=True)
+            return
+        self._run_live_search(query, *self._options(), self._mode())
+
+    @work(exclusive=True, thread=True, group="live-search")
+    def _run_live_search(
+        self, query: str, case_sensitive: bool, whole_word: bool, regex: bool, mode: str
+    ) -> None:
+        """Runs a live query, publishing the first page as soon as it fills."""
+        worker = get_current_worker()
+        session = self.app.live_search_session
+        hits: List[SearchResult] = []
+        total = 0
+        try:
+            with self.app.user_operation():
+                for result in session.run(
+                    query, case_sensitive, whole_word, regex,
+                    is_cancelled=lambda: worker.is_cancelled,
+                    position=self.app.reading_position,
+                    mode=mode,
+                ):
+                    total += 1
+                    if len(hits) < LIVE_TOP_HITS:
+                        hits.append(result)
+                        if len(hits) == LIVE_TOP_HITS:
+                            self.app.call_from_thread(self._show_live_hits, list(hits), total, False)
+        except ValueError:
+            # An incomplete regex or too short a fuzzy query is expected
+            # while typing; wait for more input.
+            return
+        if not worker.is_cancelled:
+            self.app.call_from_thread(self._show_live_hits, hits, total, True)
+
+    def _show_live_hits(self, hits: List[SearchResult], total: int, complete: bool) -> None:
+        """Replaces the live result list with the given hits."""
+        list_view = self.query_one("#live-results", ListView)
+        list_view.clear()
+        for result in hits:
+            list_view.append(SearchResultItem(result))
+        status = self.query_one("#live-status", Label)
+        if not hits:
+            status.update("")
+        elif complete:
+            status.update(f"{total} results")
+        else:
+            status.update(f"{total}+ results, searching...")
+
     def on_button_pressed(self, event: Button.Pressed) -> None:
         """Handle button presses."""
         if event.button.id == "search-button":
             query = self.query_one("#search-input", Input).value
             if query:
-                case_sensitive = self.query_one("#case-sensitive-checkbox", Checkbox).value
-                whole_word = self.query_one("#whole-word-checkbox", Checkbox).value
-                regex = self.query_one("#regex-checkbox", Checkbox).value
-                self.post_message(self.SearchInitiated(query, case_sensitive, whole_word, regex))
+                case_sensitive, whole_word, regex = self._options()
+                mode = self._mode()
+                results = None
+                if self.app.live_search_session is not None:
+                    results = self.app.live_search_session.results_for(
+                        query, case_sensitive, whole_word, regex, mode
+                    )
+                self.post_message(
+                    self.SearchInitiated(query, case_sensitive, whole_word, regex, results, mode)
+                )
             else:
                 self.app.notify("Please enter a search query.", title="Warning", severity="warning")
         elif event.button.id == "cancel-button":
+            self.workers.cancel_group(self, "live-search")
             self.app.pop_screen()
@@ -1,10 +1,17 @@
+from pathlib import Path
+
+from textual import work
 from textual.app import ComposeResult
+from textual.binding import Binding
 from textual.screen import Screen
 from textual.widgets import Header, Footer, ListView, ListItem, Label
 from textual.containers import VerticalScroll
 from textual.message import Message
 
 from epub_editor_pro.core.search_models import SearchResult
+from epub_editor_pro.core.search_report import (
+    FORMAT_CSV, FORMAT_HTML, FORMAT_JSONL, REPORT_EXTENSIONS, SearchReportWriter,
+)
 
 
 class SearchResultItem(ListItem):
@@ -16,7 +23,13 @@ class SearchResultItem(ListItem):
 
     def compose(self) -> ComposeResult:
         """Create child widgets for the list item."""
-        yield Label(f"{self.result.file_path}:{self.result.line_number}", classes="file-path")
+        location = f"{self.result.file_path}:{self.result.line_number}"
+        book = self.app.book
+        if book is not None and book.navigation is not None:
+            chapter_title = book.navigation.title_for(self.result.item_href)
+            if chapter_title:
+                location = f"{chapter_title} ({location})"
+        yield Label(location, classes="file-path")
         # The rich text markup is not working as expected here.
         # I will fix this in a later step.
         yield Label(
@@ -27,6 +40,13 @@ class SearchResultItem(ListItem):
 
 class SearchResultsScreen(Screen):
     """A screen to display search results."""
+
+    BINDINGS = [
+        Binding("c", f"export('{FORMAT_CSV}')", "Export CSV"),
+        Binding("j", f"export('{FORMAT_JSONL}')", "Export JSONL"),
+        Binding("h", f"export('{FORMAT_HTML}')", "Export HTML"),
+    ]
+
     class ReplaceSelection(Message):
         """Posted when the user wants to replace a single search result."""
 
@@ -59,3 +79,28 @@ class SearchResultsScreen(Screen):
         list_view.clear()
         for result in self.app.search_results:
             list_view.append(SearchResultItem(result))
+
+    def action_export(self, fmt: str) -> None:
+        """Writes the results to a report next to the book."""
+        book = self.app.book
+        if book is None or not self.app.search_results:
+            self.app.notify("No results to export.", title="Export", severity="warning")
+            return
+        path = Path(book.filepath)
+        self._export(path.with_name(f"{path.stem}-search{REPORT_EXTENSIONS[fmt]}"), fmt)
+
+    @work(thread=True, group="export")
+    def _export(self, target: Path, fmt: str) -> None:
+        book = self.app.book
+        try:
+            with open(target, "w", encoding="utf-8", newline="") as output:
+                with SearchReportWriter(output, fmt, title=f"Search results in {book.filepath}") as writer:
+                    writer.write_book(book, list(self.app.search_results), str(book.filepath))
+        except OSError as e:
+            self.app.call_from_thread(
+                self.app.notify, f"Could not write {target}: {e}", title="Export", severity="error"
+            )
+            return
+        self.app.call_from_thread(
+            self.app.notify, f"Exported {writer.count} results to {target}", title="Export"
+        )
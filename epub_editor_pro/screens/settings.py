@@ -1,11 +1,17 @@
 from textual.app import ComposeResult
 from textual.screen import Screen
-from textual.widgets import Header, Footer, Static, Switch
+from textual.widgets import Header, Footer, Select, Static, Switch
 from textual.containers import VerticalScroll, Vertical
 from textual.binding import Binding
 
 from epub_editor_pro.ui.material_components import Card
 
+PERFORMANCE_PROFILE_OPTIONS = [
+    ("Balanced", "balanced"),
+    ("Low-memory phone", "low_memory_phone"),
+    ("Workstation", "workstation"),
+]
+
 
 class SettingsScreen(Screen):
     """A screen for configuring application settings."""
@@ -20,6 +26,7 @@ class SettingsScreen(Screen):
         with VerticalScroll(id="settings-body"):
             yield self.make_appearance_card()
             yield self.make_behavior_card()
+            yield self.make_performance_card()
             yield Card(
                 "Keybindings",
                 Static("Keybinding customization is not yet available."),
@@ -57,9 +64,56 @@ class SettingsScreen(Screen):
                 Static("Autosave"),
                 Switch(value=settings_manager.get("autosave", True), id="autosave"),
             ),
+            Vertical(
+                Static("Optimize Assets on Save"),
+                Switch(
+                    value=settings_manager.get("optimize_assets", False),
+                    id="optimize_assets",
+                ),
+            ),
+            Vertical(
+                Static("Remove Unused CSS and Minify Stylesheets on Save"),
+                Switch(
+                    value=settings_manager.get("optimize_stylesheets", False),
+                    id="optimize_stylesheets",
+                ),
+            ),
+            Vertical(
+                Static("Edit Books Unpacked (shared with external editors)"),
+                Switch(
+                    value=settings_manager.get("unpacked_workspace", False),
+                    id="unpacked_workspace",
+                ),
+            ),
             id="behavior-card",
         )
 
+    def make_performance_card(self) -> Card:
+        """Create the performance settings card."""
+        settings_manager = self.app.settings_manager
+        return Card(
+            "Performance",
+            Vertical(
+                Static("Profile (memory, threads, caching, compression)"),
+                Select(
+                    PERFORMANCE_PROFILE_OPTIONS,
+                    value=settings_manager.get("performance_profile", "balanced"),
+                    allow_blank=False,
+                    id="performance_profile",
+                ),
+            ),
+            id="performance-card",
+        )
+
+    def on_select_changed(self, event: Select.Changed) -> None:
+        """Switch to the selected performance profile."""
+        if event.select.id != "performance_profile":
+            return
+        if event.value == self.app.settings_manager.get("performance_profile"):
+            return
+        self.app.apply_performance_profile(str(event.value))
+        self.app.notify(f"Performance profile set to {event.value.replace('_', ' ')}")
+
     def on_switch_changed(self, event: Switch.Changed) -> None:
         """Handle switch changes and save settings."""
         settings_manager = self.app.settings_manager
@@ -0,0 +1,199 @@
+import posixpath
+import struct
+import urllib.parse
+import zipfile
+import zlib
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Tuple
+
+
+def normalize_href(href: str) -> str:
+    """
+    Normalizes a manifest-relative href for comparison.
+
+    Percent-escapes are decoded and '.' and '..' segments are collapsed, so
+    'text/../ch%201.xhtml' and 'ch 1.xhtml' compare equal.
+    """
+    path = posixpath.normpath(urllib.parse.unquote(href))
+    return "" if path == "." else path
+
+
+def resolve_href(base_href: str, reference: str) -> Optional[Tuple[str, str]]:
+    """
+    Resolves a reference found in a document against the document's href.
+
+    Both the base and the result are relative to the OPF directory.
+
+    Args:
+        base_href: The manifest href of the document containing the reference.
+        reference: The raw value of an href/src attribute.
+
+    Returns:
+        A (normalized target href, fragment) tuple, or None if the reference
+        points outside the book (it has a scheme or a host).
+    """
+    parts = urllib.parse.urlsplit(reference.strip())
+    if parts.scheme or parts.netloc:
+        return None
+    if not parts.path:
+        return normalize_href(base_href), urllib.parse.unquote(parts.fragment)
+    target = posixpath.join(posixpath.dirname(base_href), parts.path)
+    return normalize_href(target), urllib.parse.unquote(parts.fragment)
+
+
+def deflate_raw(data: bytes, level: int = zlib.Z_DEFAULT_COMPRESSION) -> bytes:
+    """Compresses data into a raw deflate stream, as stored in ZIP members."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+
+# Record layouts from the ZIP specification (PKWARE APPNOTE.TXT).
+LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+END_RECORD = struct.Struct("<4s4H2LH")
+ZIP64_END_RECORD = struct.Struct("<4sQ2H2L4Q")
+ZIP64_LOCATOR = struct.Struct("<4sLQL")
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+CENTRAL_HEADER_SIGNATURE = b"PK\x01\x02"
+END_RECORD_SIGNATURE = b"PK\x05\x06"
+ZIP64_END_RECORD_SIGNATURE = b"PK\x06\x06"
+ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+ZIP64_EXTRA_ID = 0x0001
+UTF8_FLAG = 0x800
+# From these on, sizes, offsets and entry counts need the ZIP64 extensions,
+# and the classic field holds the all-ones marker instead.
+ZIP32_LIMIT = 0xFFFFFFFF
+ZIP32_MAX_ENTRIES = 0xFFFF
+
+
+def read_raw_member(fp: BinaryIO, info: zipfile.ZipInfo) -> bytes:
+    """
+    Reads the still-compressed payload of a ZIP member.
+
+    This lets a member be copied into another archive without being
+    decompressed and compressed again. `fp` is a binary file of the
+    archive `info` comes from, opened by the caller and used only here.
+    """
+    fp.seek(info.header_offset)
+    header = fp.read(LOCAL_HEADER.size)
+    if len(header) != LOCAL_HEADER.size or header[:4] != LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f"Bad local file header for '{info.filename}'.")
+    fields = LOCAL_HEADER.unpack(header)
+    name_length, extra_length = fields[-2], fields[-1]
+    fp.seek(name_length + extra_length, 1)
+    payload = fp.read(info.compress_size)
+    if len(payload) != info.compress_size:
+        raise zipfile.BadZipFile(f"Truncated data for '{info.filename}'.")
+    return payload
+
+
+def _field(value: int, limit: int, marker: int) -> int:
+    return marker if value >= limit else value
+
+
+def _dos_date_time(date_time: Tuple[int, ...]) -> Tuple[int, int]:
+    year, month, day, hour, minute, second = date_time[:6]
+    return (year - 1980) << 9 | month << 5 | day, hour << 11 | minute << 5 | second // 2
+
+
+class RawZipWriter:
+    """
+    Writes a ZIP archive from members whose payloads are already compressed.
+
+    Each member is written as given: `zinfo` carries the name, date, compression
+    type, CRC and uncompressed size, and the payload is the matching raw
+    (deflate or stored) data. This lets the expensive compression happen
+    elsewhere, e.g. in worker threads, or be skipped for members copied from
+    another archive. The format follows the ZIP specification, with the
+    ZIP64 extensions where sizes or counts need them, so it relies on no
+    zipfile internals. Use it as a context manager, or call `close` to write
+    the central directory.
+    """
+
+    def __init__(self, path: Path):
+        self._fp = open(path, "wb")
+        self._members: List[Tuple[zipfile.ZipInfo, int, int]] = []  # (info, flags, header offset)
+
+    def write(self, zinfo: zipfile.ZipInfo, payload: bytes):
+        """Writes a member with its already compressed payload."""
+        zinfo.compress_size = len(payload)
+        if not zinfo.external_attr:
+            zinfo.external_attr = 0o600 << 16
+        offset = self._fp.tell()
+        name = zinfo.filename.encode("utf-8")
+        flags = UTF8_FLAG if not zinfo.filename.isascii() else 0
+        zip64 = zinfo.file_size >= ZIP32_LIMIT or zinfo.compress_size >= ZIP32_LIMIT
+        extra = b""
+        if zip64:
+            extra = struct.pack("<2H2Q", ZIP64_EXTRA_ID, 16, zinfo.file_size, zinfo.compress_size)
+        date, time_ = _dos_date_time(zinfo.date_time)
+        self._fp.write(LOCAL_HEADER.pack(
+            LOCAL_HEADER_SIGNATURE, 45 if zip64 else 20, flags, zinfo.compress_type, time_, date,
+            zinfo.CRC,
+            0xFFFFFFFF if zip64 else zinfo.compress_size,
+            0xFFFFFFFF if zip64 else zinfo.file_size,
+            len(name), len(extra),
+        ))
+        self._fp.write(name)
+        self._fp.write(extra)
+        self._fp.write(payload)
+        self._members.append((zinfo, flags, offset))
+
+    def write_stored(self, zinfo: zipfile.ZipInfo, data: bytes):
+        """Writes a member uncompressed, such as the mimetype."""
+        zinfo.compress_type = zipfile.ZIP_STORED
+        zinfo.CRC = zlib.crc32(data)
+        zinfo.file_size = len(data)
+        self.write(zinfo, data)
+
+    def _write_central_directory(self):
+        start = self._fp.tell()
+        for zinfo, flags, offset in self._members:
+            name = zinfo.filename.encode("utf-8")
+            large = [value for value in (zinfo.file_size, zinfo.compress_size, offset) if value >= ZIP32_LIMIT]
+            extra = b""
+            if large:
+                # Only the fields that overflow, in this order.
+                extra = struct.pack(f"<2H{len(large)}Q", ZIP64_EXTRA_ID, 8 * len(large), *large)
+            date, time_ = _dos_date_time(zinfo.date_time)
+            version = 45 if large else 20
+            self._fp.write(CENTRAL_HEADER.pack(
+                CENTRAL_HEADER_SIGNATURE, zinfo.create_system << 8 | version, version, flags,
+                zinfo.compress_type, time_, date, zinfo.CRC,
+                _field(zinfo.compress_size, ZIP32_LIMIT, 0xFFFFFFFF), _field(zinfo.file_size, ZIP32_LIMIT, 0xFFFFFFFF),
+                len(name), len(extra), len(zinfo.comment), 0, 0, zinfo.external_attr,
+                _field(offset, ZIP32_LIMIT, 0xFFFFFFFF),
+            ))
+            self._fp.write(name)
+            self._fp.write(extra)
+            self._fp.write(zinfo.comment)
+        end = self._fp.tell()
+        count, size = len(self._members), end - start
+        if count >= ZIP32_MAX_ENTRIES or size >= ZIP32_LIMIT or start >= ZIP32_LIMIT:
+            self._fp.write(ZIP64_END_RECORD.pack(
+                ZIP64_END_RECORD_SIGNATURE, ZIP64_END_RECORD.size - 12, 45, 45, 0, 0, count, count, size, start,
+            ))
+            self._fp.write(ZIP64_LOCATOR.pack(ZIP64_LOCATOR_SIGNATURE, 0, end, 1))
+        self._fp.write(END_RECORD.pack(
+            END_RECORD_SIGNATURE, 0, 0,
+            _field(count, ZIP32_MAX_ENTRIES, 0xFFFF), _field(count, ZIP32_MAX_ENTRIES, 0xFFFF),
+            _field(size, ZIP32_LIMIT, 0xFFFFFFFF), _field(start, ZIP32_LIMIT, 0xFFFFFFFF), 0,
+        ))
+
+    def close(self):
+        """Writes the central directory and closes the file."""
+        if self._fp.closed:
+            return
+        try:
+            self._write_central_directory()
+        finally:
+            self._fp.close()
+
+    def __enter__(self) -> "RawZipWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._fp.close()
@@ -0,0 +1,109 @@
+import codecs
+import re
+from typing import Optional
+
+from bs4 import UnicodeDammit
+
+DEFAULT_ENCODING = "utf-8"
+
+# Byte order marks, longest first so UTF-32 LE is not taken for UTF-16 LE.
+BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+# Declarations are looked for in the start of the document only, as
+# browsers do when prescanning for a meta charset.
+PRESCAN_BYTES = 4096
+
+XML_DECLARATION_RE = re.compile(rb"""^\s*<\?xml[^>]*?\sencoding\s*=\s*["']([A-Za-z0-9._:-]+)["']""")
+XML_DECLARATION_TEXT_RE = re.compile(r"^\s*(<\?xml[^>]*\?>)")
+META_CHARSET_RE = re.compile(
+    rb"""<meta\s[^>]*?charset\s*=\s*["']?\s*([A-Za-z0-9._:-]+)""", re.IGNORECASE
+)
+
+
+def _lookup(name: bytes) -> Optional[str]:
+    """Returns the Python codec for a declared encoding, if it is usable."""
+    try:
+        codec = codecs.lookup(name.decode("ascii")).name
+    except (LookupError, UnicodeDecodeError):
+        return None
+    # A wide encoding declared in ASCII-compatible bytes is a wrong declaration.
+    if codec.startswith(("utf-16", "utf-32")):
+        return None
+    return codec
+
+
+def detect_encoding(data: bytes) -> str:
+    """
+    Detects the encoding of an XML or HTML document.
+
+    A byte order mark wins, then the XML declaration, then a meta charset
+    declaration. Documents declaring nothing are UTF-8, as XML requires.
+    """
+    for bom, codec in BOMS:
+        if data.startswith(bom):
+            return codec
+
+    head = data[:PRESCAN_BYTES]
+    for pattern in (XML_DECLARATION_RE, META_CHARSET_RE):
+        match = pattern.search(head)
+        if match:
+            codec = _lookup(match.group(1))
+            if codec:
+                return codec
+    return DEFAULT_ENCODING
+
+
+def _decodes(data: bytes, encoding: Optional[str]) -> bool:
+    if not encoding:
+        return False
+    try:
+        data.decode(encoding)
+    except (UnicodeDecodeError, LookupError):
+        return False
+    return True
+
+
+def document_encoding(data: bytes) -> str:
+    """
+    Returns an encoding the whole document decodes in without loss.
+
+    The detected encoding is used when it fits. A mislabelled document is
+    sniffed instead, and Latin-1, which maps every byte, is the last
+    resort: text that is written back must give the original bytes for
+    everything that was not replaced.
+    """
+    encoding = detect_encoding(data)
+    if _decodes(data, encoding):
+        return encoding
+    dammit = UnicodeDammit(data, is_html=True)
+    if not dammit.contains_replacement_characters and _decodes(data, dammit.original_encoding):
+        return codecs.lookup(dammit.original_encoding).name
+    return "latin-1"
+
+
+def decode_text(data: bytes, encoding: str) -> str:
+    """
+    Decodes a document. Bytes invalid in the encoding are replaced rather
+    than failing; text decoded in the `document_encoding` has none.
+    """
+    return data.decode(encoding, errors="replace")
+
+
+def encode_text(text: str, encoding: str) -> bytes:
+    """
+    Encodes a document, writing characters the encoding cannot represent as
+    numeric character references so that nothing is lost.
+    """
+    return text.encode(encoding, errors="xmlcharrefreplace")
+
+
+def xml_declaration(text: str) -> Optional[str]:
+    """Returns the XML declaration a decoded document starts with, if any."""
+    match = XML_DECLARATION_TEXT_RE.match(text)
+    return match.group(1) if match else None
@@ -0,0 +1,134 @@
+import importlib.util
+import unittest
+import shutil
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from epub_editor_pro.core.batch_rules import (
+    ReplaceRule,
+    RuleSet,
+    RuleSetError,
+    compile_ruleset,
+    load_ruleset,
+    save_ruleset,
+)
+from epub_editor_pro.core.epub_model import EpubBook, ManifestItem
+from epub_editor_pro.core.normalized_text import text_lines
+from epub_editor_pro.core.replace_engine import ReplaceEngine
+
+
+class TestRuleSetFiles(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a temporary directory and a ruleset."""
+        self.test_dir = Path("tests/temp_rules_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        self.ruleset = RuleSet(
+            rules=(
+                ReplaceRule("colour", "color", whole_word=True),
+                ReplaceRule(r"(\d+)-(\d+)", r"\1–\2", regex=True, items=("text/*.xhtml",), selector="p.note"),
+            ),
+            name="House style",
+        )
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.test_dir)
+
+    def test_round_trip(self):
+        """Test that rulesets survive being saved as JSON."""
+        path = self.test_dir / "rules.json"
+        save_ruleset(self.ruleset, path)
+        self.assertEqual(load_ruleset(path), self.ruleset)
+
+    @unittest.skipUnless(importlib.util.find_spec("yaml"), "PyYAML is not installed")
+    def test_yaml_round_trip(self):
+        """Test that rulesets survive being saved as YAML."""
+        path = self.test_dir / "rules.yml"
+        save_ruleset(self.ruleset, path)
+        self.assertEqual(load_ruleset(path), self.ruleset)
+
+    def test_invalid_files(self):
+        """Test that malformed rulesets are reported as RuleSetError."""
+        path = self.test_dir / "rules.json"
+        for content in ('{"rules": [{"find": ""}]}', '{"rules": [{"find": "a", "regexp": true}]}',
+                        '{"version": 2, "rules": []}', '[1, 2]', '{"rules": '):
+            path.write_text(content)
+            with self.assertRaises(RuleSetError):
+                load_ruleset(path)
+        with self.assertRaises(RuleSetError):
+            load_ruleset(self.test_dir / "missing.json")
+
+    def test_compile_is_cached_and_validated(self):
+        """Test that compiling is cached and rejects bad patterns and selectors."""
+        self.assertIs(compile_ruleset(self.ruleset), compile_ruleset(self.ruleset))
+        with self.assertRaises(RuleSetError):
+            compile_ruleset(RuleSet(rules=(ReplaceRule("(", regex=True),)))
+        with self.assertRaises(RuleSetError):
+            compile_ruleset(RuleSet(rules=(ReplaceRule("a", selector="p[",),)))
+
+        compiled = compile_ruleset(RuleSet(rules=(ReplaceRule("a", enabled=False),) + self.ruleset.rules))
+        self.assertEqual(len(compiled.rules), 2)
+        self.assertEqual(len(compiled.rules_for("text/ch1.xhtml", "ch1")), 2)
+        self.assertEqual(len(compiled.rules_for("notes.xhtml", "notes")), 1)
+
+    def test_unhashable_fields(self):
+        """Test that list fields are made hashable, and other unhashable values rejected."""
+        ruleset = RuleSet(rules=[ReplaceRule("a", items=["*.xhtml"])])
+        self.assertEqual(ruleset.rules[0].items, ("*.xhtml",))
+        self.assertEqual(len(compile_ruleset(ruleset).rules), 1)
+        with self.assertRaises(RuleSetError):
+            compile_ruleset(RuleSet.from_dict({"rules": [{"find": "a", "selector": ["p"]}]}))
+
+
+class TestApplyRules(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a mock book with two documents."""
+        self.mock_book = MagicMock(spec=EpubBook)
+        self.mock_book.manifest = {
+            'ch1': ManifestItem(id='ch1', href='text/ch1.xhtml', media_type='application/xhtml+xml'),
+            'ch2': ManifestItem(id='ch2', href='text/ch2.xhtml', media_type='application/xhtml+xml'),
+        }
+        self.content_store = {
+            'text/ch1.xhtml': b'<html><body><p>cat dog</p><p class="note">cat</p></body></html>',
+            'text/ch2.xhtml': b'<html><body><p>cat</p></body></html>',
+        }
+        self.mock_content_manager = MagicMock()
+        self.mock_content_manager.get_content.side_effect = lambda href: self.content_store[href]
+        self.mock_content_manager.update_content.side_effect = (
+            lambda href, content: self.content_store.__setitem__(href, content)
+        )
+        self.mock_content_manager.get_text.side_effect = (
+            lambda href: self.mock_content_manager.get_content(href).decode("utf-8")
+        )
+        self.mock_content_manager.get_encoding.return_value = "utf-8"
+        # Text lines are parsed from the decoded text, as the content manager does.
+        self.mock_content_manager.get_text_lines.side_effect = (
+            lambda href, parser="lxml": text_lines(self.mock_content_manager.get_text(href), parser)
+        )
+        # Sizes come from the archive directory; all documents are small.
+        self.mock_content_manager.get_size.return_value = 0
+        self.mock_book.content_manager = self.mock_content_manager
+        self.engine = ReplaceEngine(self.mock_book)
+
+    def test_rules_are_ordered_and_scoped(self):
+        """Test rule order, item scoping and selector scoping."""
+        ruleset = RuleSet(rules=(
+            ReplaceRule("cat", "bird", selector="p.note"),
+            ReplaceRule("bird", "owl", items=("ch1",)),
+            ReplaceRule("dog", "fox", items=("text/ch2.*",)),
+        ))
+        self.assertEqual(self.engine.apply_rules(compile_ruleset(ruleset)), 2)
+
+        ch1 = self.content_store['text/ch1.xhtml']
+        self.assertIn(b'cat dog', ch1)
+        self.assertIn(b'owl', ch1)
+        # Only the first document was written.
+        self.mock_content_manager.update_content.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
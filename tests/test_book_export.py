@@ -0,0 +1,138 @@
+import io
+import json
+import unittest
+import zipfile
+import shutil
+from pathlib import Path
+
+from epub_editor_pro.core.book_export import BookExporter, extract_text
+
+
+CONTAINER_XML = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+
+CONTENT_OPF = """<?xml version="1.0"?>
+<package version="2.0" xmlns="http://www.idpf.org/2007/opf" unique-identifier="pub-id">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:title>Test Title</dc:title>
+  </metadata>
+  <manifest>
+    <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
+    <item id="ch1" href="text/ch1.xhtml" media-type="application/xhtml+xml"/>
+    <item id="ch2" href="text/ch2.xhtml" media-type="application/xhtml+xml"/>
+  </manifest>
+  <spine toc="ncx">
+    <itemref idref="ch2"/>
+    <itemref idref="ch1"/>
+  </spine>
+</package>"""
+
+TOC_NCX = """<?xml version="1.0"?>
+<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">
+  <navMap>
+    <navPoint id="n1"><navLabel><text>Opening</text></navLabel><content src="text/ch2.xhtml"/></navPoint>
+    <navPoint id="n2"><navLabel><text>Closing</text></navLabel><content src="text/ch1.xhtml"/></navPoint>
+  </navMap>
+</ncx>"""
+
+
+def _xhtml(body):
+    return f'<html xmlns="http://www.w3.org/1999/xhtml"><head><title>t</title></head><body>{body}</body></html>'
+
+
+class TestBookExport(unittest.TestCase):
+
+    def setUp(self):
+        """Create two test EPUBs."""
+        self.test_dir = Path("tests/temp_export_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        self.books = [self._write("first.epub", "First"), self._write("second.epub", "Second")]
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.test_dir)
+
+    def _write(self, name, word):
+        path = self.test_dir / name
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+            zf.writestr("META-INF/container.xml", CONTAINER_XML)
+            zf.writestr("OEBPS/content.opf", CONTENT_OPF)
+            zf.writestr("OEBPS/toc.ncx", TOC_NCX)
+            zf.writestr("OEBPS/text/ch1.xhtml", _xhtml(f"<p>{word} end.</p>"))
+            zf.writestr("OEBPS/text/ch2.xhtml", _xhtml(f"<h1>{word}</h1><p>Start.</p>"))
+        return path
+
+    def test_extract_text(self):
+        """Test plain text and Markdown extraction."""
+        content = _xhtml(
+            "<h2>Title</h2><p>Some <em>very</em>\n  <b>bold</b> text.<script>x()</script></p>"
+            "<ul><li>one</li><li>two</li></ul><blockquote><p>Quoted</p></blockquote>"
+        ).encode()
+        self.assertEqual(
+            extract_text(content),
+            "Title\n\nSome very bold text.\n\none\n\ntwo\n\nQuoted",
+        )
+        self.assertEqual(
+            extract_text(content, markdown=True),
+            "## Title\n\nSome *very* **bold** text.\n\n- one\n\n- two\n\n> Quoted",
+        )
+
+    def test_jsonl_stream_keeps_book_and_spine_order(self):
+        """Test that records are written in order, even with a one-record buffer."""
+        output = io.StringIO()
+        missing = self.test_dir / "missing.epub"
+        exporter = BookExporter("jsonl", max_workers=2, queue_size=1)
+        report = exporter.export_to_stream(self.books + [missing], output)
+
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(
+            [(Path(r["book"]).name, r["index"], r["href"], r["title"]) for r in records],
+            [
+                ("first.epub", 0, "text/ch2.xhtml", "Opening"),
+                ("first.epub", 1, "text/ch1.xhtml", "Closing"),
+                ("second.epub", 0, "text/ch2.xhtml", "Opening"),
+                ("second.epub", 1, "text/ch1.xhtml", "Closing"),
+            ],
+        )
+        self.assertEqual(records[0]["text"], "First\n\nStart.")
+        self.assertEqual((report.books, report.chapters), (2, 4))
+        self.assertEqual([path for path, _ in report.errors], [str(missing)])
+
+    def test_export_to_directory(self):
+        """Test that each book gets its own Markdown file."""
+        output_dir = self.test_dir / "out"
+        report = BookExporter("markdown").export_to_directory(self.books, output_dir)
+        self.assertEqual((report.books, report.chapters), (2, 4))
+        self.assertEqual(
+            (output_dir / "second.md").read_text(encoding="utf-8"),
+            "# Second\n\nStart.\n\nSecond end.\n\n",
+        )
+
+    def test_export_to_directory_same_names(self):
+        """Test that books with the same name in different directories get their own files."""
+        other_dir = self.test_dir / "other"
+        other_dir.mkdir()
+        other = self._write("other/first.epub", "Other")
+        output_dir = self.test_dir / "out"
+        books = [self.books[0], other, self.books[0]]
+        report = BookExporter("markdown", max_workers=2).export_to_directory(books, output_dir)
+        self.assertEqual((report.books, report.chapters), (2, 4))
+        self.assertEqual(sorted(path.name for path in output_dir.iterdir()), ["first-2.md", "first.md"])
+        self.assertIn("# First", (output_dir / "first.md").read_text(encoding="utf-8"))
+        self.assertIn("# Other", (output_dir / "first-2.md").read_text(encoding="utf-8"))
+
+    def test_unknown_format(self):
+        """Test that unknown formats are rejected."""
+        with self.assertRaises(ValueError):
+            BookExporter("pdf")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import zipfile
+import shutil
+from pathlib import Path
+
+from epub_editor_pro.core.book_statistics import StatisticsEngine, count_document
+from epub_editor_pro.core.epub_loader import EpubLoader
+
+
+CONTAINER_XML = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+
+CONTENT_OPF = """<?xml version="1.0"?>
+<package version="2.0" xmlns="http://www.idpf.org/2007/opf" unique-identifier="pub-id">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:title>Test Title</dc:title>
+  </metadata>
+  <manifest>
+    <item id="ch1" href="text/ch1.xhtml" media-type="application/xhtml+xml"/>
+    <item id="ch2" href="text/ch2.xhtml" media-type="application/xhtml+xml"/>
+    <item id="cover" href="images/cover.png" media-type="image/png"/>
+  </manifest>
+  <spine>
+    <itemref idref="ch2"/>
+    <itemref idref="ch1"/>
+  </spine>
+</package>"""
+
+
+def _xhtml(body):
+    return (
+        '<html xmlns="http://www.w3.org/1999/xhtml"><head><title>Head</title>'
+        f'<style>p {{ margin: 0 }}</style></head><body>{body}</body></html>'
+    )
+
+
+class TestBookStatistics(unittest.TestCase):
+
+    def setUp(self):
+        """Create a test EPUB and load it."""
+        self.test_dir = Path("tests/temp_statistics_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        epub_path = self.test_dir / "book.epub"
+        with zipfile.ZipFile(epub_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+            zf.writestr("META-INF/container.xml", CONTAINER_XML)
+            zf.writestr("OEBPS/content.opf", CONTENT_OPF)
+            zf.writestr("OEBPS/text/ch1.xhtml", _xhtml("<p>One <em>small</em> step.</p>"))
+            zf.writestr("OEBPS/text/ch2.xhtml", _xhtml("<p>Don't stop<br/>the the music</p>"))
+            zf.writestr("OEBPS/images/cover.png", b"\x89PNG" + b"\0" * 96)
+        loader = EpubLoader(epub_path)
+        self.book = loader.load()
+        loader.close()
+
+    def tearDown(self):
+        """Close the book and remove the temporary directory."""
+        self.book.content_manager.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_count_document(self):
+        """Test that only body text is counted, ignoring styles and scripts."""
+        chapter = count_document(
+            "a.xhtml", 0, _xhtml("<p>Hello, <b>World</b>!<script>var x;</script> hello</p>").encode()
+        )
+        self.assertEqual(chapter.words, 3)
+        self.assertEqual(chapter.word_counts["hello"], 2)
+        self.assertEqual(chapter.characters, len("Hello,World!hello"))
+        self.assertEqual(chapter.character_counts["l"], 5)
+
+    def test_compute(self):
+        """Test book totals, spine order and image sizes."""
+        statistics = StatisticsEngine(self.book, max_workers=2).compute()
+        self.assertEqual([chapter.href for chapter in statistics.chapters], ["text/ch2.xhtml", "text/ch1.xhtml"])
+        self.assertEqual(statistics.words, 8)
+        self.assertEqual(statistics.most_common_words(1), [("the", 2)])
+        self.assertEqual(statistics.image_count, 1)
+        self.assertEqual(statistics.image_bytes, 100)
+        self.assertGreater(statistics.text_bytes, 0)
+
+    def test_recompute_only_counts_changed_documents(self):
+        """Test that cached chapters are reused until their content changes."""
+        engine = StatisticsEngine(self.book)
+        self.assertIsNone(engine.cached)
+        first = engine.compute()
+        self.assertEqual(sorted(first.recomputed), ["text/ch1.xhtml", "text/ch2.xhtml"])
+        self.assertEqual(engine.compute().recomputed, [])
+
+        self.book.content_manager.update_content("text/ch1.xhtml", _xhtml("<p>Two words</p>").encode())
+        statistics = engine.compute()
+        self.assertEqual(statistics.recomputed, ["text/ch1.xhtml"])
+        self.assertEqual(statistics.words, 7)
+        self.assertIs(engine.cached, statistics)
+
+    def test_cancel(self):
+        """Test that a cancelled computation returns None."""
+        self.assertIsNone(StatisticsEngine(self.book).compute(is_cancelled=lambda: True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import shutil
+import threading
+import unittest
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+from epub_editor_pro.core.content_manager import StaleContentError
+from epub_editor_pro.core.epub_loader import EpubLoader
+from epub_editor_pro.core.normalized_text import text_lines
+from epub_editor_pro.core.settings_model import PerformanceProfile
+
+
+CONTAINER_XML = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+
+CHAPTERS = 12
+
+
+def _xhtml(body):
+    return f'<html xmlns="http://www.w3.org/1999/xhtml"><head><title>t</title></head><body>{body}</body></html>'
+
+
+def _content_opf():
+    items = "".join(
+        f'<item id="c{i}" href="c{i}.xhtml" media-type="application/xhtml+xml"/>' for i in range(CHAPTERS)
+    )
+    refs = "".join(f'<itemref idref="c{i}"/>' for i in range(CHAPTERS))
+    return f"""<?xml version="1.0"?>
+<package version="2.0" xmlns="http://www.idpf.org/2007/opf" unique-identifier="pub-id">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/"><dc:title>Test Title</dc:title></metadata>
+  <manifest>{items}</manifest>
+  <spine>{refs}</spine>
+</package>"""
+
+
+class TestConcurrentContentManager(unittest.TestCase):
+
+    def setUp(self):
+        """Create a test EPUB and load it."""
+        self.test_dir = Path("tests/temp_content_manager_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        self.epub_path = self.test_dir / "book.epub"
+        self.chapters = {
+            f"c{i}.xhtml": _xhtml(f"<p>Chapter {i}.</p>" + "<p>Filler text.</p>" * 200 * (i + 1))
+            for i in range(CHAPTERS)
+        }
+        with zipfile.ZipFile(self.epub_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+            zf.writestr("META-INF/container.xml", CONTAINER_XML)
+            zf.writestr("OEBPS/content.opf", _content_opf())
+            for href, chapter in self.chapters.items():
+                zf.writestr(f"OEBPS/{href}", chapter)
+        self.book = EpubLoader(self.epub_path).load()
+        self.content_manager = self.book.content_manager
+
+    def tearDown(self):
+        """Close the book and remove the temporary directory."""
+        self.content_manager.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_concurrent_reads(self):
+        """Test that threads reading and evicting at once each get the right content."""
+        budget = sum(len(chapter) for chapter in self.chapters.values()) // 3
+        self.content_manager.apply_profile(PerformanceProfile(cache_budget=budget))
+        hrefs = list(self.chapters) * 20
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            texts = list(executor.map(self.content_manager.get_text, hrefs))
+
+        self.assertEqual(texts, [self.chapters[href] for href in hrefs])
+        self.assertLessEqual(self.content_manager.cached_bytes, budget + len(self.chapters["c11.xhtml"]))
+
+    def test_versions(self):
+        """Test that updates bump the version, and stale updates are refused."""
+        self.assertEqual(self.content_manager.get_version("c0.xhtml"), 0)
+        self.assertEqual(self.content_manager.update_text("c0.xhtml", _xhtml("<p>One.</p>")), 1)
+        with self.assertRaises(StaleContentError):
+            self.content_manager.update_text("c0.xhtml", _xhtml("<p>Two.</p>"), expected_version=0)
+        self.assertEqual(self.content_manager.update_text("c0.xhtml", _xhtml("<p>Two.</p>"), expected_version=1), 2)
+        self.assertEqual(self.content_manager.get_text("c0.xhtml"), _xhtml("<p>Two.</p>"))
+        self.assertEqual(self.content_manager.get_version("c1.xhtml"), 0)
+
+    def test_concurrent_updates_are_not_lost(self):
+        """Test that read-modify-write loops checked by version lose no update."""
+        def append_mark():
+            while True:
+                version = self.content_manager.get_version("c0.xhtml")
+                text = self.content_manager.get_text("c0.xhtml")
+                try:
+                    self.content_manager.update_text(
+                        "c0.xhtml", text.replace("</body>", "<b/></body>"), expected_version=version
+                    )
+                    return
+                except StaleContentError:
+                    continue
+
+        threads = [threading.Thread(target=append_mark) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.content_manager.get_text("c0.xhtml").count("<b/>"), 16)
+        self.assertEqual(self.content_manager.get_version("c0.xhtml"), 16)
+
+    def test_stale_parse_is_not_cached(self):
+        """Test that lines parsed from content replaced meanwhile are not kept."""
+        new_text = _xhtml("<p>Replaced.</p>")
+
+        def parse_during_update(text, parser):
+            self.content_manager.update_text("c0.xhtml", new_text)
+            return text_lines(text, parser)
+
+        with patch("epub_editor_pro.core.content_manager.text_lines", side_effect=parse_during_update):
+            stale = self.content_manager.get_text_lines("c0.xhtml")
+        self.assertIn("Chapter 0.", "".join(stale))
+        fresh = "".join(self.content_manager.get_text_lines("c0.xhtml"))
+        self.assertIn("Replaced.", fresh)
+        self.assertNotIn("Chapter 0.", fresh)
+
+    def test_handles_are_reopened_after_close(self):
+        """Test that reads after closing the archive open fresh handles."""
+        self.content_manager.get_content("c0.xhtml", cache=False)
+        self.content_manager.close()
+        self.assertEqual(self.content_manager.get_content("c1.xhtml", cache=False), self.chapters["c1.xhtml"].encode())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import shutil
+import unittest
+import zipfile
+from pathlib import Path
+
+from epub_editor_pro.core.css_analysis import CssAnalyzer, minify_css, parse_stylesheet
+from epub_editor_pro.core.epub_loader import EpubLoader
+from epub_editor_pro.core.epub_saver import EpubSaver
+
+
+CONTAINER_XML = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+
+CONTENT_OPF = """<?xml version="1.0"?>
+<package version="2.0" xmlns="http://www.idpf.org/2007/opf" unique-identifier="pub-id">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:title>Test Title</dc:title>
+  </metadata>
+  <manifest>
+    <item id="ch1" href="ch1.xhtml" media-type="application/xhtml+xml"/>
+    <item id="ch2" href="ch2.xhtml" media-type="application/xhtml+xml"/>
+    <item id="css" href="style.css" media-type="text/css"/>
+  </manifest>
+  <spine>
+    <itemref idref="ch1"/>
+    <itemref idref="ch2"/>
+  </spine>
+</package>"""
+
+STYLESHEET = """@charset "utf-8";
+/* Body text */
+body { margin: 0; font-family: "Times New Roman", serif; }
+p.note, div.sidebar > p { color: red; }
+.unused { display: none; }
+div.chapter p + p { text-indent: 1em; }
+a:hover::after { content: "/* kept */"; }
+[epub|type~="footnote"] { font-size: small; }
+@media screen and (min-width: 40em) {
+  .wide { max-width: 40em; }
+}
+@font-face { font-family: "Body"; src: url("fonts/body.ttf"); }
+"""
+
+
+def _xhtml(body):
+    return f'<html xmlns="http://www.w3.org/1999/xhtml"><head><title>t</title></head><body>{body}</body></html>'
+
+
+class TestCssAnalysis(unittest.TestCase):
+
+    def setUp(self):
+        """Create a test EPUB with one stylesheet and load it."""
+        self.test_dir = Path("tests/temp_css_analysis_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        self.epub_path = self.test_dir / "book.epub"
+        with zipfile.ZipFile(self.epub_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+            zf.writestr("META-INF/container.xml", CONTAINER_XML)
+            zf.writestr("OEBPS/content.opf", CONTENT_OPF)
+            zf.writestr("OEBPS/ch1.xhtml", _xhtml('<p class="note">Note</p><p><a href="ch2.xhtml">Next</a></p>'))
+            zf.writestr("OEBPS/ch2.xhtml", _xhtml('<div class="chapter"><p>One</p><p>Two</p></div>'))
+            zf.writestr("OEBPS/style.css", STYLESHEET)
+        self.book = EpubLoader(self.epub_path).load()
+        self.analyzer = CssAnalyzer(self.book, max_workers=2)
+
+    def tearDown(self):
+        """Close the book and remove the temporary directory."""
+        self.book.content_manager.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_parse_stylesheet(self):
+        """Test that style rules are found, with @media rules, and other at-rules skipped."""
+        rules = parse_stylesheet("style.css", STYLESHEET)
+        self.assertEqual(
+            [rule.selectors for rule in rules],
+            [
+                ("body",), ("p.note", "div.sidebar > p"), (".unused",), ("div.chapter p + p",),
+                ("a:hover::after",), ('[epub|type~="footnote"]',), (".wide",),
+            ],
+        )
+        self.assertEqual(rules[2].line, 5)
+        self.assertIsNotNone(rules[-1].group)
+
+    def test_unused_rules(self):
+        """Test that rules are matched against every document, keeping dynamic and namespaced ones."""
+        report = self.analyzer.analyze()
+        self.assertEqual(report.documents, 2)
+        stylesheet = report.stylesheets[0]
+        self.assertEqual([rule.selectors for rule in stylesheet.unused_rules], [(".unused",), (".wide",)])
+        self.assertEqual([selector for _, selector in stylesheet.unused_selectors], ["div.sidebar > p"])
+
+    def test_results_are_cached_per_document(self):
+        """Test that analyzing again only re-parses edited documents."""
+        self.assertEqual(self.analyzer.analyze().rematched, ["ch1.xhtml", "ch2.xhtml"])
+        self.assertEqual(self.analyzer.analyze().rematched, [])
+        content_manager = self.book.content_manager
+        content_manager.update_text("ch2.xhtml", _xhtml('<div class="unused">Hidden</div>'))
+        report = self.analyzer.analyze()
+        self.assertEqual(report.rematched, ["ch2.xhtml"])
+        unused = [rule.selectors for rule in report.stylesheets[0].unused_rules]
+        self.assertEqual(unused, [("div.chapter p + p",), (".wide",)])
+
+    def test_minify(self):
+        """Test that comments and whitespace go, but strings stay as they are."""
+        self.assertEqual(
+            minify_css('/* x */ a > b ,\n c { content: "/* x */  y" ; color : red ; }\n'),
+            'a>b,c{content:"/* x */  y";color :red}',
+        )
+
+    def test_saver_prunes_and_minifies(self):
+        """Test that saving with stylesheet optimization writes pruned, minified CSS."""
+        self.book.content_manager.update_text(
+            "ch1.xhtml", _xhtml('<p class="note">Note</p><p><a href="ch2.xhtml">On</a></p>')
+        )
+        saver = EpubSaver(self.book, optimize_stylesheets=True)
+        saver.save(backup=False)
+        self.assertEqual(saver.css_report.unused_rules, 2)
+        self.assertGreater(saver.css_report.bytes_saved, 0)
+        with zipfile.ZipFile(self.epub_path) as zf:
+            css = zf.read("OEBPS/style.css").decode("utf-8")
+        self.assertNotIn(".unused", css)
+        self.assertNotIn("@media", css)
+        self.assertIn("p.note{color:red}", css)
+        self.assertIn('a:hover::after{content:"/* kept */"}', css)
+        self.assertIn('@font-face{font-family:"Body";src:url("fonts/body.ttf")}', css)
+
+    def test_prune_keeps_layout(self):
+        """Test that pruning without minifying only removes the unused parts."""
+        report = self.analyzer.analyze()
+        self.analyzer.write_stylesheets(report, minify=False)
+        css = self.book.content_manager.get_text("style.css")
+        self.assertEqual(
+            css,
+            STYLESHEET.replace(".unused { display: none; }\n", "")
+            .replace("p.note, div.sidebar > p {", "p.note {")
+            .replace("@media screen and (min-width: 40em) {\n  .wide { max-width: 40em; }\n}\n", ""),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+import time
+import unittest
+import zipfile
+import shutil
+from pathlib import Path
+from unittest.mock import patch
+
+from lxml import etree
+
+from epub_editor_pro.core.epub_loader import EpubLoader
+from epub_editor_pro.core.epub_packer import EpubPacker, PackError
+from epub_editor_pro.core.metadata_index import DC_NS, OPF_NS
+from epub_editor_pro.core.navigation import XHTML_NS
+
+
+CONTAINER_XML = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+
+CONTENT_OPF = """<?xml version="1.0"?>
+<package version="2.0" xmlns="http://www.idpf.org/2007/opf" unique-identifier="pub-id">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:title>Test Title</dc:title>
+  </metadata>
+  <manifest>
+    <item id="ch1" href="text/ch1.xhtml" media-type="application/xhtml+xml"/>
+    <item id="gone" href="text/gone.xhtml" media-type="application/xhtml+xml"/>
+  </manifest>
+  <spine>
+    <itemref idref="ch1"/>
+    <itemref idref="gone"/>
+  </spine>
+</package>"""
+
+
+def _xhtml(body):
+    return f'<html xmlns="http://www.w3.org/1999/xhtml"><head><title>t</title></head><body>{body}</body></html>'
+
+
+class TestEpubPacker(unittest.TestCase):
+
+    def setUp(self):
+        """Create an unpacked book."""
+        self.test_dir = Path("tests/temp_packer_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.source = self.test_dir / "source"
+        self._write("text/ch1.xhtml", _xhtml("<p>One</p>"))
+        self._write("text/ch2.xhtml", _xhtml("<p>Two</p>"))
+        self._write("images/cover.png", b"\x89PNG" + b"\0" * 64)
+        self._write(".DS_Store", b"junk")
+        self.output = self.test_dir / "book.epub"
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.test_dir)
+
+    def _write(self, name, content):
+        path = self.source / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        path.write_bytes(content)
+
+    def _load(self):
+        loader = EpubLoader(self.output)
+        try:
+            return loader.load()
+        finally:
+            loader.close()
+
+    def test_generates_container_and_package(self):
+        """Test that a bare directory becomes a loadable EPUB."""
+        report = EpubPacker(self.source).pack(self.output)
+        self.assertTrue(report.generated_opf)
+
+        with zipfile.ZipFile(self.output) as zf:
+            first = zf.infolist()[0]
+            self.assertEqual((first.filename, first.compress_type), ("mimetype", zipfile.ZIP_STORED))
+            self.assertNotIn(".DS_Store", zf.namelist())
+            self.assertEqual(zf.getinfo("images/cover.png").compress_type, zipfile.ZIP_STORED)
+        book = self._load()
+        self.assertEqual(
+            sorted(item.href for item in book.manifest.values()),
+            ["images/cover.png", "nav.xhtml", "text/ch1.xhtml", "text/ch2.xhtml"],
+        )
+        self.assertEqual([book.manifest[s.idref].href for s in book.spine], ["text/ch1.xhtml", "text/ch2.xhtml"])
+
+    def test_generated_package_is_valid_epub3(self):
+        """Test that a navigation document is generated and the language is read from the content."""
+        self._write("text/ch1.xhtml", _xhtml("<p>Un</p>").replace("<html ", '<html xml:lang="fr" ').replace(
+            "<title>t</title>", "<title>Premier</title>"
+        ))
+        EpubPacker(self.source).pack(self.output)
+        with zipfile.ZipFile(self.output) as zf:
+            opf = etree.fromstring(zf.read("content.opf"))
+            nav = etree.fromstring(zf.read("nav.xhtml"))
+        self.assertEqual(opf.findtext(f"{{{OPF_NS}}}metadata/{{{DC_NS}}}language"), "fr")
+        nav_item = opf.find(f"{{{OPF_NS}}}manifest/{{{OPF_NS}}}item[@properties='nav']")
+        self.assertEqual(nav_item.get("href"), "nav.xhtml")
+        links = [(a.get("href"), a.text) for a in nav.iter(f"{{{XHTML_NS}}}a")]
+        self.assertEqual(links, [("text/ch1.xhtml", "Premier"), ("text/ch2.xhtml", "t")])
+        book = self._load()
+        self.assertEqual([entry.title for entry in book.navigation.entries], ["Premier", "t"])
+
+    def test_undetermined_language(self):
+        """Test that content declaring no language is marked undetermined."""
+        EpubPacker(self.source).pack(self.output)
+        with zipfile.ZipFile(self.output) as zf:
+            opf = etree.fromstring(zf.read("content.opf"))
+        self.assertEqual(opf.findtext(f"{{{OPF_NS}}}metadata/{{{DC_NS}}}language"), "und")
+
+    def test_updates_existing_manifest(self):
+        """Test that new files are added and missing ones removed, with their spine entries."""
+        self.source = self.test_dir / "source"
+        shutil.move(str(self.source / "text"), str(self.test_dir / "text"))
+        shutil.move(str(self.source / "images"), str(self.test_dir / "images"))
+        (self.source / "OEBPS").mkdir()
+        shutil.move(str(self.test_dir / "text"), str(self.source / "OEBPS" / "text"))
+        shutil.move(str(self.test_dir / "images"), str(self.source / "OEBPS" / "images"))
+        self._write("META-INF/container.xml", CONTAINER_XML)
+        self._write("OEBPS/content.opf", CONTENT_OPF)
+
+        report = EpubPacker(self.source).pack(self.output)
+        self.assertEqual(report.manifest_added, ["OEBPS/images/cover.png", "OEBPS/text/ch2.xhtml"])
+        self.assertEqual(report.manifest_removed, ["OEBPS/text/gone.xhtml"])
+        book = self._load()
+        self.assertEqual(book.metadata.title, "Test Title")
+        self.assertNotIn("gone", book.manifest)
+        self.assertEqual([book.manifest[s.idref].href for s in book.spine], ["text/ch1.xhtml", "text/ch2.xhtml"])
+
+    def test_rebuild_reuses_unchanged_members(self):
+        """Test that only changed files are compressed again."""
+        packer = EpubPacker(self.source, max_workers=2)
+        first = packer.pack(self.output)
+        self.assertEqual(first.reused_members, 0)
+        self.assertTrue(EpubPacker.cache_path(self.output).exists())
+
+        self._write("text/ch2.xhtml", _xhtml("<p>Two, edited at length.</p>"))
+        second = packer.pack(self.output)
+        # The generated package document may change too, with its timestamp.
+        self.assertIn(second.compressed_members, (1, 2))
+        self.assertEqual(second.reused_members + second.compressed_members, first.members - 1)
+        self.assertEqual(packer.pack(self.output).compressed_members, 0)
+        with zipfile.ZipFile(self.output) as zf:
+            self.assertIn(b"edited", zf.read("text/ch2.xhtml"))
+            self.assertIsNone(zf.testzip())
+
+    def test_unchanged_tree_packs_to_same_bytes(self):
+        """Test that packing does not depend on the clock, generated members included."""
+        EpubPacker(self.source, use_cache=False).pack(self.output)
+        later = time.time() + 86400
+        real_localtime = time.localtime
+        with patch("time.time", return_value=later), \
+                patch("time.localtime", side_effect=lambda secs=None: real_localtime(later if secs is None else secs)):
+            again = self.test_dir / "again.epub"
+            EpubPacker(self.source, use_cache=False).pack(again)
+        self.assertEqual(again.read_bytes(), self.output.read_bytes())
+
+    def test_not_a_directory(self):
+        """Test that packing a missing directory fails cleanly."""
+        with self.assertRaises(PackError):
+            EpubPacker(self.test_dir / "missing").pack(self.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import os
+import unittest
+import zipfile
+import shutil
+from pathlib import Path
+
+from epub_editor_pro.core.epub_loader import EpubLoader
+from epub_editor_pro.core.epub_saver import EpubSaver
+
+
+CONTAINER_XML = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+
+CONTENT_OPF = """<?xml version="1.0"?>
+<package version="2.0" xmlns="http://www.idpf.org/2007/opf" unique-identifier="pub-id">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:title>Test Title</dc:title>
+  </metadata>
+  <manifest>
+    <item id="ch1" href="ch1.xhtml" media-type="application/xhtml+xml"/>
+    <item id="ch2" href="ch2.xhtml" media-type="application/xhtml+xml"/>
+    <item id="cover" href="cover.jpg" media-type="image/jpeg"/>
+  </manifest>
+  <spine>
+    <itemref idref="ch1"/>
+    <itemref idref="ch2"/>
+  </spine>
+</package>"""
+
+CHAPTER = "<html><body>" + "<p>Some repetitive chapter text.</p>" * 200 + "</body></html>"
+
+
+class TestEpubSaver(unittest.TestCase):
+
+    def setUp(self):
+        """Create a test EPUB whose image is (wastefully) deflated."""
+        self.test_dir = Path("tests/temp_saver_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        self.epub_path = self.test_dir / "book.epub"
+        self.image = os.urandom(20000)
+
+        with zipfile.ZipFile(self.epub_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+            zf.writestr("META-INF/container.xml", CONTAINER_XML)
+            zf.writestr("OEBPS/content.opf", CONTENT_OPF)
+            zf.writestr("OEBPS/ch1.xhtml", CHAPTER)
+            zf.writestr("OEBPS/ch2.xhtml", CHAPTER, compress_type=zipfile.ZIP_STORED)
+            zf.writestr("OEBPS/cover.jpg", self.image)
+
+        loader = EpubLoader(self.epub_path)
+        self.book = loader.load()
+        loader.close()
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.book.content_manager.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_save_writes_modified_content(self):
+        """Test that a plain save keeps unmodified members and writes changes."""
+        self.book.content_manager.update_content("ch1.xhtml", b"<html><body>changed</body></html>")
+        EpubSaver(self.book).save()
+
+        with zipfile.ZipFile(self.epub_path) as zf:
+            self.assertEqual(zf.namelist()[0], "mimetype")
+            self.assertEqual(zf.read("OEBPS/ch1.xhtml"), b"<html><body>changed</body></html>")
+            self.assertEqual(zf.read("OEBPS/ch2.xhtml"), CHAPTER.encode())
+            self.assertEqual(zf.read("OEBPS/cover.jpg"), self.image)
+            self.assertIsNone(zf.testzip())
+        self.assertTrue((self.test_dir / "book.epub.bak").exists())
+        self.assertFalse(self.book.is_modified)
+
+    def test_modified_members_keep_order_and_compression(self):
+        """Test that concurrently compressed members are written deterministically."""
+        with zipfile.ZipFile(self.epub_path) as zf:
+            original_order = zf.namelist()
+        self.book.content_manager.update_content("ch1.xhtml", b"<p>one</p>" * 100)
+        self.book.content_manager.update_content("ch2.xhtml", b"<p>two</p>" * 100)
+        self.book.content_manager.update_content("new.xhtml", b"<p>new</p>")
+        EpubSaver(self.book, max_workers=4).save()
+
+        with zipfile.ZipFile(self.epub_path) as zf:
+            self.assertEqual(zf.namelist(), original_order + ["OEBPS/new.xhtml"])
+            self.assertEqual(zf.getinfo("OEBPS/ch1.xhtml").compress_type, zipfile.ZIP_DEFLATED)
+            self.assertEqual(zf.getinfo("OEBPS/ch2.xhtml").compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(zf.read("OEBPS/ch2.xhtml"), b"<p>two</p>" * 100)
+            self.assertEqual(zf.read("OEBPS/new.xhtml"), b"<p>new</p>")
+            self.assertIsNone(zf.testzip())
+
+    def test_optimized_save_compresses_by_media_type(self):
+        """Test that media is stored, text deflated, and a report produced."""
+        self.book.content_manager.update_content("ch1.xhtml", b"<html><body>changed</body></html>")
+        saver = EpubSaver(self.book, optimize_assets=True, max_workers=2)
+        saver.save()
+
+        with zipfile.ZipFile(self.epub_path) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(zf.namelist()[0], "mimetype")
+            self.assertEqual(zf.getinfo("mimetype").compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(zf.getinfo("OEBPS/cover.jpg").compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(zf.getinfo("OEBPS/ch2.xhtml").compress_type, zipfile.ZIP_DEFLATED)
+            self.assertEqual(zf.read("OEBPS/cover.jpg"), self.image)
+            self.assertEqual(zf.read("OEBPS/ch1.xhtml"), b"<html><body>changed</body></html>")
+            self.assertEqual(zf.read("OEBPS/ch2.xhtml"), CHAPTER.encode())
+
+        report = saver.report
+        self.assertEqual(report.members, 5)
+        self.assertEqual(report.copied_members, 2)  # container.xml and content.opf
+        self.assertEqual(report.stored_members, 1)
+        self.assertEqual(report.deflate_skipped_bytes, len(self.image))
+        self.assertGreater(report.bytes_saved, 0)
+
+        # The saved book can be loaded again.
+        loader = EpubLoader(self.epub_path)
+        loader.load()
+        loader.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
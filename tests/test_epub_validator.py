@@ -0,0 +1,119 @@
+import unittest
+import zipfile
+import shutil
+from pathlib import Path
+
+from epub_editor_pro.core.epub_loader import EpubLoader
+from epub_editor_pro.core.epub_validator import EpubValidator
+
+
+CONTAINER_XML = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+
+CONTENT_OPF = """<?xml version="1.0"?>
+<package version="2.0" xmlns="http://www.idpf.org/2007/opf" unique-identifier="pub-id">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:title>Test Title</dc:title>
+  </metadata>
+  <manifest>
+    <item id="ch1" href="text/ch1.xhtml" media-type="application/xhtml+xml"/>
+    <item id="ch2" href="text/ch2.xhtml" media-type="application/xhtml+xml"/>
+    <item id="ch3" href="text/ch3.xhtml" media-type="application/xhtml+xml"/>
+  </manifest>
+  <spine>
+    <itemref idref="ch1"/>
+    <itemref idref="ch2"/>
+    <itemref idref="ch3"/>
+  </spine>
+</package>"""
+
+
+def _xhtml(body):
+    return f'<html xmlns="http://www.w3.org/1999/xhtml"><head><title>t</title></head><body>{body}</body></html>'
+
+
+class TestEpubValidator(unittest.TestCase):
+
+    def setUp(self):
+        """Create a test EPUB and load it."""
+        self.test_dir = Path("tests/temp_validator_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        self.epub_path = self.test_dir / "book.epub"
+
+    def tearDown(self):
+        """Close the book and remove the temporary directory."""
+        if getattr(self, "book", None):
+            self.book.content_manager.close()
+        shutil.rmtree(self.test_dir)
+
+    def _load(self, files, opf=CONTENT_OPF):
+        with zipfile.ZipFile(self.epub_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+            zf.writestr("META-INF/container.xml", CONTAINER_XML)
+            zf.writestr("OEBPS/content.opf", opf)
+            for name, content in files.items():
+                zf.writestr(name, content)
+        loader = EpubLoader(self.epub_path)
+        self.book = loader.load()
+        loader.close()
+        return self.book
+
+    def _codes(self, report):
+        return sorted((issue.code, issue.item_href) for issue in report.issues)
+
+    def test_valid_book_has_no_issues(self):
+        """Test that a consistent book validates cleanly."""
+        book = self._load({
+            "OEBPS/text/ch1.xhtml": _xhtml('<p id="a"><a href="ch2.xhtml#b">next</a></p>'),
+            "OEBPS/text/ch2.xhtml": _xhtml('<p id="b"><a href="#b">self</a></p>'),
+            "OEBPS/text/ch3.xhtml": _xhtml('<p><a href="http://example.com/">web</a></p>'),
+        })
+        report = EpubValidator(book).validate()
+        self.assertEqual(report.issues, [])
+        self.assertTrue(report.is_valid)
+
+    def test_structural_and_content_issues(self):
+        """Test that each kind of problem is reported."""
+        opf = CONTENT_OPF.replace('<itemref idref="ch3"/>', '<itemref idref="ch3"/><itemref idref="nope"/>')
+        book = self._load({
+            "OEBPS/text/ch1.xhtml": _xhtml('<p id="a">1</p><p id="a"><a href="ch2.xhtml#zzz">x</a></p>'),
+            "OEBPS/text/ch2.xhtml": _xhtml('<p>unclosed'),
+            "OEBPS/extra.css": "p {}",
+        }, opf=opf)
+        report = EpubValidator(book).validate()
+        self.assertEqual(self._codes(report), [
+            ("broken-anchor", "text/ch1.xhtml"),
+            ("duplicate-id", "text/ch1.xhtml"),
+            ("manifest-missing", "text/ch3.xhtml"),
+            ("not-well-formed", "text/ch2.xhtml"),
+            ("orphaned-entry", None),
+            ("spine-unresolved", None),
+        ])
+
+    def test_revalidation_only_rechecks_changed_documents_and_dependents(self):
+        """Test that cached results are reused for unchanged documents."""
+        book = self._load({
+            "OEBPS/text/ch1.xhtml": _xhtml('<p id="a"><a href="ch2.xhtml#b">next</a></p>'),
+            "OEBPS/text/ch2.xhtml": _xhtml('<p id="b">two</p>'),
+            "OEBPS/text/ch3.xhtml": _xhtml('<p id="c">three</p>'),
+        })
+        validator = EpubValidator(book)
+        first = validator.validate()
+        self.assertEqual(sorted(first.rechecked), ["text/ch1.xhtml", "text/ch2.xhtml", "text/ch3.xhtml"])
+
+        self.assertEqual(validator.validate().rechecked, [])
+
+        book.content_manager.update_content("text/ch2.xhtml", _xhtml('<p id="renamed">two</p>').encode())
+        report = validator.validate()
+        self.assertEqual(report.rechecked, ["text/ch2.xhtml"])
+        self.assertEqual(self._codes(report), [("broken-anchor", "text/ch1.xhtml")])
+
+
+if __name__ == "__main__":
+    unittest.main()
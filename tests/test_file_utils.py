@@ -0,0 +1,80 @@
+import shutil
+import unittest
+import zipfile
+import zlib
+from pathlib import Path
+from unittest.mock import patch
+
+from epub_editor_pro.utils import file_utils
+from epub_editor_pro.utils.file_utils import RawZipWriter, deflate_raw, read_raw_member
+
+
+MEMBERS = {
+    "mimetype": b"application/epub+zip",
+    "OEBPS/ch1.xhtml": b"<p>" + b"Some text. " * 200 + b"</p>",
+    "OEBPS/café.xhtml": b"<p>Accented name.</p>",
+}
+
+
+class TestRawZip(unittest.TestCase):
+
+    def setUp(self):
+        """Create a temporary directory."""
+        self.test_dir = Path("tests/temp_file_utils_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        self.path = self.test_dir / "out.zip"
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.test_dir)
+
+    def _write(self):
+        with RawZipWriter(self.path) as writer:
+            for name, data in MEMBERS.items():
+                zinfo = zipfile.ZipInfo(name, (2024, 5, 17, 12, 30, 10))
+                if name == "mimetype":
+                    writer.write_stored(zinfo, data)
+                    continue
+                zinfo.compress_type = zipfile.ZIP_DEFLATED
+                zinfo.CRC = zlib.crc32(data)
+                zinfo.file_size = len(data)
+                writer.write(zinfo, deflate_raw(data))
+
+    def _check(self):
+        with zipfile.ZipFile(self.path) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(zf.namelist(), list(MEMBERS))
+            self.assertEqual({name: zf.read(name) for name in MEMBERS}, MEMBERS)
+            self.assertEqual(zf.getinfo("mimetype").compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(zf.getinfo("OEBPS/ch1.xhtml").date_time, (2024, 5, 17, 12, 30, 10))
+
+    def test_round_trip(self):
+        """Test that written archives read back with zipfile, and raw payloads copy over."""
+        self._write()
+        self._check()
+        with zipfile.ZipFile(self.path) as zf, open(self.path, "rb") as raw:
+            info = zf.getinfo("OEBPS/ch1.xhtml")
+            payload = read_raw_member(raw, info)
+        self.assertEqual(payload, deflate_raw(MEMBERS["OEBPS/ch1.xhtml"]))
+
+    def test_zip64_records(self):
+        """Test that the ZIP64 extensions are written when sizes or counts need them."""
+        with patch.object(file_utils, "ZIP32_LIMIT", 100), patch.object(file_utils, "ZIP32_MAX_ENTRIES", 2):
+            self._write()
+        self.assertIn(file_utils.ZIP64_END_RECORD_SIGNATURE, self.path.read_bytes())
+        self._check()
+
+    def test_bad_local_header(self):
+        """Test that a member whose header is not where the directory says is rejected."""
+        self._write()
+        with zipfile.ZipFile(self.path) as zf, open(self.path, "rb") as raw:
+            info = zf.getinfo("OEBPS/ch1.xhtml")
+            info.header_offset += 1
+            with self.assertRaises(zipfile.BadZipFile):
+                read_raw_member(raw, info)
+
+
+if __name__ == "__main__":
+    unittest.main()
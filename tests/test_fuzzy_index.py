@@ -0,0 +1,106 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from epub_editor_pro.core import fuzzy_index
+from epub_editor_pro.core.epub_model import EpubBook, ManifestItem, SpineItem
+from epub_editor_pro.core.fuzzy_index import (
+    BookTrigramIndex, TrigramIndex, default_max_distance, document_trigrams, fold_case,
+)
+from epub_editor_pro.core.normalized_text import normalize_document
+from epub_editor_pro.core.search_engine import SearchEngine
+
+
+class TestTrigramIndex(unittest.TestCase):
+
+    def test_approximate_matches(self):
+        """Test that near misses are found with their edit distance."""
+        index = TrigramIndex("We shall receve the reciept tomorow, as Agreed.")
+        matches = list(index.search("receive", 1))
+        self.assertEqual([index.text[m.start:m.end] for m in matches], ["receve"])
+        self.assertEqual(matches[0].distance, 1)
+
+        match, = index.search("tomorrow", 1)
+        self.assertEqual((index.text[match.start:match.end], match.distance), ("tomorow", 1))
+        match, = index.search("AGREED", 0)
+        self.assertEqual(match.distance, 0)
+        self.assertEqual(list(index.search("elephant", 1)), [])
+
+    def test_only_candidates_are_verified(self):
+        """Test that the exact edit distance only runs on index candidates."""
+        index = TrigramIndex("unrelated words " * 50 + "one receve here")
+        with patch.object(
+            fuzzy_index, "_best_substring_match", wraps=fuzzy_index._best_substring_match
+        ) as verify:
+            self.assertEqual(len(list(index.search("receive", 1))), 1)
+        self.assertLessEqual(verify.call_count, 5)
+
+    def test_helpers(self):
+        """Test the default distance and length preserving case folding."""
+        self.assertEqual(default_max_distance("abc"), 1)
+        self.assertEqual(default_max_distance("a" * 13), 2)
+        self.assertEqual(len(fold_case("İstanbul")), len("İstanbul"))
+
+    def test_book_index_candidates(self):
+        """Test that only documents sharing enough trigrams are candidates."""
+        index = BookTrigramIndex()
+        index.add("ch1.xhtml", document_trigrams("We shall receve it."))
+        index.add("ch2.xhtml", document_trigrams("Nothing to see here."))
+        index.add("ch3.xhtml", document_trigrams("The RECEIVER is here."))
+        self.assertEqual(index.candidates("receive", 1), {"ch1.xhtml", "ch3.xhtml"})
+        self.assertEqual(index.candidates("elephant", 1), set())
+
+        index.remove("ch3.xhtml")
+        self.assertNotIn("ch3.xhtml", index)
+        self.assertEqual(index.candidates("receive", 1), {"ch1.xhtml"})
+        self.assertNotIn("eiv", index.postings)
+
+
+class TestFuzzySearch(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a mock book whose content manager builds real indexes."""
+        documents = {
+            "ch1.xhtml": "<html><body><p>The <em>mispelled</em> word.</p></body></html>",
+            "ch2.xhtml": "<html><body><p>Nothing to see.</p></body></html>",
+        }
+        self.mock_book = MagicMock(spec=EpubBook)
+        self.mock_book.manifest = {
+            "ch1": ManifestItem(id="ch1", href="ch1.xhtml", media_type="application/xhtml+xml"),
+            "ch2": ManifestItem(id="ch2", href="ch2.xhtml", media_type="application/xhtml+xml"),
+        }
+        self.mock_book.spine = [SpineItem(idref="ch1"), SpineItem(idref="ch2")]
+        content_manager = MagicMock()
+        content_manager.get_normalized_text.side_effect = lambda href: normalize_document(documents[href])
+        content_manager.get_trigram_index.side_effect = (
+            lambda href: TrigramIndex(content_manager.get_normalized_text(href).text)
+        )
+        book_index = BookTrigramIndex()
+        for href, document in documents.items():
+            book_index.add(href, document_trigrams(normalize_document(document).text))
+        content_manager.get_book_trigram_index.return_value = book_index
+        self.mock_book.content_manager = content_manager
+        self.engine = SearchEngine(self.mock_book)
+
+    def test_search_fuzzy(self):
+        """Test fuzzy results, including through the mode dispatcher."""
+        results = list(self.engine.search_fuzzy("misspelled word"))
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].item_href, "ch1.xhtml")
+        self.assertEqual(results[0].match_text, "mispelled word")
+        self.assertEqual(results[0].context_before, "The ")
+
+        results = list(self.engine.search_in_mode("fuzzy", "MISPELED", True, True, False))
+        self.assertEqual(len(results), 1)
+
+        with self.assertRaises(ValueError):
+            list(self.engine.search_fuzzy("ab"))
+
+    def test_only_candidate_documents_are_loaded(self):
+        """Test that documents the book index rules out are not loaded."""
+        list(self.engine.search_fuzzy("misspelled"))
+        calls = self.mock_book.content_manager.get_normalized_text.call_args_list
+        self.assertEqual({call.args[0] for call in calls}, {"ch1.xhtml"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import zipfile
+import shutil
+from pathlib import Path
+
+from epub_editor_pro.core.library_dedup import FingerprintCache, LibraryScanner, MemberFingerprint
+
+
+class TestLibraryScanner(unittest.TestCase):
+
+    def setUp(self):
+        """Create a small library whose books share a font."""
+        self.test_dir = Path("tests/temp_dedup_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        (self.test_dir / "library" / "nested").mkdir(parents=True)
+        self.font = bytes(range(256)) * 40
+
+        self._make_book(self.test_dir / "library" / "a.epub", {"OEBPS/font.otf": self.font})
+        self._make_book(self.test_dir / "library" / "nested" / "b.epub", {"fonts/same.otf": self.font})
+        self._make_book(self.test_dir / "library" / "c.epub", {"OEBPS/other.css": b"p { margin: 0 }"})
+        self.cache_path = self.test_dir / "cache.json"
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.test_dir)
+
+    def _make_book(self, path, members):
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+            for name, content in members.items():
+                zf.writestr(name, content)
+
+    def test_scan_reports_shared_members(self):
+        """Test that identical members in different books are grouped."""
+        report = LibraryScanner(FingerprintCache(self.cache_path)).scan([self.test_dir / "library"])
+        self.assertEqual(report.books_scanned, 3)
+        self.assertEqual(len(report.groups), 1)
+        group = report.groups[0]
+        self.assertEqual(sorted(m.name for m in group.members), ["OEBPS/font.otf", "fonts/same.otf"])
+        self.assertEqual(group.reclaimable_bytes, group.members[0].compress_size)
+        self.assertEqual(report.reclaimable_bytes, group.reclaimable_bytes)
+        self.assertEqual(report.members_hashed, 0)
+
+    def test_rescan_only_reads_changed_books(self):
+        """Test that the persistent cache makes re-scans incremental."""
+        LibraryScanner(FingerprintCache(self.cache_path)).scan([self.test_dir / "library"])
+
+        report = LibraryScanner(FingerprintCache(self.cache_path)).scan([self.test_dir / "library"])
+        self.assertEqual(report.books_rescanned, 0)
+        self.assertEqual(len(report.groups), 1)
+
+        self._make_book(self.test_dir / "library" / "c.epub", {"x/font.otf": self.font + b"!"})
+        report = LibraryScanner(FingerprintCache(self.cache_path)).scan([self.test_dir / "library"])
+        self.assertEqual(report.books_rescanned, 1)
+
+    def test_crc_collisions_are_resolved_by_hashing(self):
+        """Test that content hashes are only used for CRCs that collide."""
+        fingerprints = [
+            MemberFingerprint("a", "x", crc=1, size=10, compress_size=5),
+            MemberFingerprint("b", "x", crc=1, size=10, compress_size=5),
+            MemberFingerprint("c", "y", crc=1, size=20, compress_size=9),
+            MemberFingerprint("d", "z", crc=2, size=10, compress_size=5),
+            MemberFingerprint("e", "z", crc=2, size=10, compress_size=5),
+        ]
+        hashed = []
+
+        def content_hash(member):
+            hashed.append(member.book)
+            return "same" if member.book in ("a", "c") else member.book
+
+        groups = LibraryScanner().find_duplicates(fingerprints, content_hash)
+        self.assertEqual(sorted(hashed), ["a", "b"])
+        self.assertEqual([[m.book for m in g.members] for g in groups], [["d", "e"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
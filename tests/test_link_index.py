@@ -0,0 +1,174 @@
+import shutil
+import unittest
+import zipfile
+from pathlib import Path
+
+from epub_editor_pro.core.epub_loader import EpubLoader
+from epub_editor_pro.core.epub_saver import EpubSaver
+from epub_editor_pro.core.epub_validator import EpubValidator
+from epub_editor_pro.core.link_index import LinkIndex, RenameError
+
+
+CONTAINER_XML = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+
+CONTENT_OPF = """<?xml version="1.0"?>
+<package version="2.0" xmlns="http://www.idpf.org/2007/opf" unique-identifier="pub-id">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:title>Test Title</dc:title>
+  </metadata>
+  <manifest>
+    <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
+    <item id="ch1" href="text/ch1.xhtml" media-type="application/xhtml+xml"/>
+    <item id="ch2" href="text/ch2.xhtml" media-type="application/xhtml+xml"/>
+    <item id="ch3" href="text/ch3.xhtml" media-type="application/xhtml+xml"/>
+    <item id="css" href="styles/main.css" media-type="text/css"/>
+    <item id="bg" href="images/bg.png" media-type="image/png"/>
+  </manifest>
+  <spine toc="ncx">
+    <itemref idref="ch1"/>
+    <itemref idref="ch2"/>
+    <itemref idref="ch3"/>
+  </spine>
+</package>"""
+
+TOC_NCX = """<?xml version="1.0"?>
+<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">
+  <navMap>
+    <navPoint id="n1"><navLabel><text>One</text></navLabel><content src="text/ch1.xhtml"/></navPoint>
+    <navPoint id="n2"><navLabel><text>Two</text></navLabel><content src="text/ch2.xhtml#intro"/></navPoint>
+  </navMap>
+</ncx>"""
+
+CSS = "body { background: url('../images/bg.png'); }\n"
+
+
+def _xhtml(body):
+    return (
+        '<html xmlns="http://www.w3.org/1999/xhtml"><head><title>t</title>'
+        '<link rel="stylesheet" href="../styles/main.css"/></head>'
+        f'<body>{body}</body></html>'
+    )
+
+
+FILES = {
+    "OEBPS/toc.ncx": TOC_NCX,
+    "OEBPS/text/ch1.xhtml": _xhtml('<p><a href="ch2.xhtml#intro">Next</a> <a id="top" href="#top">Top</a></p>'),
+    "OEBPS/text/ch2.xhtml": _xhtml(
+        '<h1 id="intro">Two</h1><p><a href="#intro">Here</a> <a href="ch1.xhtml">Back</a></p>'
+    ),
+    "OEBPS/text/ch3.xhtml": _xhtml('<p style="background: url(../images/bg.png)">Three</p>'),
+    "OEBPS/styles/main.css": CSS,
+    "OEBPS/images/bg.png": b"\x89PNG",
+}
+
+
+class TestLinkIndex(unittest.TestCase):
+
+    def setUp(self):
+        """Create a test EPUB with cross-references and load it."""
+        self.test_dir = Path("tests/temp_link_index_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        self.epub_path = self.test_dir / "book.epub"
+        with zipfile.ZipFile(self.epub_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+            zf.writestr("META-INF/container.xml", CONTAINER_XML)
+            zf.writestr("OEBPS/content.opf", CONTENT_OPF)
+            for name, content in FILES.items():
+                zf.writestr(name, content)
+        self.book = EpubLoader(self.epub_path).load()
+        self.index = LinkIndex(self.book, max_workers=2)
+
+    def tearDown(self):
+        """Close the book and remove the temporary directory."""
+        self.book.content_manager.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_references_in_both_directions(self):
+        """Test that attribute, CSS and navigation references are indexed by target."""
+        self.index.refresh()
+        self.assertEqual(
+            self.index.referring_documents("text/ch2.xhtml"),
+            ["content.opf", "text/ch1.xhtml", "text/ch2.xhtml", "toc.ncx"],
+        )
+        self.assertEqual(
+            self.index.referring_documents("images/bg.png"),
+            ["content.opf", "styles/main.css", "text/ch3.xhtml"],
+        )
+        self.assertEqual(
+            [(r.source, r.raw) for r in self.index.references_to("text/ch2.xhtml", "intro")],
+            [("text/ch1.xhtml", "ch2.xhtml#intro"), ("text/ch2.xhtml", "#intro"), ("toc.ncx", "text/ch2.xhtml#intro")],
+        )
+        self.assertIn("intro", self.index.ids("text/ch2.xhtml"))
+
+    def test_refresh_only_reads_changed_documents(self):
+        """Test that a second refresh only re-indexes edited documents."""
+        self.assertEqual(len(self.index.refresh()), 6)
+        content_manager = self.book.content_manager
+        content_manager.update_text(
+            "text/ch3.xhtml", content_manager.get_text("text/ch3.xhtml").replace("../images/bg.png", "ch1.xhtml")
+        )
+        self.assertEqual(self.index.refresh(), ["text/ch3.xhtml"])
+        self.assertEqual(self.index.referring_documents("images/bg.png"), ["content.opf", "styles/main.css"])
+        self.assertIn("text/ch3.xhtml", self.index.referring_documents("text/ch1.xhtml"))
+
+    def test_rename_item_updates_only_referring_documents(self):
+        """Test that renaming a chapter rewrites the manifest, TOC and links to it, and saves."""
+        changed = self.index.rename_item("text/ch2.xhtml", "chapters/two.xhtml")
+        # The chapter moved to another directory, so its own links changed too.
+        self.assertEqual(changed, ["chapters/two.xhtml", "content.opf", "text/ch1.xhtml", "toc.ncx"])
+        content_manager = self.book.content_manager
+        self.assertFalse(content_manager.is_item_modified("text/ch3.xhtml"))
+        self.assertIn('href="../chapters/two.xhtml#intro"', content_manager.get_text("text/ch1.xhtml"))
+        self.assertIn('src="chapters/two.xhtml#intro"', content_manager.get_text("toc.ncx"))
+        self.assertIn('href="chapters/two.xhtml"', content_manager.get_text("content.opf"))
+        moved = content_manager.get_text("chapters/two.xhtml")
+        self.assertIn('href="../text/ch1.xhtml"', moved)
+        self.assertIn('href="#intro"', moved)
+        self.assertIn('href="../styles/main.css"', moved)
+        self.assertEqual(self.book.manifest["ch2"].href, "chapters/two.xhtml")
+        self.assertEqual(self.book.navigation.title_for("chapters/two.xhtml", "intro"), "Two")
+
+        EpubSaver(self.book).save(backup=False)
+        with zipfile.ZipFile(self.epub_path) as zf:
+            names = zf.namelist()
+        self.assertIn("OEBPS/chapters/two.xhtml", names)
+        self.assertNotIn("OEBPS/text/ch2.xhtml", names)
+        self.book.content_manager.close()
+        self.book = EpubLoader(self.epub_path).load()
+        report = EpubValidator(self.book).validate()
+        self.assertEqual(report.errors, [])
+
+    def test_rename_anchor(self):
+        """Test that renaming an id rewrites the id and every link to it."""
+        changed = LinkIndex(self.book).rename_anchor("text/ch2.xhtml", "intro", "opening")
+        self.assertEqual(changed, ["text/ch1.xhtml", "text/ch2.xhtml", "toc.ncx"])
+        content_manager = self.book.content_manager
+        self.assertIn('href="ch2.xhtml#opening"', content_manager.get_text("text/ch1.xhtml"))
+        chapter = content_manager.get_text("text/ch2.xhtml")
+        self.assertIn('<h1 id="opening">', chapter)
+        self.assertIn('href="#opening"', chapter)
+        self.assertIn('src="text/ch2.xhtml#opening"', content_manager.get_text("toc.ncx"))
+        self.assertEqual(self.book.navigation.title_for("text/ch2.xhtml", "opening"), "Two")
+
+    def test_rename_errors(self):
+        """Test that invalid renames are refused before anything changes."""
+        with self.assertRaises(RenameError):
+            self.index.rename_item("text/missing.xhtml", "text/new.xhtml")
+        with self.assertRaises(RenameError):
+            self.index.rename_item("text/ch1.xhtml", "text/ch3.xhtml")
+        with self.assertRaises(RenameError):
+            self.index.rename_item("text/ch1.xhtml", "../outside.xhtml")
+        with self.assertRaises(RenameError):
+            self.index.rename_anchor("text/ch2.xhtml", "missing", "other")
+        self.assertFalse(self.book.is_modified)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+from unittest.mock import MagicMock
+
+from epub_editor_pro.core.live_search import LiveSearchSession
+from epub_editor_pro.core.search_engine import SearchEngine
+from epub_editor_pro.core.epub_model import EpubBook, ManifestItem, SpineItem
+from epub_editor_pro.core.normalized_text import text_lines
+
+
+class TestLiveSearchSession(unittest.TestCase):
+    def setUp(self):
+        """Set up a mock EpubBook and a live search session over it."""
+        self.mock_book = MagicMock(spec=EpubBook)
+        self.mock_book.manifest = {
+            "item1": ManifestItem(
+                id="item1", href="page1.xhtml", media_type="application/xhtml+xml"
+            ),
+            "item2": ManifestItem(
+                id="item2", href="page2.xhtml", media_type="application/xhtml+xml"
+            ),
+        }
+        self.mock_book.spine = [SpineItem(idref="item1"), SpineItem(idref="item2")]
+        contents = {
+            "page1.xhtml": b"<html><body><p>The theory of the thermal theme.</p></body></html>",
+            "page2.xhtml": b"<html><body><p>Nothing here.</p><p>Then there.</p></body></html>",
+        }
+        self.mock_content_manager = MagicMock()
+        self.mock_content_manager.get_content.side_effect = lambda href: contents[href]
+        # Documents are decoded through the content manager's text cache.
+        self.mock_content_manager.get_text.side_effect = (
+            lambda href: self.mock_content_manager.get_content(href).decode("utf-8")
+        )
+        self.mock_content_manager.get_encoding.return_value = "utf-8"
+        # Text lines are parsed from the decoded text, as the content manager does.
+        self.mock_content_manager.get_text_lines.side_effect = (
+            lambda href, parser="lxml": text_lines(self.mock_content_manager.get_text(href), parser)
+        )
+        # Sizes come from the archive directory; all documents are small.
+        self.mock_content_manager.get_size.return_value = 0
+        self.mock_book.content_manager = self.mock_content_manager
+
+        self.engine = SearchEngine(self.mock_book)
+        self.session = LiveSearchSession(self.engine)
+
+    def _run(self, query, case_sensitive=False, whole_word=False, regex=False):
+        return list(self.session.run(query, case_sensitive, whole_word, regex))
+
+    def test_extended_query_narrows_without_rescanning(self):
+        """A query extending the previous one is answered from its results."""
+        self.assertEqual(len(self._run("the")), 7)
+        self.mock_content_manager.get_content.reset_mock()
+
+        narrowed = self._run("ther")
+        self.mock_content_manager.get_content.assert_not_called()
+        self.assertEqual([r.match_text for r in narrowed], ["ther", "ther"])
+
+        full = list(self.engine.search("ther", False, False, False))
+        self.assertEqual(
+            [(r.item_href, r.line_number, r.context_before) for r in narrowed],
+            [(r.item_href, r.line_number, r.context_before) for r in full],
+        )
+
+    def test_unrelated_query_rescans(self):
+        """A query that does not contain the previous one searches the book."""
+        self._run("the")
+        self.mock_content_manager.get_content.reset_mock()
+        self.assertEqual(len(self._run("nothing")), 1)
+        self.assertTrue(self.mock_content_manager.get_content.called)
+
+    def test_regex_and_whole_word_are_not_narrowed(self):
+        """Narrowing is only used when it cannot drop matches."""
+        self._run("the", whole_word=True)
+        self.assertFalse(self.session.can_narrow("then", False, False, False))
+        self._run("the")
+        self.assertFalse(self.session.can_narrow("then", False, False, True))
+        self.assertFalse(self.session.can_narrow("then", True, False, False))
+        self.assertTrue(self.session.can_narrow("THEN", False, True, False))
+
+    def test_cancelled_run_is_not_reused(self):
+        """A partially consumed query does not become the narrowing base."""
+        cancelled = iter(self.session.run("the", False, False, False, is_cancelled=lambda: True))
+        self.assertEqual(list(cancelled), [])
+        self.assertIsNone(self.session.results_for("the", False, False, False))
+        self.assertFalse(self.session.can_narrow("then", False, False, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import unittest
+import zipfile
+import shutil
+from pathlib import Path
+
+from epub_editor_pro.core.metadata_index import MetadataCache, MetadataIndexer, read_book_summary
+
+
+CONTAINER_XML = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+
+# The manifest is deliberately broken: only the metadata should be parsed.
+CONTENT_OPF = """<?xml version="1.0"?>
+<package version="2.0" xmlns="http://www.idpf.org/2007/opf" unique-identifier="pub-id">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:title>{title}</dc:title>
+    <dc:creator>First Author</dc:creator>
+    <dc:creator>Second Author</dc:creator>
+    <dc:language>en</dc:language>
+  </metadata>
+  <manifest>
+    <item id="ch1" href="ch1.xhtml"
+</package>"""
+
+
+class TestMetadataIndex(unittest.TestCase):
+
+    def setUp(self):
+        """Create a directory of test EPUBs."""
+        self.test_dir = Path("tests/temp_metadata_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        self.books = [self._make_book(f"book{i}.epub", f"Title {i}") for i in range(3)]
+        self.cache_path = self.test_dir / "metadata.sqlite3"
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.test_dir)
+
+    def _make_book(self, name, title):
+        path = self.test_dir / name
+        with zipfile.ZipFile(path, 'w') as zf:
+            zf.writestr("mimetype", "application/epub+zip")
+            zf.writestr("META-INF/container.xml", CONTAINER_XML)
+            zf.writestr("OEBPS/content.opf", CONTENT_OPF.format(title=title))
+        return path
+
+    def test_read_book_summary_stops_after_metadata(self):
+        """Test that the summary is read without parsing the manifest."""
+        summary = read_book_summary(str(self.books[0]))
+        self.assertIsNone(summary.error)
+        self.assertEqual(summary.title, "Title 0")
+        self.assertEqual(summary.creator, "First Author")
+        self.assertEqual(summary.language, "en")
+
+    def test_invalid_file_is_recorded(self):
+        """Test that unreadable books are cached with an error."""
+        broken = self.test_dir / "broken.epub"
+        broken.write_bytes(b"not a zip")
+        indexer = MetadataIndexer(MetadataCache(self.cache_path))
+        indexer.index([broken])
+        self.assertIsNotNone(indexer.cached(broken).error)
+
+    def test_index_only_reads_changed_books(self):
+        """Test that the cache persists and changed files are refreshed."""
+        batches = []
+        cache = MetadataCache(self.cache_path)
+        self.assertEqual(MetadataIndexer(cache, batch_size=2).index(self.books, on_batch=batches.append), 3)
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        cache.close()
+
+        cache = MetadataCache(self.cache_path)
+        indexer = MetadataIndexer(cache)
+        self.assertEqual(indexer.index(self.books), 0)
+        self.assertEqual(indexer.cached(self.books[2]).title, "Title 2")
+
+        self._make_book("book1.epub", "Renamed")
+        stat = os.stat(self.books[1])
+        os.utime(self.books[1], (stat.st_atime, stat.st_mtime + 10))
+        self.assertEqual(indexer.index(self.books), 1)
+        self.assertEqual(indexer.cached(self.books[1]).title, "Renamed")
+        cache.close()
+
+    def test_closed_cache_is_inert(self):
+        """Test that indexing still finishing after the cache is closed does not fail."""
+        cache = MetadataCache(self.cache_path)
+        cache.close()
+        indexer = MetadataIndexer(cache)
+        self.assertEqual(indexer.index(self.books), 3)
+        self.assertEqual(indexer.cached(self.books[0]).title, "Title 0")
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import unittest
+import zipfile
+import shutil
+from pathlib import Path
+
+from epub_editor_pro.core.epub_loader import EpubLoader
+from epub_editor_pro.core.navigation import parse_nav_document
+
+
+CONTAINER_XML = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+
+CONTENT_OPF = """<?xml version="1.0"?>
+<package version="3.0" xmlns="http://www.idpf.org/2007/opf" unique-identifier="pub-id">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:title>Test Title</dc:title>
+  </metadata>
+  <manifest>
+    {nav_item}
+    <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
+    <item id="ch1" href="text/ch1.xhtml" media-type="application/xhtml+xml"/>
+    <item id="ch1b" href="text/ch1b.xhtml" media-type="application/xhtml+xml"/>
+    <item id="ch2" href="text/ch2.xhtml" media-type="application/xhtml+xml"/>
+  </manifest>
+  <spine toc="ncx">
+    <itemref idref="ch1"/>
+    <itemref idref="ch1b"/>
+    <itemref idref="ch2"/>
+  </spine>
+</package>"""
+
+NAV_XHTML = """<?xml version="1.0" encoding="utf-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+<body>
+  <nav epub:type="landmarks"><ol><li><a href="text/ch2.xhtml">Landmark</a></li></ol></nav>
+  <nav epub:type="toc">
+    <ol>
+      <li><a href="text/ch1.xhtml">Chapter  One</a>
+        <ol><li><a href="text/ch1.xhtml#s1">Section 1.1</a></li></ol>
+      </li>
+      <li><a href="text/ch2.xhtml">Chapter Two</a></li>
+    </ol>
+  </nav>
+</body>
+</html>"""
+
+TOC_NCX = """<?xml version="1.0" encoding="utf-8"?>
+<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">
+  <navMap>
+    <navPoint id="p1" playOrder="1">
+      <navLabel><text>NCX One</text></navLabel>
+      <content src="text/ch1.xhtml"/>
+      <navPoint id="p2" playOrder="2">
+        <navLabel><text>NCX Section</text></navLabel>
+        <content src="text/ch1.xhtml#s1"/>
+      </navPoint>
+    </navPoint>
+    <navPoint id="p3" playOrder="3">
+      <navLabel><text>NCX Two</text></navLabel>
+      <content src="text/ch2.xhtml"/>
+    </navPoint>
+  </navMap>
+</ncx>"""
+
+
+class TestNavigation(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a temporary directory."""
+        self.test_dir = Path("tests/temp_navigation_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.test_dir)
+
+    def _load(self, with_nav):
+        path = self.test_dir / "book.epub"
+        nav_item = '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>'
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+            zf.writestr("META-INF/container.xml", CONTAINER_XML)
+            zf.writestr("OEBPS/content.opf", CONTENT_OPF.format(nav_item=nav_item if with_nav else ""))
+            zf.writestr("OEBPS/nav.xhtml", NAV_XHTML)
+            zf.writestr("OEBPS/toc.ncx", TOC_NCX)
+        loader = EpubLoader(path)
+        book = loader.load()
+        loader.close()
+        return book
+
+    def test_nav_document_is_preferred(self):
+        """Test that the EPUB 3 toc nav is parsed, ignoring other navs."""
+        book = self._load(with_nav=True)
+        self.assertEqual([entry.title for entry in book.toc], ["Chapter One", "Chapter Two"])
+        self.assertEqual(book.toc[0].href, "text/ch1.xhtml")
+        self.assertEqual(len(book.navigation), 3)
+
+    def test_ncx_fallback(self):
+        """Test that the NCX is used when there is no navigation document."""
+        book = self._load(with_nav=False)
+        self.assertEqual([entry.title for entry in book.toc], ["NCX One", "NCX Two"])
+        self.assertEqual(book.toc[0].children[0].title, "NCX Section")
+        self.assertEqual(book.toc[0].children[0].fragment, "s1")
+
+    def test_children_are_loaded_lazily(self):
+        """Test that nested entries are only read when accessed."""
+        book = self._load(with_nav=True)
+        self.assertIsNone(book.toc[0]._children)
+        self.assertEqual([child.title for child in book.toc[0].children], ["Section 1.1"])
+        self.assertEqual(book.toc[0].children[0].level, 1)
+
+    def test_title_lookup(self):
+        """Test resolving documents and anchors to chapter titles."""
+        book = self._load(with_nav=True)
+        navigation = book.navigation
+        self.assertEqual(navigation.title_for("text/ch1.xhtml"), "Chapter One")
+        self.assertEqual(navigation.title_for("text/ch1.xhtml", "s1"), "Section 1.1")
+        self.assertEqual(navigation.title_for("text/ch1.xhtml", "unknown"), "Chapter One")
+        # A document without an entry belongs to the preceding chapter.
+        self.assertEqual(navigation.title_for("text/ch1b.xhtml"), "Chapter One")
+        self.assertEqual(navigation.title_for("text/ch2.xhtml"), "Chapter Two")
+        self.assertIsNone(navigation.title_for("nav.xhtml"))
+
+    def test_lookups_load_only_covering_subtrees(self):
+        """Test that a lookup loads only the subtrees that can hold the document."""
+        book = self._load(with_nav=True)
+        navigation = book.navigation
+        self.assertEqual(navigation.title_for("text/ch2.xhtml"), "Chapter Two")
+        self.assertIsNone(book.toc[0]._children)
+        self.assertEqual(navigation.title_for("text/ch1.xhtml", "s1"), "Section 1.1")
+        self.assertIsNotNone(book.toc[0]._children)
+        self.assertIsNone(book.toc[1]._children)
+
+    def test_nav_without_toc(self):
+        """Test that an untyped nav stands for the TOC, but landmarks never do."""
+        landmarks_only = NAV_XHTML.replace('<nav epub:type="toc">', '<nav epub:type="page-list">').encode()
+        self.assertEqual(parse_nav_document(landmarks_only, "nav.xhtml", {}), [])
+        untyped = NAV_XHTML.replace('<nav epub:type="toc">', '<nav>').encode()
+        entries = parse_nav_document(untyped, "nav.xhtml", {})
+        self.assertEqual([entry.title for entry in entries], ["Chapter One", "Chapter Two"])
+
+
+if __name__ == "__main__":
+    unittest.main()
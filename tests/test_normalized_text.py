@@ -0,0 +1,84 @@
+import unittest
+from unittest.mock import MagicMock
+
+from epub_editor_pro.core.epub_model import EpubBook, ManifestItem, SpineItem
+from epub_editor_pro.core.normalized_text import normalize_document, normalize_query
+from epub_editor_pro.core.search_engine import SearchEngine
+from epub_editor_pro.core.search_scope import SearchScope
+
+DOCUMENT = (
+    "<html><head><style>p { color: red }</style></head><body>"
+    "<p>The  quick <em>bro</em>wn\n  fo\u00adx</p>"
+    "<p>jumps over a ﬁne dog.</p><p class=\"note\">A quick <b>brown</b> note.</p>"
+    "</body></html>"
+)
+
+
+class TestNormalizedText(unittest.TestCase):
+
+    def test_normalization(self):
+        """Test whitespace, soft hyphen, ligature and block handling."""
+        normalized = normalize_document(DOCUMENT)
+        self.assertEqual(
+            normalized.text,
+            "The quick brown fox jumps over a fine dog. A quick brown note.",
+        )
+        self.assertEqual(normalize_query(" ﬁne\n  do\u00adg "), "fine dog")
+
+    def test_source_spans(self):
+        """Test that normalized ranges map back to exact text node offsets."""
+        normalized = normalize_document(DOCUMENT)
+        start = normalized.text.index("brown fox")
+        spans = normalized.source_spans(start, start + len("brown fox"))
+        self.assertEqual([span.node.parent.name for span in spans], ["em", "p"])
+        self.assertEqual(str(spans[0].node)[spans[0].start:spans[0].end], "bro")
+        self.assertEqual(str(spans[1].node)[spans[1].start:spans[1].end], "wn\n  fo\u00adx")
+
+        start = normalized.text.index("fine")
+        span, = normalized.source_spans(start, start + 4)
+        self.assertEqual(str(span.node)[span.start:span.end], "ﬁne")
+
+
+class TestPhraseSearch(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a mock book whose content manager builds real normalized text."""
+        self.mock_book = MagicMock(spec=EpubBook)
+        self.mock_book.manifest = {
+            "ch1": ManifestItem(id="ch1", href="ch1.xhtml", media_type="application/xhtml+xml"),
+        }
+        self.mock_book.spine = [SpineItem(idref="ch1")]
+        self.mock_content_manager = MagicMock()
+        self.mock_content_manager.get_text.return_value = DOCUMENT
+        self.mock_content_manager.get_size.return_value = 0
+        self.mock_content_manager.get_normalized_text.side_effect = (
+            lambda href: normalize_document(self.mock_content_manager.get_text(href))
+        )
+        self.mock_book.content_manager = self.mock_content_manager
+        self.engine = SearchEngine(self.mock_book)
+
+    def test_phrases_are_found_across_elements(self):
+        """Test that split phrases are found where the line search misses them."""
+        self.assertEqual(list(self.engine.search("brown fox", False, False, False)), [])
+        results = list(self.engine.search_phrase("brown  fox", False, False, False))
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].match_text, "brown fox")
+        self.assertEqual(results[0].line_number, 1)
+        self.assertEqual(results[0].context_after, " jumps over a fine dog. A quick brown no")
+
+        self.assertEqual(len(list(self.engine.search_phrase("a ﬁne dog", False, True, False))), 1)
+        self.assertEqual(len(list(self.engine.search_phrase(r"fo\w jumps", False, False, True))), 1)
+
+    def test_phrase_search_line_numbers_and_scope(self):
+        """Test line numbers and node scoping of phrase results."""
+        results = list(self.engine.search_phrase("quick brown", False, False, False))
+        self.assertEqual([r.line_number for r in results], [1, 2])
+        scoped = list(self.engine.search_phrase(
+            "quick brown", False, False, False, scope=SearchScope(selector="p.note")
+        ))
+        self.assertEqual(len(scoped), 1)
+        self.assertEqual(scoped[0].context_after, " note.")
+
+
+if __name__ == "__main__":
+    unittest.main()
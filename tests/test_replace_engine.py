@@ -1,8 +1,10 @@
+import threading
 import unittest
 from unittest.mock import MagicMock
 
 from epub_editor_pro.core.replace_engine import ReplaceEngine
 from epub_editor_pro.core.epub_model import EpubBook, ManifestItem
+from epub_editor_pro.core.normalized_text import text_lines
 
 
 class TestReplaceEngine(unittest.TestCase):
@@ -21,6 +23,17 @@ class TestReplaceEngine(unittest.TestCase):
 
         # This will be called by the engine to get the content
         self.mock_content_manager.get_content.return_value = self.initial_content
+        # Documents are decoded through the content manager's text cache.
+        self.mock_content_manager.get_text.side_effect = (
+            lambda href: self.mock_content_manager.get_content(href).decode("utf-8")
+        )
+        self.mock_content_manager.get_encoding.return_value = "utf-8"
+        # Text lines are parsed from the decoded text, as the content manager does.
+        self.mock_content_manager.get_text_lines.side_effect = (
+            lambda href, parser="lxml": text_lines(self.mock_content_manager.get_text(href), parser)
+        )
+        # Sizes come from the archive directory; all documents are small.
+        self.mock_content_manager.get_size.return_value = 0
 
         self.replace_engine = ReplaceEngine(self.mock_book)
 
@@ -80,6 +93,68 @@ class TestReplaceEngine(unittest.TestCase):
         final_content = content_store['content/page1.xhtml']
         self.assertIn(b'a sample to sample substitution', final_content)
 
+    def test_preview_does_not_modify_content(self):
+        """Test that a preview reports counts and snippets without mutating."""
+        preview = self.replace_engine.preview_all(
+            find='test',
+            replace='sample',
+            case_sensitive=False,
+            whole_word=True,
+            regex=False
+        )
+        self.mock_content_manager.update_content.assert_not_called()
+        self.assertEqual(preview.total, 2)
+        self.assertEqual(len(preview.files), 1)
+
+        file_preview = preview.files[0]
+        self.assertEqual(file_preview.item_href, 'content/page1.xhtml')
+        self.assertEqual(len(file_preview.snippets), 2)
+        self.assertIn('a test to test', file_preview.snippets[0].before)
+        self.assertIn('a sample to test', file_preview.snippets[0].after)
+
+    def test_preview_reads_files_in_workers(self):
+        """Test that files are read by the preview's worker threads, not the caller."""
+        readers = []
+        decode = self.mock_content_manager.get_text.side_effect
+
+        def get_text(href):
+            readers.append(threading.current_thread())
+            return decode(href)
+
+        self.mock_content_manager.get_text.side_effect = get_text
+        preview = self.replace_engine.start_preview('test', 'sample', False, True, False)
+        self.assertEqual(len(list(self.replace_engine.iter_preview(preview, max_workers=2))), 1)
+        self.assertEqual(len(readers), 1)
+        self.assertIsNot(readers[0], threading.current_thread())
+
+    def test_apply_preview_reuses_computed_content(self):
+        """Test that applying a preview stores the precomputed documents."""
+        preview = self.replace_engine.preview_all('test', 'sample', False, True, False)
+        self.mock_content_manager.get_content.reset_mock()
+
+        replacements = self.replace_engine.apply_preview(preview)
+
+        self.assertEqual(replacements, 2)
+        self.mock_content_manager.update_content.assert_called_once_with(
+            'content/page1.xhtml', preview.files[0].new_content
+        )
+
+    def test_apply_preview_recomputes_stale_files(self):
+        """Test that a file edited after the preview is replaced afresh."""
+        content_store = {'content/page1.xhtml': self.initial_content}
+        self.mock_content_manager.get_content.side_effect = lambda href: content_store[href]
+        self.mock_content_manager.update_content.side_effect = (
+            lambda href, new_content: content_store.__setitem__(href, new_content)
+        )
+
+        preview = self.replace_engine.preview_all('test', 'sample', False, True, False)
+        content_store['content/page1.xhtml'] = b'<html><body><p>One more test.</p></body></html>'
+
+        replacements = self.replace_engine.apply_preview(preview)
+
+        self.assertEqual(replacements, 1)
+        self.assertIn(b'One more sample.', content_store['content/page1.xhtml'])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -2,7 +2,8 @@ import unittest
 from unittest.mock import MagicMock
 
 from epub_editor_pro.core.search_engine import SearchEngine
-from epub_editor_pro.core.epub_model import EpubBook, ManifestItem
+from epub_editor_pro.core.epub_model import EpubBook, ManifestItem, SpineItem
+from epub_editor_pro.core.normalized_text import text_lines
 
 
 class TestSearchEngine(unittest.TestCase):
@@ -24,6 +25,7 @@ class TestSearchEngine(unittest.TestCase):
                 id="item3", href="styles/style.css", media_type="text/css"
             ),
         }
+        self.mock_book.spine = [SpineItem(idref="item1"), SpineItem(idref="item2")]
 
         self.mock_content_manager = MagicMock()
         self.mock_book.content_manager = self.mock_content_manager
@@ -44,6 +46,17 @@ class TestSearchEngine(unittest.TestCase):
             return b""
 
         self.mock_content_manager.get_content.side_effect = get_content_side_effect
+        # Documents are decoded through the content manager's text cache.
+        self.mock_content_manager.get_text.side_effect = (
+            lambda href: self.mock_content_manager.get_content(href).decode("utf-8")
+        )
+        self.mock_content_manager.get_encoding.return_value = "utf-8"
+        # Text lines are parsed from the decoded text, as the content manager does.
+        self.mock_content_manager.get_text_lines.side_effect = (
+            lambda href, parser="lxml": text_lines(self.mock_content_manager.get_text(href), parser)
+        )
+        # Sizes come from the archive directory; all documents are small.
+        self.mock_content_manager.get_size.return_value = 0
 
         self.search_engine = SearchEngine(self.mock_book)
 
@@ -113,6 +126,44 @@ class TestSearchEngine(unittest.TestCase):
         )
         self.assertEqual(len(results), 0)
 
+    def _schedule_hrefs(self, position=None):
+        return [item.href for item in self.search_engine._schedule(position)]
+
+    def test_documents_are_searched_in_spine_order(self):
+        """Test that the spine order, not the manifest order, is used."""
+        self.mock_book.spine = [SpineItem(idref="item2"), SpineItem(idref="item1")]
+        self.assertEqual(
+            self._schedule_hrefs(), ["content/page2.xhtml", "content/page1.xhtml"]
+        )
+
+    def test_schedule_prioritizes_position_and_defers_non_linear(self):
+        """Test that documents near the position come first and non-linear ones last."""
+        self.mock_book.manifest = {
+            f"c{i}": ManifestItem(id=f"c{i}", href=f"c{i}.xhtml", media_type="application/xhtml+xml")
+            for i in range(6)
+        }
+        self.mock_book.spine = [
+            SpineItem(idref="c0"),
+            SpineItem(idref="c1", linear=False),
+            SpineItem(idref="c2"),
+            SpineItem(idref="c3"),
+            SpineItem(idref="c4"),
+        ]
+        self.assertEqual(
+            self._schedule_hrefs(position=3),
+            ["c3.xhtml", "c4.xhtml", "c2.xhtml", "c0.xhtml", "c1.xhtml", "c5.xhtml"],
+        )
+        self.assertEqual(self.search_engine.spine_position("c3.xhtml"), 3)
+        self.assertIsNone(self.search_engine.spine_position("c5.xhtml"))
+
+    def test_stopping_early_skips_remaining_documents(self):
+        """Test that only the documents needed for the first result are loaded."""
+        results = self.search_engine.search(
+            query="page", case_sensitive=False, whole_word=True, regex=False
+        )
+        next(results)
+        self.mock_content_manager.get_content.assert_called_once_with("content/page1.xhtml")
+
 
 if __name__ == "__main__":
     unittest.main()
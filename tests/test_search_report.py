@@ -0,0 +1,136 @@
+import csv
+import io
+import json
+import shutil
+import unittest
+import zipfile
+from pathlib import Path
+
+from epub_editor_pro.core.search_models import SearchResult
+from epub_editor_pro.core.search_report import SearchReportWriter, report_format_for
+from epub_editor_pro.epub_cli import main
+
+
+CONTAINER_XML = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+
+CONTENT_OPF = """<?xml version="1.0"?>
+<package version="2.0" xmlns="http://www.idpf.org/2007/opf" unique-identifier="pub-id">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:title>Test Title</dc:title>
+  </metadata>
+  <manifest>
+    <item id="ch1" href="ch1.xhtml" media-type="application/xhtml+xml"/>
+  </manifest>
+  <spine>
+    <itemref idref="ch1"/>
+  </spine>
+</package>"""
+
+CHAPTER = """<html xmlns="http://www.w3.org/1999/xhtml"><head><title>t</title></head>
+<body><p>The whale &amp; the sea.</p>
+<p>Another whale.</p></body></html>"""
+
+
+def _result(match="whale", before="The <big> ", after=", \"here\""):
+    return SearchResult("ch1.xhtml", 3, match, before, after, "ch1.xhtml")
+
+
+class TestSearchReport(unittest.TestCase):
+
+    def test_csv(self):
+        """Test that CSV rows round-trip, with a header."""
+        output = io.StringIO()
+        with SearchReportWriter(output, "csv") as writer:
+            writer.write(_result(), "book.epub", "Chapter 1")
+        rows = list(csv.reader(io.StringIO(output.getvalue())))
+        self.assertEqual(rows[0], ["book", "href", "chapter", "line", "match", "before", "after"])
+        self.assertEqual(rows[1], ["book.epub", "ch1.xhtml", "Chapter 1", "3", "whale", "The <big> ", ', "here"'])
+
+    def test_jsonl(self):
+        """Test that each result is one JSON record."""
+        output = io.StringIO()
+        with SearchReportWriter(output, "jsonl") as writer:
+            writer.write(_result(), "book.epub")
+            writer.write(_result("sea"), "book.epub")
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([record["match"] for record in records], ["whale", "sea"])
+        self.assertIsNone(records[0]["chapter"])
+
+    def test_html_is_escaped(self):
+        """Test that the HTML report escapes text and highlights matches."""
+        output = io.StringIO()
+        with SearchReportWriter(output, "html", title="Results <1>") as writer:
+            writer.write(_result(), "book.epub")
+        report = output.getvalue()
+        self.assertIn("<title>Results &lt;1&gt;</title>", report)
+        self.assertIn("The &lt;big&gt; <mark>whale</mark>, &quot;here&quot;", report)
+        self.assertTrue(report.endswith("<p>1 results.</p>\n</body>\n</html>\n"))
+
+    def test_results_are_written_as_they_come(self):
+        """Test that nothing is buffered: each result is written before the next is produced."""
+        output = io.StringIO()
+        writer = SearchReportWriter(output, "jsonl")
+        sizes = []
+
+        def results():
+            for _ in range(3):
+                sizes.append(len(output.getvalue()))
+                yield _result()
+
+        book = type("Book", (), {"navigation": None})()
+        self.assertEqual(writer.write_book(book, results(), "book.epub"), 3)
+        self.assertEqual(sizes[0], 0)
+        self.assertTrue(sizes[0] < sizes[1] < sizes[2])
+
+    def test_format_from_extension(self):
+        """Test that the format follows the report's extension."""
+        self.assertEqual(report_format_for(Path("hits.HTM")), "html")
+        self.assertEqual(report_format_for(Path("hits.jsonl")), "jsonl")
+        self.assertIsNone(report_format_for(Path("hits.txt")))
+        with self.assertRaises(ValueError):
+            SearchReportWriter(io.StringIO(), "xml")
+
+
+class TestSearchCommand(unittest.TestCase):
+
+    def setUp(self):
+        """Create a test EPUB."""
+        self.test_dir = Path("tests/temp_search_report_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        self.epub_path = self.test_dir / "book.epub"
+        with zipfile.ZipFile(self.epub_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+            zf.writestr("META-INF/container.xml", CONTAINER_XML)
+            zf.writestr("OEBPS/content.opf", CONTENT_OPF)
+            zf.writestr("OEBPS/ch1.xhtml", CHAPTER)
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.test_dir)
+
+    def test_search_report(self):
+        """Test that `search --report` writes every book's results in the report's format."""
+        report = self.test_dir / "hits.jsonl"
+        books = [str(self.epub_path), str(self.epub_path)]
+        self.assertEqual(main(["search", "whale", *books, "--report", str(report)]), 0)
+        records = [json.loads(line) for line in report.read_text(encoding="utf-8").splitlines()]
+        self.assertEqual(len(records), 4)
+        self.assertEqual(records[0]["book"], str(self.epub_path))
+        self.assertEqual(records[0]["before"], "The ")
+        self.assertEqual(records[0]["after"], " & the sea.")
+
+    def test_invalid_query(self):
+        """Test that an invalid regex fails the command."""
+        report = self.test_dir / "hits.csv"
+        self.assertEqual(main(["search", "(", str(self.epub_path), "--regex", "--report", str(report)]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
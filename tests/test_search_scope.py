@@ -0,0 +1,104 @@
+import unittest
+from unittest.mock import MagicMock
+
+from epub_editor_pro.core.epub_model import EpubBook, ManifestItem, SpineItem
+from epub_editor_pro.core.normalized_text import text_lines
+from epub_editor_pro.core.replace_engine import ReplaceEngine
+from epub_editor_pro.core.search_engine import SearchEngine
+from epub_editor_pro.core.search_scope import SearchScope
+
+
+def _chapter(number):
+    return (
+        f'<html><body><p>Chapter {number} mentions a cat.</p>'
+        f'<p class="footnote">Note {number}: the <em>cat</em> is real.</p></body></html>'
+    ).encode()
+
+
+class TestSearchScope(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a mock book with four chapters and a non-spine document."""
+        self.mock_book = MagicMock(spec=EpubBook)
+        self.mock_book.manifest = {
+            f"ch{i}": ManifestItem(id=f"ch{i}", href=f"text/ch{i}.xhtml", media_type="application/xhtml+xml")
+            for i in range(4)
+        }
+        self.mock_book.manifest["extra"] = ManifestItem(
+            id="extra", href="extra.xhtml", media_type="application/xhtml+xml"
+        )
+        self.mock_book.spine = [SpineItem(idref=f"ch{i}") for i in range(4)]
+
+        self.content_store = {item.href: _chapter(i) for i, item in enumerate(self.mock_book.manifest.values())}
+        self.mock_content_manager = MagicMock()
+        self.mock_content_manager.get_content.side_effect = lambda href: self.content_store[href]
+        self.mock_content_manager.update_content.side_effect = (
+            lambda href, content: self.content_store.__setitem__(href, content)
+        )
+        self.mock_content_manager.get_text.side_effect = (
+            lambda href: self.mock_content_manager.get_content(href).decode("utf-8")
+        )
+        self.mock_content_manager.get_encoding.return_value = "utf-8"
+        # Text lines are parsed from the decoded text, as the content manager does.
+        self.mock_content_manager.get_text_lines.side_effect = (
+            lambda href, parser="lxml": text_lines(self.mock_content_manager.get_text(href), parser)
+        )
+        # Sizes come from the archive directory; all documents are small.
+        self.mock_content_manager.get_size.return_value = 0
+        self.mock_book.content_manager = self.mock_content_manager
+
+    def _search(self, scope):
+        return list(SearchEngine(self.mock_book).search("cat", False, True, False, scope=scope))
+
+    def _loaded(self):
+        return {call.args[0] for call in self.mock_content_manager.get_content.call_args_list}
+
+    def test_document_filters_skip_loading(self):
+        """Test that out-of-scope documents are never loaded."""
+        results = self._search(SearchScope(spine_start=1, spine_end=2))
+        self.assertEqual({r.item_href for r in results}, {"text/ch1.xhtml", "text/ch2.xhtml"})
+        self.assertEqual(self._loaded(), {"text/ch1.xhtml", "text/ch2.xhtml"})
+
+        self.mock_content_manager.get_content.reset_mock()
+        results = self._search(SearchScope(href_glob="extra*"))
+        self.assertEqual({r.item_href for r in results}, {"extra.xhtml"})
+        self.assertEqual(self._loaded(), {"extra.xhtml"})
+
+    def test_node_filters(self):
+        """Test that selectors and element names restrict matches."""
+        unscoped = self._search(None)
+        footnotes = self._search(SearchScope(selector="p.footnote"))
+        emphasis = self._search(SearchScope(elements=("em",)))
+        self.assertEqual(len(unscoped), 10)
+        self.assertEqual(len(footnotes), 5)
+        self.assertEqual(len(emphasis), 5)
+        # Scoped results keep the line and context of an unscoped search.
+        self.assertEqual(footnotes[0].line_number, unscoped[1].line_number)
+        self.assertEqual(footnotes[0].context_before, unscoped[1].context_before)
+
+    def test_scoped_replace_all(self):
+        """Test that replace-all honours document and node scopes."""
+        engine = ReplaceEngine(self.mock_book)
+        count = engine.replace_all(
+            "cat", "dog", False, True, False,
+            scope=SearchScope(spine_end=1, selector="p.footnote"),
+        )
+        self.assertEqual(count, 2)
+        self.assertEqual(self._loaded(), {"text/ch0.xhtml", "text/ch1.xhtml"})
+        ch0 = self.content_store["text/ch0.xhtml"]
+        self.assertIn(b"mentions a cat", ch0)
+        self.assertIn(b"dog", ch0)
+        self.assertNotIn(b"dog", self.content_store["text/ch2.xhtml"])
+
+    def test_invalid_scope(self):
+        """Test that invalid selectors and ranges raise ValueError."""
+        with self.assertRaises(ValueError):
+            self._search(SearchScope(selector="p["))
+        with self.assertRaises(ValueError):
+            ReplaceEngine(self.mock_book).replace_all(
+                "cat", "dog", False, False, False, scope=SearchScope(spine_start=3, spine_end=1)
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,12 @@
 import json
+import shutil
 import unittest
+import zipfile
 from pathlib import Path
 from unittest.mock import patch, mock_open
 
-from epub_editor_pro.core.settings_model import Settings, SettingsManager
+from epub_editor_pro.core.epub_loader import EpubLoader
+from epub_editor_pro.core.settings_model import PROFILE_PRESETS, PerformanceProfile, Settings, SettingsManager
 
 
 class TestSettingsModel(unittest.TestCase):
@@ -92,5 +95,147 @@ class TestSettingsModel(unittest.TestCase):
         self.assertIsNone(manager.get("non_existent"))
 
 
+class TestPerformanceProfiles(unittest.TestCase):
+
+    def setUp(self):
+        """Create a temporary directory for settings files."""
+        self.test_dir = Path("tests/temp_profile_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        self.default_path = self.test_dir / "defaults.json"
+        self.user_path = self.test_dir / "user.json"
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.test_dir)
+
+    def _manager(self, defaults, user):
+        self.default_path.write_text(json.dumps(defaults))
+        self.user_path.write_text(json.dumps(user))
+        return SettingsManager(self.default_path, self.user_path)
+
+    def test_user_knobs_override_the_preset(self):
+        """Test that a preset is loaded with the user's knobs merged over it."""
+        manager = self._manager(
+            {"performance_profile": "balanced"},
+            {"performance_profile": "workstation", "performance": {"max_workers": 2, "unknown": 1}},
+        )
+        self.assertEqual(manager.performance_profile, "workstation")
+        self.assertEqual(manager.performance.max_workers, 2)
+        self.assertEqual(manager.performance.compression_level, PROFILE_PRESETS["workstation"].compression_level)
+
+    def test_invalid_knobs_and_profiles_fall_back(self):
+        """Test that invalid values give the preset, and unknown presets the default."""
+        manager = self._manager({}, {"performance_profile": "low_memory_phone", "performance": {"parser_backend": "x"}})
+        self.assertEqual(manager.performance, PROFILE_PRESETS["low_memory_phone"])
+        manager = self._manager({}, {"performance_profile": "mainframe"})
+        self.assertEqual(manager.performance_profile, "balanced")
+        self.assertEqual(manager.performance, PerformanceProfile())
+
+    def test_sizes_are_validated(self):
+        """Test that cache budgets and chunk thresholds must be non-negative integers or None."""
+        for name in ("cache_budget", "chunk_threshold"):
+            for value in ("64", -1, 1.5, True, [1]):
+                with self.subTest(name=name, value=value):
+                    with self.assertRaises(ValueError):
+                        PerformanceProfile(**{name: value}).validate()
+                    manager = self._manager({}, {"performance_profile": "workstation", "performance": {name: value}})
+                    self.assertEqual(manager.performance, PROFILE_PRESETS["workstation"])
+            for value in (None, 0, 1024):
+                PerformanceProfile(**{name: value}).validate()
+
+    def test_only_changed_knobs_are_saved(self):
+        """Test that saving records the differences from the preset, and presets reset them."""
+        manager = self._manager({}, {})
+        manager.apply_profile("low_memory_phone")
+        manager.performance.max_workers = 2
+        manager.save_settings()
+        saved = json.loads(self.user_path.read_text())
+        self.assertEqual(saved["performance_profile"], "low_memory_phone")
+        self.assertEqual(saved["performance"], {"max_workers": 2})
+
+        manager.apply_profile("low_memory_phone")
+        self.assertEqual(manager.performance.max_workers, 1)
+        with self.assertRaises(ValueError):
+            manager.apply_profile("mainframe")
+
+
+class TestContentManagerProfile(unittest.TestCase):
+
+    def setUp(self):
+        """Create a test EPUB with three 1000-byte chapters."""
+        self.test_dir = Path("tests/temp_cache_budget_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        items = "".join(
+            f'<item id="c{i}" href="c{i}.xhtml" media-type="application/xhtml+xml"/>' for i in range(3)
+        )
+        epub_path = self.test_dir / "book.epub"
+        with zipfile.ZipFile(epub_path, 'w') as zf:
+            zf.writestr("mimetype", "application/epub+zip")
+            zf.writestr(
+                "META-INF/container.xml",
+                '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles>'
+                '<rootfile full-path="content.opf" media-type="application/oebps-package+xml"/>'
+                '</rootfiles></container>',
+            )
+            zf.writestr(
+                "content.opf",
+                '<package xmlns="http://www.idpf.org/2007/opf" version="2.0"><metadata/>'
+                f'<manifest>{items}</manifest><spine/></package>',
+            )
+            for i in range(3):
+                zf.writestr(f"c{i}.xhtml", f"<p>{i}</p>".ljust(1000))
+        loader = EpubLoader(epub_path)
+        self.book = loader.load()
+        loader.close()
+        self.content_manager = self.book.content_manager
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.content_manager.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_cache_budget_evicts_least_recently_used(self):
+        """Test that unmodified content past the budget is dropped, oldest first."""
+        self.content_manager.apply_profile(PerformanceProfile(cache_budget=2000))
+        self.content_manager.get_text("c0.xhtml")
+        self.content_manager.update_content("c1.xhtml", b"<p>edited</p>".ljust(1000))
+        self.content_manager.get_content("c2.xhtml")
+        self.content_manager.get_text("c0.xhtml")  # Now the most recently used
+        self.content_manager.apply_profile(PerformanceProfile(cache_budget=1000))
+        self.assertEqual(list(self.content_manager._content_cache), ["c1.xhtml", "c0.xhtml"])
+        self.assertIn("c0.xhtml", self.content_manager._text_cache)
+
+        # Modified content is kept whatever the budget.
+        self.content_manager.apply_profile(PerformanceProfile(cache_budget=0))
+        self.assertEqual(list(self.content_manager._content_cache), ["c1.xhtml"])
+        self.assertNotIn("c0.xhtml", self.content_manager._text_cache)
+
+    def test_search_layers_without_index(self):
+        """Test that with the search index off only one document's layers are kept."""
+        self.content_manager.apply_profile(PerformanceProfile(search_index=False))
+        self.content_manager.get_trigram_index("c0.xhtml")
+        self.content_manager.get_trigram_index("c1.xhtml")
+        self.assertEqual(list(self.content_manager._normalized_cache), ["c1.xhtml"])
+        self.assertEqual(list(self.content_manager._trigram_cache), ["c1.xhtml"])
+
+    def test_book_trigram_index_without_search_index(self):
+        """Test that the book's trigram index is kept without the search index, until a change."""
+        self.content_manager.apply_profile(PerformanceProfile(search_index=False))
+        hrefs = ["c0.xhtml", "c1.xhtml", "c2.xhtml"]
+        index = self.content_manager.get_book_trigram_index(hrefs)
+        self.assertEqual(index.candidates("<2>", 0), set())
+        self.assertEqual(list(self.content_manager._normalized_cache), ["c2.xhtml"])
+
+        self.content_manager.update_content("c0.xhtml", b"<p>edited</p>")
+        self.assertNotIn("c0.xhtml", index)
+        self.assertIn("c1.xhtml", index)
+        self.content_manager.get_book_trigram_index(hrefs)
+        self.assertEqual(index.candidates("edited", 0), {"c0.xhtml"})
+
+
 if __name__ == "__main__":
     unittest.main()
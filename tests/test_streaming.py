@@ -0,0 +1,159 @@
+import codecs
+import io
+import re
+import shutil
+import unittest
+import zipfile
+from pathlib import Path
+
+from epub_editor_pro.core.epub_loader import EpubLoader
+from epub_editor_pro.core.replace_engine import ReplaceEngine
+from epub_editor_pro.core.search_engine import SearchEngine
+from epub_editor_pro.core.settings_model import PerformanceProfile
+from epub_editor_pro.core.streaming import StreamingUnsupported, iter_text_lines, stream_replace
+
+
+CONTAINER_XML = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+
+CONTENT_OPF = """<?xml version="1.0"?>
+<package version="2.0" xmlns="http://www.idpf.org/2007/opf" unique-identifier="pub-id">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:title>Test Title</dc:title>
+  </metadata>
+  <manifest>
+    <item id="big" href="big.xhtml" media-type="application/xhtml+xml"/>
+    <item id="small" href="small.xhtml" media-type="application/xhtml+xml"/>
+  </manifest>
+  <spine>
+    <itemref idref="big"/>
+    <itemref idref="small"/>
+  </spine>
+</package>"""
+
+DOCUMENT = """<?xml version="1.0" encoding="utf-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" xml:lang="en">
+<head><title>Big &amp; long</title><style>p.theme { color: red; }</style></head>
+<body>
+<!-- The theme starts here. -->
+<p epub:type="theme" class="a&quot;b">The theme &lt;one&gt; <b>theme</b>&#160;two<br/></p>
+<p>Last theme line</p>
+</body>
+</html>"""
+
+
+class TestStreaming(unittest.TestCase):
+
+    def setUp(self):
+        """Create an EPUB with one large and one small chapter."""
+        self.test_dir = Path("tests/temp_streaming_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        # Enough paragraphs to span several reads.
+        paragraphs = "\n".join(f"<p>Paragraph {i} of the theme.</p>" for i in range(5000))
+        self.big = DOCUMENT.replace("</body>", paragraphs + "\n</body>")
+        self.epub_path = self.test_dir / "book.epub"
+        with zipfile.ZipFile(self.epub_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+            zf.writestr("META-INF/container.xml", CONTAINER_XML)
+            zf.writestr("OEBPS/content.opf", CONTENT_OPF)
+            zf.writestr("OEBPS/big.xhtml", self.big)
+            zf.writestr("OEBPS/small.xhtml", DOCUMENT.replace("theme", "thermal theme"))
+        self.book = EpubLoader(self.epub_path).load()
+        self.threshold = len(DOCUMENT) * 2
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.book.content_manager.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_text_lines(self):
+        """Test that text is split into lines, without styles, comments or markup."""
+        lines = list(iter_text_lines(io.BytesIO(DOCUMENT.encode("utf-8"))))
+        self.assertEqual(lines[1], "Big & long")
+        self.assertEqual(lines[4], "The theme <one> theme\xa0two")
+        self.assertEqual(lines[5], "Last theme line")
+
+    def test_stream_replace_round_trip(self):
+        """Test that only text changes, and the markup is written back as it was."""
+        count, new_content = stream_replace(
+            io.BytesIO(DOCUMENT.encode("utf-8")),
+            [(re.compile("theme"), "motif"), (re.compile("motif <"), "motif ≤")],
+        )
+        self.assertEqual(count, 4)
+        self.assertEqual(
+            new_content.decode("utf-8"),
+            DOCUMENT.replace("<b>theme", "<b>motif")
+            .replace("The theme &lt;", "The motif ≤")
+            .replace("Last theme", "Last motif")
+            .replace("&#160;", "\xa0"),
+        )
+
+    def test_stream_replace_keeps_encoding(self):
+        """Test that a document is written back in its declared encoding."""
+        document = DOCUMENT.replace("utf-8", "iso-8859-1").replace("two", "deux à").encode("iso-8859-1")
+        _, new_content = stream_replace(io.BytesIO(document), [(re.compile("deux"), "trois")])
+        self.assertIn("trois à".encode("iso-8859-1"), new_content)
+        self.assertIsNone(stream_replace(io.BytesIO(document), [(re.compile("absent"), "")])[1])
+
+    def test_stream_replace_writes_one_bom(self):
+        """Test that documents with a byte order mark keep exactly one, however long."""
+        body = "".join(f"<p>Paragraph {i}, theme.</p>\n" for i in range(5000))
+        for encoding, bom, declared in (
+            ("utf-8-sig", codecs.BOM_UTF8, "utf-8"),
+            ("utf-16", (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE), "utf-16"),
+        ):
+            with self.subTest(encoding=encoding):
+                document = (
+                    f'<?xml version="1.0" encoding="{declared}"?>\n'
+                    f'<html xmlns="http://www.w3.org/1999/xhtml"><body>{body}</body></html>'
+                )
+                count, new_content = stream_replace(
+                    io.BytesIO(document.encode(encoding)), [(re.compile("theme"), "motif")]
+                )
+                self.assertEqual(count, 5000)
+                self.assertTrue(new_content.startswith(bom))
+                text = new_content.decode(encoding)
+                self.assertNotIn("\ufeff", text)
+                self.assertEqual(text, document.replace("theme", "motif"))
+
+    def test_dtd_entities_are_unsupported(self):
+        """Test that entities the parser would drop stop the streaming rewrite."""
+        with self.assertRaises(StreamingUnsupported):
+            stream_replace(io.BytesIO(b"<p>a&nbsp;theme</p>"), [(re.compile("theme"), "motif")])
+
+    def test_search_streams_oversized_documents(self):
+        """Test that streamed and parsed searches give the same results."""
+        def search(threshold):
+            engine = SearchEngine(self.book, PerformanceProfile(chunk_threshold=threshold))
+            return [
+                (r.item_href, r.line_number, r.match_text, r.context_before)
+                for r in engine.search("theme", False, True, False)
+            ]
+
+        streamed = search(self.threshold)
+        # The large document was never read whole into the cache.
+        self.assertNotIn("big.xhtml", self.book.content_manager._content_cache)
+        self.assertEqual(len(streamed), 5003 + 3)
+        self.assertEqual(streamed, search(None))
+
+    def test_replace_streams_oversized_documents(self):
+        """Test that a replace-all rewrites a large document by streaming it."""
+        engine = ReplaceEngine(self.book, PerformanceProfile(chunk_threshold=self.threshold))
+        # The small chapter is parsed, and its comment edited too.
+        self.assertEqual(engine.replace_all("theme", "motif", True, True, False), 5003 + 4)
+        big = self.book.content_manager.get_text("big.xhtml")
+        self.assertTrue(big.startswith('<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>'))
+        self.assertIn("<p>Paragraph 4999 of the motif.</p>", big)
+        self.assertIn("p.theme { color: red; }", big)
+        self.assertEqual(self.book.content_manager.get_text("small.xhtml").count("thermal motif"), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import codecs
+import unittest
+import zipfile
+import shutil
+from pathlib import Path
+
+from epub_editor_pro.core.epub_loader import EpubLoader
+from epub_editor_pro.core.replace_engine import ReplaceEngine
+from epub_editor_pro.core.search_models import SearchResult
+from epub_editor_pro.utils.text_utils import detect_encoding, document_encoding
+
+
+CONTAINER_XML = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+
+CONTENT_OPF = """<?xml version="1.0"?>
+<package version="2.0" xmlns="http://www.idpf.org/2007/opf" unique-identifier="pub-id">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:title>Test Title</dc:title>
+  </metadata>
+  <manifest>
+    <item id="ch1" href="ch1.xhtml" media-type="application/xhtml+xml"/>
+  </manifest>
+  <spine>
+    <itemref idref="ch1"/>
+  </spine>
+</package>"""
+
+LATIN1_CHAPTER = """<?xml version="1.0" encoding="ISO-8859-1"?>
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head><meta http-equiv="Content-Type" content="text/html; charset=iso-8859-1"/></head>
+<body><p>Un café à la crème.</p></body>
+</html>"""
+
+
+class TestDetectEncoding(unittest.TestCase):
+
+    def test_bom_wins(self):
+        """Test that a byte order mark takes precedence over declarations."""
+        self.assertEqual(detect_encoding(codecs.BOM_UTF8 + b'<?xml version="1.0" encoding="latin-1"?>'), "utf-8-sig")
+        self.assertEqual(detect_encoding("<p/>".encode("utf-16")), "utf-16")
+        self.assertEqual(detect_encoding("<p/>".encode("utf-32")), "utf-32")
+
+    def test_declarations(self):
+        """Test the XML declaration, then the meta charset."""
+        self.assertEqual(detect_encoding(b"<?xml version='1.0' encoding='ISO-8859-1'?><html/>"), "iso8859-1")
+        self.assertEqual(detect_encoding(b'<html><head><meta charset="windows-1252"></head></html>'), "cp1252")
+        self.assertEqual(
+            detect_encoding(b'<meta http-equiv="Content-Type" content="text/html; charset=Shift_JIS"/>'),
+            "shift_jis",
+        )
+
+    def test_defaults_to_utf8(self):
+        """Test undeclared, unknown and implausible declarations."""
+        self.assertEqual(detect_encoding(b"<html><body>plain</body></html>"), "utf-8")
+        self.assertEqual(detect_encoding(b'<?xml version="1.0" encoding="no-such-codec"?>'), "utf-8")
+        self.assertEqual(detect_encoding(b'<?xml version="1.0" encoding="UTF-16"?>'), "utf-8")
+
+    def test_document_encoding_is_lossless(self):
+        """Test that mislabelled documents get an encoding they decode in without loss."""
+        self.assertEqual(document_encoding(LATIN1_CHAPTER.encode("latin-1")), "iso8859-1")
+        mislabelled = LATIN1_CHAPTER.replace("ISO-8859-1", "utf-8").encode("latin-1")
+        encoding = document_encoding(mislabelled)
+        self.assertEqual(mislabelled.decode(encoding).encode(encoding), mislabelled)
+        self.assertIn("café", mislabelled.decode(encoding))
+        garbage = b'<?xml version="1.0" encoding="utf-8"?><p>\x81\x8d\xff\xfe\x00</p>'
+        encoding = document_encoding(garbage)
+        self.assertEqual(garbage.decode(encoding).encode(encoding), garbage)
+
+
+class TestContentManagerEncoding(unittest.TestCase):
+
+    def setUp(self):
+        """Create a test EPUB with a Latin-1 chapter."""
+        self.test_dir = Path("tests/temp_encoding_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        epub_path = self.test_dir / "book.epub"
+        with zipfile.ZipFile(epub_path, 'w') as zf:
+            zf.writestr("mimetype", "application/epub+zip")
+            zf.writestr("META-INF/container.xml", CONTAINER_XML)
+            zf.writestr("OEBPS/content.opf", CONTENT_OPF)
+            zf.writestr("OEBPS/ch1.xhtml", LATIN1_CHAPTER.encode("latin-1"))
+
+        loader = EpubLoader(epub_path)
+        self.book = loader.load()
+        loader.close()
+        self.content_manager = self.book.content_manager
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.content_manager.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_text_is_decoded_once(self):
+        """Test that decoded text is cached until the content changes."""
+        text = self.content_manager.get_text("ch1.xhtml")
+        self.assertIn("café à la crème", text)
+        self.assertIs(self.content_manager.get_text("ch1.xhtml"), text)
+
+        self.content_manager.update_content("ch1.xhtml", b"<p>new</p>")
+        self.assertEqual(self.content_manager.get_text("ch1.xhtml"), "<p>new</p>")
+
+    def test_replacements_keep_the_original_encoding(self):
+        """Test that replace-all and replace-one write Latin-1 back."""
+        engine = ReplaceEngine(self.book)
+        self.assertEqual(engine.replace_all("café", "thé", False, False, False), 1)
+        content = self.content_manager.get_content("ch1.xhtml")
+        self.assertTrue(content.startswith(b'<?xml version="1.0" encoding="ISO-8859-1"?>'))
+        self.assertIn("thé".encode("latin-1"), content)
+        self.assertIn(b"charset=iso-8859-1", content)
+
+        line = next(
+            i for i, text in enumerate(self.content_manager.get_text("ch1.xhtml").splitlines())
+            if "crème" in text
+        )
+        result = SearchResult("ch1.xhtml", line, "crème", "", "", "ch1.xhtml")
+        self.assertTrue(engine.replace_one(result, "crème € brûlée"))
+        content = self.content_manager.get_content("ch1.xhtml")
+        # The euro sign does not exist in Latin-1 and becomes a character reference.
+        self.assertIn("crème &#8364; brûlée".encode("latin-1"), content)
+
+    def test_mislabelled_document_keeps_its_bytes(self):
+        """Test that replacing in a document with a wrong charset label loses nothing else."""
+        mislabelled = LATIN1_CHAPTER.replace("ISO-8859-1", "utf-8").replace("iso-8859-1", "utf-8")
+        self.content_manager.update_content("ch1.xhtml", mislabelled.encode("latin-1"))
+        self.assertNotIn("\ufffd", self.content_manager.get_text("ch1.xhtml"))
+        self.content_manager.update_text(
+            "ch1.xhtml", self.content_manager.get_text("ch1.xhtml").replace("Un café", "Le café")
+        )
+        expected = mislabelled.replace("Un café", "Le café").encode("latin-1")
+        self.assertEqual(self.content_manager.get_content("ch1.xhtml"), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import shutil
+import threading
+import unittest
+import zipfile
+from pathlib import Path
+from unittest.mock import patch
+
+from epub_editor_pro.core.epub_loader import EpubLoader
+from epub_editor_pro.core.search_engine import SearchEngine
+from epub_editor_pro.core.settings_model import PerformanceProfile
+from epub_editor_pro.core.warmup import NORMALIZED_FACTOR, TEXT_FACTOR, CacheWarmer
+
+
+CONTAINER_XML = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+
+CONTENT_OPF = """<?xml version="1.0"?>
+<package version="2.0" xmlns="http://www.idpf.org/2007/opf" unique-identifier="pub-id">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:title>Test Title</dc:title>
+  </metadata>
+  <manifest>
+    <item id="ch1" href="ch1.xhtml" media-type="application/xhtml+xml"/>
+    <item id="ch2" href="ch2.xhtml" media-type="application/xhtml+xml"/>
+    <item id="ch3" href="ch3.xhtml" media-type="application/xhtml+xml"/>
+  </manifest>
+  <spine>
+    <itemref idref="ch3"/>
+    <itemref idref="ch1"/>
+    <itemref idref="ch2"/>
+  </spine>
+</package>"""
+
+
+def _xhtml(body):
+    return f'<html xmlns="http://www.w3.org/1999/xhtml"><head><title>t</title></head><body>{body}</body></html>'
+
+
+class TestCacheWarmer(unittest.TestCase):
+
+    def setUp(self):
+        """Create a test EPUB and load it."""
+        self.test_dir = Path("tests/temp_warmup_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        self.epub_path = self.test_dir / "book.epub"
+        self.chapter = _xhtml("<p>Some words to warm.</p>")
+        with zipfile.ZipFile(self.epub_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+            zf.writestr("META-INF/container.xml", CONTAINER_XML)
+            zf.writestr("OEBPS/content.opf", CONTENT_OPF)
+            for name in ("ch1", "ch2", "ch3"):
+                zf.writestr(f"OEBPS/{name}.xhtml", self.chapter)
+        self.book = EpubLoader(self.epub_path).load()
+
+    def tearDown(self):
+        """Close the book and remove the temporary directory."""
+        self.book.content_manager.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_warms_in_reading_order(self):
+        """Test that spine documents are parsed in order, so searching parses nothing."""
+        warmer = CacheWarmer(self.book)
+        self.assertEqual(warmer.run(), ["ch3.xhtml", "ch1.xhtml", "ch2.xhtml"])
+        self.assertIn("ch2.xhtml", self.book.content_manager._normalized_cache)
+        with patch("epub_editor_pro.core.content_manager.text_lines") as text_lines:
+            results = list(SearchEngine(self.book).search("warm", False, True, False))
+        text_lines.assert_not_called()
+        self.assertEqual(len(results), 3)
+
+    def test_stays_within_budget(self):
+        """Test that warming stops before the content and its text outgrow the budget."""
+        profile = PerformanceProfile(cache_budget=2 * (1 + TEXT_FACTOR) * len(self.chapter), search_index=False)
+        warmer = CacheWarmer(self.book, profile)
+        self.assertEqual(warmer.run(), ["ch3.xhtml", "ch1.xhtml"])
+        self.assertEqual(self.book.content_manager._normalized_cache, {})
+
+    def test_normalized_text_counts_against_budget(self):
+        """Test that documents whose normalized text does not fit only get their lines."""
+        size = len(self.chapter)
+        budget = (3 * (1 + TEXT_FACTOR) + NORMALIZED_FACTOR) * size
+        warmer = CacheWarmer(self.book, PerformanceProfile(cache_budget=budget))
+        self.assertEqual(warmer.run(), ["ch3.xhtml", "ch1.xhtml", "ch2.xhtml"])
+        self.assertEqual(list(self.book.content_manager._normalized_cache), ["ch3.xhtml"])
+
+    def test_paused_during_user_operations(self):
+        """Test that warming waits for user operations, and can be cancelled meanwhile."""
+        warmer = CacheWarmer(self.book)
+        results = []
+        cancelled = threading.Event()
+        with warmer.paused():
+            thread = threading.Thread(target=lambda: results.append(warmer.run(cancelled.is_set)))
+            thread.start()
+            thread.join(0.3)
+            self.assertTrue(thread.is_alive())
+            self.assertEqual(self.book.content_manager._content_cache, {})
+            cancelled.set()
+            thread.join()
+        self.assertEqual(results, [None])
+        self.assertEqual(warmer.run(), ["ch3.xhtml", "ch1.xhtml", "ch2.xhtml"])
+
+
+if __name__ == "__main__":
+    unittest.main()
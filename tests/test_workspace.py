@@ -0,0 +1,168 @@
+import os
+import shutil
+import sys
+import time
+import unittest
+import zipfile
+from pathlib import Path
+
+from epub_editor_pro.core.epub_loader import EpubLoader
+from epub_editor_pro.core.epub_saver import EpubSaver
+from epub_editor_pro.core.workspace import InotifyWatcher, Workspace, WorkspaceError
+
+
+CONTAINER_XML = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+
+CONTENT_OPF = """<?xml version="1.0"?>
+<package version="2.0" xmlns="http://www.idpf.org/2007/opf" unique-identifier="pub-id">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:title>Test Title</dc:title>
+  </metadata>
+  <manifest>
+    <item id="ch1" href="text/ch1.xhtml" media-type="application/xhtml+xml"/>
+    <item id="ch2" href="text/ch2.xhtml" media-type="application/xhtml+xml"/>
+  </manifest>
+  <spine>
+    <itemref idref="ch1"/>
+    <itemref idref="ch2"/>
+  </spine>
+</package>"""
+
+
+def _xhtml(body):
+    return f'<html xmlns="http://www.w3.org/1999/xhtml"><head><title>t</title></head><body>{body}</body></html>'
+
+
+class TestWorkspace(unittest.TestCase):
+
+    def setUp(self):
+        """Create a test EPUB and load it."""
+        self.test_dir = Path("tests/temp_workspace_files")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        self.epub_path = self.test_dir / "book.epub"
+        with zipfile.ZipFile(self.epub_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+            zf.writestr("META-INF/container.xml", CONTAINER_XML)
+            zf.writestr("OEBPS/content.opf", CONTENT_OPF)
+            zf.writestr("OEBPS/text/ch1.xhtml", _xhtml("<p>One</p>"))
+            zf.writestr("OEBPS/text/ch2.xhtml", _xhtml("<p>Two</p>"))
+        loader = EpubLoader(self.epub_path)
+        self.book = loader.load()
+        loader.close()
+        self.directory = self.test_dir / "workspace"
+        self.workspace = Workspace(self.epub_path, self.directory, polling=True)
+
+    def tearDown(self):
+        """Stop watching and remove the temporary directory."""
+        self.book.content_manager.close_workspace()
+        self.workspace.close()
+        self.book.content_manager.close()
+        shutil.rmtree(self.test_dir)
+
+    def _edit_externally(self, name, body):
+        path = self.directory / name
+        path.write_text(_xhtml(body), encoding="utf-8")
+        # Make sure the change is visible to mtime comparisons.
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000_000))
+
+    def test_external_edits_invalidate_and_save(self):
+        """Test that files edited by other programs replace cached content and are saved."""
+        self.assertTrue(self.workspace.open())
+        content_manager = self.book.content_manager
+        content_manager.attach_workspace(self.workspace)
+        self.assertIn("One", content_manager.get_text("text/ch1.xhtml"))
+
+        content_manager.update_text("text/ch2.xhtml", _xhtml("<p>Ours</p>"))
+        self.assertIn(b"Ours", (self.directory / "OEBPS/text/ch2.xhtml").read_bytes())
+        self._edit_externally("OEBPS/text/ch1.xhtml", "<p>Theirs</p>")
+        self.workspace._watcher.check()
+
+        # Our own write to ch2 is recognized and not reported.
+        self.assertEqual(content_manager.sync_workspace(), ["text/ch1.xhtml"])
+        self.assertIn("Theirs", content_manager.get_text("text/ch1.xhtml"))
+        self.assertTrue(content_manager.is_item_modified("text/ch1.xhtml"))
+
+        EpubSaver(self.book).save(backup=False)
+        with zipfile.ZipFile(self.epub_path) as zf:
+            self.assertIn(b"Theirs", zf.read("OEBPS/text/ch1.xhtml"))
+            self.assertIn(b"Ours", zf.read("OEBPS/text/ch2.xhtml"))
+
+    def test_reopen_reuses_extraction_and_finds_offline_edits(self):
+        """Test that an up-to-date workspace is not extracted again."""
+        self.assertTrue(self.workspace.open())
+        self.workspace.close()
+        self._edit_externally("OEBPS/text/ch2.xhtml", "<p>Offline</p>")
+
+        reopened = Workspace(self.epub_path, self.directory, polling=True)
+        self.assertFalse(reopened.open())
+        self.assertEqual(reopened.drain_changes(), {"OEBPS/text/ch2.xhtml"})
+        reopened.close()
+
+    def _replace_archive(self):
+        with zipfile.ZipFile(self.epub_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+            zf.writestr("META-INF/container.xml", CONTAINER_XML)
+            zf.writestr("OEBPS/content.opf", CONTENT_OPF)
+            zf.writestr("OEBPS/text/ch1.xhtml", _xhtml("<p>New one</p>"))
+        stat = self.epub_path.stat()
+        os.utime(self.epub_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000_000))
+
+    def test_changed_archive_is_extracted_afresh(self):
+        """Test that a stale workspace is replaced, without files the archive no longer has."""
+        self.assertTrue(self.workspace.open())
+        self.workspace.close()
+        self._replace_archive()
+
+        reopened = Workspace(self.epub_path, self.directory, polling=True)
+        self.assertTrue(reopened.open())
+        reopened.close()
+        self.assertIn("New one", (self.directory / "OEBPS/text/ch1.xhtml").read_text(encoding="utf-8"))
+        self.assertFalse((self.directory / "OEBPS/text/ch2.xhtml").exists())
+        self.assertEqual(sorted(path.name for path in self.test_dir.iterdir()), ["book.epub", "workspace"])
+
+    def test_changed_archive_keeps_unsaved_edits(self):
+        """Test that a workspace with unsaved edits is kept when its archive changed."""
+        self.assertTrue(self.workspace.open())
+        self.workspace.close()
+        self._edit_externally("OEBPS/text/ch2.xhtml", "<p>Unsaved</p>")
+        self._replace_archive()
+
+        with self.assertRaises(WorkspaceError):
+            Workspace(self.epub_path, self.directory, polling=True).open()
+        self.assertIn("Unsaved", (self.directory / "OEBPS/text/ch2.xhtml").read_text(encoding="utf-8"))
+
+    def test_invalid_member_names(self):
+        """Test that member names cannot escape the workspace."""
+        with self.assertRaises(WorkspaceError):
+            self.workspace.path_for("../outside.txt")
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux only")
+    def test_inotify_watcher(self):
+        """Test that the inotify watcher reports written files, including in new directories."""
+        changes = []
+        self.directory.mkdir()
+        watcher = InotifyWatcher(self.directory, changes.append)
+        watcher.start()
+        try:
+            (self.directory / "a.txt").write_text("a")
+            (self.directory / "sub").mkdir()
+            time.sleep(0.1)
+            (self.directory / "sub" / "b.txt").write_text("b")
+            deadline = time.monotonic() + 5
+            while {"a.txt", "sub/b.txt"} - set(changes) and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            watcher.stop()
+        self.assertLessEqual({"a.txt", "sub/b.txt"}, set(changes))
+
+
+if __name__ == "__main__":
+    unittest.main()